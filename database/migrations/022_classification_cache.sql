@@ -0,0 +1,50 @@
+-- =============================================================================
+-- Migration 022 — Classification Result Cache
+--
+-- PURPOSE:
+--   Shared (cross-process) tier of the Python analyser's classification
+--   cache. SMEs send the same recurring supplier lines every month
+--   ("Origin Energy", "BP Station", "Telstra"); caching the LLM verdict
+--   per normalised line avoids paying for a Groq/Gemini round-trip again.
+--
+-- KEY:
+--   cache_key = SHA-256 of (factor-set version, normalised description,
+--   normalised supplier, normalised account name). The factor-set version
+--   changes whenever an NGA edition / factor value changes, so stale
+--   verdicts are never served against a new catalogue.
+--
+-- EVICTION:
+--   Rows carry expires_at; readers ignore expired rows and the analyser
+--   deletes them opportunistically.
+--
+-- TENANCY:
+--   The key has no company in it: one row serves every tenant sending the
+--   same normalised line. Rows therefore hold only the verdict (factor id,
+--   status, confidence). The LLM's reasoning is NOT stored — it can quote
+--   a tenant's transaction description — and the analyser writes a
+--   generic note on a hit. The normalised line itself is only present as
+--   a SHA-256 hash.
+--
+-- Depends on: schema.sql (emission_factors).
+-- =============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS classification_cache (
+    cache_key           TEXT        PRIMARY KEY,
+    factor_set_version  TEXT        NOT NULL,
+    emission_factor_id  UUID        REFERENCES emission_factors (id) ON DELETE CASCADE,
+    classification_status TEXT      NOT NULL
+        CHECK (classification_status IN ('classified', 'needs_review', 'factor_not_found')),
+    confidence          NUMERIC(4,3),
+    hit_count           INTEGER     NOT NULL DEFAULT 0,
+    created_at          TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    expires_at          TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_cc_expires ON classification_cache (expires_at);
+
+-- Service-role only: the analyser connects with the backend credentials.
+ALTER TABLE classification_cache ENABLE ROW LEVEL SECURITY;
+
+COMMIT;
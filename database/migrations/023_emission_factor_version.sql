@@ -0,0 +1,55 @@
+-- =============================================================================
+-- Migration 023 — Emission Factor Version Stamp
+--
+-- PURPOSE:
+--   The Python analyser keeps a process-local cache of decoded emission
+--   factors per (nga_year, state). NGA factors change about once a year
+--   (migrations 014, 017), so instead of re-querying on every request the
+--   cache checks a single version stamp and/or listens on a channel.
+--
+-- MECHANISM:
+--   1. emission_factor_version — one-row table holding a monotonically
+--      increasing version number.
+--   2. Statement-level trigger on emission_factors (INSERT / UPDATE /
+--      DELETE / TRUNCATE) bumps the version and sends
+--      NOTIFY emission_factors_changed, '<version>'.
+--
+-- Depends on: schema.sql (emission_factors).
+-- =============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS emission_factor_version (
+    id          SMALLINT    PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version     BIGINT      NOT NULL DEFAULT 1,
+    updated_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO emission_factor_version (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_emission_factor_version()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+DECLARE
+    new_version BIGINT;
+BEGIN
+    UPDATE emission_factor_version
+       SET version = version + 1, updated_at = NOW()
+     WHERE id = 1
+    RETURNING version INTO new_version;
+
+    PERFORM pg_notify('emission_factors_changed', new_version::TEXT);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS tg_emission_factor_version ON emission_factors;
+CREATE TRIGGER tg_emission_factor_version
+    AFTER INSERT OR UPDATE OR DELETE ON emission_factors
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_emission_factor_version();
+
+DROP TRIGGER IF EXISTS tg_emission_factor_version_truncate ON emission_factors;
+CREATE TRIGGER tg_emission_factor_version_truncate
+    AFTER TRUNCATE ON emission_factors
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_emission_factor_version();
+
+COMMIT;
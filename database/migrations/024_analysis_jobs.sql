@@ -0,0 +1,79 @@
+-- =============================================================================
+-- Migration 024 — Analysis Job Queue
+--
+-- PURPOSE:
+--   A full-year ledger can't be classified inside one HTTP request.
+--   POST /analyse/jobs stages the transactions here and returns a job id;
+--   the Python analyser's worker pool claims jobs and processes them in
+--   chunks. Because the queue lives in Postgres, jobs survive restarts.
+--
+-- MECHANISM:
+--   1. analysis_jobs — one row per job: status, progress cursor
+--      (next_seq), the running aggregate (JSONB) and the final summary.
+--   2. analysis_job_items — the staged input, one row per transaction,
+--      plus its ClassifiedTransaction result once its chunk commits.
+--   3. Workers claim with FOR UPDATE SKIP LOCKED and hold a lease
+--      (heartbeat_at). A job whose lease expired — the worker died — is
+--      claimed again and resumes from next_seq: each chunk's results,
+--      transaction upserts and progress commit in one transaction, so
+--      nothing is lost or written twice.
+--
+-- Depends on: schema.sql (companies), 021 (current_company_id()).
+-- =============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+    id                      UUID        PRIMARY KEY DEFAULT gen_random_uuid(),
+    company_id              UUID        NOT NULL REFERENCES companies (id) ON DELETE CASCADE,
+    nga_year                SMALLINT    NOT NULL,
+    state                   TEXT,
+    status                  TEXT        NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+    total_transactions      INTEGER     NOT NULL,
+    processed_transactions  INTEGER     NOT NULL DEFAULT 0,
+    chunk_size              INTEGER     NOT NULL,
+    next_seq                INTEGER     NOT NULL DEFAULT 0,     -- first item not yet committed
+    aggregate               JSONB,                              -- RunningAggregate state
+    summary                 JSONB,                              -- final summary once completed
+    error                   TEXT,
+    attempts                INTEGER     NOT NULL DEFAULT 0,
+    locked_by               TEXT,
+    heartbeat_at            TIMESTAMPTZ,
+    created_at              TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at              TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    completed_at            TIMESTAMPTZ
+);
+
+-- Claim order for workers; completed / failed jobs drop out of the index.
+CREATE INDEX IF NOT EXISTS idx_aj_claimable
+    ON analysis_jobs (created_at)
+    WHERE status IN ('queued', 'running');
+
+CREATE INDEX IF NOT EXISTS idx_aj_company ON analysis_jobs (company_id, created_at DESC);
+
+CREATE TABLE IF NOT EXISTS analysis_job_items (
+    job_id   UUID    NOT NULL REFERENCES analysis_jobs (id) ON DELETE CASCADE,
+    seq      INTEGER NOT NULL,                                  -- 0-based input position
+    payload  JSONB   NOT NULL,                                  -- TransactionInput
+    result   JSONB,                                             -- ClassifiedTransaction
+    PRIMARY KEY (job_id, seq)
+);
+
+DROP TRIGGER IF EXISTS set_analysis_jobs_updated_at ON analysis_jobs;
+CREATE TRIGGER set_analysis_jobs_updated_at
+    BEFORE UPDATE ON analysis_jobs
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+-- Tenant isolation for client-side reads; the analyser uses the service role.
+ALTER TABLE analysis_jobs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE analysis_jobs FORCE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS analysis_jobs_select ON analysis_jobs;
+CREATE POLICY analysis_jobs_select ON analysis_jobs
+    FOR SELECT
+    USING (company_id = current_company_id());
+
+ALTER TABLE analysis_job_items ENABLE ROW LEVEL SECURITY;
+
+COMMIT;
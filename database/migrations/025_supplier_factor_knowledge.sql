@@ -0,0 +1,155 @@
+-- =============================================================================
+-- Migration 025 — Supplier → Factor Knowledge (cross-company)
+--
+-- PURPOSE:
+--   Every company buys from the same suppliers ("Origin Energy", "Ampol",
+--   "Qantas", "Telstra"). Once a supplier has been classified confidently —
+--   or a reviewer has confirmed / corrected its factor — other companies'
+--   lines from that supplier should not need a Groq/Gemini call. This table
+--   is the shared supplier → factor memory the Python analyser consults
+--   before any LLM call.
+--
+-- KEY:
+--   supplier_key = supplier_key(transactions.supplier_name): lower-cased,
+--   non-alphanumerics → space, legal suffixes (pty, ltd, limited, inc, …)
+--   dropped, whitespace collapsed. "ORIGIN ENERGY PTY LTD" and
+--   "Origin Energy Ltd." share one key. The analyser's Python normaliser
+--   (supplier_knowledge.supplier_key) must stay identical to this function.
+--   A GiST trigram index serves the fuzzy fallback (nearest key by
+--   pg_trgm distance) for spellings that still differ ("origin energy
+--   retail", "orgin energy").
+--
+-- MECHANISM:
+--   1. One row per (supplier_key, emission_factor_id) with two evidence
+--      counters: confirmed_count (reviewed or manually classified lines)
+--      and auto_count (automatic classifications with confidence ≥ 0.90).
+--   2. Statement-level triggers on transactions (INSERT / UPDATE, with
+--      transition tables) fold each write's qualifying rows into the
+--      counters in one set-based upsert. A row counts again only when its
+--      factor, status or review stamp changes — re-analysing the same lines
+--      does not inflate the evidence. Lines the analyser answered from this
+--      table (classification_notes 'Supplier knowledge…') are never fed back.
+--   3. Backfill from existing transactions.
+--
+--   No tenant data is stored: only a normalised supplier name, a factor id
+--   and counts.
+--
+-- Depends on: schema.sql (transactions, emission_factors).
+-- =============================================================================
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE OR REPLACE FUNCTION supplier_key(name TEXT)
+RETURNS TEXT LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT NULLIF(btrim(regexp_replace(
+               regexp_replace(
+                   regexp_replace(lower(COALESCE(name, '')), '[^a-z0-9]+', ' ', 'g'),
+                   '\m(pty|ltd|limited|inc|llc|plc|co|corp|corporation|the)\M', ' ', 'g'),
+               '\s+', ' ', 'g')), '')
+$$;
+
+CREATE TABLE IF NOT EXISTS supplier_factor_knowledge (
+    supplier_key        TEXT        NOT NULL,
+    emission_factor_id  UUID        NOT NULL REFERENCES emission_factors (id) ON DELETE CASCADE,
+    confirmed_count     INTEGER     NOT NULL DEFAULT 0,
+    auto_count          INTEGER     NOT NULL DEFAULT 0,
+    updated_at          TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (supplier_key, emission_factor_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sfk_key_trgm
+    ON supplier_factor_knowledge USING gist (supplier_key gist_trgm_ops);
+
+-- Service-role only: the analyser connects with the backend credentials.
+ALTER TABLE supplier_factor_knowledge ENABLE ROW LEVEL SECURITY;
+
+-- ---------------------------------------------------------------------------
+-- Learning triggers
+-- ---------------------------------------------------------------------------
+
+CREATE OR REPLACE FUNCTION learn_supplier_factors()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO supplier_factor_knowledge AS k
+               (supplier_key, emission_factor_id, confirmed_count, auto_count)
+        SELECT supplier_key(n.supplier_name), n.emission_factor_id,
+               COUNT(*) FILTER (WHERE n.reviewed_at IS NOT NULL OR n.classified_by <> 'ai'),
+               COUNT(*) FILTER (WHERE n.reviewed_at IS NULL AND n.classified_by = 'ai')
+          FROM new_rows n
+         WHERE n.classification_status = 'classified'
+           AND n.emission_factor_id IS NOT NULL
+           AND supplier_key(n.supplier_name) IS NOT NULL
+           AND (n.reviewed_at IS NOT NULL OR n.classified_by <> 'ai'
+                OR n.classification_confidence >= 0.90)
+           AND COALESCE(n.classification_notes, '') NOT LIKE 'Supplier knowledge%'
+         GROUP BY 1, 2
+        ON CONFLICT (supplier_key, emission_factor_id) DO UPDATE SET
+            confirmed_count = k.confirmed_count + EXCLUDED.confirmed_count,
+            auto_count      = k.auto_count      + EXCLUDED.auto_count,
+            updated_at      = NOW();
+    ELSE
+        INSERT INTO supplier_factor_knowledge AS k
+               (supplier_key, emission_factor_id, confirmed_count, auto_count)
+        SELECT supplier_key(n.supplier_name), n.emission_factor_id,
+               COUNT(*) FILTER (WHERE n.reviewed_at IS NOT NULL OR n.classified_by <> 'ai'),
+               COUNT(*) FILTER (WHERE n.reviewed_at IS NULL AND n.classified_by = 'ai')
+          FROM new_rows n
+          JOIN old_rows o ON o.id = n.id
+         WHERE n.classification_status = 'classified'
+           AND n.emission_factor_id IS NOT NULL
+           AND supplier_key(n.supplier_name) IS NOT NULL
+           AND (n.reviewed_at IS NOT NULL OR n.classified_by <> 'ai'
+                OR n.classification_confidence >= 0.90)
+           AND COALESCE(n.classification_notes, '') NOT LIKE 'Supplier knowledge%'
+           AND (o.emission_factor_id    IS DISTINCT FROM n.emission_factor_id
+             OR o.classification_status IS DISTINCT FROM n.classification_status
+             OR o.reviewed_at           IS DISTINCT FROM n.reviewed_at
+             OR o.classified_by         IS DISTINCT FROM n.classified_by)
+         GROUP BY 1, 2
+        ON CONFLICT (supplier_key, emission_factor_id) DO UPDATE SET
+            confirmed_count = k.confirmed_count + EXCLUDED.confirmed_count,
+            auto_count      = k.auto_count      + EXCLUDED.auto_count,
+            updated_at      = NOW();
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Transition tables are only allowed on single-event triggers.
+DROP TRIGGER IF EXISTS tg_learn_supplier_factors_insert ON transactions;
+CREATE TRIGGER tg_learn_supplier_factors_insert
+    AFTER INSERT ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION learn_supplier_factors();
+
+DROP TRIGGER IF EXISTS tg_learn_supplier_factors_update ON transactions;
+CREATE TRIGGER tg_learn_supplier_factors_update
+    AFTER UPDATE ON transactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION learn_supplier_factors();
+
+-- ---------------------------------------------------------------------------
+-- Backfill
+-- ---------------------------------------------------------------------------
+
+INSERT INTO supplier_factor_knowledge (supplier_key, emission_factor_id, confirmed_count, auto_count)
+SELECT supplier_key(t.supplier_name), t.emission_factor_id,
+       COUNT(*) FILTER (WHERE t.reviewed_at IS NOT NULL OR t.classified_by <> 'ai'),
+       COUNT(*) FILTER (WHERE t.reviewed_at IS NULL AND t.classified_by = 'ai')
+  FROM transactions t
+ WHERE t.classification_status = 'classified'
+   AND t.emission_factor_id IS NOT NULL
+   AND supplier_key(t.supplier_name) IS NOT NULL
+   AND (t.reviewed_at IS NOT NULL OR t.classified_by <> 'ai'
+        OR t.classification_confidence >= 0.90)
+   AND COALESCE(t.classification_notes, '') NOT LIKE 'Supplier knowledge%'
+ GROUP BY 1, 2
+ON CONFLICT (supplier_key, emission_factor_id) DO UPDATE SET
+    confirmed_count = EXCLUDED.confirmed_count,
+    auto_count      = EXCLUDED.auto_count,
+    updated_at      = NOW();
+
+COMMIT;
@@ -0,0 +1,217 @@
+-- =============================================================================
+-- Migration 026 — Incremental Emission Rollups
+--
+-- PURPOSE:
+--   Report generation and the dashboards total transactions.co2e_kg by
+--   scope and category, which scans every transaction of the company (even
+--   with idx_tx_reporting). emission_rollups keeps those totals per
+--   (company, reporting_year, reporting_quarter, scope, category), so a
+--   company's annual totals are read from a handful of rows.
+--
+-- KEY:
+--   reporting_year / reporting_quarter — the transaction's own columns when
+--   set (Xero / MYOB sync), else derived from transaction_date with the
+--   Australian financial year (July–June; FY2025 = 1 Jul 2024 – 30 Jun 2025,
+--   Q1 = Jul–Sep): au_financial_year() / au_financial_quarter().
+--   scope    — transactions.scope, 0 when unset.
+--   category — emission_factors.category of the matched factor, '' when no
+--   factor is matched.
+--
+-- MECHANISM:
+--   Statement-level triggers on transactions (INSERT / UPDATE / DELETE,
+--   with transition tables) apply each statement's delta: old rows are
+--   subtracted, new rows added, grouped by key, in one upsert. Updates that
+--   change nothing the rollup tracks cancel out and write nothing. Rows whose
+--   count drops to zero are deleted. All sums are NUMERIC, so deltas never
+--   drift through rounding.
+--
+--   Aggregation rules follow the analyser's RunningAggregate: co2e counts
+--   when co2e_kg > 0 and scope is set (whatever the status); emitting_count
+--   counts those rows.
+--
+--   The analyser's `rollups` command checks the table against a fresh
+--   aggregate (`check`) and rebuilds it (`rebuild`), per company or for all.
+--   A factor whose category is edited later leaves old rows under the old
+--   category until a rebuild.
+--
+-- Depends on: schema.sql (transactions, emission_factors), 019 (scope columns).
+-- =============================================================================
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION au_financial_year(d DATE)
+RETURNS SMALLINT LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT (EXTRACT(YEAR FROM d)::INT + CASE WHEN EXTRACT(MONTH FROM d) >= 7 THEN 1 ELSE 0 END)::SMALLINT
+$$;
+
+CREATE OR REPLACE FUNCTION au_financial_quarter(d DATE)
+RETURNS SMALLINT LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT (((EXTRACT(MONTH FROM d)::INT + 5) % 12) / 3 + 1)::SMALLINT
+$$;
+
+-- No foreign key to companies: deleting a company cascades to its
+-- transactions, and the delete trigger removes the rollup rows itself.
+CREATE TABLE IF NOT EXISTS emission_rollups (
+    company_id              UUID          NOT NULL,
+    reporting_year          SMALLINT      NOT NULL,
+    reporting_quarter       SMALLINT      NOT NULL CHECK (reporting_quarter BETWEEN 1 AND 4),
+    scope                   SMALLINT      NOT NULL CHECK (scope BETWEEN 0 AND 3),
+    category                TEXT          NOT NULL,
+
+    tx_count                BIGINT        NOT NULL DEFAULT 0,
+    classified_count        BIGINT        NOT NULL DEFAULT 0,
+    needs_review_count      BIGINT        NOT NULL DEFAULT 0,
+    factor_not_found_count  BIGINT        NOT NULL DEFAULT 0,
+    excluded_count          BIGINT        NOT NULL DEFAULT 0,
+    emitting_count          BIGINT        NOT NULL DEFAULT 0,
+
+    co2e_kg                 NUMERIC(18,4) NOT NULL DEFAULT 0,
+    scope1_co2e_kg          NUMERIC(18,4) NOT NULL DEFAULT 0,
+    scope2_co2e_kg          NUMERIC(18,4) NOT NULL DEFAULT 0,
+    scope3_co2e_kg          NUMERIC(18,4) NOT NULL DEFAULT 0,
+    amount_aud              NUMERIC(18,2) NOT NULL DEFAULT 0,
+    classified_amount_aud   NUMERIC(18,2) NOT NULL DEFAULT 0,
+
+    updated_at              TIMESTAMPTZ   NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (company_id, reporting_year, reporting_quarter, scope, category)
+);
+
+-- Service-role only: the analyser connects with the backend credentials.
+ALTER TABLE emission_rollups ENABLE ROW LEVEL SECURITY;
+
+-- ---------------------------------------------------------------------------
+-- Aggregate of a set of transaction rows, one row per rollup key.
+-- `source` is a query over transaction rows with an extra `sign` column
+-- (+1 / -1); used by the delta trigger and by check / rebuild.
+-- ---------------------------------------------------------------------------
+
+CREATE OR REPLACE FUNCTION emission_rollup_select(source TEXT)
+RETURNS TEXT LANGUAGE sql IMMUTABLE AS $fn$
+    SELECT format($q$
+        SELECT t.company_id,
+               COALESCE(t.reporting_year,    au_financial_year(t.transaction_date))    AS reporting_year,
+               COALESCE(t.reporting_quarter, au_financial_quarter(t.transaction_date)) AS reporting_quarter,
+               COALESCE(t.scope, 0)::SMALLINT                                          AS scope,
+               COALESCE(ef.category, '')                                               AS category,
+               SUM(t.sign)                                                             AS tx_count,
+               SUM(t.sign) FILTER (WHERE t.classification_status = 'classified')       AS classified_count,
+               SUM(t.sign) FILTER (WHERE t.classification_status = 'needs_review')     AS needs_review_count,
+               SUM(t.sign) FILTER (WHERE t.classification_status = 'factor_not_found') AS factor_not_found_count,
+               SUM(t.sign) FILTER (WHERE t.classification_status = 'excluded')         AS excluded_count,
+               SUM(t.sign) FILTER (WHERE t.co2e_kg > 0 AND t.scope IS NOT NULL)        AS emitting_count,
+               SUM(t.sign * t.co2e_kg) FILTER (WHERE t.co2e_kg > 0 AND t.scope IS NOT NULL) AS co2e_kg,
+               SUM(t.sign * t.scope1_co2e_kg)                                          AS scope1_co2e_kg,
+               SUM(t.sign * t.scope2_co2e_kg)                                          AS scope2_co2e_kg,
+               SUM(t.sign * t.scope3_co2e_kg)                                          AS scope3_co2e_kg,
+               SUM(t.sign * t.amount_aud)                                              AS amount_aud,
+               SUM(t.sign * t.amount_aud) FILTER (WHERE t.classification_status = 'classified') AS classified_amount_aud
+          FROM (%s) t
+          LEFT JOIN emission_factors ef ON ef.id = t.emission_factor_id
+         GROUP BY 1, 2, 3, 4, 5
+    $q$, source)
+$fn$;
+
+CREATE OR REPLACE FUNCTION apply_emission_rollup_delta()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+DECLARE
+    source TEXT;
+BEGIN
+    source := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT n.*, 1 AS sign FROM new_rows n'
+        WHEN 'DELETE' THEN 'SELECT o.*, -1 AS sign FROM old_rows o'
+        ELSE 'SELECT n.*, 1 AS sign FROM new_rows n UNION ALL SELECT o.*, -1 AS sign FROM old_rows o'
+    END;
+
+    -- Transition tables are visible to dynamic SQL run by the trigger function.
+    EXECUTE format($q$
+        WITH delta AS (%s)
+        INSERT INTO emission_rollups AS r (
+            company_id, reporting_year, reporting_quarter, scope, category,
+            tx_count, classified_count, needs_review_count, factor_not_found_count,
+            excluded_count, emitting_count, co2e_kg, scope1_co2e_kg, scope2_co2e_kg,
+            scope3_co2e_kg, amount_aud, classified_amount_aud
+        )
+        SELECT company_id, reporting_year, reporting_quarter, scope, category,
+               tx_count, COALESCE(classified_count, 0), COALESCE(needs_review_count, 0),
+               COALESCE(factor_not_found_count, 0), COALESCE(excluded_count, 0),
+               COALESCE(emitting_count, 0), COALESCE(co2e_kg, 0), COALESCE(scope1_co2e_kg, 0),
+               COALESCE(scope2_co2e_kg, 0), COALESCE(scope3_co2e_kg, 0), COALESCE(amount_aud, 0),
+               COALESCE(classified_amount_aud, 0)
+          FROM delta
+         WHERE tx_count <> 0 OR classified_count <> 0 OR needs_review_count <> 0
+            OR factor_not_found_count <> 0 OR excluded_count <> 0 OR emitting_count <> 0
+            OR co2e_kg <> 0 OR scope1_co2e_kg <> 0 OR scope2_co2e_kg <> 0
+            OR scope3_co2e_kg <> 0 OR amount_aud <> 0 OR classified_amount_aud <> 0
+         -- Fixed lock order across concurrent writers of the same company.
+         ORDER BY company_id, reporting_year, reporting_quarter, scope, category
+        ON CONFLICT (company_id, reporting_year, reporting_quarter, scope, category) DO UPDATE SET
+            tx_count               = r.tx_count               + EXCLUDED.tx_count,
+            classified_count       = r.classified_count       + EXCLUDED.classified_count,
+            needs_review_count     = r.needs_review_count     + EXCLUDED.needs_review_count,
+            factor_not_found_count = r.factor_not_found_count + EXCLUDED.factor_not_found_count,
+            excluded_count         = r.excluded_count         + EXCLUDED.excluded_count,
+            emitting_count         = r.emitting_count         + EXCLUDED.emitting_count,
+            co2e_kg                = r.co2e_kg                + EXCLUDED.co2e_kg,
+            scope1_co2e_kg         = r.scope1_co2e_kg         + EXCLUDED.scope1_co2e_kg,
+            scope2_co2e_kg         = r.scope2_co2e_kg         + EXCLUDED.scope2_co2e_kg,
+            scope3_co2e_kg         = r.scope3_co2e_kg         + EXCLUDED.scope3_co2e_kg,
+            amount_aud             = r.amount_aud             + EXCLUDED.amount_aud,
+            classified_amount_aud  = r.classified_amount_aud  + EXCLUDED.classified_amount_aud,
+            updated_at             = NOW()
+    $q$, emission_rollup_select(source));
+
+    IF TG_OP <> 'INSERT' THEN
+        EXECUTE $q$
+            DELETE FROM emission_rollups r
+             WHERE r.tx_count = 0
+               AND r.company_id IN (SELECT DISTINCT company_id FROM old_rows)
+        $q$;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Transition tables are only allowed on single-event triggers.
+DROP TRIGGER IF EXISTS tg_emission_rollups_insert ON transactions;
+CREATE TRIGGER tg_emission_rollups_insert
+    AFTER INSERT ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_emission_rollup_delta();
+
+DROP TRIGGER IF EXISTS tg_emission_rollups_update ON transactions;
+CREATE TRIGGER tg_emission_rollups_update
+    AFTER UPDATE ON transactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_emission_rollup_delta();
+
+DROP TRIGGER IF EXISTS tg_emission_rollups_delete ON transactions;
+CREATE TRIGGER tg_emission_rollups_delete
+    AFTER DELETE ON transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_emission_rollup_delta();
+
+-- ---------------------------------------------------------------------------
+-- Initial build
+-- ---------------------------------------------------------------------------
+
+TRUNCATE emission_rollups;
+DO $$
+BEGIN
+    EXECUTE format(
+        'INSERT INTO emission_rollups (company_id, reporting_year, reporting_quarter, scope, category,
+             tx_count, classified_count, needs_review_count, factor_not_found_count, excluded_count,
+             emitting_count, co2e_kg, scope1_co2e_kg, scope2_co2e_kg, scope3_co2e_kg, amount_aud,
+             classified_amount_aud)
+         SELECT company_id, reporting_year, reporting_quarter, scope, category, tx_count,
+                COALESCE(classified_count, 0), COALESCE(needs_review_count, 0),
+                COALESCE(factor_not_found_count, 0), COALESCE(excluded_count, 0),
+                COALESCE(emitting_count, 0), COALESCE(co2e_kg, 0), COALESCE(scope1_co2e_kg, 0),
+                COALESCE(scope2_co2e_kg, 0), COALESCE(scope3_co2e_kg, 0), COALESCE(amount_aud, 0),
+                COALESCE(classified_amount_aud, 0)
+           FROM (%s) a',
+        emission_rollup_select('SELECT t.*, 1 AS sign FROM transactions t')
+    );
+END;
+$$;
+
+COMMIT;
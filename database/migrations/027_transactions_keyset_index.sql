@@ -0,0 +1,30 @@
+-- =============================================================================
+-- Migration 027 — Keyset Index for Transaction Listing
+--
+-- PURPOSE:
+--   GET /transactions pages a company's ledger newest first with a keyset
+--   cursor on (transaction_date DESC, id DESC) instead of OFFSET, so page
+--   10 000 costs the same as page 1. idx_tx_company_date orders by date
+--   only: every page had to fetch and sort all rows sharing the boundary
+--   date. Adding id makes the index match the ORDER BY exactly, and the
+--   cursor condition (transaction_date, id) < ($date, $id) becomes an index
+--   bound.
+--
+--   The new index has idx_tx_company_date as its prefix, so it serves every
+--   query the old one did (dashboard date ranges, /reports/aggregate); the
+--   old one is dropped to keep a single index on the write path.
+--
+--   On a large live table, run the CREATE as CREATE INDEX CONCURRENTLY
+--   outside this transaction first; the IF NOT EXISTS below then no-ops.
+--
+-- Depends on: schema.sql (transactions).
+-- =============================================================================
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_tx_company_date_id
+    ON transactions (company_id, transaction_date DESC, id DESC);
+
+DROP INDEX IF EXISTS idx_tx_company_date;
+
+COMMIT;
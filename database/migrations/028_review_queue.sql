@@ -0,0 +1,28 @@
+-- =============================================================================
+-- Migration 028 — Review Queue Index
+--
+-- PURPOSE:
+--   Reviewers work through each company's unresolved lines
+--   (needs_review / factor_not_found), oldest classification first.
+--   idx_tx_status indexes status across every company, so a company's
+--   queue meant scanning all companies' unresolved rows (or the company's
+--   whole ledger). This partial index only holds unresolved rows, in queue
+--   order per company: the next N items are an index range scan, and the
+--   index shrinks as rows are resolved.
+--
+-- USED BY:
+--   GET  /review/queue    — next N items with their top candidate factors
+--   POST /review/resolve  — bulk accept / override; one statement updates
+--                           the rows and appends transaction_audit_log
+--                           ('manual_review_resolved', migration 019)
+--
+-- Depends on: schema.sql (transactions).
+-- =============================================================================
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_tx_review_queue
+    ON transactions (company_id, classified_at)
+    WHERE classification_status IN ('needs_review', 'factor_not_found');
+
+COMMIT;
@@ -0,0 +1,71 @@
+-- =============================================================================
+-- Migration 029 — Factor Refresh Tracking
+--
+-- PURPOSE:
+--   Factor refreshes (014, 017) change factor values in place
+--   (ON CONFLICT DO UPDATE) or publish a new edition next to the old one.
+--   Stored transactions keep the co2e_kg computed with the old values, and
+--   re-running /analyse over every ledger was the only way to catch up.
+--   The reclassify job (skills/spend_to_carbon_analyzer/reclassify.py)
+--   instead diffs the factor sets and recomputes only the rows whose factor
+--   changed value, unit or method.
+--
+-- MECHANISM:
+--   1. emission_factor_applied — per factor, the co2e_factor, unit,
+--      calculation_method and scope the stored ledger was computed with.
+--      Filled when a factor is inserted (statement trigger below) and
+--      advanced by the reclassify job once the affected rows are
+--      recomputed. An in-place edit of emission_factors leaves it behind,
+--      which is exactly the diff the job reads.
+--   2. idx_tx_emission_factor — finds a factor's transactions without
+--      scanning every ledger.
+--
+--   The backfill assumes stored transactions match the current factors.
+--   Run it before the next refresh, not after.
+--
+-- Depends on: schema.sql (emission_factors, transactions), 017 (factor values).
+-- =============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS emission_factor_applied (
+    factor_id           UUID          PRIMARY KEY REFERENCES emission_factors (id) ON DELETE CASCADE,
+    co2e_factor         NUMERIC(18,6) NOT NULL,
+    unit                TEXT          NOT NULL,
+    calculation_method  TEXT          NOT NULL,
+    scope               SMALLINT      NOT NULL,
+    recorded_at         TIMESTAMPTZ   NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE emission_factor_applied IS
+'Factor values the stored transactions were computed with. Differences from emission_factors are '
+'pending recalculation — see reclassify.py.';
+
+INSERT INTO emission_factor_applied (factor_id, co2e_factor, unit, calculation_method, scope)
+SELECT id, co2e_factor, unit, calculation_method, scope
+FROM emission_factors
+ON CONFLICT (factor_id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION record_new_emission_factors()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO emission_factor_applied (factor_id, co2e_factor, unit, calculation_method, scope)
+    SELECT id, co2e_factor, unit, calculation_method, scope
+    FROM new_rows
+    ON CONFLICT (factor_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$;
+
+-- Rows updated by INSERT ... ON CONFLICT DO UPDATE are not in new_rows.
+DROP TRIGGER IF EXISTS tg_emission_factor_applied ON emission_factors;
+CREATE TRIGGER tg_emission_factor_applied
+    AFTER INSERT ON emission_factors
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION record_new_emission_factors();
+
+CREATE INDEX IF NOT EXISTS idx_tx_emission_factor
+    ON transactions (emission_factor_id)
+    WHERE emission_factor_id IS NOT NULL;
+
+COMMIT;
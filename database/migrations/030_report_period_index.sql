@@ -0,0 +1,32 @@
+-- =============================================================================
+-- Migration 030 — Reporting-Quarter Index for Quarterly Reports
+--
+-- PURPOSE:
+--   emission_rollups (026) files each transaction under its reporting
+--   quarter: reporting_year / reporting_quarter when set (Xero / MYOB sync),
+--   else the Australian financial quarter of transaction_date. Quarterly
+--   GET /reports/aggregate used to group the raw transactions by date
+--   instead, so a synced line whose reporting period differs from its date
+--   landed in a different quarter depending on which source answered.
+--
+--   The transactions query now filters and groups on the same keys. This
+--   expression index makes that filter an index range per company, as
+--   idx_tx_company_date_id does for monthly reports. idx_tx_reporting
+--   (schema.sql) only covers the raw columns, which are NULL for most rows.
+--
+--   On a large live table, run the CREATE as CREATE INDEX CONCURRENTLY
+--   outside this transaction first; the IF NOT EXISTS below then no-ops.
+--
+-- Depends on: 026 (au_financial_year / au_financial_quarter).
+-- =============================================================================
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_tx_company_reporting_period
+    ON transactions (
+        company_id,
+        COALESCE(reporting_year,    au_financial_year(transaction_date)),
+        COALESCE(reporting_quarter, au_financial_quarter(transaction_date))
+    );
+
+COMMIT;
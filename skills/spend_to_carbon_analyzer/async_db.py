@@ -0,0 +1,587 @@
+"""
+EcoLink Australia — Async database layer for the Spend-to-Carbon API.
+
+asyncpg pool used by the `async def` endpoints, so a request waiting on
+Postgres no longer holds one of the server's worker threads. Mirrors the
+factor and transaction queries in `db.py`, which remains in use for
+background threads, and holds the API side of the analysis-job queue.
+
+Configuration (shared with db.py):
+  DB_POOL_MIN / DB_POOL_MAX   — pool size (default 1 / 10)
+  DB_STATEMENT_TIMEOUT_MS     — server-side statement_timeout (default 30000, 0 = none)
+  DB_STATEMENT_CACHE_SIZE     — prepared statements cached per connection
+                                (default 100; set 0 behind PgBouncer /
+                                Supabase transaction-mode pooling)
+  DB_SSLMODE                  — libpq-style sslmode (default "require")
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from datetime import date
+from typing import Optional
+
+from .db import (
+    _UPSERT_COLUMNS,
+    _UPSERT_ON_CONFLICT,
+    DB_POOL_MAX,
+    DB_POOL_MIN,
+    DB_SSLMODE,
+    DB_STATEMENT_TIMEOUT_MS,
+    UPSERT_PAGE_SIZE,
+    _conflict_rounds,
+    _upsert_params,
+)
+
+logger = logging.getLogger("ecolink.async_db")
+
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "100"))
+
+# ---------------------------------------------------------------------------
+# Connection pool (created by the app lifespan, or lazily on first use)
+# ---------------------------------------------------------------------------
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def init_pool():
+    """Create the asyncpg pool if it doesn't exist yet and return it."""
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            import asyncpg  # lazy import — keeps module import cheap for scripts
+
+            database_url = os.environ.get("DATABASE_URL")
+            if not database_url:
+                raise RuntimeError("DATABASE_URL environment variable is not set.")
+            _pool = await asyncpg.create_pool(
+                dsn=database_url,
+                min_size=DB_POOL_MIN,
+                max_size=DB_POOL_MAX,
+                ssl=DB_SSLMODE,
+                statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+                server_settings={"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)},
+            )
+            logger.info(
+                "asyncpg pool initialised (size %d–%d, statement cache %d).",
+                DB_POOL_MIN, DB_POOL_MAX, DB_STATEMENT_CACHE_SIZE,
+            )
+    return _pool
+
+
+async def close_pool() -> None:
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
+
+
+async def _get_pool():
+    return _pool if _pool is not None else await init_pool()
+
+
+# ---------------------------------------------------------------------------
+# Emission factor queries
+# ---------------------------------------------------------------------------
+
+async def fetch_all_factors(nga_year: int, state: Optional[str] = None) -> list[dict]:
+    """Async `db.fetch_all_factors` — same filters and ordering."""
+    pool = await _get_pool()
+    if state:
+        rows = await pool.fetch(
+            """
+            SELECT
+                id, scope, category, subcategory, activity,
+                unit, calculation_method, co2e_factor,
+                match_keywords, state, state_specific,
+                source_table
+            FROM emission_factors
+            WHERE nga_year = $1
+              AND is_current = TRUE
+              AND (state IS NULL OR state = $2)
+            ORDER BY scope, category, activity
+            """,
+            nga_year, state,
+        )
+    else:
+        rows = await pool.fetch(
+            """
+            SELECT
+                id, scope, category, subcategory, activity,
+                unit, calculation_method, co2e_factor,
+                match_keywords, state, state_specific,
+                source_table
+            FROM emission_factors
+            WHERE nga_year = $1
+              AND is_current = TRUE
+              AND state_specific = FALSE
+            ORDER BY scope, category, activity
+            """,
+            nga_year,
+        )
+    return [dict(row) for row in rows]
+
+
+async def fetch_factor_version() -> Optional[int]:
+    """Current emission_factor_version stamp (migration 023), or None if absent."""
+    pool = await _get_pool()
+    async with pool.acquire() as conn:
+        if not await conn.fetchval("SELECT to_regclass('emission_factor_version') IS NOT NULL"):
+            return None
+        version = await conn.fetchval("SELECT version FROM emission_factor_version WHERE id = 1")
+        return int(version) if version is not None else None
+
+
+async def fetch_factor_by_id(factor_id: str) -> Optional[dict]:
+    """Fetch a single emission factor by UUID."""
+    pool = await _get_pool()
+    row = await pool.fetchrow(
+        """
+        SELECT id, scope, category, subcategory, activity,
+               unit, calculation_method, co2e_factor, nga_year
+        FROM emission_factors
+        WHERE id = $1::uuid
+        """,
+        factor_id,
+    )
+    return dict(row) if row else None
+
+
+# ---------------------------------------------------------------------------
+# Transaction persistence
+# ---------------------------------------------------------------------------
+
+# One array parameter per column; unnest() turns them back into rows, so a
+# whole page is a single prepared statement regardless of its length.
+_UPSERT_UNNEST_SQL = f"""
+    INSERT INTO transactions ({_UPSERT_COLUMNS})
+    SELECT
+        $1::uuid, t.source, t.external_id,
+        t.transaction_date, t.description, t.supplier_name,
+        t.amount_aud, t.account_code, t.account_name,
+        t.emission_factor_id::uuid, t.classification_status,
+        t.classification_confidence, t.classification_notes,
+        NOW(), 'ai',
+        t.quantity_value, t.quantity_unit,
+        t.co2e_kg, t.scope
+    FROM unnest(
+        $2::text[], $3::text[], $4::date[], $5::text[], $6::text[],
+        $7::float8[], $8::text[], $9::text[], $10::text[], $11::text[],
+        $12::float8[], $13::text[], $14::float8[], $15::text[],
+        $16::float8[], $17::int2[]
+    ) AS t (
+        source, external_id, transaction_date, description, supplier_name,
+        amount_aud, account_code, account_name, emission_factor_id,
+        classification_status, classification_confidence, classification_notes,
+        quantity_value, quantity_unit, co2e_kg, scope
+    )
+    {_UPSERT_ON_CONFLICT}
+"""
+
+_UNNEST_FIELDS = (
+    "source", "external_id", "transaction_date", "description", "supplier_name",
+    "amount_aud", "account_code", "account_name", "emission_factor_id",
+    "classification_status", "classification_confidence", "classification_notes",
+    "quantity_value", "quantity_unit", "co2e_kg", "scope",
+)
+
+
+def _as_date(value) -> date:
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _float_or_none(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def _unnest_args(page: list[dict]) -> list[list]:
+    columns = {field: [row[field] for row in page] for field in _UNNEST_FIELDS}
+    columns["transaction_date"] = [_as_date(v) for v in columns["transaction_date"]]
+    for field in ("amount_aud", "classification_confidence", "quantity_value", "co2e_kg"):
+        columns[field] = [_float_or_none(v) for v in columns[field]]
+    columns["scope"] = [int(v) if v is not None else None for v in columns["scope"]]
+    return [columns[field] for field in _UNNEST_FIELDS]
+
+
+async def upsert_transactions(company_id: str, classified: list[dict]) -> int:
+    """
+    Async `db.upsert_transactions`: same ON CONFLICT semantics and the same
+    round-splitting for repeated external_ids. Returns rows affected.
+    """
+    if not classified:
+        return 0
+
+    params = [_upsert_params(company_id, tx) for tx in classified]
+    rows_affected = 0
+    pool = await _get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            for batch in _conflict_rounds(params):
+                for start in range(0, len(batch), UPSERT_PAGE_SIZE):
+                    page = batch[start:start + UPSERT_PAGE_SIZE]
+                    returned = await conn.fetch(_UPSERT_UNNEST_SQL, company_id, *_unnest_args(page))
+                    rows_affected += len(returned)
+    return rows_affected
+
+
+# ---------------------------------------------------------------------------
+# Analysis jobs (migration 024) — API side
+# ---------------------------------------------------------------------------
+
+def _json_column(value):
+    # asyncpg returns json/jsonb as text unless a codec is registered.
+    return json.loads(value) if isinstance(value, str) else value
+
+
+async def create_analysis_job(
+    company_id: str,
+    nga_year: int,
+    state: Optional[str],
+    payloads: list[dict],
+    chunk_size: int,
+) -> dict:
+    """Create a queued job and stage its transactions with COPY. Returns the job row."""
+    pool = await _get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            job = await conn.fetchrow(
+                """
+                INSERT INTO analysis_jobs (company_id, nga_year, state, total_transactions, chunk_size)
+                VALUES ($1::uuid, $2, $3, $4, $5)
+                RETURNING id, status, total_transactions, created_at
+                """,
+                company_id, nga_year, state, len(payloads), chunk_size,
+            )
+            await conn.copy_records_to_table(
+                "analysis_job_items",
+                columns=["job_id", "seq", "payload"],
+                records=((job["id"], seq, json.dumps(p)) for seq, p in enumerate(payloads)),
+            )
+    return dict(job)
+
+
+async def fetch_analysis_job(job_id: str) -> Optional[dict]:
+    pool = await _get_pool()
+    row = await pool.fetchrow(
+        """
+        SELECT id, company_id, nga_year, state, status,
+               total_transactions, processed_transactions,
+               aggregate, summary, error,
+               created_at, updated_at, completed_at
+        FROM analysis_jobs
+        WHERE id = $1::uuid
+        """,
+        job_id,
+    )
+    if not row:
+        return None
+    job = dict(row)
+    job["aggregate"] = _json_column(job["aggregate"])
+    job["summary"]   = _json_column(job["summary"])
+    return job
+
+
+async def fetch_analysis_job_results(job_id: str, offset: int, limit: int) -> list[dict]:
+    """Committed per-transaction results, in input order."""
+    pool = await _get_pool()
+    rows = await pool.fetch(
+        """
+        SELECT result
+        FROM analysis_job_items
+        WHERE job_id = $1::uuid AND seq >= $2 AND result IS NOT NULL
+        ORDER BY seq
+        LIMIT $3
+        """,
+        job_id, offset, limit,
+    )
+    return [_json_column(row["result"]) for row in rows]
+
+
+# ---------------------------------------------------------------------------
+# Report aggregation — GET /reports/aggregate
+# ---------------------------------------------------------------------------
+
+# One row per (period, scope, category) of a company's transactions; the
+# same counting rules as RunningAggregate (co2e counts when > 0 and scoped).
+# Period is the month or financial-quarter start.
+_REPORT_GROUPS_SQL = """
+SELECT {period_start}                                                        AS period_start,
+       COALESCE(t.scope, 0)::int                                             AS scope,
+       COALESCE(ef.category, '')                                             AS category,
+       COUNT(*)                                                              AS tx_count,
+       COUNT(*) FILTER (WHERE t.classification_status = 'classified')       AS classified_count,
+       COUNT(*) FILTER (WHERE t.classification_status = 'needs_review')     AS needs_review_count,
+       COUNT(*) FILTER (WHERE t.classification_status = 'factor_not_found') AS factor_not_found_count,
+       COUNT(*) FILTER (WHERE t.classification_status = 'excluded')         AS excluded_count,
+       COUNT(*) FILTER (WHERE t.co2e_kg > 0 AND t.scope IS NOT NULL)        AS emitting_count,
+       COALESCE(SUM(t.co2e_kg) FILTER (WHERE t.co2e_kg > 0 AND t.scope IS NOT NULL), 0) AS co2e_kg,
+       COALESCE(SUM(t.amount_aud), 0)                                        AS amount_aud,
+       COALESCE(SUM(t.amount_aud) FILTER (WHERE t.classification_status = 'classified'), 0)
+                                                                             AS classified_amount_aud
+FROM transactions t
+LEFT JOIN emission_factors ef ON ef.id = t.emission_factor_id
+WHERE t.company_id = $1::uuid
+  AND {period_filter}
+GROUP BY 1, 2, 3
+ORDER BY 1, 2, 3
+"""
+
+# Months by transaction_date between two dates, on idx_tx_company_date_id.
+REPORT_GROUPS_SQL = _REPORT_GROUPS_SQL.format(
+    period_start  = "date_trunc('month', t.transaction_date)::date",
+    period_filter = "t.transaction_date BETWEEN $2 AND $3",
+)
+
+# Financial quarters keyed exactly like emission_rollups (migration 026) —
+# the transaction's reporting_year / reporting_quarter, else its date's —
+# so both sources file a line under the same quarter. Quarters
+# ($2, $3)..($4, $5) inclusive, on idx_tx_company_reporting_period (030).
+_FY = "COALESCE(t.reporting_year, au_financial_year(t.transaction_date))"
+_FQ = "COALESCE(t.reporting_quarter, au_financial_quarter(t.transaction_date))"
+QUARTER_GROUPS_SQL = _REPORT_GROUPS_SQL.format(
+    period_start  = f"make_date({_FY} - ({_FQ} <= 2)::int, (({_FQ} - 1) * 3 + 6) % 12 + 1, 1)",
+    period_filter = f"({_FY}, {_FQ}) BETWEEN ($2::smallint, $3::smallint) AND ($4::smallint, $5::smallint)",
+)
+
+# The same groups per financial quarter, from emission_rollups (migration 026).
+ROLLUP_GROUPS_SQL = """
+SELECT make_date(reporting_year - (reporting_quarter <= 2)::int,
+                 ((reporting_quarter - 1) * 3 + 6) % 12 + 1, 1)             AS period_start,
+       scope::int AS scope, category,
+       tx_count, classified_count, needs_review_count, factor_not_found_count,
+       excluded_count, emitting_count, co2e_kg, amount_aud, classified_amount_aud
+FROM emission_rollups
+WHERE company_id = $1::uuid
+  AND (reporting_year, reporting_quarter) BETWEEN ($2::smallint, $3::smallint)
+                                              AND ($4::smallint, $5::smallint)
+ORDER BY 1, 2, 3
+"""
+
+
+async def fetch_report_groups(company_id: str, date_from: date, date_to: date) -> list[dict]:
+    """Monthly grouped totals of a company's transactions between two dates (inclusive)."""
+    pool = await _get_pool()
+    rows = await pool.fetch(REPORT_GROUPS_SQL, company_id, date_from, date_to)
+    return [dict(row) for row in rows]
+
+
+async def fetch_quarter_groups(
+    company_id: str,
+    first: tuple[int, int],
+    last: tuple[int, int],
+) -> list[dict]:
+    """Grouped totals of a company's transactions for financial quarters `first`..`last` (inclusive)."""
+    pool = await _get_pool()
+    rows = await pool.fetch(QUARTER_GROUPS_SQL, company_id, *first, *last)
+    return [dict(row) for row in rows]
+
+
+async def fetch_rollup_groups(
+    company_id: str,
+    first: tuple[int, int],
+    last: tuple[int, int],
+) -> Optional[list[dict]]:
+    """
+    Rollup rows for financial quarters `first`..`last` ((year, quarter),
+    inclusive), or None when emission_rollups does not exist.
+    """
+    pool = await _get_pool()
+    async with pool.acquire() as conn:
+        if not await conn.fetchval("SELECT to_regclass('emission_rollups') IS NOT NULL"):
+            return None
+        rows = await conn.fetch(ROLLUP_GROUPS_SQL, company_id, *first, *last)
+    return [dict(row) for row in rows]
+
+
+# ---------------------------------------------------------------------------
+# Transaction listing — GET /transactions (keyset pages, migration 027)
+# ---------------------------------------------------------------------------
+
+# Columns GET /transactions can project.
+TRANSACTION_FIELDS = (
+    "id", "source", "external_id", "transaction_date", "description", "supplier_name",
+    "amount_aud", "account_code", "account_name", "emission_factor_id",
+    "classification_status", "classification_confidence", "classification_notes",
+    "classified_at", "classified_by", "quantity_value", "quantity_unit", "co2e_kg", "scope",
+    "scope1_co2e_kg", "scope2_co2e_kg", "scope3_co2e_kg", "reporting_year",
+    "reporting_quarter", "reviewed_at", "updated_at",
+)
+
+
+def transactions_page_query(
+    company_id: str,
+    fields: list[str],
+    limit: int,
+    statuses: Optional[list[str]] = None,
+    scope: Optional[int] = None,
+    after: Optional[tuple[date, str]] = None,
+) -> tuple[str, list]:
+    """
+    SQL and arguments for one page, newest first. `after` is the
+    (transaction_date, id) of the previous page's last row; the condition
+    is only emitted when used, so each shape gets its own plan, bounded by
+    idx_tx_company_date_id.
+    """
+    columns = [f for f in TRANSACTION_FIELDS if f in fields]
+    for key in ("transaction_date", "id"):          # the cursor needs both
+        if key not in columns:
+            columns.append(key)
+    args: list = [company_id]
+    where = ["company_id = $1::uuid"]
+    if statuses:
+        args.append(statuses)
+        where.append(f"classification_status = ANY(${len(args)}::text[])")
+    if scope is not None:
+        args.append(scope)
+        where.append(f"scope = ${len(args)}::smallint")
+    if after is not None:
+        args.extend(after)
+        where.append(f"(transaction_date, id) < (${len(args) - 1}::date, ${len(args)}::uuid)")
+    args.append(limit)
+    sql = (
+        f"SELECT {', '.join(columns)} FROM transactions "
+        f"WHERE {' AND '.join(where)} "
+        f"ORDER BY transaction_date DESC, id DESC LIMIT ${len(args)}"
+    )
+    return sql, args
+
+
+async def fetch_transactions_page(
+    company_id: str,
+    fields: list[str],
+    limit: int,
+    statuses: Optional[list[str]] = None,
+    scope: Optional[int] = None,
+    after: Optional[tuple[date, str]] = None,
+) -> list[dict]:
+    pool = await _get_pool()
+    sql, args = transactions_page_query(company_id, fields, limit, statuses, scope, after)
+    rows = await pool.fetch(sql, *args)
+    return [dict(row) for row in rows]
+
+
+# ---------------------------------------------------------------------------
+# Review queue — GET /review/queue, POST /review/resolve (migration 028)
+# ---------------------------------------------------------------------------
+
+# Literal in every query so the planner can match idx_tx_review_queue's
+# predicate (a bound parameter cannot prove it under a generic plan).
+_UNRESOLVED = "classification_status IN ('needs_review', 'factor_not_found')"
+
+_REVIEW_COLUMNS = """
+    id, transaction_date, description, supplier_name, account_name, amount_aud,
+    quantity_value, quantity_unit, classification_status, classification_confidence,
+    classification_notes, emission_factor_id, co2e_kg, scope, classified_at
+"""
+
+REVIEW_QUEUE_SQL = f"""
+SELECT {_REVIEW_COLUMNS}
+FROM transactions
+WHERE company_id = $1::uuid AND {_UNRESOLVED}
+  AND ($2::text IS NULL OR classification_status = $2::text)
+ORDER BY classified_at, id
+LIMIT $3
+"""
+
+_RESOLVE_REVIEWS_SQL = f"""
+WITH d AS (
+    SELECT *
+    FROM unnest($3::uuid[], $4::text[], $5::uuid[], $6::numeric[], $7::smallint[],
+                $8::numeric[], $9::text[], $10::text[])
+        AS d(id, action, factor_id, co2e_kg, scope, quantity_value, quantity_unit, note)
+),
+resolved AS (
+    UPDATE transactions t
+       SET classification_status     = 'classified',
+           emission_factor_id        = CASE WHEN d.action = 'override' THEN d.factor_id      ELSE t.emission_factor_id END,
+           co2e_kg                   = CASE WHEN d.action = 'override' THEN d.co2e_kg        ELSE t.co2e_kg END,
+           scope                     = CASE WHEN d.action = 'override' THEN d.scope          ELSE t.scope END,
+           quantity_value            = CASE WHEN d.action = 'override' THEN d.quantity_value ELSE t.quantity_value END,
+           quantity_unit             = CASE WHEN d.action = 'override' THEN d.quantity_unit  ELSE t.quantity_unit END,
+           classification_confidence = 1.0,
+           classified_at             = NOW(),
+           classified_by             = ($2::uuid)::text,
+           reviewed_by_user_id       = $2::uuid,
+           reviewed_at               = NOW(),
+           review_notes              = d.note,
+           updated_at                = NOW()
+      FROM d
+     WHERE t.id = d.id
+       AND t.company_id = $1::uuid
+       AND t.{_UNRESOLVED}
+       AND (d.action = 'override' OR t.emission_factor_id IS NOT NULL)
+    RETURNING t.id, d.action, t.emission_factor_id, t.co2e_kg, t.scope, d.note
+)
+INSERT INTO transaction_audit_log (transaction_id, event_type, user_id, payload)
+SELECT id, 'manual_review_resolved', $2::uuid,
+       jsonb_build_object('action', action, 'emission_factor_id', emission_factor_id,
+                          'co2e_kg', co2e_kg, 'scope', scope, 'note', note,
+                          'via', 'review_queue')
+FROM resolved
+RETURNING transaction_id
+"""
+
+
+async def fetch_review_queue(company_id: str, limit: int, status: Optional[str] = None) -> tuple[list[dict], int]:
+    """The company's next `limit` unresolved rows, oldest first, and the queue length."""
+    pool = await _get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(REVIEW_QUEUE_SQL, company_id, status, limit)
+        size = await conn.fetchval(
+            f"SELECT COUNT(*) FROM transactions WHERE company_id = $1::uuid AND {_UNRESOLVED}"
+            " AND ($2::text IS NULL OR classification_status = $2::text)",
+            company_id, status,
+        )
+    return [dict(row) for row in rows], int(size)
+
+
+async def fetch_review_rows(company_id: str, transaction_ids: list[str]) -> list[dict]:
+    """Unresolved rows among `transaction_ids` (the ones a resolve call may touch)."""
+    pool = await _get_pool()
+    rows = await pool.fetch(
+        f"""
+        SELECT {_REVIEW_COLUMNS}
+        FROM transactions
+        WHERE company_id = $1::uuid AND id = ANY($2::uuid[]) AND {_UNRESOLVED}
+        """,
+        company_id, transaction_ids,
+    )
+    return [dict(row) for row in rows]
+
+
+async def fetch_factors_by_ids(factor_ids: list[str]) -> list[dict]:
+    """Emission factors by UUID (current or not), in one query."""
+    pool = await _get_pool()
+    rows = await pool.fetch(
+        """
+        SELECT id, scope, category, subcategory, activity,
+               unit, calculation_method, co2e_factor, nga_year
+        FROM emission_factors
+        WHERE id = ANY($1::uuid[])
+        """,
+        factor_ids,
+    )
+    return [dict(row) for row in rows]
+
+
+async def resolve_reviews(company_id: str, reviewer_id: str, decisions: list[dict]) -> list[str]:
+    """
+    Apply accept / override decisions and append one audit-log row per
+    resolved transaction, in a single statement. Rows already resolved, of
+    another company, or accepted without a factor are skipped. Returns the
+    resolved transaction ids.
+    """
+    import asyncpg  # lazy import — keeps module import cheap for scripts
+
+    columns = ("id", "action", "factor_id", "co2e_kg", "scope", "quantity_value", "quantity_unit", "note")
+    arrays = [[d.get(c) for d in decisions] for c in columns]
+    pool = await _get_pool()
+    try:
+        rows = await pool.fetch(_RESOLVE_REVIEWS_SQL, company_id, reviewer_id, *arrays)
+    except asyncpg.ForeignKeyViolationError as exc:
+        raise ValueError(f"Unknown reviewer or emission factor: {exc.detail or exc}") from exc
+    return [str(row["transaction_id"]) for row in rows]
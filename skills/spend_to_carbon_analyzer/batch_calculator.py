@@ -0,0 +1,319 @@
+"""
+EcoLink Australia — Columnar batch CO2e calculator.
+
+`calculate_co2e` handles one transaction at a time and formats a long note
+string for every row, and `aggregate_results` then walks the rows a second
+time. `calculate_batch` does the whole batch column-wise:
+
+  1. One Python pass resolves each row's quantity (input → AI hint →
+     description → spend estimate, via the same `_resolve_quantity` as
+     `calculate_co2e`) into flat columns: amount, quantity, method and the
+     factor's position in a `FactorRegistry`, whose array columns carry
+     each factor's value, method, scope and category.
+  2. co2e = round(base × factor, 4) for the whole column at once.
+  3. Scope and category totals are folded into a `RunningAggregate` with
+     ordered per-bin sums.
+
+Notes are rendered only when a row is asked for with `with_notes=True`.
+
+Results are identical to `calculate_co2e` + `RunningAggregate.add`:
+  - np.rint(x·10⁴)/10⁴ equals Python's round(x, 4) except at near-ties,
+    which are detected and recomputed with `round`;
+  - np.bincount accumulates in input order, like the sequential Python sums
+    (np.sum's pairwise summation would not match).
+
+NumPy is optional: without it the same columns are computed in plain
+Python, which still skips note rendering and the second pass.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from typing import Optional
+
+from .calculator import RunningAggregate, _resolve_quantity
+from .factor_registry import ACTIVITY_BASED, SPEND_BASED, FactorRegistry
+
+try:  # optional — vectorised path
+    import numpy as np
+except ImportError:  # pragma: no cover — exercised where NumPy is absent
+    np = None
+
+# Per-row method codes (the first two mirror the registry's method column)
+_ACTIVITY, _SPEND = ACTIVITY_BASED, SPEND_BASED
+_NONE, _FALLBACK, _UNKNOWN = -1, -2, -3
+
+
+class BatchCalculation:
+    """Column results of `calculate_batch`; rows are materialised on demand."""
+
+    def __init__(self, transactions: list[dict], factors: list, methods: list[int],
+                 amounts: list[float], quantities: list, sources: list, co2e: list) -> None:
+        self._transactions = transactions
+        self._factors      = factors
+        self._methods      = methods
+        self._amounts      = amounts
+        self._quantities   = quantities
+        self._sources      = sources
+        self.co2e_kg       = co2e
+
+    def __len__(self) -> int:
+        return len(self._methods)
+
+    def row(self, i: int, with_notes: bool = False) -> dict:
+        """The dict `calculate_co2e` would return for row i."""
+        method = self._methods[i]
+        factor = self._factors[i]
+        result = {
+            "co2e_kg":                 None,
+            "quantity_value":          None,
+            "quantity_unit":           None,
+            "calculation_method_used": "none",
+            "calc_notes":              None,
+        }
+        if method == _NONE:
+            return result
+        if method == _UNKNOWN:
+            if with_notes:
+                result["calc_notes"] = (
+                    f"Unknown calculation method '{factor.get('calculation_method', 'spend_based')}' — skipped."
+                )
+            return result
+
+        co2e_kg = self.co2e_kg[i]
+        amount  = self._amounts[i]
+        per_unit = float(factor["co2e_factor"])
+        unit     = factor["unit"]
+        if method == _ACTIVITY:
+            quantity, source = self._quantities[i], self._sources[i]
+            result.update({
+                "co2e_kg":                 co2e_kg,
+                "quantity_value":          quantity,
+                "quantity_unit":           unit,
+                "calculation_method_used": f"activity_based ({source})",
+            })
+            if with_notes:
+                result["calc_notes"] = (
+                    f"{quantity} {unit} × {per_unit} kg CO2e/{unit} "
+                    f"= {co2e_kg:.4f} kg CO2e "
+                    f"[NGA factor: {factor.get('activity')}, source: {source}]"
+                )
+        elif method == _FALLBACK:
+            result.update({
+                "co2e_kg":                 co2e_kg,
+                "quantity_value":          amount,
+                "quantity_unit":           "AUD",
+                "calculation_method_used": "spend_based_fallback",
+            })
+            if with_notes:
+                result["calc_notes"] = (
+                    f"Activity-based factor applied via spend fallback. "
+                    f"${amount:.2f} AUD × {per_unit} kg CO2e/AUD = {co2e_kg:.4f} kg CO2e. "
+                    f"Provide quantity in {unit} for a more accurate result."
+                )
+        else:
+            result.update({
+                "co2e_kg":                 co2e_kg,
+                "quantity_value":          amount,
+                "quantity_unit":           "AUD",
+                "calculation_method_used": "spend_based",
+            })
+            if with_notes:
+                result["calc_notes"] = (
+                    f"${amount:.2f} AUD × {per_unit} kg CO2e/AUD "
+                    f"= {co2e_kg:.4f} kg CO2e "
+                    f"[NGA factor: {factor.get('activity')}]"
+                )
+        return result
+
+    def rows(self, with_notes: bool = False) -> list[dict]:
+        return [self.row(i, with_notes) for i in range(len(self))]
+
+
+# ---------------------------------------------------------------------------
+# Exact vectorised rounding
+# ---------------------------------------------------------------------------
+
+def _round4(values) -> list[float]:
+    """round(v, 4) for every element, bit-for-bit equal to Python's round."""
+    if np is None:
+        return [round(v, 4) for v in values]
+
+    raw    = np.asarray(values, dtype=np.float64)
+    scaled = raw * 1e4
+    result = np.rint(scaled) / 1e4
+    # x·10⁴ carries a rounding error of about one ulp, so near a .5 tie (or
+    # beyond 2⁵² where rint is meaningless) the candidate may be wrong.
+    frac   = np.abs(scaled - np.floor(scaled) - 0.5)
+    unsafe = (frac <= np.abs(scaled) * 1e-15 + 1e-9) | (np.abs(scaled) >= 2.0 ** 52)
+    out = result.tolist()
+    for i in np.flatnonzero(unsafe).tolist():
+        out[i] = round(float(raw[i]), 4)
+    return out
+
+
+def _ordered_sums(bins: list[int], weights: list[float], initial: list[float]) -> list[float]:
+    """Per-bin sums added strictly in input order, starting from `initial`."""
+    if np is None:
+        totals = list(initial)
+        for b, w in zip(bins, weights):
+            totals[b] += w
+        return totals
+    # Prepending the starting values keeps the additions in the same order
+    # as RunningAggregate.add: ((initial + w0) + w1) + ...
+    n = len(initial)
+    all_bins    = np.concatenate([np.arange(n), np.asarray(bins, dtype=np.intp)])
+    all_weights = np.concatenate([np.asarray(initial, dtype=np.float64), np.asarray(weights, dtype=np.float64)])
+    return np.bincount(all_bins, weights=all_weights, minlength=n).tolist()
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def calculate_batch(
+    transactions: list[dict],
+    classifications: list[dict],
+    aggregate: Optional[RunningAggregate] = None,
+    statuses: Optional[list[str]] = None,
+    registry: Optional[FactorRegistry] = None,
+) -> BatchCalculation:
+    """
+    Compute CO2e for a batch. When `aggregate` is given, the batch's totals
+    are folded into it exactly as `aggregate.add(enriched_rows)` would;
+    `statuses` (one classification_status per row) defaults to the
+    classifications' "status".
+
+    `registry` is the factor set's registry (`registry_for(factors)`); when
+    it is missing, or a matched factor is not one of its objects, the
+    batch's distinct factors are indexed on the spot.
+    """
+    n = len(transactions)
+    factors: list = [clf.get("matched_factor") for clf in classifications]
+    slots = registry.positions(factors) if registry is not None else None
+    if slots is None:
+        distinct = {id(f): f for f in factors if f is not None}
+        registry = FactorRegistry(distinct.values())
+        slots    = registry.positions(factors)
+    method_of = registry.method
+
+    methods:    list[int] = [_NONE] * n
+    amounts:    list[float] = [0.0] * n
+    quantities: list = [None] * n
+    sources:    list = [None] * n
+    bases:      list[float] = [0.0] * n
+
+    # ── Step 1: resolve quantities into columns (per-row Python) ────────────
+    for i, (tx, clf) in enumerate(zip(transactions, classifications)):
+        amount = float(tx.get("amount_aud", 0))
+        amounts[i] = amount
+        slot = slots[i]
+        if slot < 0:
+            continue
+
+        method = method_of[slot]
+        if method == _ACTIVITY:
+            quantity, source = _resolve_quantity(tx, clf, factors[i])
+            if quantity is None:
+                methods[i], bases[i] = _FALLBACK, amount
+            else:
+                methods[i], bases[i] = _ACTIVITY, quantity
+                quantities[i], sources[i] = quantity, source
+        elif method == _SPEND:
+            methods[i], bases[i] = _SPEND, amount
+        else:
+            methods[i] = _UNKNOWN
+
+    # ── Step 2: co2e = round(base × factor, 4), whole column at once ────────
+    computed = [i for i, m in enumerate(methods) if m != _NONE and m != _UNKNOWN]
+    if np is not None and computed:
+        idx      = np.asarray(computed, dtype=np.intp)
+        slot_col = np.asarray(slots, dtype=np.intp)[idx]
+        per_unit = np.frombuffer(registry.co2e_factor, dtype=np.float64)
+        products = np.asarray(bases, dtype=np.float64)[idx] * per_unit[slot_col]
+    else:
+        per_unit = registry.co2e_factor
+        products = [float(bases[i]) * per_unit[slots[i]] for i in computed]
+    co2e: list = [None] * n
+    for i, value in zip(computed, _round4(products)):
+        co2e[i] = value
+
+    batch = BatchCalculation(transactions, factors, methods, amounts, quantities, sources, co2e)
+
+    # ── Step 3: fold totals into the running aggregate ───────────────────────
+    if aggregate is not None:
+        if statuses is None:
+            statuses = [clf["status"] for clf in classifications]
+        _fold(aggregate, batch, statuses, slots, registry)
+    return batch
+
+
+def _fold(
+    aggregate: RunningAggregate,
+    batch: BatchCalculation,
+    statuses: list[str],
+    slots: list[int],
+    registry: FactorRegistry,
+) -> None:
+    """`aggregate.add` over the batch columns, with identical results."""
+    amounts = batch._amounts
+    co2e    = batch.co2e_kg
+
+    # ── Counts ───────────────────────────────────────────────────────────────
+    aggregate.total_transactions += len(amounts)
+    status_counts = aggregate.status_counts
+    for status, count in Counter(statuses).items():      # first-seen order
+        status_counts[status] = status_counts.get(status, 0) + count
+
+    # ── AUD totals ───────────────────────────────────────────────────────────
+    classified = [a for a, s in zip(amounts, statuses) if s == "classified"]
+    aggregate.total_amount_aud,      = _ordered_sums([0] * len(amounts), amounts, [aggregate.total_amount_aud])
+    aggregate.classified_amount_aud, = _ordered_sums([0] * len(classified), classified, [aggregate.classified_amount_aud])
+
+    # ── Per-scope row counts (any non-zero co2e) ─────────────────────────────
+    scope_of = registry.scope
+    for i, value in enumerate(co2e):
+        if value:
+            scope = scope_of[slots[i]]
+            if scope in aggregate.scope_counts:
+                aggregate.scope_counts[scope] += 1
+
+    # ── Scope and category totals (positive co2e only), in row order ────────
+    category_of = list(zip(registry.category, scope_of))
+    positive    = [i for i, value in enumerate(co2e) if value is not None and value > 0]
+    weights     = [co2e[i] for i in positive]
+
+    scope_keys = list(aggregate.scope_totals)
+    scope_bin  = {scope: b for b, scope in enumerate(scope_keys)}
+    category_keys = list(aggregate.category_map)
+    category_bin  = {key: b for b, key in enumerate(category_keys)}
+    s_bins, c_bins = [], []
+    for i in positive:
+        slot = slots[i]
+        scope, key = scope_of[slot], category_of[slot]
+        b = scope_bin.get(scope)
+        if b is None:
+            b = scope_bin[scope] = len(scope_keys)
+            scope_keys.append(scope)
+        s_bins.append(b)
+        b = category_bin.get(key)
+        if b is None:
+            b = category_bin[key] = len(category_keys)
+            category_keys.append(key)
+        c_bins.append(b)
+
+    scope_sums = _ordered_sums(s_bins, weights, [aggregate.scope_totals.get(s, 0.0) for s in scope_keys])
+    for scope, total in zip(scope_keys, scope_sums):
+        aggregate.scope_totals[scope] = total
+
+    category_sums = _ordered_sums(
+        c_bins, weights,
+        [aggregate.category_map[k]["co2e_kg"] if k in aggregate.category_map else 0.0 for k in category_keys],
+    )
+    counts = Counter(c_bins)
+    for b, (key, total) in enumerate(zip(category_keys, category_sums)):
+        entry = aggregate.category_map.setdefault(
+            key, {"category": key[0], "scope": key[1], "co2e_kg": 0.0, "tx_count": 0},
+        )
+        entry["co2e_kg"]   = total
+        entry["tx_count"] += counts.get(b, 0)
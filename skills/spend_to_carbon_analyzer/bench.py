@@ -0,0 +1,1812 @@
+"""
+EcoLink Australia — Micro-benchmarks for the Spend-to-Carbon analyser.
+
+Runs offline against synthetic data; no LLM keys required.
+
+Usage:
+  python -m skills.spend_to_carbon_analyzer.bench keyword [--rows 10000]
+  python -m skills.spend_to_carbon_analyzer.bench llm [--rows 200] [--latency 0.25] [--concurrency 8] [--batch-size 10]
+  python -m skills.spend_to_carbon_analyzer.bench providers [--rows 200] [--timeout 2]
+  python -m skills.spend_to_carbon_analyzer.bench clients [--calls 500] [--concurrency 8]
+  python -m skills.spend_to_carbon_analyzer.bench recall [--k 3,5,8,12]
+  python -m skills.spend_to_carbon_analyzer.bench calc [--rows 100000]
+  python -m skills.spend_to_carbon_analyzer.bench embed [--scores 0 0.2 0.3 0.4] [--margins 0 0.05 0.1]
+  python -m skills.spend_to_carbon_analyzer.bench rules [--rows 10000]
+  python -m skills.spend_to_carbon_analyzer.bench registry [--rows 100000]
+  python -m skills.spend_to_carbon_analyzer.bench response [--rows 500] [--requests 50]
+  python -m skills.spend_to_carbon_analyzer.bench supplier [--rows 10000]
+  BENCH_DATABASE_URL=postgresql://localhost/ecolink_bench \
+  python -m skills.spend_to_carbon_analyzer.bench upsert [--rows 5000]
+  BENCH_DATABASE_URL=... python -m skills.spend_to_carbon_analyzer.bench rollups [--rows 1000000] [--companies 2]
+  BENCH_DATABASE_URL=... python -m skills.spend_to_carbon_analyzer.bench aggregate [--rows 200000] [--companies 5]
+  BENCH_DATABASE_URL=... python -m skills.spend_to_carbon_analyzer.bench paging [--rows 1000000] [--limit 100]
+  BENCH_DATABASE_URL=... python -m skills.spend_to_carbon_analyzer.bench reclassify [--rows 500000] [--companies 4]
+  BENCH_DATABASE_URL=... DB_SSLMODE=disable \
+  python -m skills.spend_to_carbon_analyzer.bench load [--requests 2000] [--concurrency 50]
+
+`upsert`, `rollups`, `aggregate`, `paging`, `reclassify` and `load` are the exceptions:
+they need a local Postgres (BENCH_DATABASE_URL). All but `load` work inside
+their own temporary schema, which they drop afterwards; `load` expects schema.sql and the factor seed applied.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+from . import batch_calculator, classifier, provider_health
+from .batch_calculator import calculate_batch
+from .calculator import RunningAggregate, calculate_co2e
+from .classifier import (
+    CONFIDENCE_THRESHOLD,
+    _build_user_prompt,
+    _keyword_haystack,
+    classify_batch,
+)
+from .db import ROLLUP_METRICS, _UPSERT_SQL, _UPSERT_TEMPLATE, _upsert_params, upsert_rows
+from .embedding_index import EmbeddingIndex
+from .factor_registry import registry_for
+from .keyword_index import KeywordIndex
+from .llm_clients import GROQ_MODEL, LLM_SDK_MAX_RETRIES, llm_clients
+from .merchant_rules import MerchantRuleEngine
+from .result_cache import classification_cache
+from .retrieval import FactorRetriever
+from .supplier_knowledge import SupplierKnowledge, supplier_key
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+_VOCAB = [
+    "bp", "shell", "caltex", "ampol", "petrol", "unleaded", "diesel", "servo",
+    "natural gas", "gas bill", "agl", "origin", "energyaustralia", "electricity",
+    "power bill", "qantas", "virgin", "jetstar", "flight", "airfare", "uber",
+    "taxi", "hotel", "accommodation", "freight", "courier", "toll", "startrack",
+    "waste", "skip bin", "cleanaway", "water", "sydney water", "stationery",
+    "officeworks", "bunnings", "hardware", "telstra", "optus", "internet",
+    "catering", "restaurant", "lpg", "elgas", "generator", "truck fuel",
+]
+
+_NOISE = [
+    "pty ltd", "sydney", "melbourne", "invoice", "payment", "ref", "store",
+    "monthly", "account", "services", "nsw", "vic", "qld", "card", "eftpos",
+]
+
+
+def synthetic_factors(count: int = 60, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    factors = []
+    for i in range(count):
+        keywords = rng.sample(_VOCAB, rng.randint(2, 8))
+        factors.append({
+            "id":                 f"00000000-0000-0000-0000-{i:012d}",
+            "scope":              rng.choice([1, 2, 3]),
+            "category":           f"Category {i % 12}",
+            "activity":           f"Activity {i}",
+            "unit":               rng.choice(["L", "kWh", "GJ", "km", "AUD"]),
+            "calculation_method": rng.choice(["activity_based", "spend_based"]),
+            "co2e_factor":        round(rng.uniform(0.001, 3.0), 6),
+            "match_keywords":     keywords,
+        })
+    return factors
+
+
+def synthetic_transactions(count: int = 10_000, seed: int = 11) -> list[dict]:
+    rng = random.Random(seed)
+    txs = []
+    for i in range(count):
+        words = rng.sample(_VOCAB, rng.randint(0, 3)) + rng.sample(_NOISE, 3)
+        rng.shuffle(words)
+        txs.append({
+            "description":   " ".join(words).title() + f" #{i}",
+            "supplier_name": rng.choice(_NOISE).title(),
+            "account_name":  rng.choice(["Motor Vehicle Expenses", "Utilities", "Travel", None]),
+            "amount_aud":    round(rng.uniform(5, 2_000), 2),
+        })
+    return txs
+
+
+_SEED_SQL = Path(__file__).resolve().parents[2] / "database" / "seeds" / "emission_factors.sql"
+
+_SEED_ROW = re.compile(
+    r"\((\d{4}),\s*TRUE,\s*(\d),\s*'([^']*)',\s*'([^']*)',\s*'([^']*)',\s*'([^']*)',\s*"
+    r"([\d.]+),[^']*?'(\w+)',\s*ARRAY\[([^\]]*)\],\s*'([^']*)',\s*NULL,\s*(?:TRUE|FALSE),\s*(NULL|'\w+')\)",
+)
+
+
+def seed_factors(path: Path = _SEED_SQL) -> list[dict]:
+    """Parse the NGA 2024 seed file into factor dicts shaped like `fetch_all_factors` rows."""
+    factors = []
+    for i, m in enumerate(_SEED_ROW.finditer(path.read_text(encoding="utf-8"))):
+        year, scope, category, subcategory, activity, unit, co2e, method, keywords, table, state = m.groups()
+        factors.append({
+            "id":                 f"00000000-0000-0000-0001-{i:012d}",
+            "nga_year":           int(year),
+            "scope":              int(scope),
+            "category":           category,
+            "subcategory":        subcategory,
+            "activity":           activity,
+            "unit":               unit,
+            "co2e_factor":        float(co2e),
+            "calculation_method": method,
+            "match_keywords":     re.findall(r"'([^']*)'", keywords),
+            "source_table":       table,
+            "state":              None if state == "NULL" else state.strip("'"),
+        })
+    return factors
+
+
+_MIGRATIONS = Path(__file__).resolve().parents[2] / "database" / "migrations"
+
+_RULE_ROW = re.compile(
+    r"\(\s*'((?:[^']|'')*)',\s*'((?:[^']|'')*)',\s*'(\w+)',\s*'(\w+)',\s*(\d),\s*(NULL|'\w+'),\s*"
+    r"(TRUE|FALSE),\s*'((?:[^']|'')*)',\s*(\d+)(?:,\s*'(\w+)')?\)",
+)
+
+
+def seed_merchant_rules() -> list[dict]:
+    """Rules seeded by migrations 016 and 018 (with 018's action back-fill), in engine order."""
+    rules = []
+    for name in ("016_merchant_classification_rules.sql", "018_merchant_classification_rules.sql"):
+        for m in _RULE_ROW.finditer((_MIGRATIONS / name).read_text(encoding="utf-8")):
+            merchant, pattern, match_type, category, scope, unit, state, citation, priority, action = m.groups()
+            if action is None:
+                action = (
+                    "IGNORE" if scope == "0" or category == "excluded_finance"
+                    else "NEEDS_REVIEW" if category == "accommodation_business"
+                    else "EXTRACT_VOLUME"
+                )
+            rules.append({
+                "id":             f"00000000-0000-0000-0002-{len(rules):012d}",
+                "merchant_name":  merchant.replace("''", "'"),
+                "pattern":        pattern.replace("''", "'"),
+                "match_type":     match_type,
+                "category_code":  category,
+                "scope":          int(scope),
+                "activity_unit":  None if unit == "NULL" else unit.strip("'"),
+                "requires_state": state == "TRUE",
+                "notes_citation": citation.replace("''", "'"),
+                "priority":       int(priority),
+                "action":         action,
+            })
+    # ORDER BY priority DESC, created_at ASC — insertion order stands in for created_at.
+    return sorted(rules, key=lambda r: -r["priority"])
+
+
+# Hand-labelled sample: (description, supplier_name, account_name, expected activity).
+# Deliberately phrased to miss most match_keywords — these are the rows that reach the LLM.
+LABELLED_SAMPLE: list[tuple[str, Optional[str], Optional[str], str]] = [
+    ("Fuel card - unleaded 45.2L",            "Coles Express",       "Motor Vehicle Expenses", "Petrol — Passenger Vehicles"),
+    ("Ampol Foodary Parramatta",              None,                  "Motor Vehicle Expenses", "Petrol — Passenger Vehicles"),
+    ("Premium 98 top-up company car",         None,                  "Fuel",                   "Petrol — Passenger Vehicles"),
+    ("Diesel for work ute",                   "Puma Energy",         "Motor Vehicle Expenses", "Diesel — Passenger Vehicles"),
+    ("Fleet diesel - prime movers March",     "Viva Energy",         "Freight Fuel",           "Diesel — Heavy Vehicles (>3.5t GVM)"),
+    ("Generator fuel drop - site 4",          "Fuel Distributors",   "Site Costs",             "Diesel — Stationary Combustion"),
+    ("Gas cylinder swap 45kg",                "Elgas",               "Kitchen",                "LPG — Stationary Combustion"),
+    ("Jemena gas account Q3",                 None,                  "Utilities",              "Natural Gas — Commercial & Industrial"),
+    ("Quarterly gas usage 18 GJ",             "Origin",              "Utilities",              "Natural Gas — Commercial & Industrial"),
+    ("Ausgrid network charges",               None,                  "Electricity",            "Electricity — NSW Grid"),
+    ("Power bill Jul-Sep 4,210 kWh",          "Energex",             "Electricity",            "Electricity — QLD Grid"),
+    ("CitiPower supply charge",               None,                  "Utilities",              "Electricity — VIC Grid"),
+    ("Synergy electricity Perth office",      None,                  "Utilities",              "Electricity — WA Grid"),
+    ("Evoenergy quarterly account",           None,                  "Electricity",            "Electricity — ACT Grid"),
+    ("SYD-MEL return economy",                "Qantas Airways",      "Travel - Domestic",      "Air Travel — Domestic Flights (spend-based)"),
+    ("Virgin Australia BNE-SYD",              None,                  "Travel",                 "Air Travel — Domestic Flights (spend-based)"),
+    ("Sydney to Singapore business class",    "Singapore Airlines",  "Travel - International", "Air Travel — International Flights (spend-based)"),
+    ("Conference stay 3 nights",              "Ibis Melbourne",      "Travel",                 "Accommodation — Hotels & Motels (spend-based)"),
+    ("Airbnb - Hobart site visit",            None,                  "Travel",                 "Accommodation — Hotels & Motels (spend-based)"),
+    ("Trip to airport",                       "Uber",                "Travel - Local",         "Ground Transport — Taxi & Ride Share (spend-based)"),
+    ("13CABS fare CBD",                       None,                  "Travel - Local",         "Ground Transport — Taxi & Ride Share (spend-based)"),
+    ("Pallet delivery to Brisbane DC",        "StarTrack",           "Freight Outwards",       "Freight — Domestic Road (spend-based)"),
+    ("Parcel post - customer orders",         "Sendle",              "Postage & Freight",      "Freight — Domestic Road (spend-based)"),
+    ("Overnight air cargo to Darwin",         "Qantas Freight",      "Freight Outwards",       "Freight — Domestic Air (spend-based)"),
+    ("Team lunch",                            "Cafe Sydney",         "Staff Amenities",        "Purchased Goods — Food & Beverages (spend-based)"),
+    ("Office milk and coffee",                "Woolworths",          "Staff Amenities",        "Purchased Goods — Food & Beverages (spend-based)"),
+    ("Toner cartridges x4",                   "Officeworks",         "Office Expenses",        "Purchased Goods — Office Supplies (spend-based)"),
+    ("A4 copy paper 10 reams",                None,                  "Printing & Stationery",  "Purchased Goods — Office Supplies (spend-based)"),
+    ("FY24 audit fee",                        "BDO",                 "Accounting Fees",        "Purchased Services — Professional & Business Services (spend-based)"),
+    ("Contract review",                       "Gilbert + Tobin",     "Legal Fees",             "Purchased Services — Professional & Business Services (spend-based)"),
+    ("NBN business 100",                      "Telstra",             "Telephone & Internet",   "Purchased Services — IT & Telecommunications (spend-based)"),
+    ("AWS monthly usage",                     "Amazon Web Services", "Software & Hosting",     "Purchased Services — IT & Telecommunications (spend-based)"),
+    ("Microsoft 365 licences",                None,                  "Software subscription",  "Purchased Services — IT & Telecommunications (spend-based)"),
+    ("General waste lift x4",                 "Cleanaway",           "Waste Removal",          "Waste — Municipal Solid Waste to Landfill"),
+    ("6m3 skip hire",                         None,                  "Waste Removal",          "Waste — Municipal Solid Waste to Landfill"),
+    ("Quarterly water usage 92 kL",           "Sydney Water",        "Water Rates",            "Water — Mains Supply (spend-based)"),
+    ("Split system regas R410A 2kg",          "Coolmasters HVAC",    "Repairs & Maintenance",  "Refrigerant — R-410A (HVAC)"),
+    ("Car aircon regas",                      "Ultra Tune",          "Motor Vehicle Expenses", "Refrigerant — R-134a (Automotive)"),
+    ("Avtur uplift charter",                  "Air BP",              "Aircraft Fuel",          "Aviation Turbine Fuel — Domestic"),
+    ("Top up R32 refrigerant",                "Daikin Service",      "Repairs & Maintenance",  "Refrigerant — R-32 (HVAC)"),
+]
+
+
+# ---------------------------------------------------------------------------
+# Reference implementation (pre-index keyword loop)
+# ---------------------------------------------------------------------------
+
+def _legacy_keyword_prematch(
+    transaction: dict,
+    factors: list[dict],
+) -> Optional[tuple[dict, float]]:
+    haystack = _keyword_haystack(transaction)
+
+    best_factor = None
+    best_score  = 0.0
+
+    for factor in factors:
+        keywords: list[str] = factor.get("match_keywords") or []
+        if not keywords:
+            continue
+
+        matched_kw = [kw for kw in keywords if kw.lower() in haystack]
+        if not matched_kw:
+            continue
+
+        score = min(len(matched_kw) / max(len(keywords), 1) * 0.95, 0.92)
+        score += min(max(len(kw) for kw in matched_kw) * 0.005, 0.05)
+
+        if score > best_score:
+            best_score  = score
+            best_factor = factor
+
+    if best_factor and best_score >= CONFIDENCE_THRESHOLD:
+        return best_factor, round(best_score, 3)
+
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Fake LLM provider (OpenAI-compatible, as spoken by the Groq SDK)
+# ---------------------------------------------------------------------------
+
+class FakeLLMServer:
+    """
+    Local HTTP server answering Groq chat-completion calls after `latency`
+    seconds with a fixed classification. Point the Groq SDK at it through
+    GROQ_BASE_URL (see `bench_llm`). Multi-transaction prompts get one
+    answer per transaction index. Speaks HTTP/1.1, so clients can keep
+    connections alive; `connections` counts the TCP connections accepted.
+    """
+
+    def __init__(self, factor_id: str, latency: float = 0.25) -> None:
+        self.factor_id     = factor_id
+        self.latency       = latency
+        self.requests      = 0
+        self.request_bytes = 0
+        self.connections   = 0
+        self._lock         = threading.Lock()
+        self._httpd        = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread       = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.requests      = 0
+            self.request_bytes = 0
+            self.connections   = 0
+
+    def _answer(self, prompt: str) -> dict:
+        answer = {
+            "matched_factor_id": self.factor_id,
+            "confidence":        0.9,
+            "reasoning":         "Fake provider response.",
+            "quantity_hint":     {"value": None, "unit": None},
+        }
+        marker = "Transactions:\n"
+        if marker not in prompt:
+            return answer
+        batch = json.loads(prompt.split(marker, 1)[1].split("\n", 1)[0])
+        return {"results": [{"index": tx["index"], **answer} for tx in batch]}
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True    # headers and body go out as separate writes
+
+            def setup(self) -> None:
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_POST(self) -> None:  # noqa: N802 — http.server API
+                payload = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                with server._lock:
+                    server.requests      += 1
+                    server.request_bytes += len(payload)
+                time.sleep(server.latency)
+
+                prompt  = json.loads(payload)["messages"][-1]["content"]
+                content = json.dumps(server._answer(prompt))
+                body = json.dumps({
+                    "id":      "chatcmpl-fake",
+                    "object":  "chat.completion",
+                    "created": int(time.time()),
+                    "model":   "llama-3.3-70b-versatile",
+                    "choices": [{
+                        "index":         0,
+                        "finish_reason": "stop",
+                        "message":       {"role": "assistant", "content": content},
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }).encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "FakeLLMServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+def _timed(fn: Callable[[], object]) -> tuple[object, float]:
+    start = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - start
+
+
+def bench_keyword(rows: int) -> None:
+    factors = synthetic_factors()
+    txs     = synthetic_transactions(rows)
+
+    legacy, legacy_s = _timed(
+        lambda: [_legacy_keyword_prematch(tx, factors) for tx in txs]
+    )
+
+    def _indexed() -> list:
+        index = KeywordIndex(factors)
+        return [index.best_match(_keyword_haystack(tx), CONFIDENCE_THRESHOLD) for tx in txs]
+
+    indexed, indexed_s = _timed(_indexed)
+
+    mismatches = sum(
+        1 for a, b in zip(legacy, indexed)
+        if (a and (a[0]["id"], a[1])) != (b and (b[0]["id"], b[1]))
+    )
+    hits = sum(1 for r in indexed if r)
+
+    print(f"keyword pre-match — {rows} transactions × {len(factors)} factors ({hits} hits)")
+    print(f"  legacy loop   : {legacy_s * 1000:9.1f} ms")
+    print(f"  keyword index : {indexed_s * 1000:9.1f} ms  (incl. build)")
+    print(f"  speed-up      : {legacy_s / indexed_s:9.2f}×")
+    print(f"  mismatches    : {mismatches}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+def _letters(n: int) -> str:
+    letters = ""
+    while True:
+        n, r = divmod(n, 26)
+        letters += chr(ord("a") + r)
+        if not n:
+            return letters
+
+
+def _llm_misses(rows: int) -> list[dict]:
+    """
+    Keyword-free, distinct descriptions so every row misses the fast path
+    and the classification cache (which ignores digits).
+    """
+    return [
+        {"description": f"Misc supplier {_letters(i)} invoice", "amount_aud": 100.0}
+        for i in range(rows)
+    ]
+
+
+def bench_llm(rows: int, latency: float, concurrency: int, batch_size: int) -> None:
+    factors = synthetic_factors()
+    txs = _llm_misses(rows)
+    # (label, workers, batch size, start with a cold cache)
+    modes = [
+        ("sequential", 1,           1,          True),
+        ("concurrent", concurrency, 1,          True),
+        ("batched",    concurrency, batch_size, True),
+        ("warm cache", concurrency, batch_size, False),
+    ]
+
+    print(f"LLM classification — {rows} keyword misses, {latency * 1000:.0f} ms fake provider latency")
+    baseline_ids = None
+    baseline_s   = None
+    failed       = False
+
+    # Measure the LLM path itself: no line may be answered locally.
+    classifier.EMBEDDING_STAGE = False
+
+    with FakeLLMServer(str(factors[0]["id"]), latency) as server:
+        os.environ["GROQ_API_KEY"]  = "fake-key"
+        os.environ["GROQ_BASE_URL"] = server.url
+
+        for label, workers, size, cold in modes:
+            if cold:
+                classification_cache.clear()
+            server.reset_counters()
+            results, elapsed = _timed(
+                lambda: classify_batch(txs, factors, max_concurrency=workers, llm_batch_size=size)
+            )
+            ids = [r["matched_factor"] and r["matched_factor"]["id"] for r in results]
+            classified = sum(1 for r in results if r["status"] == "classified")
+            if baseline_ids is None:
+                baseline_ids, baseline_s = ids, elapsed
+
+            print(
+                f"  {label:<10} (workers={workers:<2} batch={size:<3}): {elapsed:7.2f} s  "
+                f"{baseline_s / elapsed:5.2f}×  calls={server.requests:<4} "
+                f"prompt bytes={server.request_bytes:<9} classified={classified}/{rows}"
+            )
+            failed |= ids != baseline_ids or classified != rows
+
+    if failed:
+        raise SystemExit(1)
+
+
+class _FakeProvider:
+    """
+    Stand-in for `_groq_request` / `_gemini_request`: answers after `latency`
+    seconds, except a `slow_share` of calls that take `slow` seconds. Calls
+    longer than the timeout raise, like the SDKs' read timeout.
+    """
+
+    def __init__(self, factor_id: str, latency: float, slow: float = 0.0, slow_share: float = 0.0) -> None:
+        self.factor_id  = factor_id
+        self.latency    = latency
+        self.slow       = slow
+        self.slow_share = slow_share
+        self.calls      = 0
+        self._rng       = random.Random(23)
+        self._lock      = threading.Lock()
+
+    def __call__(self, user_prompt: str, max_tokens: int, timeout: float) -> dict:
+        with self._lock:
+            self.calls += 1
+            slow = self._rng.random() < self.slow_share
+        latency = self.slow if slow else self.latency
+        time.sleep(min(latency, timeout))
+        if latency > timeout:
+            raise TimeoutError(f"no response within {timeout:.1f}s")
+        return {"matched_factor_id": self.factor_id, "confidence": 0.9, "reasoning": "fake"}
+
+
+def bench_providers(rows: int, timeout: float) -> None:
+    factors = synthetic_factors()
+    factor_id = str(factors[0]["id"])
+    txs = _llm_misses(rows)
+    classifier.EMBEDDING_STAGE = False
+    logging.getLogger("ecolink.providers").setLevel(logging.ERROR)  # one warning per failed call
+
+    # (label, Groq stand-in, Gemini stand-in)
+    scenarios = [
+        ("healthy",    _FakeProvider(factor_id, 0.05),                              _FakeProvider(factor_id, 0.08)),
+        ("slow tail",  _FakeProvider(factor_id, 0.05, slow=1.5, slow_share=0.10),   _FakeProvider(factor_id, 0.08)),
+        ("groq down",  _FakeProvider(factor_id, 0.05, slow=60.0, slow_share=1.0),   _FakeProvider(factor_id, 0.08)),
+    ]
+    # (label, hedging, breaker failure threshold)
+    modes = [("sequential", False, 10**9), ("health layer", True, provider_health.LLM_BREAKER_FAILURES)]
+
+    print(f"Provider health — {rows} LLM-bound rows, one prompt each, 4 workers, {timeout:.1f} s timeout")
+    print(f"  {'scenario':<10} {'mode':<13} {'total':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}  "
+          f"{'groq':>5} {'gemini':>6} {'hedged':>6}  answered")
+
+    ask_llm = classifier._ask_llm
+    try:
+        for scenario, groq, gemini in scenarios:
+            for mode, hedge, threshold in modes:
+                provider_health.LLM_HEDGE = hedge
+                for provider in (provider_health.GROQ, provider_health.GEMINI):
+                    provider.reset()
+                    provider.timeout = timeout
+                    provider.breaker.failure_threshold = threshold
+                classification_cache.clear()
+                groq.calls = gemini.calls = 0
+                hedges_before = provider_health.hedges
+                classifier._groq_request, classifier._gemini_request = groq, gemini
+
+                latencies: list[float] = []
+                lock = threading.Lock()
+
+                def timed_ask(*args, **kwargs):
+                    started = time.perf_counter()
+                    try:
+                        return ask_llm(*args, **kwargs)
+                    finally:
+                        with lock:
+                            latencies.append(time.perf_counter() - started)
+
+                classifier._ask_llm = timed_ask
+                results, elapsed = _timed(
+                    lambda: classify_batch(txs, factors, max_concurrency=4, llm_batch_size=1)
+                )
+                latencies.sort()
+
+                def pct(q: float) -> str:
+                    return f"{latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000:5.0f}ms"
+
+                answered = sum(1 for r in results if r["status"] == "classified")
+                print(
+                    f"  {scenario:<10} {mode:<13} {elapsed:6.2f}s {pct(0.5)} {pct(0.95)} {pct(0.99)} "
+                    f"{latencies[-1] * 1000:5.0f}ms  {groq.calls:5d} {gemini.calls:6d} "
+                    f"{provider_health.hedges - hedges_before:6d}  {answered}/{rows}"
+                )
+    finally:
+        classifier._ask_llm = ask_llm
+
+
+def _legacy_groq_request(user_prompt: str, max_tokens: int, timeout: float) -> dict:
+    """Groq call as it was before the client registry: SDK import and a new client per call."""
+    from groq import Groq
+
+    client = Groq(api_key=os.environ["GROQ_API_KEY"], timeout=timeout, max_retries=LLM_SDK_MAX_RETRIES)
+    response = client.chat.completions.create(
+        model=GROQ_MODEL,
+        messages=[
+            {"role": "system", "content": classifier.SYSTEM_PROMPT},
+            {"role": "user",   "content": user_prompt},
+        ],
+        temperature=0.1,
+        max_tokens=max_tokens,
+        response_format={"type": "json_object"},
+    )
+    return json.loads(response.choices[0].message.content)
+
+
+def bench_clients(calls: int, concurrency: int) -> None:
+    factors = synthetic_factors()
+    prompt = _build_user_prompt(_llm_misses(1)[0], factors[:8])
+    modes = [
+        ("client per call", _legacy_groq_request),
+        ("shared client",   classifier._groq_request),
+    ]
+
+    print(f"LLM clients — {calls} Groq calls against a local mock (no added latency), "
+          f"sequential and {concurrency} threads")
+    print(f"  {'mode':<16} {'threads':>7} {'mean':>8} {'p50':>8} {'p95':>8} {'total':>8}  new connections")
+    with FakeLLMServer(str(factors[0]["id"]), latency=0.0) as server:
+        os.environ["GROQ_API_KEY"]  = "fake-key"
+        os.environ["GROQ_BASE_URL"] = server.url
+
+        for label, request in modes:
+            for threads in (1, concurrency):
+                llm_clients.close()
+                request(prompt, 64, 10.0)            # warm-up: SDK import, first client
+                server.reset_counters()
+                latencies: list[float] = []
+                lock = threading.Lock()
+
+                def one(_: int) -> None:
+                    started = time.perf_counter()
+                    request(prompt, 64, 10.0)
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+
+                if threads == 1:
+                    _, total = _timed(lambda: [one(i) for i in range(calls)])
+                else:
+                    with ThreadPoolExecutor(max_workers=threads) as pool:
+                        _, total = _timed(lambda: list(pool.map(one, range(calls))))
+                latencies.sort()
+                print(
+                    f"  {label:<16} {threads:7d} {sum(latencies) / calls * 1000:6.2f}ms "
+                    f"{latencies[calls // 2] * 1000:6.2f}ms {latencies[int(calls * 0.95)] * 1000:6.2f}ms "
+                    f"{total:7.2f}s  {server.connections}"
+                )
+    llm_clients.close()
+
+
+def bench_recall(ks: list[int]) -> None:
+    factors = seed_factors()
+    by_activity = {f["activity"]: f for f in factors}
+    sample = [
+        ({"description": d, "supplier_name": s, "account_name": a, "amount_aud": 100.0}, by_activity[label])
+        for d, s, a, label in LABELLED_SAMPLE
+    ]
+
+    full_bytes = sum(len(_build_user_prompt(tx, factors)) for tx, _ in sample)
+    print(f"Candidate retrieval — {len(sample)} labelled transactions, {len(factors)} seed factors")
+    print(f"  {'k':>4}  {'recall@k':>8}  {'avg candidates':>14}  {'prompt size':>11}")
+
+    for k in ks:
+        retriever = FactorRetriever(factors, top_k=k)
+        hits = candidates = prompt_bytes = 0
+        for tx, expected in sample:
+            top = retriever.top_k(tx)
+            hits         += any(f is expected for f in top)
+            candidates   += len(top)
+            prompt_bytes += len(_build_user_prompt(tx, top))
+        print(
+            f"  {k:>4}  {hits / len(sample):8.1%}  {candidates / len(sample):14.1f}  "
+            f"{prompt_bytes / full_bytes:10.0%}"
+        )
+
+
+
+# Lines no factor describes — an embedding answer for any of these is wrong.
+_OFF_TOPIC = ["Mystery charge", "Team lunch", "Staff birthday cake", "Bank fee", "Legal retainer Q2",
+              "Donation - local footy club", "Parking fine", "Christmas party venue hire"]
+
+
+def bench_embed(scores: list[float], margins: list[float], rows: int) -> None:
+    factors = seed_factors()
+    by_activity = {f["activity"]: f for f in factors}
+    sample = [
+        ({"description": d, "supplier_name": s, "account_name": a, "amount_aud": 100.0}, by_activity[label])
+        for d, s, a, label in LABELLED_SAMPLE
+    ]
+    off_topic = [{"description": d, "amount_aud": 40.0} for d in _OFF_TOPIC]
+    index, build_s = _timed(lambda: EmbeddingIndex(factors))
+
+    print(f"Nearest-factor embeddings — {len(sample)} labelled + {len(off_topic)} off-topic transactions, "
+          f"{len(factors)} seed factors (index built in {build_s * 1000:.1f} ms)")
+    print(f"  {'score':>5}  {'margin':>6}  {'classified':>10}  {'review':>6}  {'to LLM':>6}  "
+          f"{'correct':>7}  {'off-topic':>9}")
+    saved = classifier.EMBEDDING_STAGE, classifier.EMBEDDING_MIN_SCORE, classifier.EMBEDDING_MIN_MARGIN
+    try:
+        for min_score in scores:
+            for margin in margins:
+                classifier.EMBEDDING_STAGE      = True
+                classifier.EMBEDDING_MIN_SCORE  = min_score
+                classifier.EMBEDDING_MIN_MARGIN = margin
+                results = [classifier._embedding_stage(tx, factors, index) for tx, _ in sample]
+                stray   = sum(1 for tx in off_topic if classifier._embedding_stage(tx, factors, index))
+                answered  = [(r, expected) for r, (_, expected) in zip(results, sample) if r]
+                confident = sum(1 for r, _ in answered if r["status"] == "classified")
+                correct   = sum(1 for r, expected in answered if r["matched_factor"] is expected)
+                print(
+                    f"  {min_score:5.2f}  {margin:6.2f}  {confident:10d}  {len(answered) - confident:6d}  "
+                    f"{len(sample) - len(answered):6d}  "
+                    f"{(correct / len(answered) if answered else 0.0):7.1%}  {stray:9d}"
+                )
+    finally:
+        classifier.EMBEDDING_STAGE, classifier.EMBEDDING_MIN_SCORE, classifier.EMBEDDING_MIN_MARGIN = saved
+
+    txs = synthetic_transactions(rows)
+    _, lookup_s = _timed(lambda: [index.nearest(tx) for tx in txs])
+    print(f"  lookup: {lookup_s / rows * 1e6:.1f} µs per transaction ({rows} synthetic lines)")
+
+
+def _legacy_rule_match(rules: list[dict], tx: dict) -> Optional[dict]:
+    """First-match loop over priority-sorted rules, as in transaction_router.ts."""
+    texts = [t.lower() for t in (tx.get("description"), tx.get("supplier_name")) if t]
+    for rule in rules:
+        pattern = rule["pattern"].lower()
+        for text in texts:
+            if rule["match_type"] == "contains":
+                hit = pattern in text
+            elif rule["match_type"] == "starts_with":
+                hit = text.startswith(pattern)
+            else:
+                hit = text == pattern
+            if hit:
+                return rule
+    return None
+
+
+def bench_rules(rows: int) -> None:
+    rules = seed_merchant_rules()
+    rng   = random.Random(17)
+    txs   = synthetic_transactions(rows)
+    # Mix in real merchant names so a good share of lines hit a rule.
+    merchants = [r["pattern"].strip() for r in rules]
+    for tx in txs:
+        if rng.random() < 0.4:
+            tx["description"] = f"{rng.choice(merchants).upper()} {tx['description']}"
+
+    legacy, legacy_s = _timed(lambda: [_legacy_rule_match(rules, tx) for tx in txs])
+
+    def _compiled() -> list:
+        engine = MerchantRuleEngine(rules)
+        return [engine.match(tx) for tx in txs]
+
+    compiled, compiled_s = _timed(_compiled)
+
+    mismatches = sum(
+        1 for a, b in zip(legacy, compiled)
+        if (a and a["id"]) != (b and b.id)
+    )
+    hits = sum(1 for r in compiled if r)
+
+    print(f"merchant rules — {rows} transactions × {len(rules)} seeded rules ({hits} hits)")
+    print(f"  first-match loop : {legacy_s * 1000:9.1f} ms")
+    print(f"  compiled engine  : {compiled_s * 1000:9.1f} ms  (incl. build)")
+    print(f"  speed-up         : {legacy_s / compiled_s:9.2f}×")
+    print(f"  mismatches       : {mismatches}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+def bench_calc(rows: int) -> None:
+    factors = synthetic_factors()
+    txs     = synthetic_transactions(rows)
+    rng     = random.Random(13)
+    statuses = ["classified", "classified", "classified", "needs_review", "factor_not_found"]
+    classifications = []
+    for tx in txs:
+        status = rng.choice(statuses)
+        factor = rng.choice(factors) if status != "factor_not_found" else None
+        if factor and factor["calculation_method"] == "activity_based" and rng.random() < 0.5:
+            tx["quantity_value"] = round(rng.uniform(1, 500), 2)
+            tx["quantity_unit"]  = factor["unit"]
+        classifications.append({"matched_factor": factor, "status": status})
+
+    def _per_row() -> tuple[list[dict], dict]:
+        enriched = []
+        for tx, clf in zip(txs, classifications):
+            calc   = calculate_co2e(tx, clf)
+            factor = clf["matched_factor"]
+            enriched.append({
+                **tx, **calc,
+                "matched_factor":        factor,
+                "classification_status": clf["status"],
+                "scope":                 factor["scope"] if factor else None,
+            })
+        return enriched, RunningAggregate().add(enriched).to_state()
+
+    def _batch(with_notes: bool) -> tuple[list[dict], dict]:
+        aggregate = RunningAggregate()
+        batch = calculate_batch(txs, classifications, aggregate)
+        return batch.rows(with_notes), aggregate.to_state()
+
+    (legacy, legacy_agg), legacy_s = _timed(_per_row)
+    (lean, lean_agg), lean_s       = _timed(lambda: _batch(False))
+    (noted, noted_agg), noted_s    = _timed(lambda: _batch(True))
+
+    fields = ("co2e_kg", "quantity_value", "quantity_unit", "calculation_method_used")
+    mismatches = sum(
+        1 for a, b, c in zip(legacy, lean, noted)
+        if any(repr(a[f]) != repr(b[f]) for f in fields) or a["calc_notes"] != c["calc_notes"]
+    )
+    mismatches += (repr(lean_agg) != repr(legacy_agg)) + (repr(noted_agg) != repr(legacy_agg))
+
+    print(f"CO2e calculation + aggregation — {rows} transactions "
+          f"({'NumPy' if batch_calculator.np is not None else 'pure Python'} batch path)")
+    print(f"  per-row calculate_co2e  : {legacy_s * 1000:9.1f} ms")
+    print(f"  batch, no notes         : {lean_s * 1000:9.1f} ms  ({legacy_s / lean_s:.2f}×)")
+    print(f"  batch, notes rendered   : {noted_s * 1000:9.1f} ms  ({legacy_s / noted_s:.2f}×)")
+    print(f"  mismatches              : {mismatches}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+def synthetic_enriched(factors: tuple, count: int, seed: int = 5) -> list[dict]:
+    """Rows shaped like `classify_and_calculate` output, ~90% matched to `factors`."""
+    rng = random.Random(seed)
+    enriched = []
+    for i, tx in enumerate(synthetic_transactions(count, seed)):
+        factor = rng.choice(factors) if rng.random() < 0.9 else None
+        enriched.append({
+            **tx,
+            "transaction_date":          date(2024, 1 + i % 12, 1 + i % 28),
+            "external_id":               f"INV-{i}" if i % 3 else None,
+            "matched_factor":            factor,
+            "classification_status":     rng.choice(("classified", "needs_review")) if factor else "factor_not_found",
+            "classification_confidence": round(rng.uniform(0.5, 1.0), 2) if factor else None,
+            "classification_notes":      f"Keyword pre-match: '{factor['activity']}'" if factor else None,
+            "quantity_value":            round(rng.uniform(1, 500), 2) if factor else None,
+            "quantity_unit":             factor["unit"] if factor else None,
+            "co2e_kg":                   round(rng.uniform(0, 900), 4) if factor else None,
+            "scope":                     factor["scope"] if factor else None,
+        })
+    return enriched
+
+
+def bench_registry(rows: int) -> None:
+    from .factor_cache import EmissionFactor
+    from .pipeline import to_classified_transaction
+
+    factors  = tuple(EmissionFactor(row, 2024) for row in seed_factors())
+    rng      = random.Random(5)
+    ids      = [str(rng.choice(factors)["id"]) for _ in range(rows)]
+    enriched = synthetic_enriched(factors, rows)
+
+    def _linear_lookup() -> list:
+        return [next((f for f in factors if str(f["id"]) == factor_id), None) for factor_id in ids]
+
+    def _indexed_lookup() -> list:
+        registry = registry_for(factors)
+        return [registry.get(factor_id) for factor_id in ids]
+
+    linear, linear_s   = _timed(_linear_lookup)
+    indexed, indexed_s = _timed(_indexed_lookup)
+
+    per_row, per_row_s = _timed(lambda: [to_classified_transaction(e, 2024) for e in enriched])
+    shared, shared_s   = _timed(
+        lambda: [to_classified_transaction(e, 2024, registry_for(factors)) for e in enriched]
+    )
+
+    mismatches = sum(a is not b for a, b in zip(linear, indexed))
+    mismatches += sum(a.model_dump() != b.model_dump() for a, b in zip(per_row, shared))
+
+    print(f"factor registry — {len(factors)} seeded factors, {rows} lookups / result rows")
+    print(f"  id lookup, linear scan  : {linear_s * 1000:9.1f} ms")
+    print(f"  id lookup, hash index   : {indexed_s * 1000:9.1f} ms  ({linear_s / indexed_s:.1f}×)")
+    print(f"  rows, summary per row   : {per_row_s * 1000:9.1f} ms")
+    print(f"  rows, shared summaries  : {shared_s * 1000:9.1f} ms  ({per_row_s / shared_s:.2f}×)")
+    print(f"  mismatches              : {mismatches}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+def bench_response(rows: int, requests: int) -> None:
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+
+    from .factor_cache import EmissionFactor
+    from .main import app
+    from .models import AnalyseResponse
+    from .pipeline import classified_row, summary_fields, summary_values, to_classified_transaction
+    from .response_json import FASTAPI_DUMPS_WITH_PYDANTIC, render_json
+
+    factors  = tuple(EmissionFactor(row, 2024) for row in seed_factors())
+    registry = registry_for(factors)
+    enriched = synthetic_enriched(factors, rows)
+    aggregate = RunningAggregate().add(enriched)
+    field = next(r for r in app.routes if getattr(r, "path", None) == "/analyse").response_field
+    head = {"company_id": "00000000-0000-0000-0000-000000000001", "nga_year": 2024, "state": None}
+
+    def _model_path() -> bytes:
+        response = AnalyseResponse(
+            **head,
+            results=[to_classified_transaction(e, 2024, registry) for e in enriched],
+            **summary_fields(aggregate),
+        )
+        # What FastAPI does with a returned model under response_model. For
+        # async endpoints serialize_response never suspends, so the coroutine
+        # completes on its first step.
+        kwargs = {"dump_json": True} if FASTAPI_DUMPS_WITH_PYDANTIC else {}
+        try:
+            serialize_response(field=field, response_content=response, **kwargs).send(None)
+        except StopIteration as done:
+            content = done.value
+        return content if FASTAPI_DUMPS_WITH_PYDANTIC else JSONResponse(content).body
+
+    def _fast_path() -> bytes:
+        return render_json({
+            **head,
+            "results": [classified_row(e, 2024, registry) for e in enriched],
+            **summary_values(aggregate),
+        })
+
+    def _cpu(fn: Callable[[], bytes]) -> tuple[bytes, float]:
+        fn()                                   # warm registry summaries
+        start = time.process_time()
+        for _ in range(requests):
+            body = fn()
+        return body, (time.process_time() - start) / requests
+
+    model_body, model_s = _cpu(_model_path)
+    fast_body, fast_s   = _cpu(_fast_path)
+
+    print(f"/analyse response build + serialisation — {rows} rows, CPU per request "
+          f"(mean of {requests}; {'pydantic-core' if FASTAPI_DUMPS_WITH_PYDANTIC else 'json.dumps'} rendering)")
+    print(f"  models + response_model : {model_s * 1000:8.2f} ms")
+    print(f"  fast path               : {fast_s * 1000:8.2f} ms  ({model_s / fast_s:.2f}×)")
+    print(f"  byte-identical          : {model_body == fast_body} ({len(fast_body)} bytes)")
+    if model_body != fast_body:
+        raise SystemExit(1)
+
+
+# The columns `upsert_rows` writes, the dedup index it conflicts on, and what
+# the rollup triggers (migration 026) and the factor refresh (029) read.
+_BENCH_SCHEMA = """
+CREATE SCHEMA ecolink_bench;
+CREATE TABLE ecolink_bench.transactions (
+    id                        UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    company_id                UUID NOT NULL,
+    source                    TEXT NOT NULL,
+    external_id               TEXT,
+    transaction_date          DATE NOT NULL,
+    description               TEXT NOT NULL,
+    supplier_name             TEXT,
+    amount_aud                NUMERIC(14,2) NOT NULL,
+    account_code              TEXT,
+    account_name              TEXT,
+    emission_factor_id        UUID,
+    classification_status     TEXT NOT NULL,
+    classification_confidence NUMERIC(4,3),
+    classification_notes      TEXT,
+    classified_at             TIMESTAMPTZ,
+    classified_by             TEXT NOT NULL,
+    quantity_value            NUMERIC(14,4),
+    quantity_unit             TEXT,
+    co2e_kg                   NUMERIC(14,4),
+    scope                     SMALLINT,
+    reporting_year            SMALLINT,
+    reporting_quarter         SMALLINT,
+    scope1_co2e_kg            NUMERIC(14,4) NOT NULL DEFAULT 0,
+    scope2_co2e_kg            NUMERIC(14,4) NOT NULL DEFAULT 0,
+    scope3_co2e_kg            NUMERIC(14,4) NOT NULL DEFAULT 0,
+    report_id                 UUID,
+    updated_at                TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE TABLE ecolink_bench.emission_factors (
+    id                 UUID PRIMARY KEY,
+    n                  INT NOT NULL,
+    category           TEXT NOT NULL,
+    scope              SMALLINT NOT NULL,
+    nga_year           SMALLINT NOT NULL DEFAULT 2024,
+    activity           TEXT NOT NULL DEFAULT '',
+    state              TEXT,
+    unit               TEXT NOT NULL DEFAULT 'AUD',
+    calculation_method TEXT NOT NULL DEFAULT 'spend_based',
+    co2e_factor        NUMERIC(18,6) NOT NULL DEFAULT 0.35
+);
+CREATE UNIQUE INDEX ON ecolink_bench.transactions (company_id, source, external_id)
+    WHERE external_id IS NOT NULL;
+CREATE INDEX idx_tx_company_date_id ON ecolink_bench.transactions (company_id, transaction_date DESC, id DESC);
+SET search_path TO ecolink_bench;
+"""
+
+
+def _supplier_variants(name: str, rng: random.Random) -> dict[str, str]:
+    """How another company's ledger might spell the same supplier."""
+    words = name.split()
+    longest = max(range(len(words)), key=lambda i: len(words[i]))
+    word = words[longest]
+    cut = rng.randrange(1, len(word) - 1) if len(word) > 3 else None
+    typo = words[:longest] + [word[:cut] + word[cut + 1:] if cut else word] + words[longest + 1:]
+    return {
+        "same":        name,
+        "legal form":  f"{name.upper()} PTY LTD",
+        "punctuation": f"{name}, Ltd.",
+        "typo":        " ".join(typo),
+    }
+
+
+def bench_supplier(rows: int) -> None:
+    factors = seed_factors()
+    by_activity = {f["activity"]: f for f in factors}
+    labelled = [(s, by_activity[label]) for _, s, _, label in LABELLED_SAMPLE if s]
+
+    # Company A's reviewed lines become the shared knowledge…
+    knowledge = SupplierKnowledge()
+    knowledge.load([
+        {
+            "supplier_key":       supplier_key(s),
+            "emission_factor_id": f["id"],
+            "activity":           f["activity"],
+            "confirmed_count":    1,
+            "auto_count":         0,
+        }
+        for s, f in labelled
+    ])
+
+    # …and company B's lines from the same suppliers are looked up in it.
+    rng = random.Random(3)
+    kinds: dict[str, list[tuple[str, dict]]] = {}
+    for s, f in labelled:
+        for kind, variant in _supplier_variants(s, rng).items():
+            kinds.setdefault(kind, []).append((variant, f))
+    unseen = [tx["supplier_name"] or tx["description"] for tx in synthetic_transactions(200, seed=19)]
+    unseen = [s for s in unseen if not any(supplier_key(s) == supplier_key(k) for k, _ in labelled)]
+
+    print(f"Supplier knowledge — {len(labelled)} reviewed supplier lines from one company, "
+          f"looked up as another company spells them")
+    print(f"  {'variant':<12} {'answered':>8}  {'correct':>7}")
+    for kind, queries in kinds.items():
+        verdicts = [(knowledge.lookup(q), f) for q, f in queries]
+        answered = [(v, f) for v, f in verdicts if v]
+        correct  = sum(1 for v, f in answered if v.factor_id == str(f["id"]))
+        print(f"  {kind:<12} {len(answered) / len(queries):8.1%}  "
+              f"{(correct / len(answered) if answered else 0.0):7.1%}")
+    false_hits = sum(1 for s in unseen if knowledge.lookup(s))
+    print(f"  {'unknown':<12} {false_hits / len(unseen):8.1%}  (suppliers never seen — should stay unanswered)")
+
+    names = [f"{rng.choice(labelled)[0]} {rng.choice(_NOISE)}" for _ in range(rows)]
+    knowledge.clear()
+    queries = knowledge.queries
+    _, prefetch_s = _timed(lambda: knowledge.prefetch(names))
+    _, lookup_s   = _timed(lambda: [knowledge.lookup(n) for n in names])
+    print(f"  {rows} lines: one prefetch ({knowledge.queries - queries} query, {prefetch_s * 1000:.1f} ms in-memory), "
+          f"then {lookup_s / rows * 1e6:.1f} µs per cached lookup")
+
+
+def _legacy_upsert_rows(cur, company_id: str, classified: list[dict]) -> int:
+    """The pre-bulk path: one INSERT ... ON CONFLICT round-trip per row."""
+    sql = _UPSERT_SQL.replace("VALUES %s", "VALUES " + _UPSERT_TEMPLATE)
+    rows_affected = 0
+    for tx in classified:
+        cur.execute(sql, _upsert_params(company_id, tx))
+        rows_affected += cur.rowcount
+    return rows_affected
+
+
+def bench_upsert(rows: int) -> None:
+    import psycopg2  # lazy import — the other benchmarks don't need a driver
+
+    dsn = os.environ.get("BENCH_DATABASE_URL")
+    if not dsn:
+        raise SystemExit("Set BENCH_DATABASE_URL to a scratch Postgres database.")
+
+    rng = random.Random(3)
+    company_id = "00000000-0000-0000-0000-00000000c0de"
+    txs = [
+        {
+            **tx,
+            "source":                "xero",
+            "external_id":           f"INV-{i}",
+            "transaction_date":      "2024-03-01",
+            "classification_status": rng.choice(["classified", "needs_review"]),
+            "co2e_kg":               round(rng.uniform(0, 500), 4),
+            "scope":                 rng.choice([1, 2, 3]),
+        }
+        for i, tx in enumerate(synthetic_transactions(rows))
+    ]
+    # A re-sync of the same invoices: every row hits the conflict branch.
+    updates = [{**tx, "co2e_kg": tx["co2e_kg"] + 1} for tx in txs]
+    paths = [("row-by-row", _legacy_upsert_rows), ("bulk", upsert_rows)]
+
+    print(f"upsert_transactions — {rows} rows, local Postgres")
+    conn = psycopg2.connect(dsn)
+    failed = False
+    try:
+        for label, fn in paths:
+            with conn.cursor() as cur:
+                cur.execute("DROP SCHEMA IF EXISTS ecolink_bench CASCADE")
+                cur.execute(_BENCH_SCHEMA)
+                for phase, batch in (("insert", txs), ("update", updates)):
+                    affected, elapsed = _timed(lambda: fn(cur, company_id, batch))
+                    conn.commit()
+                    print(
+                        f"  {label:<10} {phase}: {elapsed:7.2f} s  "
+                        f"{rows / elapsed:9.0f} rows/s  affected={affected}"
+                    )
+                    failed |= affected != rows
+                cur.execute("SELECT COUNT(*), SUM(co2e_kg) FROM transactions")
+                count, total = cur.fetchone()
+                print(f"  {label:<10} final : {count} rows, co2e_kg sum {total}")
+        with conn.cursor() as cur:
+            cur.execute("DROP SCHEMA ecolink_bench CASCADE")
+        conn.commit()
+    finally:
+        conn.close()
+
+    if failed:
+        raise SystemExit(1)
+
+
+_MIGRATIONS              = Path(__file__).resolve().parents[2] / "database" / "migrations"
+_ROLLUP_MIGRATION        = _MIGRATIONS / "026_emission_rollups.sql"
+_REPORT_PERIOD_MIGRATION = _MIGRATIONS / "030_report_period_index.sql"
+
+_BENCH_FACTORS = 24
+_BENCH_CATEGORIES = ("Stationary Energy", "Transport", "Electricity", "Waste", "Water", "Purchased Goods")
+# (unit, method, co2e_factor, AUD per unit) by n % 3
+_BENCH_FACTOR_UNITS = (("L", "activity_based", 2.31, 2.1), ("kWh", "activity_based", 0.66, 0.3),
+                       ("AUD", "spend_based", 0.35, 1.0))
+
+# `rows` lines over three financial years: 70% classified, 10% each
+# needs_review / factor_not_found / excluded.
+_ROLLUP_LOAD_SQL = """
+INSERT INTO transactions (
+    company_id, source, external_id, transaction_date, description, supplier_name, amount_aud,
+    emission_factor_id, classification_status, classified_by, co2e_kg, scope,
+    scope1_co2e_kg, scope2_co2e_kg, scope3_co2e_kg
+)
+SELECT %(company)s, 'xero', 'G-' || g, DATE '2021-07-01' + (g %% 1095),
+       'Synthetic line ' || g, 'Supplier ' || (g %% 500), (g %% 997) + 0.5,
+       CASE WHEN s.status IN ('classified', 'needs_review') THEN f.id END,
+       s.status, 'ai', s.co2e, CASE WHEN s.co2e IS NOT NULL THEN f.scope END,
+       CASE WHEN f.scope = 1 THEN COALESCE(s.co2e, 0) ELSE 0 END,
+       CASE WHEN f.scope = 2 THEN COALESCE(s.co2e, 0) ELSE 0 END,
+       CASE WHEN f.scope = 3 THEN COALESCE(s.co2e, 0) ELSE 0 END
+FROM generate_series(1, %(rows)s) g
+JOIN emission_factors f ON f.n = g %% %(factors)s
+CROSS JOIN LATERAL (
+    SELECT CASE g %% 10 WHEN 0 THEN 'needs_review' WHEN 1 THEN 'factor_not_found'
+                        WHEN 2 THEN 'excluded' ELSE 'classified' END AS status
+) st
+CROSS JOIN LATERAL (
+    SELECT st.status,
+           CASE WHEN st.status IN ('classified', 'needs_review') THEN (g %% 1000) * 0.37 END AS co2e
+) s
+"""
+
+
+def _create_ledger_schema(cur) -> None:
+    """Fresh `ecolink_bench` schema with the bench factors and migrations 026 and 030 applied."""
+    cur.execute("DROP SCHEMA IF EXISTS ecolink_bench CASCADE")
+    cur.execute(_BENCH_SCHEMA)
+    cur.executemany(
+        """
+        INSERT INTO emission_factors (id, n, category, scope, activity, unit, calculation_method, co2e_factor)
+        VALUES (gen_random_uuid(), %s, %s, %s, %s, %s, %s, %s)
+        """,
+        [
+            (n, _BENCH_CATEGORIES[n % len(_BENCH_CATEGORIES)], 1 + n % 3, f"Bench activity {n}",
+             *_BENCH_FACTOR_UNITS[n % 3][:3])
+            for n in range(_BENCH_FACTORS)
+        ],
+    )
+    cur.execute(_ROLLUP_MIGRATION.read_text())          # its own BEGIN / COMMIT
+    cur.execute(_REPORT_PERIOD_MIGRATION.read_text())
+
+
+def _median_time(fn: Callable[[], object], repeats: int) -> tuple[object, float]:
+    timings, value = [], None
+    for _ in range(repeats):
+        value, elapsed = _timed(fn)
+        timings.append(elapsed)
+    return value, sorted(timings)[len(timings) // 2]
+
+
+def bench_rollups(rows: int, companies: int, batch: int, repeats: int) -> None:
+    """
+    Report totals from emission_rollups vs a scan of transactions, at `rows`
+    transactions per company; write cost of the delta triggers; check and
+    rebuild times. Fails if the rollups ever disagree with the scan.
+    """
+    import psycopg2  # lazy import — the other benchmarks don't need a driver
+    import psycopg2.extras
+
+    from .db import rebuild_rollup_rows, rollup_drift, rollup_rows
+    from .rollups import report_totals
+
+    dsn = os.environ.get("BENCH_DATABASE_URL")
+    if not dsn:
+        raise SystemExit("Set BENCH_DATABASE_URL to a scratch Postgres database.")
+
+    ids = [f"00000000-0000-0000-0000-0000000c0d{i:02x}" for i in range(companies + 1)]
+    target, writer = ids[0], ids[-1]
+    year = 2023     # FY2023 = 1 Jul 2022 – 30 Jun 2023
+
+    print(f"emission rollups — {rows} transactions x {companies} companies, local Postgres")
+    conn = psycopg2.connect(dsn)
+    failed = False
+    try:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        _create_ledger_schema(cur)
+        conn.commit()
+
+        # ── Bulk load: first company without the triggers, the rest with ──────
+        for i, company in enumerate(ids[:-1]):
+            triggers = i > 0
+            cur.execute(f"ALTER TABLE transactions {'ENABLE' if triggers else 'DISABLE'} TRIGGER USER")
+            _, elapsed = _timed(lambda: cur.execute(
+                _ROLLUP_LOAD_SQL, {"company": company, "rows": rows, "factors": _BENCH_FACTORS},
+            ))
+            conn.commit()
+            print(f"  load {'with' if triggers else 'w/o '} triggers: {elapsed:7.2f} s  {rows / elapsed:9.0f} rows/s")
+        cur.execute("ALTER TABLE transactions ENABLE TRIGGER USER")
+        written, elapsed = _timed(lambda: rebuild_rollup_rows(cur, target))
+        conn.commit()
+        print(f"  rebuild (1 company)  : {elapsed:7.2f} s  {written} rollup rows")
+        cur.execute("ANALYZE transactions; ANALYZE emission_rollups")
+        conn.commit()
+
+        # ── Read: one company's financial-year totals ──────────────────────────
+        cur.execute(
+            "SELECT emission_rollup_select(%s) AS q",
+            (cur.mogrify(
+                "SELECT t.*, 1 AS sign FROM transactions t WHERE t.company_id = %s"
+                " AND t.transaction_date BETWEEN %s AND %s",
+                (target, date(year - 1, 7, 1), date(year, 6, 30)),
+            ).decode(),),
+        )
+        sums = ", ".join(f"SUM(COALESCE({m}, 0)) AS {m}" for m in ROLLUP_METRICS)
+        scan_sql = (
+            f"SELECT scope, category, {sums} FROM ({cur.fetchone()['q']}) fresh "
+            "WHERE reporting_year = %s GROUP BY scope, category ORDER BY scope, category"
+        )
+
+        def scan() -> list[dict]:
+            cur.execute(scan_sql, (year,))
+            return [dict(row) for row in cur.fetchall()]
+
+        scanned, scan_s = _median_time(scan, repeats)
+        rolled, rollup_s = _median_time(lambda: rollup_rows(cur, target, year), repeats)
+        conn.commit()
+        same = report_totals(scanned) == report_totals(rolled)
+        failed |= not same
+        print(f"  FY{year} totals, scan   : {scan_s * 1000:9.2f} ms  ({len(scanned)} groups)")
+        print(f"  FY{year} totals, rollup : {rollup_s * 1000:9.2f} ms  "
+              f"({scan_s / rollup_s:.0f}x, {'identical' if same else 'MISMATCH'})")
+
+        # ── Write: the delta triggers on the upsert path ───────────────────────
+        rng = random.Random(5)
+        txs = [
+            {
+                **tx,
+                "source":                "xero",
+                "external_id":           f"W-{i}",
+                "transaction_date":      "2023-03-01",
+                "classification_status": rng.choice(["classified", "needs_review"]),
+                "co2e_kg":               round(rng.uniform(0, 500), 4),
+                "scope":                 rng.choice([1, 2, 3]),
+            }
+            for i, tx in enumerate(synthetic_transactions(batch))
+        ]
+        updates = [{**tx, "co2e_kg": tx["co2e_kg"] + 1} for tx in txs]
+        for triggers in (False, True):
+            cur.execute(f"ALTER TABLE transactions {'ENABLE' if triggers else 'DISABLE'} TRIGGER USER")
+            for phase, rows_in in (("insert", txs), ("update", updates)):
+                _, elapsed = _timed(lambda: upsert_rows(cur, writer, rows_in))
+                conn.commit()
+                print(f"  upsert {phase} {'with' if triggers else 'w/o '} triggers: "
+                      f"{elapsed * 1000:8.1f} ms  {batch / elapsed:9.0f} rows/s")
+            if not triggers:
+                cur.execute("DELETE FROM transactions WHERE company_id = %s", (writer,))
+                conn.commit()
+        cur.execute("ALTER TABLE transactions ENABLE TRIGGER USER")
+
+        _, elapsed = _timed(lambda: cur.execute(
+            """
+            UPDATE transactions
+               SET classification_status = 'classified', co2e_kg = COALESCE(co2e_kg, 0) + 1
+             WHERE company_id = %s AND classification_status = 'needs_review'
+            """,
+            (target,),
+        ))
+        updated = cur.rowcount
+        conn.commit()
+        print(f"  review {updated} rows      : {elapsed:7.2f} s (one UPDATE, deltas applied)")
+
+        # ── Consistency ────────────────────────────────────────────────────────
+        drift, elapsed = _timed(lambda: rollup_drift(cur))
+        conn.commit()
+        failed |= bool(drift)
+        print(f"  check (all companies): {elapsed:7.2f} s  {len(drift)} drifted keys")
+        _, elapsed = _timed(lambda: rebuild_rollup_rows(cur))
+        conn.commit()
+        print(f"  rebuild (all)        : {elapsed:7.2f} s")
+
+        cur.execute("DROP SCHEMA ecolink_bench CASCADE")
+        conn.commit()
+    finally:
+        conn.close()
+
+    if failed:
+        raise SystemExit(1)
+
+
+def _plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def bench_aggregate(rows: int, companies: int, repeats: int) -> None:
+    """
+    GET /reports/aggregate queries: EXPLAIN check (no sequential scan of
+    transactions), latency of the grouped transactions query per month and
+    per quarter vs the rollup rows, and identical summaries from both.
+    """
+    import asyncpg
+    import psycopg2  # lazy import — the other benchmarks don't need a driver
+    import psycopg2.extras
+
+    from .async_db import QUARTER_GROUPS_SQL, REPORT_GROUPS_SQL, ROLLUP_GROUPS_SQL
+    from .pipeline import summary_values
+    from .rollups import period_summaries, quarter_span
+
+    dsn = os.environ.get("BENCH_DATABASE_URL")
+    if not dsn:
+        raise SystemExit("Set BENCH_DATABASE_URL to a scratch Postgres database.")
+
+    ids = [f"00000000-0000-0000-0000-0000000a99{i:02x}" for i in range(companies)]
+    target = ids[0]
+    date_from, date_to = date(2022, 7, 1), date(2023, 6, 30)     # FY2023
+    span = quarter_span(date_from, date_to)
+
+    print(f"report aggregation — {rows} transactions x {companies} companies, FY2023, local Postgres")
+    conn = psycopg2.connect(dsn)
+    failed = False
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            _create_ledger_schema(cur)
+            for company in ids:
+                cur.execute(_ROLLUP_LOAD_SQL, {"company": company, "rows": rows, "factors": _BENCH_FACTORS})
+            cur.execute("ANALYZE transactions; ANALYZE emission_rollups")
+        conn.commit()
+
+        async def _run() -> None:
+            nonlocal failed
+            aconn = await asyncpg.connect(dsn, server_settings={"search_path": "ecolink_bench"})
+            try:
+                queries = [
+                    ("transactions/month",   REPORT_GROUPS_SQL,  (target, date_from, date_to), "month"),
+                    ("transactions/quarter", QUARTER_GROUPS_SQL, (target, *span[0], *span[1]), "quarter"),
+                    ("rollups/quarter",      ROLLUP_GROUPS_SQL,            (target, *span[0], *span[1]), "quarter"),
+                ]
+                summaries = {}
+                for label, sql, args, period in queries:
+                    plan = json.loads(await aconn.fetchval("EXPLAIN (FORMAT JSON) " + sql, *args))[0]["Plan"]
+                    scans = [
+                        f"{node['Node Type']} on {node['Relation Name']}"
+                        for node in _plan_nodes(plan) if "Relation Name" in node
+                    ]
+                    seq = any(s.startswith("Seq Scan on transactions") for s in scans)
+                    failed |= seq
+                    timings = []
+                    for _ in range(repeats):
+                        start = time.perf_counter()
+                        groups = [dict(r) for r in await aconn.fetch(sql, *args)]
+                        timings.append(time.perf_counter() - start)
+                    elapsed = sorted(timings)[len(timings) // 2]
+                    if period == "quarter":
+                        summaries[label] = (
+                            summary_values(RunningAggregate().add_groups(groups)),
+                            period_summaries(groups, period),
+                        )
+                    print(f"  {label:<21}: {elapsed * 1000:9.2f} ms  {len(groups):4d} groups  "
+                          f"{'SEQ SCAN  ' if seq else ''}{'; '.join(scans)}")
+                same = summaries["transactions/quarter"] == summaries["rollups/quarter"]
+                failed |= not same
+                print(f"  rollup summary       : {'identical' if same else 'MISMATCH'}")
+            finally:
+                await aconn.close()
+
+        asyncio.run(_run())
+        with conn.cursor() as cur:
+            cur.execute("DROP SCHEMA ecolink_bench CASCADE")
+        conn.commit()
+    finally:
+        conn.close()
+
+    if failed:
+        raise SystemExit(1)
+
+
+def _offset_page_query(company_id: str, fields: list[str], limit: int, offset: int) -> tuple[str, list]:
+    """The OFFSET form of a transactions page — what keyset pagination replaces."""
+    return (
+        f"SELECT {', '.join(fields)} FROM transactions WHERE company_id = $1::uuid "
+        "ORDER BY transaction_date DESC, id DESC OFFSET $2 LIMIT $3",
+        [company_id, offset, limit],
+    )
+
+
+def bench_paging(rows: int, limit: int, depths: list[int], repeats: int) -> None:
+    """
+    GET /transactions pages at increasing depth in a `rows`-transaction
+    ledger: OFFSET vs keyset (all rows, and needs_review only). Fails if a
+    deep keyset page is more than 5x slower than the first.
+    """
+    import asyncpg
+    import psycopg2  # lazy import — the other benchmarks don't need a driver
+    import psycopg2.extras
+
+    from .async_db import transactions_page_query
+    from .main import DEFAULT_TRANSACTION_FIELDS
+
+    dsn = os.environ.get("BENCH_DATABASE_URL")
+    if not dsn:
+        raise SystemExit("Set BENCH_DATABASE_URL to a scratch Postgres database.")
+
+    target = "00000000-0000-0000-0000-00000000fa9e"
+    fields = list(DEFAULT_TRANSACTION_FIELDS)
+    depths = sorted(set(depths))
+
+    print(f"GET /transactions — {rows} transactions, {limit} per page, local Postgres")
+    conn = psycopg2.connect(dsn)
+    failed = False
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            _create_ledger_schema(cur)
+            cur.execute("ALTER TABLE transactions DISABLE TRIGGER USER")
+            # A second, smaller company shares the index.
+            for company, n in ((target, rows), ("00000000-0000-0000-0000-00000000fa9f", rows // 10)):
+                cur.execute(_ROLLUP_LOAD_SQL, {"company": company, "rows": n, "factors": _BENCH_FACTORS})
+            cur.execute("ANALYZE transactions")
+        conn.commit()
+
+        async def _median(aconn, sql: str, args: list) -> float:
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                await aconn.fetch(sql, *args)
+                timings.append(time.perf_counter() - start)
+            return sorted(timings)[len(timings) // 2]
+
+        async def _keyset(aconn, statuses: Optional[list[str]]) -> dict[int, float]:
+            """Walk the pages in order (as a client would), timing those at `depths`."""
+            timings, after = {}, None
+            for page in range(1, depths[-1] + 1):
+                sql, args = transactions_page_query(target, fields, limit, statuses, after=after)
+                if page in depths:
+                    timings[page] = await _median(aconn, sql, args)
+                found = await aconn.fetch(sql, *args)
+                if len(found) < limit:
+                    break
+                after = (found[-1]["transaction_date"], str(found[-1]["id"]))
+            return timings
+
+        async def _run() -> None:
+            nonlocal failed
+            aconn = await asyncpg.connect(dsn, server_settings={"search_path": "ecolink_bench"})
+            try:
+                offset = {}
+                for page in depths:
+                    if (page - 1) * limit < rows:
+                        offset[page] = await _median(aconn, *_offset_page_query(target, fields, limit, (page - 1) * limit))
+                series = [
+                    ("OFFSET", offset),
+                    ("keyset", await _keyset(aconn, None)),
+                    ("keyset, needs_review", await _keyset(aconn, ["needs_review"])),
+                ]
+                print(f"  {'page':>24}" + "".join(f"{d:>10}" for d in depths))
+                for label, timings in series:
+                    cells = "".join(
+                        f"{timings[d] * 1000:8.2f}ms" if d in timings else f"{'-':>10}" for d in depths
+                    )
+                    print(f"  {label:>24}{cells}")
+                    if label.startswith("keyset") and timings:
+                        first, deepest = timings[min(timings)], timings[max(timings)]
+                        failed |= deepest > 5 * first
+            finally:
+                await aconn.close()
+
+        asyncio.run(_run())
+        with conn.cursor() as cur:
+            cur.execute("DROP SCHEMA ecolink_bench CASCADE")
+        conn.commit()
+    finally:
+        conn.close()
+
+    if failed:
+        raise SystemExit(1)
+
+
+_REFRESH_MIGRATION = _MIGRATIONS / "029_factor_refresh.sql"
+
+# Quantities in each factor's unit (AUD for spend factors), co2e to match.
+_QUANTIFY_SQL = """
+UPDATE transactions t
+   SET quantity_unit  = f.unit,
+       quantity_value = ROUND(t.amount_aud / CASE f.unit WHEN 'L' THEN 2.1 WHEN 'kWh' THEN 0.3 ELSE 1 END, 2)
+  FROM emission_factors f
+ WHERE f.id = t.emission_factor_id AND t.co2e_kg IS NOT NULL;
+UPDATE transactions t
+   SET co2e_kg = ROUND(t.quantity_value * f.co2e_factor, 4)
+  FROM emission_factors f
+ WHERE f.id = t.emission_factor_id AND t.co2e_kg IS NOT NULL;
+"""
+
+# Rows a refresh should have rewritten but did not: still on an old edition,
+# a quantity left in another unit, or co2e off the stored quantity × factor
+# by more than quantity_value's 4-decimal storage explains.
+_STALE_SQL = """
+SELECT COUNT(*) AS n
+FROM transactions t
+JOIN emission_factors f ON f.id = t.emission_factor_id
+WHERE t.co2e_kg IS NOT NULL AND t.report_id IS NULL
+  AND (f.nga_year < %s
+       OR t.quantity_unit NOT IN (f.unit, 'AUD')
+       OR ABS(t.co2e_kg - t.quantity_value * f.co2e_factor) > 0.00005 * f.co2e_factor + 0.0001)
+"""
+
+
+def bench_reclassify(rows: int, companies: int, batch: int) -> None:
+    """
+    Factor refresh on `companies` ledgers of `rows` each: every computed row
+    through calculate_batch (the re-run /analyse path, without the LLM) vs
+    the reclassify job for an in-place edit of four factors and for a full
+    edition move. Fails if a refreshable row is left stale, a locked row
+    changed, or the rollups drift.
+    """
+    import psycopg2  # lazy import — the other benchmarks don't need a driver
+    import psycopg2.extras
+
+    from .db import factor_changes, rebuild_rollup_rows, record_applied_factors, rollup_drift, write_recalculated
+    from .factor_registry import FactorRegistry
+    from .reclassify import new_factor_registry, recalculate, refresh_company, refresh_rollups
+
+    dsn = os.environ.get("BENCH_DATABASE_URL")
+    if not dsn:
+        raise SystemExit("Set BENCH_DATABASE_URL to a scratch Postgres database.")
+
+    ids = [f"00000000-0000-0000-0000-0000000c0d{i:02x}" for i in range(companies)]
+    total = rows * companies
+    print(f"factor refresh — {rows} transactions x {companies} companies, local Postgres")
+    conn = psycopg2.connect(dsn)
+    failed = False
+    try:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        _create_ledger_schema(cur)
+        cur.execute("ALTER TABLE transactions DISABLE TRIGGER USER")
+        for company in ids:
+            cur.execute(_ROLLUP_LOAD_SQL, {"company": company, "rows": rows, "factors": _BENCH_FACTORS})
+        cur.execute(_QUANTIFY_SQL)
+        cur.execute("UPDATE transactions SET report_id = gen_random_uuid() WHERE external_id LIKE '%7'")
+        cur.execute("ALTER TABLE transactions ENABLE TRIGGER USER")
+        rebuild_rollup_rows(cur)
+        conn.commit()
+        cur.execute(_REFRESH_MIGRATION.read_text())     # its own BEGIN / COMMIT
+        cur.execute("ANALYZE transactions")
+        conn.commit()
+
+        locked_sql = "SELECT COALESCE(SUM(co2e_kg), 0) AS s, COUNT(*) AS n FROM transactions WHERE report_id IS NOT NULL"
+        cur.execute(locked_sql)
+        locked = dict(cur.fetchone())
+
+        def refresh(from_year: Optional[int], to_year: Optional[int]) -> dict:
+            changes = [c for c in factor_changes(cur, from_year, to_year) if c["new_id"] is not None]
+            registry = new_factor_registry(changes)
+            counts = {"recomputed": 0, "recalculated": 0, "factors": len(changes)}
+            for company in ids:
+                result = refresh_company(cur, company, changes, registry, batch=batch)
+                counts["recomputed"]   += result["recomputed"]
+                counts["recalculated"] += result["recalculated"]
+            for company in ids:
+                refresh_rollups(cur, company)
+            record_applied_factors(cur, [c["old_id"] for c in changes if c["kind"] == "in_place"])
+            conn.commit()
+            return counts
+
+        # ── Baseline: recompute every computed row in Python batches ──────────
+        cur.execute("SELECT id::text, unit, calculation_method, co2e_factor, scope, category, activity FROM emission_factors")
+        registry = FactorRegistry([dict(row) for row in cur.fetchall()])
+
+        def full() -> int:
+            written, after = 0, "00000000-0000-0000-0000-000000000000"
+            while True:
+                cur.execute(
+                    """
+                    SELECT id::text, emission_factor_id::text AS factor_id, description, amount_aud,
+                           quantity_value, quantity_unit
+                    FROM transactions
+                    WHERE co2e_kg IS NOT NULL AND report_id IS NULL AND id > %s::uuid
+                    ORDER BY id LIMIT %s
+                    """,
+                    (after, batch),
+                )
+                page = [dict(row) for row in cur.fetchall()]
+                if not page:
+                    return written
+                written += write_recalculated(cur, recalculate(page, registry))
+                after = page[-1]["id"]
+
+        written, full_s = _timed(full)
+        conn.commit()
+        print(f"  every row, Python batches : {full_s:8.2f} s  {written} rows  {written / full_s:9.0f} rows/s")
+
+        # ── In place: three values edited, one factor moved from L to kL ───────
+        cur.execute("UPDATE emission_factors SET co2e_factor = co2e_factor * 0.97 WHERE n IN (1, 2, 4)")
+        cur.execute("UPDATE emission_factors SET unit = 'kL', co2e_factor = co2e_factor * 1000 WHERE n = 3")
+        conn.commit()
+        counts, elapsed = _timed(lambda: refresh(None, None))
+        touched = counts["recomputed"] + counts["recalculated"]
+        print(f"  in place ({counts['factors']} factors)     : {elapsed:8.2f} s  {counts['recomputed']} in SQL, "
+              f"{counts['recalculated']} recalculated  ({full_s / elapsed:.0f}x, {touched / total:.0%} of rows)")
+
+        # ── Edition move: every factor re-published, a quarter with new units ──
+        cur.execute(
+            """
+            INSERT INTO emission_factors (id, n, category, scope, nga_year, activity, unit, calculation_method, co2e_factor)
+            SELECT gen_random_uuid(), n, category, scope, 2025, activity,
+                   CASE WHEN unit = 'L' AND n % 4 = 0 THEN 'kL' ELSE unit END, calculation_method,
+                   co2e_factor * CASE WHEN unit = 'L' AND n % 4 = 0 THEN 950 ELSE 0.95 END
+            FROM emission_factors WHERE nga_year = 2024
+            """
+        )
+        conn.commit()
+        counts, elapsed = _timed(lambda: refresh(2024, 2025))
+        print(f"  edition 2024 → 2025       : {elapsed:8.2f} s  {counts['recomputed']} in SQL, "
+              f"{counts['recalculated']} recalculated  ({full_s / elapsed:.1f}x)")
+
+        # ── Consistency ────────────────────────────────────────────────────────
+        cur.execute(_STALE_SQL, (2025,))
+        stale = cur.fetchone()["n"]
+        cur.execute(locked_sql)
+        locked_after = dict(cur.fetchone())
+        drift = rollup_drift(cur)
+        conn.commit()
+        failed |= bool(stale) or locked_after != locked or bool(drift)
+        print(f"  stale rows                : {stale}")
+        print(f"  locked rows unchanged     : {locked_after == locked} ({locked['n']} rows)")
+        print(f"  rollup drift              : {len(drift)} keys")
+
+        cur.execute("DROP SCHEMA ecolink_bench CASCADE")
+        conn.commit()
+    finally:
+        conn.close()
+
+    if failed:
+        raise SystemExit(1)
+
+
+def bench_load(requests: int, concurrency: int) -> None:
+    """GET /factors/{id} under concurrency: sync psycopg2 endpoint vs async asyncpg endpoint."""
+    import httpx
+    from fastapi import FastAPI
+
+    from . import async_db, db
+    from .main import app as async_app
+
+    dsn = os.environ.get("BENCH_DATABASE_URL")
+    if not dsn:
+        raise SystemExit("Set BENCH_DATABASE_URL to a local Postgres with schema.sql and seeds applied.")
+    os.environ["DATABASE_URL"]     = dsn
+    os.environ["INTERNAL_API_KEY"] = "bench-key"
+
+    with db.get_cursor() as cur:
+        cur.execute("SELECT id FROM emission_factors LIMIT 100")
+        ids = [str(row["id"]) for row in cur.fetchall()]
+    if not ids:
+        raise SystemExit("No emission factors found — apply database/seeds first.")
+
+    # The pre-async shape of the endpoint: a sync def on the threadpool,
+    # checking a psycopg2 connection out of the ThreadedConnectionPool.
+    sync_app = FastAPI()
+
+    @sync_app.get("/factors/{factor_id}")
+    def get_factor_sync(factor_id: str) -> dict:
+        factor = db.fetch_factor_by_id(factor_id)
+        return {"id": str(factor["id"]), "co2e_factor": float(factor["co2e_factor"])}
+
+    async def _drive(app) -> tuple[float, list[float]]:
+        latencies: list[float] = []
+        transport = httpx.ASGITransport(app=app)
+        headers   = {"X-API-Key": "bench-key"}
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def worker(n: int) -> None:
+                for i in range(n, requests, concurrency):
+                    start = time.perf_counter()
+                    response = await client.get(f"/factors/{ids[i % len(ids)]}", headers=headers)
+                    latencies.append(time.perf_counter() - start)
+                    response.raise_for_status()
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(n) for n in range(concurrency)))
+            return time.perf_counter() - start, latencies
+
+    async def _run() -> None:
+        await async_db.init_pool()
+        try:
+            print(f"GET /factors/{{id}} — {requests} requests, concurrency {concurrency}, pool max {db.DB_POOL_MAX}")
+            for label, app in (("sync psycopg2", sync_app), ("async asyncpg", async_app)):
+                await _drive(app)                     # warm pools and prepared statements
+                elapsed, latencies = await _drive(app)
+                latencies.sort()
+                p50 = latencies[len(latencies) // 2]
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                print(
+                    f"  {label:<14}: {requests / elapsed:8.0f} req/s  "
+                    f"p50 {p50 * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms"
+                )
+        finally:
+            await async_db.close_pool()
+
+    asyncio.run(_run())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    kw = sub.add_parser("keyword", help="Keyword pre-match: legacy loop vs compiled index.")
+    kw.add_argument("--rows", type=int, default=10_000)
+
+    llm = sub.add_parser("llm", help="classify_batch against a local fake LLM: sequential vs concurrent.")
+    llm.add_argument("--rows", type=int, default=200)
+    llm.add_argument("--latency", type=float, default=0.25, help="Injected provider latency (s).")
+    llm.add_argument("--concurrency", type=int, default=8)
+    llm.add_argument("--batch-size", type=int, default=10, help="Transactions per batched prompt.")
+
+    pv = sub.add_parser("providers", help="Groq/Gemini incidents: sequential fallback vs breakers + hedging.")
+    pv.add_argument("--rows", type=int, default=200)
+    pv.add_argument("--timeout", type=float, default=2.0)
+    cl = sub.add_parser("clients", help="Groq calls against a local mock: new client per call vs shared keep-alive client.")
+    cl.add_argument("--calls", type=int, default=500)
+    cl.add_argument("--concurrency", type=int, default=8)
+    rc = sub.add_parser("recall", help="BM25 candidate retrieval: recall@k on the labelled sample.")
+    rc.add_argument("--k", default="3,5,8,12", help="Comma-separated k values.")
+
+    calc = sub.add_parser("calc", help="CO2e calculation: per-row calculate_co2e vs columnar batch.")
+    calc.add_argument("--rows", type=int, default=100_000)
+
+    em = sub.add_parser("embed", help="Nearest-factor embeddings: classified / review / LLM escalations by threshold.")
+    em.add_argument("--scores", type=float, nargs="+", default=[0.0, 0.2, 0.3, 0.4])
+    em.add_argument("--margins", type=float, nargs="+", default=[0.0, 0.05, 0.1])
+    em.add_argument("--rows", type=int, default=10_000)
+
+    rl = sub.add_parser("rules", help="Merchant rules: first-match loop vs compiled engine.")
+    rl.add_argument("--rows", type=int, default=10_000)
+
+    rg = sub.add_parser("registry", help="Factor registry: linear id scan vs hash index, shared factor summaries.")
+    rg.add_argument("--rows", type=int, default=100_000)
+
+    rs = sub.add_parser("response", help="/analyse response: models + response_model vs fast path (CPU, bytes).")
+    rs.add_argument("--rows", type=int, default=500)
+    rs.add_argument("--requests", type=int, default=50)
+
+    sk = sub.add_parser("supplier", help="Supplier knowledge: cross-company hits by spelling variant, lookup cost.")
+    sk.add_argument("--rows", type=int, default=10_000)
+    up = sub.add_parser("upsert", help="upsert_transactions: row-by-row vs bulk, against BENCH_DATABASE_URL.")
+    up.add_argument("--rows", type=int, default=5_000)
+
+    ru = sub.add_parser("rollups", help="Report totals: transactions scan vs emission_rollups, against BENCH_DATABASE_URL.")
+    ru.add_argument("--rows", type=int, default=1_000_000, help="Transactions per company.")
+    ru.add_argument("--companies", type=int, default=2)
+    ru.add_argument("--batch", type=int, default=5_000, help="Rows per upsert in the write phase.")
+    ru.add_argument("--repeats", type=int, default=5)
+
+    ag = sub.add_parser("aggregate", help="/reports/aggregate queries: plan check, transactions vs rollups.")
+    ag.add_argument("--rows", type=int, default=200_000, help="Transactions per company.")
+    ag.add_argument("--companies", type=int, default=5)
+    ag.add_argument("--repeats", type=int, default=5)
+
+    pg = sub.add_parser("paging", help="GET /transactions: OFFSET vs keyset pages by depth, against BENCH_DATABASE_URL.")
+    pg.add_argument("--rows", type=int, default=1_000_000)
+    pg.add_argument("--limit", type=int, default=100, help="Rows per page.")
+    pg.add_argument("--depths", type=int, nargs="+", default=[1, 10, 100, 1000, 5000])
+    pg.add_argument("--repeats", type=int, default=5)
+
+    rf = sub.add_parser("reclassify", help="Factor refresh: recompute everything vs affected rows only, against BENCH_DATABASE_URL.")
+    rf.add_argument("--rows", type=int, default=500_000, help="Transactions per company.")
+    rf.add_argument("--companies", type=int, default=4)
+    rf.add_argument("--batch", type=int, default=5_000, help="Rows per recalculation page.")
+
+    ld = sub.add_parser("load", help="Endpoint load test: sync psycopg2 vs async asyncpg, against BENCH_DATABASE_URL.")
+    ld.add_argument("--requests", type=int, default=2_000)
+    ld.add_argument("--concurrency", type=int, default=50)
+
+    args = parser.parse_args()
+    if args.command == "keyword":
+        bench_keyword(args.rows)
+    elif args.command == "llm":
+        bench_llm(args.rows, args.latency, args.concurrency, args.batch_size)
+    elif args.command == "providers":
+        bench_providers(args.rows, args.timeout)
+    elif args.command == "clients":
+        bench_clients(args.calls, args.concurrency)
+    elif args.command == "recall":
+        bench_recall([int(k) for k in args.k.split(",")])
+    elif args.command == "calc":
+        bench_calc(args.rows)
+    elif args.command == "embed":
+        bench_embed(args.scores, args.margins, args.rows)
+    elif args.command == "rules":
+        bench_rules(args.rows)
+    elif args.command == "registry":
+        bench_registry(args.rows)
+    elif args.command == "response":
+        bench_response(args.rows, args.requests)
+    elif args.command == "supplier":
+        bench_supplier(args.rows)
+    elif args.command == "upsert":
+        bench_upsert(args.rows)
+    elif args.command == "rollups":
+        bench_rollups(args.rows, args.companies, args.batch, args.repeats)
+    elif args.command == "aggregate":
+        bench_aggregate(args.rows, args.companies, args.repeats)
+    elif args.command == "paging":
+        bench_paging(args.rows, args.limit, args.depths, args.repeats)
+    elif args.command == "reclassify":
+        bench_reclassify(args.rows, args.companies, args.batch)
+    elif args.command == "load":
+        bench_load(args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,53 +9,26 @@ Two calculation methods are supported:
   - spend_based    : amount_aud × co2e_factor (e.g. $150 × 0.00185 = 0.278 kg CO2e)
 
 For activity_based factors, the calculator tries to extract a quantity from:
-  1. Explicit quantity_hint from the AI classifier.
-  2. Heuristic parsing of the transaction description (e.g. "62.5L").
-  3. Falls back to spend_based if no quantity can be determined.
+  1. Explicit quantity on the transaction input.
+  2. quantity_hint from the AI classifier, reconciled with the description.
+  3. Parsing of the transaction description (e.g. "62.5L", "2 kL" → 2000 L;
+     see quantity_parser.py).
+  4. Falls back to spend_based if no quantity can be determined.
 """
 
 from __future__ import annotations
 
 import logging
-import re
 from typing import Optional
 
+from .quantity_parser import convert_quantity, quantity_in_unit, reconcile_quantity_hint
+
 logger = logging.getLogger("ecolink.calculator")
 
 # ---------------------------------------------------------------------------
-# Unit extractors — heuristics for common Australian transaction descriptions
+# Quantity heuristics
 # ---------------------------------------------------------------------------
 
-# Patterns: match quantities like "62.5L", "62.5 litres", "200 kWh", etc.
-_QUANTITY_PATTERNS: list[tuple[re.Pattern, str]] = [
-    (re.compile(r"(\d+(?:\.\d+)?)\s*(?:litre|liter|litres|liters|L\b)", re.I), "L"),
-    (re.compile(r"(\d+(?:\.\d+)?)\s*(?:kWh|kilowatt.hour)", re.I),             "kWh"),
-    (re.compile(r"(\d+(?:\.\d+)?)\s*(?:GJ|gigajoule)", re.I),                  "GJ"),
-    (re.compile(r"(\d+(?:\.\d+)?)\s*(?:km|kilometre|kilometer)", re.I),         "km"),
-    (re.compile(r"(\d+(?:\.\d+)?)\s*(?:tonne|ton\b)", re.I),                   "tonne"),
-    (re.compile(r"(\d+(?:\.\d+)?)\s*(?:kL|kilolitre)", re.I),                  "kL"),
-    (re.compile(r"(\d+(?:\.\d+)?)\s*(?:kg\b)", re.I),                          "kg"),
-    (re.compile(r"(\d+(?:\.\d+)?)\s*(?:m3|cubic metre|cubic meter)", re.I),    "m3"),
-]
-
-
-def _extract_quantity_from_description(
-    description: str,
-    expected_unit: str,
-) -> Optional[float]:
-    """
-    Attempt to extract a numeric quantity from the transaction description
-    for the given expected unit.
-    """
-    for pattern, unit in _QUANTITY_PATTERNS:
-        if unit.lower() != expected_unit.lower():
-            continue
-        match = pattern.search(description)
-        if match:
-            return float(match.group(1))
-    return None
-
-
 def _estimate_fuel_litres_from_spend(amount_aud: float, fuel_type: str) -> Optional[float]:
     """
     Rough estimate of fuel volume from spend, based on Australian average pump prices.
@@ -78,6 +51,47 @@ def _estimate_fuel_litres_from_spend(amount_aud: float, fuel_type: str) -> Optio
 # Main calculation function
 # ---------------------------------------------------------------------------
 
+def _resolve_quantity(
+    transaction: dict,
+    classification: dict,
+    factor: dict,
+) -> tuple[Optional[float], Optional[str]]:
+    """
+    Find the activity quantity for an activity_based factor.
+    Returns (quantity, source) or (None, None) when spend fallback applies.
+    Shared with the batch calculator so both paths pick the same quantity.
+    """
+    factor_unit: str  = factor["unit"]
+    description: str  = transaction.get("description", "")
+    amount_aud: float = float(transaction.get("amount_aud", 0))
+
+    # Priority 1: explicit quantity from transaction input
+    if transaction.get("quantity_value") and transaction.get("quantity_unit"):
+        quantity = convert_quantity(
+            float(transaction["quantity_value"]), transaction["quantity_unit"], factor_unit,
+        )
+        if quantity is not None:
+            return quantity, "input"
+
+    # Priority 2: quantity hint from AI classifier, reconciled with the description
+    quantity = reconcile_quantity_hint(classification.get("quantity_hint"), description, factor_unit)
+    if quantity is not None:
+        return quantity, "ai_hint"
+
+    # Priority 3: quantity parsed from the description (same cached parse)
+    quantity = quantity_in_unit(description, factor_unit)
+    if quantity is not None:
+        return quantity, "description_parse"
+
+    # Priority 4: estimate litres from spend for fuel transactions
+    if factor_unit == "L":
+        quantity = _estimate_fuel_litres_from_spend(amount_aud, factor.get("activity", ""))
+        if quantity is not None:
+            return quantity, "spend_estimate"
+
+    return None, None
+
+
 def calculate_co2e(
     transaction: dict,
     classification: dict,
@@ -114,37 +128,11 @@ def calculate_co2e(
     co2e_per_unit: float       = float(factor["co2e_factor"])
     factor_unit: str           = factor["unit"]
     method: str                = factor.get("calculation_method", "spend_based")
-    description: str           = transaction.get("description", "")
     amount_aud: float          = float(transaction.get("amount_aud", 0))
-    qty_hint: dict             = classification.get("quantity_hint") or {}
 
     # ── A. Activity-based calculation ────────────────────────────────────────
     if method == "activity_based":
-        quantity: Optional[float] = None
-
-        # Priority 1: explicit quantity from transaction input
-        if transaction.get("quantity_value") and transaction.get("quantity_unit"):
-            if transaction["quantity_unit"].lower() == factor_unit.lower():
-                quantity = float(transaction["quantity_value"])
-                source = "input"
-
-        # Priority 2: quantity hint from AI classifier
-        if quantity is None and qty_hint.get("value") and qty_hint.get("unit"):
-            if str(qty_hint["unit"]).lower() == factor_unit.lower():
-                quantity = float(qty_hint["value"])
-                source = "ai_hint"
-
-        # Priority 3: heuristic extraction from description
-        if quantity is None:
-            quantity = _extract_quantity_from_description(description, factor_unit)
-            if quantity:
-                source = "description_parse"
-
-        # Priority 4: estimate litres from spend for fuel transactions
-        if quantity is None and factor_unit == "L":
-            quantity = _estimate_fuel_litres_from_spend(amount_aud, factor.get("activity", ""))
-            if quantity:
-                source = "spend_estimate"
+        quantity, source = _resolve_quantity(transaction, classification, factor)
 
         # Priority 5: fall back to spend-based if quantity unavailable
         if quantity is None:
@@ -206,6 +194,129 @@ def calculate_co2e(
 # Aggregation
 # ---------------------------------------------------------------------------
 
+class RunningAggregate:
+    """
+    Incremental form of `aggregate_results` for streamed ledgers: feed rows
+    chunk by chunk with `add`, memory stays O(categories), and `result()`
+    returns exactly what `aggregate_results` would for all rows at once.
+
+    Also keeps the per-status counts, per-scope row counts and AUD totals
+    the API summary needs, so callers never have to hold the rows.
+    """
+
+    def __init__(self) -> None:
+        self.scope_totals: dict[int, float] = {1: 0.0, 2: 0.0, 3: 0.0}
+        self.category_map: dict[tuple, dict] = {}
+        self.scope_counts: dict[int, int]   = {1: 0, 2: 0, 3: 0}
+        self.status_counts: dict[str, int]  = {}
+        self.total_transactions    = 0
+        self.total_amount_aud      = 0.0
+        self.classified_amount_aud = 0.0
+
+    def add(self, classified_transactions: list[dict]) -> "RunningAggregate":
+        for tx in classified_transactions:
+            status = tx.get("classification_status")
+            self.total_transactions += 1
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            self.total_amount_aud += tx.get("amount_aud") or 0.0
+            if status == "classified":
+                self.classified_amount_aud += tx.get("amount_aud") or 0.0
+
+            co2e = tx.get("co2e_kg") or 0.0
+            scope = tx.get("scope")
+            factor = tx.get("matched_factor")
+
+            if scope in self.scope_counts and tx.get("co2e_kg"):
+                self.scope_counts[scope] += 1
+
+            if co2e <= 0 or scope is None:
+                continue
+
+            self.scope_totals[scope] = self.scope_totals.get(scope, 0.0) + co2e
+
+            if factor:
+                key = (factor.get("category", "Uncategorised"), scope)
+                if key not in self.category_map:
+                    self.category_map[key] = {
+                        "category": key[0],
+                        "scope":    scope,
+                        "co2e_kg":  0.0,
+                        "tx_count": 0,
+                    }
+                self.category_map[key]["co2e_kg"]  += co2e
+                self.category_map[key]["tx_count"] += 1
+        return self
+
+    def add_groups(self, groups: list[dict]) -> "RunningAggregate":
+        """
+        Fold rows that were already aggregated in SQL — one per (scope,
+        category) group with tx_count, <status>_count, emitting_count,
+        co2e_kg, amount_aud and classified_amount_aud; scope 0 / category ''
+        for rows without one.
+        """
+        for g in groups:
+            self.total_transactions    += int(g["tx_count"])
+            self.total_amount_aud      += float(g["amount_aud"])
+            self.classified_amount_aud += float(g["classified_amount_aud"])
+            for status in ("classified", "needs_review", "factor_not_found", "excluded"):
+                count = int(g[f"{status}_count"])
+                if count:
+                    self.status_counts[status] = self.status_counts.get(status, 0) + count
+
+            scope, emitting = g["scope"], int(g["emitting_count"])
+            if scope not in self.scope_counts or not emitting:
+                continue
+            co2e = float(g["co2e_kg"])
+            self.scope_counts[scope] += emitting
+            self.scope_totals[scope] += co2e
+
+            if g["category"]:
+                key = (g["category"], scope)
+                if key not in self.category_map:
+                    self.category_map[key] = {"category": key[0], "scope": scope, "co2e_kg": 0.0, "tx_count": 0}
+                self.category_map[key]["co2e_kg"]  += co2e
+                self.category_map[key]["tx_count"] += emitting
+        return self
+
+    def to_state(self) -> dict:
+        """JSON-safe snapshot, so a long-running job can resume its totals."""
+        return {
+            "scope_totals":          {str(k): v for k, v in self.scope_totals.items()},
+            "categories":            list(self.category_map.values()),
+            "scope_counts":          {str(k): v for k, v in self.scope_counts.items()},
+            "status_counts":         dict(self.status_counts),
+            "total_transactions":    self.total_transactions,
+            "total_amount_aud":      self.total_amount_aud,
+            "classified_amount_aud": self.classified_amount_aud,
+        }
+
+    @classmethod
+    def from_state(cls, state: Optional[dict]) -> "RunningAggregate":
+        aggregate = cls()
+        if not state:
+            return aggregate
+        aggregate.scope_totals  = {int(k): v for k, v in state["scope_totals"].items()}
+        aggregate.category_map  = {(c["category"], c["scope"]): dict(c) for c in state["categories"]}
+        aggregate.scope_counts  = {int(k): v for k, v in state["scope_counts"].items()}
+        aggregate.status_counts = dict(state["status_counts"])
+        aggregate.total_transactions    = state["total_transactions"]
+        aggregate.total_amount_aud      = state["total_amount_aud"]
+        aggregate.classified_amount_aud = state["classified_amount_aud"]
+        return aggregate
+
+    def result(self) -> dict:
+        total = sum(self.scope_totals.values())
+
+        return {
+            "total_co2e_kg": round(total, 4),
+            "scope_totals":  {k: round(v, 4) for k, v in self.scope_totals.items()},
+            "by_category":   [
+                {**v, "co2e_kg": round(v["co2e_kg"], 4)}
+                for v in sorted(self.category_map.values(), key=lambda x: -x["co2e_kg"])
+            ],
+        }
+
+
 def aggregate_results(
     classified_transactions: list[dict],
 ) -> dict:
@@ -217,38 +328,4 @@ def aggregate_results(
         scope_totals    : dict { 1: float, 2: float, 3: float }
         by_category     : list[dict] { category, scope, co2e_kg, tx_count }
     """
-    scope_totals: dict[int, float]          = {1: 0.0, 2: 0.0, 3: 0.0}
-    category_map: dict[tuple, dict]         = {}
-
-    for tx in classified_transactions:
-        co2e = tx.get("co2e_kg") or 0.0
-        scope = tx.get("scope")
-        factor = tx.get("matched_factor")
-
-        if co2e <= 0 or scope is None:
-            continue
-
-        scope_totals[scope] = scope_totals.get(scope, 0.0) + co2e
-
-        if factor:
-            key = (factor.get("category", "Uncategorised"), scope)
-            if key not in category_map:
-                category_map[key] = {
-                    "category": key[0],
-                    "scope":    scope,
-                    "co2e_kg":  0.0,
-                    "tx_count": 0,
-                }
-            category_map[key]["co2e_kg"]  += co2e
-            category_map[key]["tx_count"] += 1
-
-    total = sum(scope_totals.values())
-
-    return {
-        "total_co2e_kg": round(total, 4),
-        "scope_totals":  {k: round(v, 4) for k, v in scope_totals.items()},
-        "by_category":   [
-            {**v, "co2e_kg": round(v["co2e_kg"], 4)}
-            for v in sorted(category_map.values(), key=lambda x: -x["co2e_kg"])
-        ],
-    }
+    return RunningAggregate().add(classified_transactions).result()
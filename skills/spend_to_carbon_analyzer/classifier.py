@@ -5,11 +5,28 @@ Uses Groq (primary) or Gemini (fallback) to classify financial transactions
 against the National Greenhouse Accounts (NGA) emission factor table.
 
 Classification pipeline per transaction:
-  1. Keyword pre-match  — fast O(1) lookup against match_keywords[] arrays.
-  2. Groq LLM match     — if keyword match confidence < threshold.
-  3. Gemini fallback    — if Groq fails or returns no match.
+  0. Merchant rules     — known merchants from merchant_classification_rules
+                          (merchant_rules.py), 100% confidence.
+  1. Keyword pre-match  — single-pass Aho-Corasick scan over match_keywords[].
+     Supplier knowledge — the factor other companies' confident or reviewed
+                          lines from the same supplier took
+                          (supplier_knowledge.py, migration 025).
+     Nearest factor     — offline hashed n-gram embedding lookup
+                          (embedding_index.py), off by default. Only a
+                          match with a high cosine score and a clear lead
+                          over the runner-up is final; the rest go on to
+                          step 2.
+  2. Groq LLM match     — if keyword match confidence < threshold. The prompt
+                          lists only the BM25 top-k candidate factors; in
+                          batch mode several misses share one prompt.
+  3. Gemini fallback    — if Groq fails, its circuit breaker is open, or it
+                          has not answered by its p95 latency (hedged
+                          request — provider_health.py).
   4. NEEDS_REVIEW flag  — if confidence < CONFIDENCE_THRESHOLD.
   5. FACTOR_NOT_FOUND   — if no factor can be matched at all.
+
+Steps 2–3 are skipped for lines already answered by the LLM (same
+normalised text and factor set) — see result_cache.py.
 """
 
 from __future__ import annotations
@@ -18,13 +35,41 @@ import json
 import logging
 import os
 import re
-from typing import Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from .embedding_index import EmbeddingIndex
+from .factor_registry import registry_for
+from .keyword_index import KeywordIndex
+from .llm_clients import GROQ_MODEL, llm_clients
+from .merchant_rules import MerchantRuleEngine, merchant_rules
+from .provider_health import GEMINI, GROQ, first_answer
+from .result_cache import cache_key, classification_cache, factor_set_version, to_cache_value
+from .retrieval import FactorRetriever
+from .supplier_knowledge import supplier_knowledge
 
 logger = logging.getLogger("ecolink.classifier")
 
 # Minimum confidence to accept a classification as final.
 CONFIDENCE_THRESHOLD = 0.70
 
+# Nearest-factor stage: on/off, and the cosine score and lead over the
+# runner-up a match needs to be final — below either, the LLM decides.
+# Raw cosine scores are not confidences: on the labelled sample (bench
+# `embed`) every match at ≥ 0.30 with a ≥ 0.10 lead was right, and matches
+# for unrelated lines score under 0.20. Off until calibrated on real ledgers.
+EMBEDDING_STAGE      = os.environ.get("EMBEDDING_STAGE", "0") == "1"
+EMBEDDING_MIN_SCORE  = float(os.environ.get("EMBEDDING_MIN_SCORE", "0.30"))
+EMBEDDING_MIN_MARGIN = float(os.environ.get("EMBEDDING_MIN_MARGIN", "0.10"))
+
+# Max transactions classified concurrently by classify_batch (1 = sequential).
+MAX_CONCURRENCY = int(os.environ.get("CLASSIFIER_MAX_CONCURRENCY", "4"))
+
+# Keyword misses sent to the LLM per prompt (1 = one prompt per transaction).
+LLM_BATCH_SIZE = int(os.environ.get("CLASSIFIER_LLM_BATCH_SIZE", "10"))
+
 # ---------------------------------------------------------------------------
 # Prompt builder
 # ---------------------------------------------------------------------------
@@ -41,10 +86,9 @@ Rules:
 - All monetary values are AUD (Australian dollars).
 """
 
-def _build_user_prompt(transaction: dict, factors: list[dict]) -> str:
-    """Build the classification prompt for a single transaction."""
-
-    factors_json = json.dumps(
+def _factors_catalogue_json(factors: list[dict]) -> str:
+    """Serialise the emission-factor catalogue sent to the LLM."""
+    return json.dumps(
         [
             {
                 "id":       str(f["id"]),
@@ -61,15 +105,21 @@ def _build_user_prompt(transaction: dict, factors: list[dict]) -> str:
         separators=(",", ":"),
     )
 
-    tx_json = json.dumps(
-        {
-            "description":    transaction.get("description", ""),
-            "supplier_name":  transaction.get("supplier_name", ""),
-            "amount_aud":     transaction.get("amount_aud", 0),
-            "account_name":   transaction.get("account_name", ""),
-        },
-        separators=(",", ":"),
-    )
+
+def _transaction_prompt_fields(transaction: dict) -> dict:
+    return {
+        "description":    transaction.get("description", ""),
+        "supplier_name":  transaction.get("supplier_name", ""),
+        "amount_aud":     transaction.get("amount_aud", 0),
+        "account_name":   transaction.get("account_name", ""),
+    }
+
+
+def _build_user_prompt(transaction: dict, factors: list[dict]) -> str:
+    """Build the classification prompt for a single transaction."""
+
+    factors_json = _factors_catalogue_json(factors)
+    tx_json = json.dumps(_transaction_prompt_fields(transaction), separators=(",", ":"))
 
     return f"""Classify this transaction against the NGA emission factors list.
 
@@ -92,19 +142,78 @@ Respond with ONLY this JSON structure:
 """
 
 
+def _build_batch_user_prompt(transactions: list[dict], factors: list[dict]) -> str:
+    """
+    Build one classification prompt for several transactions, sharing a
+    single copy of the factor catalogue. Transactions are keyed by their
+    position in `transactions`.
+    """
+
+    factors_json = _factors_catalogue_json(factors)
+    txs_json = json.dumps(
+        [{"index": i, **_transaction_prompt_fields(tx)} for i, tx in enumerate(transactions)],
+        separators=(",", ":"),
+    )
+
+    return f"""Classify each of these {len(transactions)} transactions against the NGA emission factors list.
+Classify every transaction independently.
+
+Transactions:
+{txs_json}
+
+Available NGA Emission Factors:
+{factors_json}
+
+Respond with ONLY this JSON structure, with exactly one entry per transaction index:
+{{
+  "results": [
+    {{
+      "index": <transaction index>,
+      "matched_factor_id": "<UUID or null>",
+      "confidence": <0.0-1.0>,
+      "reasoning": "<one sentence>",
+      "quantity_hint": {{
+        "value": <number or null>,
+        "unit": "<unit string or null>"
+      }}
+    }}
+  ]
+}}
+"""
+
+
+def _parse_batch_response(raw: Optional[dict], count: int) -> dict[int, dict]:
+    """
+    Pick the well-formed per-transaction entries out of a batched LLM reply.
+    Returns { index: item } — missing or malformed items are simply absent.
+    """
+    parsed: dict[int, dict] = {}
+    if not isinstance(raw, dict) or not isinstance(raw.get("results"), list):
+        return parsed
+
+    for item in raw["results"]:
+        if not isinstance(item, dict) or "matched_factor_id" not in item:
+            continue
+        index = item.get("index")
+        if not isinstance(index, int) or isinstance(index, bool) or not 0 <= index < count:
+            continue
+        try:
+            confidence = float(item.get("confidence", 0.0))
+        except (TypeError, ValueError):
+            continue
+        if not 0.0 <= confidence <= 1.0 or index in parsed:
+            continue
+        parsed[index] = item
+
+    return parsed
+
+
 # ---------------------------------------------------------------------------
 # Keyword pre-matcher (fast path — avoids LLM call for obvious matches)
 # ---------------------------------------------------------------------------
 
-def _keyword_prematch(
-    transaction: dict,
-    factors: list[dict],
-) -> Optional[tuple[dict, float]]:
-    """
-    Try to match a transaction using the factor's match_keywords array.
-    Returns (factor, confidence) or None.
-    """
-    haystack = " ".join(
+def _keyword_haystack(transaction: dict) -> str:
+    return " ".join(
         filter(None, [
             (transaction.get("description") or "").lower(),
             (transaction.get("supplier_name") or "").lower(),
@@ -112,108 +221,90 @@ def _keyword_prematch(
         ])
     )
 
-    best_factor  = None
-    best_score   = 0.0
 
-    for factor in factors:
-        keywords: list[str] = factor.get("match_keywords") or []
-        if not keywords:
-            continue
+def _keyword_prematch(
+    transaction: dict,
+    factors: list[dict],
+    index: Optional[KeywordIndex] = None,
+) -> Optional[tuple[dict, float]]:
+    """
+    Try to match a transaction using the factor's match_keywords array.
+    Returns (factor, confidence) or None.
 
-        matched_kw = [kw for kw in keywords if kw.lower() in haystack]
-        if not matched_kw:
-            continue
+    Pass a prebuilt `KeywordIndex` for `factors` to avoid recompiling the
+    keyword automaton on every call (see `classify_batch`).
+
+    Score = proportion of keywords matched, capped at 0.92 (leaving room
+    for the LLM to override with higher confidence), plus a bonus of up to
+    0.05 for longer — more specific — keyword matches.
+    """
+    if index is None:
+        index = KeywordIndex(factors)
+    return index.best_match(_keyword_haystack(transaction), CONFIDENCE_THRESHOLD)
 
-        # Score = proportion of keywords matched, capped at 0.92
-        # (leave room for LLM to override with higher confidence)
-        score = min(len(matched_kw) / max(len(keywords), 1) * 0.95, 0.92)
 
-        # Bonus: longer keyword match = more specific
-        score += min(max(len(kw) for kw in matched_kw) * 0.005, 0.05)
+# ---------------------------------------------------------------------------
+# Groq classifier
+# ---------------------------------------------------------------------------
 
-        if score > best_score:
-            best_score  = score
-            best_factor = factor
+# Completion budget per classified transaction.
+_MAX_TOKENS_PER_TX = 256
 
-    if best_factor and best_score >= CONFIDENCE_THRESHOLD:
-        return best_factor, round(best_score, 3)
 
-    return None
+def _groq_request(user_prompt: str, max_tokens: int, timeout: float) -> dict:
+    """Send one prompt to Groq. Returns parsed JSON; raises on any failure."""
+    response = llm_clients.groq().chat.completions.create(
+        model=GROQ_MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user",   "content": user_prompt},
+        ],
+        temperature=0.1,       # Low temperature = deterministic classification
+        max_tokens=max_tokens,
+        response_format={"type": "json_object"},
+        timeout=timeout,
+    )
+    raw = response.choices[0].message.content
+    return json.loads(raw)
 
 
 # ---------------------------------------------------------------------------
-# Groq classifier
+# Gemini fallback classifier
 # ---------------------------------------------------------------------------
 
-def _classify_with_groq(
-    transaction: dict,
-    factors: list[dict],
-) -> Optional[dict]:
-    """Call Groq API to classify a transaction. Returns parsed JSON or None."""
-    try:
-        from groq import Groq  # lazy import
-
-        api_key = os.environ.get("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY is not set.")
-
-        client = Groq(api_key=api_key)
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user",   "content": _build_user_prompt(transaction, factors)},
-            ],
-            temperature=0.1,       # Low temperature = deterministic classification
-            max_tokens=256,
-            response_format={"type": "json_object"},
-        )
-        raw = response.choices[0].message.content
-        return json.loads(raw)
+def _gemini_request(user_prompt: str, max_tokens: int, timeout: float) -> dict:
+    """Send one prompt to Gemini. Returns parsed JSON; raises on any failure."""
+    model = llm_clients.gemini(max_tokens, SYSTEM_PROMPT)
+    response = model.generate_content(user_prompt, request_options={"timeout": timeout})
+    raw = response.text.strip()
 
-    except Exception as exc:
-        logger.warning("Groq classification failed: %s", exc)
-        return None
+    # Strip accidental markdown fences
+    raw = re.sub(r"^```(?:json)?\s*", "", raw)
+    raw = re.sub(r"\s*```$", "", raw)
+
+    return json.loads(raw)
 
 
 # ---------------------------------------------------------------------------
-# Gemini fallback classifier
+# Groq first, Gemini as fallback / hedge
 # ---------------------------------------------------------------------------
 
-def _classify_with_gemini(
-    transaction: dict,
-    factors: list[dict],
+def _ask_llm(
+    user_prompt: str,
+    max_tokens: int,
+    label: str,
+    accept: Callable[[dict], Optional[dict]] = lambda answer: answer,
 ) -> Optional[dict]:
-    """Call Gemini API as fallback. Returns parsed JSON or None."""
-    try:
-        import google.generativeai as genai  # lazy import
-
-        api_key = os.environ.get("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY is not set.")
-
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(
-            model_name="gemini-2.0-flash",
-            system_instruction=SYSTEM_PROMPT,
-            generation_config=genai.GenerationConfig(
-                temperature=0.1,
-                max_output_tokens=256,
-                response_mime_type="application/json",
-            ),
-        )
-        response = model.generate_content(_build_user_prompt(transaction, factors))
-        raw = response.text.strip()
-
-        # Strip accidental markdown fences
-        raw = re.sub(r"^```(?:json)?\s*", "", raw)
-        raw = re.sub(r"\s*```$", "", raw)
-
-        return json.loads(raw)
+    """
+    Groq's answer, or Gemini's when Groq fails, its circuit is open, or it
+    is still running at its p95 latency (both then race — provider_health).
+    `accept` turns a raw answer into the result, or None if it is unusable
+    (which counts as that provider failing).
+    """
+    def ask(request: Callable[[str, int, float], dict]) -> Callable[[float], Optional[dict]]:
+        return lambda timeout: accept(request(user_prompt, max_tokens, timeout))
 
-    except Exception as exc:
-        logger.warning("Gemini classification failed: %s", exc)
-        return None
+    return first_answer(GROQ, ask(_groq_request), GEMINI, ask(_gemini_request), label)
 
 
 # ---------------------------------------------------------------------------
@@ -221,6 +312,10 @@ def _classify_with_gemini(
 # ---------------------------------------------------------------------------
 
 def _find_factor_by_id(factor_id: str, factors: list[dict]) -> Optional[dict]:
+    # Cached factor sets (tuples) have a memoised UUID index; an ad-hoc list
+    # is scanned rather than indexed for a single lookup.
+    if isinstance(factors, tuple):
+        return registry_for(factors).get(factor_id)
     for f in factors:
         if str(f["id"]) == factor_id:
             return f
@@ -231,21 +326,8 @@ def _find_factor_by_id(factor_id: str, factors: list[dict]) -> Optional[dict]:
 # Main classifier function
 # ---------------------------------------------------------------------------
 
-def classify_transaction(
-    transaction: dict,
-    factors: list[dict],
-) -> dict:
-    """
-    Classify a single transaction against the NGA emission factors.
-
-    Returns a dict with:
-        matched_factor  : dict | None
-        confidence      : float | None
-        status          : ClassificationStatus string
-        notes           : str | None
-        quantity_hint   : dict | None  { value, unit }
-    """
-    result = {
+def _empty_result() -> dict:
+    return {
         "matched_factor": None,
         "confidence":     None,
         "status":         "pending",
@@ -253,31 +335,184 @@ def classify_transaction(
         "quantity_hint":  None,
     }
 
-    # ── Step 1: Keyword pre-match (fast path) ────────────────────────────────
-    prematch = _keyword_prematch(transaction, factors)
-    if prematch:
-        factor, confidence = prematch
-        result.update({
+
+def _error_result(exc: Exception) -> dict:
+    return {
+        **_empty_result(),
+        "status": "factor_not_found",
+        "notes":  f"Internal error during classification: {exc}",
+    }
+
+
+def _merchant_rule_stage(
+    transaction: dict,
+    factors: list[dict],
+    rules: Optional[MerchantRuleEngine] = None,
+) -> Optional[dict]:
+    """Step 0: deterministic merchant rules. Returns a final result, or None on a miss."""
+    rules = rules if rules is not None else merchant_rules.engine()
+    rule = rules.match(transaction)
+    if rule is None:
+        return None
+
+    source = f"Merchant rule '{rule.merchant_name}' ({rule.category_code})"
+    citation = f" [{rule.notes_citation}]" if rule.notes_citation else ""
+    if rule.excluded:
+        return {
+            **_empty_result(),
+            "confidence": 1.0,
+            "status":     "excluded",
+            "notes":      f"{source}: not emission-relevant.{citation}",
+        }
+
+    factor = rules.factor_for(rule, factors)
+    if rule.action == "NEEDS_REVIEW" or rule.activity_unit is None:
+        return {
+            **_empty_result(),
             "matched_factor": factor,
-            "confidence":     confidence,
-            "status":         "classified",
-            "notes":          f"Keyword match on '{factor['activity']}'.",
-        })
-        logger.debug(
-            "Keyword match: '%s' → %s (%.2f)",
-            transaction.get("description", ""),
-            factor["activity"],
-            confidence,
-        )
-        return result
+            "confidence":     1.0,
+            "status":         "needs_review",
+            "notes":          f"{source}: no physical quantity can be extracted — enter it manually.{citation}",
+        }
+    if factor is None:
+        if rule.requires_state:
+            return {
+                **_empty_result(),
+                "confidence": 1.0,
+                "status":     "needs_review",
+                "notes":      f"{source}: needs the company's state for the NGA grid factor.{citation}",
+            }
+        # Category known, but this factor set has nothing for it — let the
+        # keyword / LLM stages pick a factor.
+        logger.debug("%s has no factor in this set — falling through.", source)
+        return None
+
+    return {
+        **_empty_result(),
+        "matched_factor": factor,
+        "confidence":     1.0,
+        "status":         "classified",
+        "notes":          f"{source}.{citation}",
+    }
 
-    # ── Step 2: Groq LLM classification ──────────────────────────────────────
-    llm_result = _classify_with_groq(transaction, factors)
 
-    # ── Step 3: Gemini fallback ───────────────────────────────────────────────
-    if llm_result is None:
-        logger.info("Falling back to Gemini for: %s", transaction.get("description"))
-        llm_result = _classify_with_gemini(transaction, factors)
+def _keyword_stage(
+    transaction: dict,
+    factors: list[dict],
+    keyword_index: Optional[KeywordIndex] = None,
+) -> Optional[dict]:
+    """Step 1: keyword pre-match. Returns a final result, or None on a miss."""
+    prematch = _keyword_prematch(transaction, factors, keyword_index)
+    if not prematch:
+        return None
+
+    factor, confidence = prematch
+    logger.debug(
+        "Keyword match: '%s' → %s (%.2f)",
+        transaction.get("description", ""),
+        factor["activity"],
+        confidence,
+    )
+    return {
+        **_empty_result(),
+        "matched_factor": factor,
+        "confidence":     confidence,
+        "status":         "classified",
+        "notes":          f"Keyword match on '{factor['activity']}'.",
+    }
+
+
+def _supplier_knowledge_stage(transaction: dict, factors: list[dict]) -> Optional[dict]:
+    """
+    Factor recorded for this supplier across companies. Returns a final
+    result, or None when the supplier is unknown, its evidence is too thin
+    or split, or its factor is not in (or not portable to) this set.
+    """
+    verdict = supplier_knowledge.lookup(transaction.get("supplier_name"))
+    if verdict is None:
+        return None
+
+    # Other editions carry other ids for the same activity.
+    factor = _find_factor_by_id(verdict.factor_id, factors) or next(
+        (f for f in factors if f["activity"] == verdict.activity), None,
+    )
+    # Grid factors depend on the buyer's state, not the supplier.
+    if factor is None or factor.get("state_specific"):
+        return None
+
+    confidence = round(min(verdict.share * verdict.similarity, 0.95), 4)
+    if confidence < CONFIDENCE_THRESHOLD:
+        return None
+
+    logger.debug(
+        "Supplier knowledge: '%s' → %s (%.2f)",
+        transaction.get("supplier_name"),
+        factor["activity"],
+        confidence,
+    )
+    # The "Supplier knowledge" prefix keeps these rows out of the knowledge
+    # triggers (migration 025), so answers never count as their own evidence.
+    return {
+        **_empty_result(),
+        "matched_factor": factor,
+        "confidence":     confidence,
+        "status":         "classified",
+        "notes":          (
+            f"Supplier knowledge: '{verdict.supplier_key}' → '{factor['activity']}' "
+            f"({verdict.confirmed} reviewed, {verdict.automatic} automatic classifications across companies)."
+        ),
+    }
+
+
+def _embedding_stage(
+    transaction: dict,
+    factors: list[dict],
+    embedding_index: Optional[EmbeddingIndex] = None,
+) -> Optional[dict]:
+    """
+    Nearest factor by embedding similarity. Returns a final result, or None
+    when the stage is off or the match is weak or too close to call (→ LLM).
+    """
+    if not EMBEDDING_STAGE:
+        return None
+    nearest = (embedding_index or EmbeddingIndex(factors)).nearest(transaction)
+    if nearest is None or nearest.score < EMBEDDING_MIN_SCORE or nearest.margin < EMBEDDING_MIN_MARGIN:
+        return None
+
+    factor     = nearest.factor
+    confidence = embedding_confidence(nearest.score)
+    logger.debug(
+        "Embedding match: '%s' → %s (similarity %.2f, margin %.2f)",
+        transaction.get("description", ""),
+        factor["activity"],
+        nearest.score,
+        nearest.margin,
+    )
+    return {
+        **_empty_result(),
+        "matched_factor": factor,
+        "confidence":     confidence,
+        "status":         "classified",
+        "notes":          (
+            f"Nearest factor '{factor['activity']}' "
+            f"(similarity {nearest.score:.2f}, margin {nearest.margin:.2f})."
+        ),
+    }
+
+
+def embedding_confidence(score: float) -> float:
+    """
+    Map a cosine score at or above EMBEDDING_MIN_SCORE onto
+    [CONFIDENCE_THRESHOLD, 0.95] — the scale the other stages report on.
+    """
+    span = max(1.0 - EMBEDDING_MIN_SCORE, 1e-9)
+    scaled = CONFIDENCE_THRESHOLD + (score - EMBEDDING_MIN_SCORE) / span * (0.95 - CONFIDENCE_THRESHOLD)
+    return round(min(max(scaled, CONFIDENCE_THRESHOLD), 0.95), 4)
+
+
+def _interpret_llm_result(llm_result: Optional[dict], factors: list[dict]) -> dict:
+    """Steps 4–6: turn a raw LLM answer (or None) into a classification result."""
+    result = _empty_result()
 
     # ── Step 4: No LLM response at all ───────────────────────────────────────
     if llm_result is None:
@@ -332,31 +567,355 @@ def classify_transaction(
     return result
 
 
+def _cached_result(
+    transaction: dict,
+    factors: list[dict],
+    version: str,
+) -> Optional[dict]:
+    """Return a previous LLM verdict for this normalised line, or None."""
+    verdict = classification_cache.get(cache_key(transaction, version))
+    if verdict is None:
+        return None
+
+    matched_factor = None
+    if verdict["factor_id"]:
+        matched_factor = _find_factor_by_id(verdict["factor_id"], factors)
+        if matched_factor is None:
+            return None
+
+    return {
+        **_empty_result(),
+        "matched_factor": matched_factor,
+        "confidence":     verdict["confidence"],
+        "status":         verdict["status"],
+        "notes":          _cached_notes(verdict, matched_factor),
+    }
+
+
+def _cached_notes(verdict: dict, factor: Optional[dict]) -> str:
+    """
+    Note for a cached verdict. The cache is shared across companies, so it
+    keeps no LLM reasoning (which may quote another tenant's line).
+    """
+    if factor is None:
+        return "No matching NGA factor found (cached LLM verdict for this line). Manual review required."
+    if verdict["status"] == "needs_review":
+        return (
+            f"Low confidence ({verdict['confidence'] or 0:.0%}) — cached LLM verdict for this line: "
+            f"{factor['activity']}. Manual review recommended before including in final report."
+        )
+    return f"Cached LLM verdict for this line: {factor['activity']}."
+
+
+def _remember(
+    transaction: dict,
+    version: str,
+    llm_result: Optional[dict],
+    result: dict,
+) -> None:
+    """Cache genuine LLM verdicts — not provider outages or hallucinated ids."""
+    if llm_result is None:
+        return
+    if result["status"] == "factor_not_found" and llm_result.get("matched_factor_id"):
+        return
+    classification_cache.set(cache_key(transaction, version), to_cache_value(result), version)
+
+
+def _classify_with_llm(
+    transaction: dict,
+    factors: list[dict],
+    retriever: Optional[FactorRetriever] = None,
+    version: Optional[str] = None,
+) -> dict:
+    """
+    Steps 2–6 for a single transaction that missed the keyword fast path.
+    A cached verdict for the same normalised line skips the LLM entirely;
+    otherwise the prompt only carries the retriever's top-k candidates.
+    """
+    version = version or factor_set_version(factors)
+    cached  = _cached_result(transaction, factors, version)
+    if cached:
+        return cached
+
+    candidates = retriever.top_k(transaction) if retriever else factors
+
+    # ── Steps 2–3: Groq, Gemini fallback / hedge ─────────────────────────────
+    llm_result = _ask_llm(
+        _build_user_prompt(transaction, candidates),
+        _MAX_TOKENS_PER_TX,
+        transaction.get("description"),
+    )
+
+    result = _interpret_llm_result(llm_result, factors)
+    _remember(transaction, version, llm_result, result)
+    return result
+
+
+def classify_transaction(
+    transaction: dict,
+    factors: list[dict],
+    keyword_index: Optional[KeywordIndex] = None,
+    retriever: Optional[FactorRetriever] = None,
+    cache_version: Optional[str] = None,
+    rules: Optional[MerchantRuleEngine] = None,
+    embedding_index: Optional[EmbeddingIndex] = None,
+) -> dict:
+    """
+    Classify a single transaction against the NGA emission factors.
+
+    Returns a dict with:
+        matched_factor  : dict | None
+        confidence      : float | None
+        status          : ClassificationStatus string
+        notes           : str | None
+        quantity_hint   : dict | None  { value, unit }
+    """
+    # ── Step 0: Merchant rules ───────────────────────────────────────────────
+    rule_result = _merchant_rule_stage(transaction, factors, rules)
+    if rule_result:
+        return rule_result
+
+    # ── Step 1: Keyword pre-match (fast path) ────────────────────────────────
+    keyword_result = _keyword_stage(transaction, factors, keyword_index)
+    if keyword_result:
+        return keyword_result
+
+    # ── Step 1b: Supplier knowledge (cross-company) ──────────────────────────
+    knowledge_result = _supplier_knowledge_stage(transaction, factors)
+    if knowledge_result:
+        return knowledge_result
+
+    # ── Step 1c: Nearest factor (offline embeddings) ─────────────────────────
+    embedding_result = _embedding_stage(transaction, factors, embedding_index)
+    if embedding_result:
+        return embedding_result
+
+    return _classify_with_llm(
+        transaction, factors, retriever or FactorRetriever(factors), cache_version,
+    )
+
+
 # ---------------------------------------------------------------------------
 # Batch classifier
 # ---------------------------------------------------------------------------
 
+# Indexes for immutable factor sets (tuples served by factor_cache), keyed by
+# identity so each cached (nga_year, state) set is indexed exactly once.
+_INDEX_MEMO: "OrderedDict[int, tuple[tuple, KeywordIndex, FactorRetriever, EmbeddingIndex, str]]" = OrderedDict()
+_INDEX_MEMO_SIZE = 32
+_INDEX_MEMO_LOCK = threading.Lock()
+
+
+def _factor_set_indexes(
+    factors: list[dict],
+    top_k: Optional[int] = None,
+) -> tuple[KeywordIndex, FactorRetriever, EmbeddingIndex, str]:
+    """Keyword index, candidate retriever, embedding index and cache version for a factor set."""
+    if not isinstance(factors, tuple) or top_k is not None:
+        return (
+            KeywordIndex(factors), FactorRetriever(factors, top_k),
+            EmbeddingIndex(factors), factor_set_version(factors),
+        )
+
+    with _INDEX_MEMO_LOCK:
+        memo = _INDEX_MEMO.get(id(factors))
+        if memo and memo[0] is factors:
+            _INDEX_MEMO.move_to_end(id(factors))
+            return memo[1:]
+
+    indexes = (
+        KeywordIndex(factors), FactorRetriever(factors),
+        EmbeddingIndex(factors), factor_set_version(factors),
+    )
+    with _INDEX_MEMO_LOCK:
+        _INDEX_MEMO[id(factors)] = (factors, *indexes)
+        while len(_INDEX_MEMO) > _INDEX_MEMO_SIZE:
+            _INDEX_MEMO.popitem(last=False)
+    return indexes
+
+
+def candidate_factors(transaction: dict, factors: list[dict], k: int = 5) -> list[tuple[dict, float]]:
+    """
+    The k factors that best match a transaction, with their BM25 scores, best
+    first: the ranking that picks LLM prompt candidates (review queue).
+    """
+    _, retriever, _, _ = _factor_set_indexes(factors)
+    return [(retriever.factors[fi], score) for fi, score in retriever.rank(transaction)[:k]]
+
+
+def _classify_one(
+    index: int,
+    total: int,
+    transaction: dict,
+    factors: list[dict],
+    keyword_index: KeywordIndex,
+    retriever: FactorRetriever,
+    version: str,
+    rules: MerchantRuleEngine,
+    embedding_index: EmbeddingIndex,
+) -> dict:
+    logger.debug("Classifying transaction %d/%d: %s", index + 1, total, transaction.get("description"))
+    try:
+        return classify_transaction(
+            transaction, factors, keyword_index, retriever, version, rules, embedding_index,
+        )
+    except Exception as exc:
+        logger.error("Unexpected error classifying transaction %d: %s", index, exc)
+        return _error_result(exc)
+
+
+def _classify_chunk(
+    indices: list[int],
+    transactions: list[dict],
+    factors: list[dict],
+    retriever: FactorRetriever,
+    version: str,
+) -> list[dict]:
+    """
+    Classify several keyword misses with one multi-transaction LLM prompt.
+    Cached verdicts are served first; the prompt carries the union of the
+    remaining transactions' top-k candidates. Items the batched reply leaves
+    out (or garbles) fall back to a per-transaction LLM call.
+    """
+    results: dict[int, dict] = {}
+    pending: list[int] = []
+    for index in indices:
+        cached = _cached_result(transactions[index], factors, version)
+        if cached:
+            results[index] = cached
+        else:
+            pending.append(index)
+
+    chunk = [transactions[i] for i in pending]
+
+    answers: dict[int, dict] = {}
+    if len(chunk) > 1:
+        candidates = retriever.top_k_union(chunk)
+        answers = _ask_llm(
+            _build_batch_user_prompt(chunk, candidates),
+            _MAX_TOKENS_PER_TX * len(chunk),
+            f"a batch of {len(chunk)} transactions",
+            # A reply with no usable items counts as that provider failing.
+            accept=lambda raw: _parse_batch_response(raw, len(chunk)) or None,
+        ) or {}
+
+    for pos, (index, tx) in enumerate(zip(pending, chunk)):
+        try:
+            if pos in answers:
+                result = _interpret_llm_result(answers[pos], factors)
+                _remember(tx, version, answers[pos], result)
+            else:
+                if len(chunk) > 1:
+                    logger.info("Batched reply missing transaction %d — retrying individually", index)
+                result = _classify_with_llm(tx, factors, retriever, version)
+        except Exception as exc:
+            logger.error("Unexpected error classifying transaction %d: %s", index, exc)
+            result = _error_result(exc)
+        results[index] = result
+
+    return [results[i] for i in indices]
+
+
 def classify_batch(
     transactions: list[dict],
     factors: list[dict],
+    max_concurrency: Optional[int] = None,
+    llm_batch_size: Optional[int] = None,
+    top_k: Optional[int] = None,
 ) -> list[dict]:
     """
     Classify a list of transactions against the NGA emission factors.
     Returns a list of classification result dicts (same order as input).
+
+    Merchant rules, the keyword index, cross-company supplier knowledge
+    (one lookup query for the whole batch) and the nearest-factor
+    embeddings answer what they can first; only the remaining lines go to
+    the LLM.
+
+    Keyword misses are grouped `llm_batch_size` at a time (default:
+    CLASSIFIER_LLM_BATCH_SIZE) into one LLM prompt carrying a single copy
+    of the factor catalogue, cutting request count and prompt tokens by
+    roughly that factor. Each prompt only lists the `top_k` (default:
+    CLASSIFIER_TOP_K) BM25-ranked candidate factors per transaction.
+    Lines seen before (same normalised text and factor set), in this batch
+    or an earlier one, are answered from the classification cache without
+    any LLM call.
+
+    Up to `max_concurrency` LLM requests (default: CLASSIFIER_MAX_CONCURRENCY)
+    are in flight at once on a thread pool. Provider request rates are
+    capped by GROQ_MAX_RPS and GEMINI_MAX_RPS regardless of concurrency.
     """
-    results = []
-    for i, tx in enumerate(transactions):
-        logger.debug("Classifying transaction %d/%d: %s", i + 1, len(transactions), tx.get("description"))
-        try:
-            result = classify_transaction(tx, factors)
-        except Exception as exc:
-            logger.error("Unexpected error classifying transaction %d: %s", i, exc)
-            result = {
-                "matched_factor": None,
-                "confidence":     None,
-                "status":         "factor_not_found",
-                "notes":          f"Internal error during classification: {exc}",
-                "quantity_hint":  None,
-            }
-        results.append(result)
+    keyword_index, retriever, embedding_index, version = _factor_set_indexes(factors, top_k)
+    rules      = merchant_rules.engine()
+    total      = len(transactions)
+    batch_size = max(1, llm_batch_size or LLM_BATCH_SIZE)
+
+    results: list[Optional[dict]] = [None] * total
+    # Repeat lines within this batch → index of the first occurrence.
+    duplicate_of: dict[int, int] = {}
+
+    def run(job: list[int]) -> list[dict]:
+        if batch_size == 1:
+            return [_classify_one(
+                job[0], total, transactions[job[0]], factors, keyword_index, retriever, version, rules,
+                embedding_index,
+            )]
+        return _classify_chunk(job, transactions, factors, retriever, version)
+
+    if batch_size == 1:
+        supplier_knowledge.prefetch(tx.get("supplier_name") for tx in transactions)
+        jobs = [[i] for i in range(total)]
+    else:
+        for i, tx in enumerate(transactions):
+            try:
+                results[i] = (
+                    _merchant_rule_stage(tx, factors, rules)
+                    or _keyword_stage(tx, factors, keyword_index)
+                )
+            except Exception as exc:
+                logger.error("Unexpected error classifying transaction %d: %s", i, exc)
+                results[i] = _error_result(exc)
+
+        supplier_knowledge.prefetch(
+            tx.get("supplier_name") for tx, result in zip(transactions, results) if result is None
+        )
+        misses: list[int] = []
+        first_seen: dict[str, int] = {}
+        for i, tx in enumerate(transactions):
+            if results[i] is not None:
+                continue
+            try:
+                results[i] = (
+                    _supplier_knowledge_stage(tx, factors)
+                    or _embedding_stage(tx, factors, embedding_index)
+                )
+            except Exception as exc:
+                logger.error("Unexpected error classifying transaction %d: %s", i, exc)
+                results[i] = _error_result(exc)
+            if results[i] is not None:
+                continue
+            key = cache_key(tx, version)
+            if key in first_seen:
+                duplicate_of[i] = first_seen[key]
+            else:
+                first_seen[key] = i
+                misses.append(i)
+        jobs = [misses[i:i + batch_size] for i in range(0, len(misses), batch_size)]
+
+    workers = max(1, min(max_concurrency or MAX_CONCURRENCY, len(jobs)))
+    if workers == 1:
+        outputs = [run(job) for job in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="classify") as pool:
+            # Executor.map yields results in submission order.
+            outputs = list(pool.map(run, jobs))
+
+    for job, output in zip(jobs, outputs):
+        for i, result in zip(job, output):
+            results[i] = result
+
+    # Same normalised line → same verdict; the quantity hint is line-specific.
+    for i, first in duplicate_of.items():
+        results[i] = {**results[first], "quantity_hint": None}
+
     return results
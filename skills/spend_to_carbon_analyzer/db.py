@@ -1,6 +1,10 @@
 """
 EcoLink Australia — Database layer for the Spend-to-Carbon analyser.
 Uses psycopg2 (synchronous) wrapped in a simple connection pool helper.
+
+The HTTP endpoints use the asyncpg layer in `async_db.py`; this module
+serves background threads (write-behind queue, factor-cache listener,
+classification cache) and scripts. Both read the same pool settings.
 """
 
 from __future__ import annotations
@@ -8,6 +12,7 @@ from __future__ import annotations
 import os
 import logging
 from contextlib import contextmanager
+from datetime import date
 from typing import Generator, Optional
 
 import psycopg2
@@ -16,6 +21,11 @@ from psycopg2.pool import ThreadedConnectionPool
 
 logger = logging.getLogger("ecolink.db")
 
+DB_POOL_MIN             = int(os.environ.get("DB_POOL_MIN", "1"))
+DB_POOL_MAX             = int(os.environ.get("DB_POOL_MAX", "10"))
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "30000"))  # 0 = none
+DB_SSLMODE              = os.environ.get("DB_SSLMODE", "require")
+
 # ---------------------------------------------------------------------------
 # Connection pool (lazy-initialised on first request)
 # ---------------------------------------------------------------------------
@@ -29,10 +39,11 @@ def _get_pool() -> ThreadedConnectionPool:
         if not database_url:
             raise RuntimeError("DATABASE_URL environment variable is not set.")
         _pool = ThreadedConnectionPool(
-            minconn=1,
-            maxconn=10,
+            minconn=DB_POOL_MIN,
+            maxconn=DB_POOL_MAX,
             dsn=database_url,
-            sslmode="require",
+            sslmode=DB_SSLMODE,
+            options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}",
         )
         logger.info("PostgreSQL connection pool initialised.")
     return _pool
@@ -101,6 +112,45 @@ def fetch_all_factors(nga_year: int, state: Optional[str] = None) -> list[dict]:
         return [dict(row) for row in cur.fetchall()]
 
 
+def fetch_current_editions() -> list[tuple[int, Optional[str]]]:
+    """
+    List the (nga_year, state) factor sets worth preloading: every current
+    NGA edition nationally (state=None) plus once per state that has
+    state-specific factors in that edition.
+    """
+    with get_cursor() as cur:
+        cur.execute(
+            """
+            SELECT DISTINCT nga_year, state
+            FROM emission_factors
+            WHERE is_current = TRUE
+            ORDER BY nga_year, state NULLS FIRST
+            """
+        )
+        editions: list[tuple[int, Optional[str]]] = []
+        for row in cur.fetchall():
+            if (row["nga_year"], None) not in editions:
+                editions.append((row["nga_year"], None))
+            if row["state"]:
+                editions.append((row["nga_year"], row["state"]))
+        return editions
+
+
+def fetch_factor_version() -> Optional[int]:
+    """Current emission_factor_version stamp (migration 023), or None if absent."""
+    with get_cursor() as cur:
+        cur.execute(
+            """
+            SELECT to_regclass('emission_factor_version') IS NOT NULL AS present
+            """
+        )
+        if not cur.fetchone()["present"]:
+            return None
+        cur.execute("SELECT version FROM emission_factor_version WHERE id = 1")
+        row = cur.fetchone()
+        return int(row["version"]) if row else None
+
+
 def fetch_factor_by_id(factor_id: str) -> Optional[dict]:
     """Fetch a single emission factor by UUID."""
     with get_cursor() as cur:
@@ -117,10 +167,199 @@ def fetch_factor_by_id(factor_id: str) -> Optional[dict]:
         return dict(row) if row else None
 
 
+# ---------------------------------------------------------------------------
+# Merchant classification rules (migrations 016 / 018)
+# ---------------------------------------------------------------------------
+
+def fetch_merchant_rules() -> list[dict]:
+    """Active merchant rules, highest priority first (ties: oldest first)."""
+    with get_cursor() as cur:
+        cur.execute(
+            """
+            SELECT id, merchant_name, pattern, match_type, category_code, scope,
+                   activity_unit, requires_state, notes_citation, priority, action
+            FROM merchant_classification_rules
+            WHERE is_active = TRUE
+            ORDER BY priority DESC, created_at ASC
+            """
+        )
+        return [dict(row) for row in cur.fetchall()]
+
+
+def fetch_merchant_rules_fingerprint() -> Optional[str]:
+    """
+    Cheap change detector for the rules table: row count plus the newest
+    updated_at (bumped by the set_updated_at trigger). None if the table
+    doesn't exist.
+    """
+    with get_cursor() as cur:
+        cur.execute("SELECT to_regclass('merchant_classification_rules') IS NOT NULL AS present")
+        if not cur.fetchone()["present"]:
+            return None
+        cur.execute(
+            """
+            SELECT COUNT(*) AS n, MAX(updated_at) AS latest
+            FROM merchant_classification_rules
+            """
+        )
+        row = cur.fetchone()
+        return f"{row['n']}:{row['latest'].isoformat() if row['latest'] else ''}"
+
+
+# ---------------------------------------------------------------------------
+# Supplier → factor knowledge (migration 025)
+# ---------------------------------------------------------------------------
+
+def fetch_supplier_knowledge(keys: list[str]) -> list[dict]:
+    """
+    Knowledge rows for the nearest stored supplier key of each query key
+    (exact match first — trigram distance 0 — else the closest by pg_trgm
+    distance), one row per factor recorded for that supplier.
+    """
+    if not keys:
+        return []
+    with get_cursor() as cur:
+        cur.execute(
+            """
+            SELECT q.key AS query_key, k.supplier_key,
+                   similarity(k.supplier_key, q.key) AS similarity,
+                   s.emission_factor_id, ef.activity,
+                   s.confirmed_count, s.auto_count
+            FROM unnest(%s::text[]) AS q(key)
+            CROSS JOIN LATERAL (
+                SELECT supplier_key
+                FROM supplier_factor_knowledge
+                ORDER BY supplier_key <-> q.key
+                LIMIT 1
+            ) k
+            JOIN supplier_factor_knowledge s ON s.supplier_key = k.supplier_key
+            JOIN emission_factors ef         ON ef.id = s.emission_factor_id
+            """,
+            (list(keys),),
+        )
+        return [dict(row) for row in cur.fetchall()]
+
+
 # ---------------------------------------------------------------------------
 # Transaction persistence
 # ---------------------------------------------------------------------------
 
+# Column order shared by the VALUES template and `_upsert_params`.
+_UPSERT_TEMPLATE = """(
+    %(company_id)s, %(source)s, %(external_id)s,
+    %(transaction_date)s, %(description)s, %(supplier_name)s,
+    %(amount_aud)s, %(account_code)s, %(account_name)s,
+    %(emission_factor_id)s, %(classification_status)s,
+    %(classification_confidence)s, %(classification_notes)s,
+    NOW(), 'ai',
+    %(quantity_value)s, %(quantity_unit)s,
+    %(co2e_kg)s, %(scope)s
+)"""
+
+_UPSERT_COLUMNS = """
+        company_id, source, external_id,
+        transaction_date, description, supplier_name,
+        amount_aud, account_code, account_name,
+        emission_factor_id, classification_status,
+        classification_confidence, classification_notes,
+        classified_at, classified_by,
+        quantity_value, quantity_unit,
+        co2e_kg, scope
+"""
+
+# Shared with async_db so both paths keep identical conflict semantics.
+_UPSERT_ON_CONFLICT = """
+    ON CONFLICT (company_id, source, external_id)
+        WHERE external_id IS NOT NULL
+    DO UPDATE SET
+        emission_factor_id       = EXCLUDED.emission_factor_id,
+        classification_status    = EXCLUDED.classification_status,
+        classification_confidence= EXCLUDED.classification_confidence,
+        classification_notes     = EXCLUDED.classification_notes,
+        classified_at            = NOW(),
+        quantity_value           = EXCLUDED.quantity_value,
+        quantity_unit            = EXCLUDED.quantity_unit,
+        co2e_kg                  = EXCLUDED.co2e_kg,
+        scope                    = EXCLUDED.scope,
+        updated_at               = NOW()
+    RETURNING 1
+"""
+
+_UPSERT_SQL = f"INSERT INTO transactions ({_UPSERT_COLUMNS}) VALUES %s {_UPSERT_ON_CONFLICT}"
+
+# Rows per multi-row INSERT statement.
+UPSERT_PAGE_SIZE = int(os.environ.get("UPSERT_PAGE_SIZE", "500"))
+
+
+def _upsert_params(company_id: str, tx: dict) -> dict:
+    return {
+        "company_id":              company_id,
+        "source":                  tx.get("source", "manual"),
+        "external_id":             tx.get("external_id"),
+        "transaction_date":        tx["transaction_date"],
+        "description":             tx["description"],
+        "supplier_name":           tx.get("supplier_name"),
+        "amount_aud":              tx["amount_aud"],
+        "account_code":            tx.get("account_code"),
+        "account_name":            tx.get("account_name"),
+        "emission_factor_id":      tx.get("emission_factor_id"),
+        "classification_status":   tx["classification_status"],
+        "classification_confidence": tx.get("classification_confidence"),
+        "classification_notes":    tx.get("classification_notes"),
+        "quantity_value":          tx.get("quantity_value"),
+        "quantity_unit":           tx.get("quantity_unit"),
+        "co2e_kg":                 tx.get("co2e_kg"),
+        "scope":                   tx.get("scope"),
+    }
+
+
+def _conflict_rounds(params: list[dict]) -> list[list[dict]]:
+    """
+    Split rows so no statement touches the same (source, external_id) twice.
+
+    A multi-row INSERT ... ON CONFLICT DO UPDATE fails with "cannot affect
+    row a second time" when a key repeats. The n-th occurrence of a key goes
+    into round n, so rounds run in input order and the last occurrence still
+    wins — exactly as with one statement per row.
+    """
+    rounds: list[list[dict]] = []
+    seen: dict[tuple, int] = {}
+    for row in params:
+        if row["external_id"] is None:
+            n = 0                         # not covered by the partial unique index
+        else:
+            key = (row["source"], row["external_id"])
+            n = seen.get(key, -1) + 1
+            seen[key] = n
+        if n == len(rounds):
+            rounds.append([])
+        rounds[n].append(row)
+    return rounds
+
+
+def upsert_rows(
+    cur: psycopg2.extensions.cursor,
+    company_id: str,
+    classified: list[dict],
+    page_size: int = UPSERT_PAGE_SIZE,
+) -> int:
+    """
+    Bulk upsert on an open cursor: one multi-row INSERT per `page_size` rows.
+    Returns the number of rows inserted or updated.
+    """
+    params = [_upsert_params(company_id, tx) for tx in classified]
+    rows_affected = 0
+    for batch in _conflict_rounds(params):
+        # fetch=True collects RETURNING rows across every page; cur.rowcount
+        # would only report the last page.
+        returned = psycopg2.extras.execute_values(
+            cur, _UPSERT_SQL, batch,
+            template=_UPSERT_TEMPLATE, page_size=page_size, fetch=True,
+        )
+        rows_affected += len(returned)
+    return rows_affected
+
+
 def upsert_transactions(
     company_id: str,
     classified: list[dict],
@@ -128,69 +367,510 @@ def upsert_transactions(
     """
     Insert or update classified transactions in the database.
     Returns the number of rows affected.
+
+    Rows go out as multi-row INSERTs (UPSERT_PAGE_SIZE per statement), so
+    a 500-row batch costs one round-trip instead of 500.
     """
     if not classified:
         return 0
 
-    rows_affected = 0
     with get_cursor() as cur:
-        for tx in classified:
-            cur.execute(
-                """
-                INSERT INTO transactions (
-                    company_id, source, external_id,
-                    transaction_date, description, supplier_name,
-                    amount_aud, account_code, account_name,
-                    emission_factor_id, classification_status,
-                    classification_confidence, classification_notes,
-                    classified_at, classified_by,
-                    quantity_value, quantity_unit,
-                    co2e_kg, scope
-                )
-                VALUES (
-                    %(company_id)s, %(source)s, %(external_id)s,
-                    %(transaction_date)s, %(description)s, %(supplier_name)s,
-                    %(amount_aud)s, %(account_code)s, %(account_name)s,
-                    %(emission_factor_id)s, %(classification_status)s,
-                    %(classification_confidence)s, %(classification_notes)s,
-                    NOW(), 'ai',
-                    %(quantity_value)s, %(quantity_unit)s,
-                    %(co2e_kg)s, %(scope)s
-                )
-                ON CONFLICT (company_id, source, external_id)
-                    WHERE external_id IS NOT NULL
-                DO UPDATE SET
-                    emission_factor_id       = EXCLUDED.emission_factor_id,
-                    classification_status    = EXCLUDED.classification_status,
-                    classification_confidence= EXCLUDED.classification_confidence,
-                    classification_notes     = EXCLUDED.classification_notes,
-                    classified_at            = NOW(),
-                    quantity_value           = EXCLUDED.quantity_value,
-                    quantity_unit            = EXCLUDED.quantity_unit,
-                    co2e_kg                  = EXCLUDED.co2e_kg,
-                    scope                    = EXCLUDED.scope,
-                    updated_at               = NOW()
-                """,
-                {
-                    "company_id":              company_id,
-                    "source":                  tx.get("source", "manual"),
-                    "external_id":             tx.get("external_id"),
-                    "transaction_date":        tx["transaction_date"],
-                    "description":             tx["description"],
-                    "supplier_name":           tx.get("supplier_name"),
-                    "amount_aud":              tx["amount_aud"],
-                    "account_code":            tx.get("account_code"),
-                    "account_name":            tx.get("account_name"),
-                    "emission_factor_id":      tx.get("emission_factor_id"),
-                    "classification_status":   tx["classification_status"],
-                    "classification_confidence": tx.get("classification_confidence"),
-                    "classification_notes":    tx.get("classification_notes"),
-                    "quantity_value":          tx.get("quantity_value"),
-                    "quantity_unit":           tx.get("quantity_unit"),
-                    "co2e_kg":                 tx.get("co2e_kg"),
-                    "scope":                   tx.get("scope"),
-                },
-            )
-            rows_affected += cur.rowcount
+        return upsert_rows(cur, company_id, classified)
 
-    return rows_affected
+
+# ---------------------------------------------------------------------------
+# Emission rollups (migration 026)
+# ---------------------------------------------------------------------------
+
+ROLLUP_KEY = ("company_id", "reporting_year", "reporting_quarter", "scope", "category")
+
+ROLLUP_METRICS = (
+    "tx_count", "classified_count", "needs_review_count", "factor_not_found_count",
+    "excluded_count", "emitting_count", "co2e_kg", "scope1_co2e_kg", "scope2_co2e_kg",
+    "scope3_co2e_kg", "amount_aud", "classified_amount_aud",
+)
+
+
+def _fresh_rollup_sql(cur: psycopg2.extensions.cursor, company_id: Optional[str]) -> str:
+    """
+    The aggregate the triggers maintain, recomputed from `transactions`
+    (`emission_rollup_select()` — one definition for triggers and checks).
+    """
+    source = "SELECT t.*, 1 AS sign FROM transactions t"
+    if company_id is not None:
+        source += cur.mogrify(" WHERE t.company_id = %s", (company_id,)).decode()
+    cur.execute("SELECT emission_rollup_select(%s) AS q", (source,))
+    metrics = ", ".join(f"COALESCE({m}, 0) AS {m}" for m in ROLLUP_METRICS)
+    return f"SELECT {', '.join(ROLLUP_KEY)}, {metrics} FROM ({cur.fetchone()['q']}) fresh"
+
+
+def rollup_drift(cur: psycopg2.extensions.cursor, company_id: Optional[str] = None) -> list[dict]:
+    """
+    Rollup keys whose stored metrics differ from a fresh aggregate of
+    `transactions` — `expected_<metric>` / `stored_<metric>` per row (NULL
+    when the key is missing on that side). Empty when consistent.
+    """
+    fresh = _fresh_rollup_sql(cur, company_id)
+    stored = "SELECT * FROM emission_rollups"
+    if company_id is not None:
+        stored += cur.mogrify(" WHERE company_id = %s", (company_id,)).decode()
+    columns = ", ".join(f"f.{m} AS expected_{m}, r.{m} AS stored_{m}" for m in ROLLUP_METRICS)
+    cur.execute(
+        f"""
+        SELECT {', '.join(ROLLUP_KEY)}, {columns}
+        FROM ({fresh}) f
+        FULL OUTER JOIN ({stored}) r USING ({', '.join(ROLLUP_KEY)})
+        WHERE ({', '.join('f.' + m for m in ROLLUP_METRICS)})
+              IS DISTINCT FROM ({', '.join('r.' + m for m in ROLLUP_METRICS)})
+        ORDER BY {', '.join(ROLLUP_KEY)}
+        """
+    )
+    return [dict(row) for row in cur.fetchall()]
+
+
+def rebuild_rollup_rows(cur: psycopg2.extensions.cursor, company_id: Optional[str] = None) -> int:
+    """
+    Replace the rollup rows (one company's, or all) with a fresh aggregate.
+    Concurrent transaction writes wait on the table lock, then apply their
+    deltas on top of the rebuilt rows. Returns the number of rows written.
+    """
+    cur.execute("LOCK TABLE emission_rollups IN SHARE ROW EXCLUSIVE MODE")
+    if company_id is None:
+        cur.execute("DELETE FROM emission_rollups")
+    else:
+        cur.execute("DELETE FROM emission_rollups WHERE company_id = %s", (company_id,))
+    fresh = _fresh_rollup_sql(cur, company_id)
+    columns = ", ".join(ROLLUP_KEY + ROLLUP_METRICS)
+    cur.execute(f"INSERT INTO emission_rollups ({columns}) SELECT {columns} FROM ({fresh}) f")
+    return cur.rowcount
+
+
+def rollup_rows(
+    cur: psycopg2.extensions.cursor,
+    company_id: str,
+    reporting_year: int,
+    quarters: Optional[list[int]] = None,
+) -> list[dict]:
+    """Rollup metrics per (scope, category) for one company's financial year (or some quarters)."""
+    sums = ", ".join(f"SUM({m}) AS {m}" for m in ROLLUP_METRICS)
+    cur.execute(
+        f"""
+        SELECT scope, category, {sums}
+        FROM emission_rollups
+        WHERE company_id = %s
+          AND reporting_year = %s
+          AND (%s::smallint[] IS NULL OR reporting_quarter = ANY(%s::smallint[]))
+        GROUP BY scope, category
+        ORDER BY scope, category
+        """,
+        (company_id, reporting_year, quarters, quarters),
+    )
+    return [dict(row) for row in cur.fetchall()]
+
+
+def fetch_rollup_drift(company_id: Optional[str] = None) -> list[dict]:
+    with get_cursor() as cur:
+        return rollup_drift(cur, company_id)
+
+
+def rebuild_rollups(company_id: Optional[str] = None) -> int:
+    with get_cursor() as cur:
+        return rebuild_rollup_rows(cur, company_id)
+
+
+def fetch_rollups(
+    company_id: str,
+    reporting_year: int,
+    quarters: Optional[list[int]] = None,
+) -> list[dict]:
+    with get_cursor() as cur:
+        return rollup_rows(cur, company_id, reporting_year, quarters)
+
+
+# ---------------------------------------------------------------------------
+# Factor refresh (migration 029)
+# ---------------------------------------------------------------------------
+
+# Factors whose stored value, unit, method or scope moved away from what the
+# ledger was computed with (`emission_factor_applied`), and — for an edition
+# move — every `from_year` factor paired with its `to_year` successor (same
+# activity and state, same unit preferred). new_id is NULL for a factor the
+# new edition dropped.
+_FACTOR_CHANGES_SQL = """
+WITH edition AS (
+    SELECT DISTINCT ON (o.id) o.id AS old_id, n.id AS new_id
+    FROM emission_factors o
+    LEFT JOIN emission_factors n
+           ON n.nga_year = %(to_year)s
+          AND n.activity = o.activity
+          AND COALESCE(n.state, 'ALL') = COALESCE(o.state, 'ALL')
+    WHERE o.nga_year = %(from_year)s
+    ORDER BY o.id, (n.unit = o.unit) DESC, n.id
+),
+moves AS (
+    SELECT old_id, new_id, 'edition' AS kind FROM edition
+    UNION ALL
+    SELECT a.factor_id, a.factor_id, 'in_place'
+    FROM emission_factor_applied a
+    JOIN emission_factors ef ON ef.id = a.factor_id
+    WHERE (a.co2e_factor, a.unit, a.calculation_method, a.scope)
+          IS DISTINCT FROM (ef.co2e_factor, ef.unit, ef.calculation_method, ef.scope)
+      AND a.factor_id NOT IN (SELECT old_id FROM edition)
+)
+SELECT m.kind, m.old_id::text, m.new_id::text, o.activity, o.state,
+       COALESCE(a.co2e_factor, o.co2e_factor)               AS old_co2e_factor,
+       COALESCE(a.unit, o.unit)                             AS old_unit,
+       COALESCE(a.calculation_method, o.calculation_method) AS old_method,
+       n.co2e_factor, n.unit, n.calculation_method, n.scope, n.category
+FROM moves m
+JOIN emission_factors o              ON o.id = m.old_id
+LEFT JOIN emission_factor_applied a  ON a.factor_id = m.old_id
+LEFT JOIN emission_factors n         ON n.id = m.new_id
+ORDER BY m.kind, o.activity, m.old_id
+"""
+
+# Rows a refresh may rewrite: computed (co2e_kg set), not locked to a report.
+_REFRESHABLE = """
+    t.co2e_kg IS NOT NULL AND t.report_id IS NULL
+    AND (%(since)s::date IS NULL OR t.transaction_date >= %(since)s::date)
+"""
+
+# Same unit, same method: co2e = stored quantity × new factor, in SQL.
+_RECOMPUTE_SQL = f"""
+WITH m AS (
+    SELECT * FROM unnest(%(old_ids)s::uuid[], %(new_ids)s::uuid[], %(co2e_factors)s::numeric[],
+                         %(scopes)s::smallint[], %(units)s::text[])
+        AS m(old_id, new_id, co2e_factor, scope, unit)
+)
+UPDATE transactions t
+   SET emission_factor_id = m.new_id,
+       co2e_kg            = ROUND(t.quantity_value * m.co2e_factor, 4),
+       scope              = m.scope,
+       updated_at         = NOW()
+  FROM m
+ WHERE t.company_id = %(company_id)s
+   AND t.emission_factor_id = m.old_id
+   AND t.quantity_value IS NOT NULL
+   AND t.quantity_unit IN (m.unit, 'AUD')
+   AND {_REFRESHABLE}
+"""
+
+# Everything else under the changed factors, one keyset page at a time.
+_RECALCULATE_ROWS_SQL = f"""
+WITH m AS (
+    SELECT * FROM unnest(%(old_ids)s::uuid[], %(new_ids)s::uuid[], %(arithmetic)s::boolean[],
+                         %(units)s::text[])
+        AS m(old_id, new_id, arithmetic, unit)
+)
+SELECT t.id::text, m.new_id::text AS factor_id, t.description, t.amount_aud,
+       t.quantity_value, t.quantity_unit
+FROM transactions t
+JOIN m ON t.emission_factor_id = m.old_id
+WHERE t.company_id = %(company_id)s
+  AND {_REFRESHABLE}
+  AND NOT (m.arithmetic AND t.quantity_value IS NOT NULL AND t.quantity_unit IN (m.unit, 'AUD'))
+  AND t.id > %(after)s::uuid
+ORDER BY t.id
+LIMIT %(limit)s
+"""
+
+_WRITE_RECALCULATED_SQL = """
+UPDATE transactions t
+   SET emission_factor_id = u.factor_id,
+       co2e_kg            = u.co2e_kg,
+       scope              = u.scope,
+       quantity_value     = u.quantity_value,
+       quantity_unit      = u.quantity_unit,
+       updated_at         = NOW()
+  FROM unnest(%s::uuid[], %s::uuid[], %s::numeric[], %s::smallint[], %s::numeric[], %s::text[])
+       AS u(id, factor_id, co2e_kg, scope, quantity_value, quantity_unit)
+ WHERE t.id = u.id
+"""
+
+
+def factor_changes(
+    cur: psycopg2.extensions.cursor,
+    from_year: Optional[int] = None,
+    to_year: Optional[int] = None,
+) -> list[dict]:
+    """
+    The factor diff a refresh has to apply: kind ('in_place' | 'edition'),
+    old_id → new_id, the old and new co2e_factor / unit / method, and the
+    new factor's scope and category.
+    """
+    cur.execute(_FACTOR_CHANGES_SQL, {"from_year": from_year, "to_year": to_year})
+    return [dict(row) for row in cur.fetchall()]
+
+
+def factor_change_counts(
+    cur: psycopg2.extensions.cursor,
+    factor_ids: list[str],
+    since: Optional[date] = None,
+    company_id: Optional[str] = None,
+) -> dict[str, dict]:
+    """Computed rows per factor: how many a refresh would rewrite, how many are locked."""
+    cur.execute(
+        """
+        SELECT t.emission_factor_id::text AS factor_id,
+               COUNT(*) FILTER (WHERE t.report_id IS NULL)     AS refreshable,
+               COUNT(*) FILTER (WHERE t.report_id IS NOT NULL) AS locked
+        FROM transactions t
+        WHERE t.emission_factor_id = ANY(%(ids)s::uuid[])
+          AND t.co2e_kg IS NOT NULL
+          AND (%(since)s::date IS NULL OR t.transaction_date >= %(since)s::date)
+          AND (%(company_id)s::uuid IS NULL OR t.company_id = %(company_id)s::uuid)
+        GROUP BY t.emission_factor_id
+        """,
+        {"ids": factor_ids, "since": since, "company_id": company_id},
+    )
+    return {row["factor_id"]: dict(row) for row in cur.fetchall()}
+
+
+def refresh_companies(
+    cur: psycopg2.extensions.cursor,
+    factor_ids: list[str],
+    since: Optional[date] = None,
+) -> list[str]:
+    """Companies with refreshable rows under any of these factors."""
+    cur.execute(
+        f"""
+        SELECT DISTINCT t.company_id::text
+        FROM transactions t
+        WHERE t.emission_factor_id = ANY(%(ids)s::uuid[]) AND {_REFRESHABLE}
+        ORDER BY 1
+        """,
+        {"ids": factor_ids, "since": since},
+    )
+    return [row["company_id"] for row in cur.fetchall()]
+
+
+def recompute_co2e(
+    cur: psycopg2.extensions.cursor,
+    company_id: str,
+    changes: list[dict],
+    since: Optional[date] = None,
+) -> int:
+    """
+    One UPDATE for a company's rows under factors whose unit and method did
+    not change: co2e_kg = ROUND(quantity_value × new co2e_factor, 4) — the
+    stored quantity is already in the factor's unit (or AUD). Returns the
+    number of rows rewritten.
+    """
+    if not changes:
+        return 0
+    cur.execute(_RECOMPUTE_SQL, {
+        "company_id":   company_id,
+        "since":        since,
+        "old_ids":      [c["old_id"] for c in changes],
+        "new_ids":      [c["new_id"] for c in changes],
+        "co2e_factors": [c["co2e_factor"] for c in changes],
+        "scopes":       [c["scope"] for c in changes],
+        "units":        [c["unit"] for c in changes],
+    })
+    return cur.rowcount
+
+
+def recalculation_rows(
+    cur: psycopg2.extensions.cursor,
+    company_id: str,
+    changes: list[dict],
+    arithmetic: list[bool],
+    since: Optional[date] = None,
+    after: str = "00000000-0000-0000-0000-000000000000",
+    limit: int = 5_000,
+) -> list[dict]:
+    """
+    A page (ids after `after`) of the company's rows `recompute_co2e` cannot
+    handle: unit or method changed, or a stored quantity in another unit.
+    Each row carries its new factor_id.
+    """
+    cur.execute(_RECALCULATE_ROWS_SQL, {
+        "company_id": company_id,
+        "since":      since,
+        "after":      after,
+        "limit":      limit,
+        "old_ids":    [c["old_id"] for c in changes],
+        "new_ids":    [c["new_id"] for c in changes],
+        "arithmetic": arithmetic,
+        "units":      [c["unit"] for c in changes],
+    })
+    return [dict(row) for row in cur.fetchall()]
+
+
+def write_recalculated(cur: psycopg2.extensions.cursor, rows: list[dict]) -> int:
+    """Store recalculated factor, CO2e, scope and quantity for many rows in one UPDATE."""
+    if not rows:
+        return 0
+    columns = ("id", "factor_id", "co2e_kg", "scope", "quantity_value", "quantity_unit")
+    cur.execute(_WRITE_RECALCULATED_SQL, [[row[c] for row in rows] for c in columns])
+    return cur.rowcount
+
+
+def record_applied_factors(cur: psycopg2.extensions.cursor, factor_ids: list[str]) -> int:
+    """Advance `emission_factor_applied` to the current values of these factors."""
+    cur.execute(
+        """
+        UPDATE emission_factor_applied a
+           SET co2e_factor        = ef.co2e_factor,
+               unit               = ef.unit,
+               calculation_method = ef.calculation_method,
+               scope              = ef.scope,
+               recorded_at        = NOW()
+          FROM emission_factors ef
+         WHERE ef.id = a.factor_id
+           AND a.factor_id = ANY(%s::uuid[])
+        """,
+        (factor_ids,),
+    )
+    return cur.rowcount
+
+
+# ---------------------------------------------------------------------------
+# Analysis jobs (migration 024) — worker side
+# ---------------------------------------------------------------------------
+
+def claim_analysis_job(worker_id: str, lease_seconds: float) -> Optional[dict]:
+    """
+    Claim the oldest queued job, or a running one whose lease expired (its
+    worker died). SKIP LOCKED lets several workers poll without blocking.
+    """
+    with get_cursor() as cur:
+        cur.execute(
+            """
+            UPDATE analysis_jobs
+               SET status       = 'running',
+                   locked_by    = %s,
+                   heartbeat_at = NOW(),
+                   attempts     = attempts + 1
+             WHERE id = (
+                SELECT id FROM analysis_jobs
+                 WHERE status IN ('queued', 'running')
+                   AND (status = 'queued'
+                        OR heartbeat_at < NOW() - make_interval(secs => %s))
+                 ORDER BY created_at
+                 FOR UPDATE SKIP LOCKED
+                 LIMIT 1
+             )
+            RETURNING id, company_id, nga_year, state, total_transactions,
+                      processed_transactions, chunk_size, next_seq,
+                      aggregate, attempts
+            """,
+            (worker_id, lease_seconds),
+        )
+        row = cur.fetchone()
+        return dict(row) if row else None
+
+
+def fetch_analysis_job_items(job_id: str, start_seq: int, limit: int) -> list[dict]:
+    """Staged input rows [start_seq, start_seq + limit) in order."""
+    with get_cursor() as cur:
+        cur.execute(
+            """
+            SELECT seq, payload
+            FROM analysis_job_items
+            WHERE job_id = %s AND seq >= %s
+            ORDER BY seq
+            LIMIT %s
+            """,
+            (job_id, start_seq, limit),
+        )
+        return [dict(row) for row in cur.fetchall()]
+
+
+def commit_analysis_job_chunk(
+    job_id: str,
+    worker_id: str,
+    company_id: str,
+    start_seq: int,
+    enriched: list[dict],
+    results: list[dict],
+    aggregate_state: dict,
+) -> bool:
+    """
+    Persist one processed chunk atomically: transaction upserts, per-item
+    results and the job's progress cursor / running aggregate. Returns
+    False (and writes nothing) if this worker no longer holds the job or
+    the chunk was already committed.
+    """
+    with get_cursor() as cur:
+        cur.execute(
+            """
+            SELECT next_seq FROM analysis_jobs
+            WHERE id = %s AND locked_by = %s AND status = 'running'
+            FOR UPDATE
+            """,
+            (job_id, worker_id),
+        )
+        row = cur.fetchone()
+        if not row or row["next_seq"] != start_seq:
+            return False
+
+        upsert_rows(cur, company_id, enriched)
+        psycopg2.extras.execute_values(
+            cur,
+            """
+            UPDATE analysis_job_items AS i
+               SET result = v.result
+              FROM (VALUES %s) AS v (job_id, seq, result)
+             WHERE i.job_id = v.job_id AND i.seq = v.seq
+            """,
+            [
+                (job_id, start_seq + n, psycopg2.extras.Json(result))
+                for n, result in enumerate(results)
+            ],
+            template="(%s::uuid, %s, %s::jsonb)",
+        )
+        cur.execute(
+            """
+            UPDATE analysis_jobs
+               SET next_seq               = %s,
+                   processed_transactions = %s,
+                   aggregate              = %s,
+                   heartbeat_at           = NOW()
+             WHERE id = %s
+            """,
+            (
+                start_seq + len(results),
+                aggregate_state["total_transactions"],
+                psycopg2.extras.Json(aggregate_state),
+                job_id,
+            ),
+        )
+        return True
+
+
+def finish_analysis_job(job_id: str, worker_id: str, summary: dict) -> None:
+    with get_cursor() as cur:
+        cur.execute(
+            """
+            UPDATE analysis_jobs
+               SET status       = 'completed',
+                   summary      = %s,
+                   error        = NULL,
+                   locked_by    = NULL,
+                   completed_at = NOW()
+             WHERE id = %s AND locked_by = %s
+            """,
+            (psycopg2.extras.Json(summary), job_id, worker_id),
+        )
+
+
+def release_analysis_job(
+    job_id: str,
+    worker_id: str,
+    error: Optional[str] = None,
+    failed: bool = False,
+) -> None:
+    """Hand a job back to the queue (to resume later) or mark it failed."""
+    with get_cursor() as cur:
+        cur.execute(
+            """
+            UPDATE analysis_jobs
+               SET status       = %s,
+                   error        = %s,
+                   locked_by    = NULL,
+                   heartbeat_at = NULL
+             WHERE id = %s AND locked_by = %s
+            """,
+            ("failed" if failed else "queued", error, job_id, worker_id),
+        )
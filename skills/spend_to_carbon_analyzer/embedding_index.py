@@ -0,0 +1,134 @@
+"""
+EcoLink Australia — Offline nearest-factor classifier (hashed n-gram embeddings).
+
+Keyword misses used to go straight to Groq / Gemini. This index answers most
+of them locally: every factor's document (activity, category, subcategory,
+match_keywords — the text BM25 retrieval ranks on) and every transaction
+(description, supplier, account) is embedded into the same vector space,
+and the transaction is matched to its nearest factor by cosine similarity.
+
+Embedding (no model download, no network):
+  - features: word tokens plus character 3-grams of each word ("<die",
+    "die", "ies", "ese", "sel", "el>"), so "unleaded" still lands near
+    "petrol unleaded" and typos or abbreviations keep partial overlap;
+  - each feature is hashed (crc32) into EMBEDDING_DIM buckets with a
+    hash-derived sign, weighted 1 + log(tf) × idf (idf from the factor
+    documents), and the vector is L2-normalised.
+
+The factor vectors form one precomputed matrix per factor set, so a lookup
+is a single matrix-vector product (NumPy) or a walk over the query's
+postings (pure-Python fallback). `nearest` returns the best factor, its
+cosine score and its margin over the runner-up; the classifier accepts
+only high-score, clear-margin matches and sends the rest to the LLM.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import zlib
+from collections import Counter, defaultdict
+from math import log, sqrt
+from typing import NamedTuple, Optional
+
+from .retrieval import _factor_document, _transaction_query
+
+try:  # optional — dense matrix-vector product
+    import numpy as np
+except ImportError:  # pragma: no cover — exercised where NumPy is absent
+    np = None
+
+EMBEDDING_DIM = int(os.environ.get("EMBEDDING_DIM", "4096"))
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+class NearestFactor(NamedTuple):
+    factor: dict
+    score:  float       # cosine similarity of the best factor
+    margin: float       # best score − runner-up score
+
+
+def _features(text: str) -> Counter:
+    """Word tokens and boundary-marked character 3-grams of `text`."""
+    features: Counter = Counter()
+    for word in _WORD_RE.findall(text.lower()):
+        features["w:" + word] += 1
+        marked = f"<{word}>"
+        for i in range(len(marked) - 2):
+            features[marked[i:i + 3]] += 1
+    return features
+
+
+def _bucket(feature: str, dim: int) -> tuple[int, float]:
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, (1.0 if h & 0x80000000 else -1.0)
+
+
+class EmbeddingIndex:
+    """Hashed n-gram embeddings of one factor set, for nearest-factor lookups."""
+
+    def __init__(self, factors: list[dict], dim: int = EMBEDDING_DIM) -> None:
+        self.factors = factors
+        self.dim     = dim
+
+        docs = [_features(_factor_document(f)) for f in factors]
+        n  = len(docs)
+        df = Counter(feature for d in docs for feature in d)
+        self._idf = {feature: log((n + 1) / (freq + 1)) + 1.0 for feature, freq in df.items()}
+        # Features no factor uses still count towards the query's norm.
+        self._unseen_idf = log(n + 1) + 1.0
+
+        vectors = [self._embed(doc) for doc in docs]
+        self._matrix = self._postings = None
+        if np is not None:
+            # bucket-major, so a query only gathers the rows of its own buckets
+            matrix = np.zeros((dim, n), dtype=np.float64)
+            for fi, vec in enumerate(vectors):
+                for b, w in vec.items():
+                    matrix[b, fi] = w
+            self._matrix = matrix
+        else:
+            postings: dict[int, list[tuple[int, float]]] = defaultdict(list)
+            for fi, vec in enumerate(vectors):
+                for b, w in vec.items():
+                    postings[b].append((fi, w))
+            self._postings = dict(postings)
+
+    def __len__(self) -> int:
+        return len(self.factors)
+
+    def _embed(self, features: Counter) -> dict[int, float]:
+        vec: dict[int, float] = defaultdict(float)
+        idf, unseen = self._idf, self._unseen_idf
+        for feature, tf in features.items():
+            b, sign = _bucket(feature, self.dim)
+            vec[b] += sign * (1.0 + log(tf)) * idf.get(feature, unseen)
+        norm = sqrt(sum(w * w for w in vec.values()))
+        return {b: w / norm for b, w in vec.items() if w} if norm else {}
+
+    def _scores(self, vec: dict[int, float]) -> list[float]:
+        if self._matrix is not None:
+            buckets = np.fromiter(vec.keys(), dtype=np.intp, count=len(vec))
+            weights = np.fromiter(vec.values(), dtype=np.float64, count=len(vec))
+            return (weights @ self._matrix[buckets]).tolist()
+        scores = [0.0] * len(self.factors)
+        for b, w in vec.items():
+            for fi, fw in self._postings.get(b, ()):
+                scores[fi] += fw * w
+        return scores
+
+    def nearest(self, transaction: dict) -> Optional[NearestFactor]:
+        """Best factor by cosine similarity, or None if nothing overlaps at all."""
+        if not self.factors:
+            return None
+        vec = self._embed(_features(_transaction_query(transaction)))
+        if not vec:
+            return None
+        scores = self._scores(vec)
+        # First factor wins ties, as in the keyword index.
+        best = max(range(len(scores)), key=scores.__getitem__)
+        if scores[best] <= 0.0:
+            return None
+        runner_up = max((s for i, s in enumerate(scores) if i != best), default=0.0)
+        return NearestFactor(self.factors[best], scores[best], scores[best] - max(runner_up, 0.0))
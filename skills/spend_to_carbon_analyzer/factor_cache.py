@@ -0,0 +1,303 @@
+"""
+EcoLink Australia — Process-local emission-factor cache.
+
+NGA factors change about once a year, yet every /analyse and /factors call
+used to run `fetch_all_factors` against Postgres and rebuild the row dicts.
+This cache keeps each (nga_year, state) factor set decoded into compact,
+immutable `EmissionFactor` objects and serves it without a DB round-trip.
+
+Invalidation (migration 023):
+  - Version stamp: at most every FACTOR_CACHE_CHECK_SECONDS the cache reads
+    `emission_factor_version`; a changed stamp drops every cached set.
+  - LISTEN/NOTIFY: with FACTOR_CACHE_LISTEN=1 a background thread listens
+    on `emission_factors_changed` and invalidates immediately.
+  - Without migration 023, entries simply expire after FACTOR_CACHE_MAX_AGE.
+
+Every invalidation bumps a generation counter. A load notes the generation
+before it queries and discards its result if an invalidation landed while
+it ran, so a slow load cannot re-cache the set a NOTIFY just dropped.
+
+`warm_up()` preloads every current edition at application startup.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import select
+import threading
+import time
+from collections.abc import Mapping
+from typing import Iterator, Optional
+
+from . import async_db
+from .db import DB_SSLMODE, fetch_all_factors, fetch_current_editions, fetch_factor_version
+
+logger = logging.getLogger("ecolink.factor_cache")
+
+FACTOR_CACHE_CHECK_SECONDS = float(os.environ.get("FACTOR_CACHE_CHECK_SECONDS", "30"))
+FACTOR_CACHE_MAX_AGE       = float(os.environ.get("FACTOR_CACHE_MAX_AGE", "3600"))
+FACTOR_CACHE_LISTEN        = os.environ.get("FACTOR_CACHE_LISTEN", "").lower() in ("1", "true", "yes")
+
+NOTIFY_CHANNEL = "emission_factors_changed"
+
+
+# ---------------------------------------------------------------------------
+# Decoded factor row
+# ---------------------------------------------------------------------------
+
+class EmissionFactor(Mapping):
+    """
+    Immutable, slot-based emission factor.
+
+    Implements the read-only Mapping protocol so existing code that reads
+    factors as dicts (`f["unit"]`, `f.get("match_keywords")`) keeps working.
+    """
+
+    __slots__ = (
+        "id", "nga_year", "scope", "category", "subcategory", "activity",
+        "unit", "calculation_method", "co2e_factor", "match_keywords",
+        "state", "state_specific", "source_table",
+    )
+
+    def __init__(self, row: dict, nga_year: int) -> None:
+        values = {
+            "id":                 str(row["id"]),
+            "nga_year":           row.get("nga_year", nga_year),
+            "scope":              int(row["scope"]),
+            "category":           row["category"],
+            "subcategory":        row.get("subcategory"),
+            "activity":           row["activity"],
+            "unit":               row["unit"],
+            "calculation_method": row["calculation_method"],
+            "co2e_factor":        float(row["co2e_factor"]),
+            "match_keywords":     tuple(row.get("match_keywords") or ()),
+            "state":              row.get("state"),
+            "state_specific":     bool(row.get("state_specific")),
+            "source_table":       row.get("source_table"),
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError("EmissionFactor is immutable")
+
+    def __getitem__(self, key: str) -> object:
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"EmissionFactor({self.activity!r}, {self.co2e_factor} kg CO2e/{self.unit})"
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+class FactorCache:
+    """Thread-safe cache of decoded factor sets keyed by (nga_year, state)."""
+
+    def __init__(
+        self,
+        check_seconds: float = FACTOR_CACHE_CHECK_SECONDS,
+        max_age: float = FACTOR_CACHE_MAX_AGE,
+    ) -> None:
+        self.check_seconds = check_seconds
+        self.max_age       = max_age
+        self._sets: dict[tuple[int, Optional[str]], tuple[float, tuple[EmissionFactor, ...]]] = {}
+        self._lock         = threading.Lock()
+        self._version: Optional[int] = None
+        self._checked_at   = 0.0
+        self._generation   = 0
+        self.hits          = 0
+        self.loads         = 0
+        self.invalidations = 0
+
+    def get(self, nga_year: int, state: Optional[str] = None) -> tuple[EmissionFactor, ...]:
+        """
+        Return the factor set for (nga_year, state), loading it on a miss.
+        Raises whatever `fetch_all_factors` raises when the DB is unavailable.
+        """
+        self._check_version()
+        key = (nga_year, state)
+        now = time.monotonic()
+        cached = self._lookup(key, now)
+        if cached is not None:
+            return cached
+        generation = self._generation
+        return self._store(key, now, nga_year, fetch_all_factors(nga_year, state), generation)
+
+    async def aget(self, nga_year: int, state: Optional[str] = None) -> tuple[EmissionFactor, ...]:
+        """`get` for async endpoints — version check and loads go through asyncpg."""
+        if self._version_check_due():
+            try:
+                self.observe_version(await async_db.fetch_factor_version())
+            except Exception as exc:
+                logger.warning("Emission factor version check failed: %s", exc)
+        key = (nga_year, state)
+        now = time.monotonic()
+        cached = self._lookup(key, now)
+        if cached is not None:
+            return cached
+        generation = self._generation
+        return self._store(key, now, nga_year, await async_db.fetch_all_factors(nga_year, state), generation)
+
+    def _lookup(self, key: tuple, now: float) -> Optional[tuple[EmissionFactor, ...]]:
+        with self._lock:
+            entry = self._sets.get(key)
+            if entry and now - entry[0] < self.max_age:
+                self.hits += 1
+                return entry[1]
+        return None
+
+    def _store(
+        self, key: tuple, now: float, nga_year: int, rows: list[dict], generation: int,
+    ) -> tuple[EmissionFactor, ...]:
+        factors = tuple(EmissionFactor(row, nga_year) for row in rows)
+        with self._lock:
+            # Don't cache empty sets — the seed may simply not have run yet —
+            # nor a set loaded before an invalidation that landed mid-load.
+            if factors and generation == self._generation:
+                self._sets[key] = (now, factors)
+            self.loads += 1
+        return factors
+
+    def invalidate(self, reason: str = "manual") -> None:
+        with self._lock:
+            self._sets.clear()
+            self._generation   += 1
+            self.invalidations += 1
+        logger.info("Emission factor cache invalidated (%s).", reason)
+
+    def warm_up(self) -> int:
+        """Preload every current NGA edition. Returns the number of sets loaded."""
+        self._check_version(force=True)
+        loaded = 0
+        for nga_year, state in fetch_current_editions():
+            self.get(nga_year, state)
+            loaded += 1
+        logger.info("Emission factor cache warmed: %d factor sets.", loaded)
+        return loaded
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "factor_sets":   len(self._sets),
+                "version":       self._version,
+                "hits":          self.hits,
+                "loads":         self.loads,
+                "invalidations": self.invalidations,
+            }
+
+    # ── Version stamp ────────────────────────────────────────────────────────
+
+    def _version_check_due(self, force: bool = False) -> bool:
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_seconds:
+            return False
+        self._checked_at = now
+        return True
+
+    def _check_version(self, force: bool = False) -> None:
+        if not self._version_check_due(force):
+            return
+        try:
+            version = fetch_factor_version()
+        except Exception as exc:
+            logger.warning("Emission factor version check failed: %s", exc)
+            return
+        self.observe_version(version)
+
+    def observe_version(self, version: Optional[int]) -> None:
+        """Record a version stamp (from a query or a NOTIFY payload)."""
+        if version is None:
+            return
+        with self._lock:
+            changed  = self._version is not None and version != self._version
+            previous = self._version
+            self._version = version
+        if changed:
+            self.invalidate(f"version {previous} → {version}")
+
+
+factor_cache = FactorCache()
+
+
+def get_factors(nga_year: int, state: Optional[str] = None) -> tuple[EmissionFactor, ...]:
+    """Cached replacement for `db.fetch_all_factors`."""
+    return factor_cache.get(nga_year, state)
+
+
+async def aget_factors(nga_year: int, state: Optional[str] = None) -> tuple[EmissionFactor, ...]:
+    """Cached replacement for `async_db.fetch_all_factors`."""
+    return await factor_cache.aget(nga_year, state)
+
+
+# ---------------------------------------------------------------------------
+# LISTEN/NOTIFY invalidation
+# ---------------------------------------------------------------------------
+
+class _FactorChangeListener(threading.Thread):
+    """Background LISTEN on `emission_factors_changed`; reconnects on failure."""
+
+    def __init__(self, cache: FactorCache) -> None:
+        super().__init__(name="factor-cache-listen", daemon=True)
+        self.cache = cache
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self) -> None:
+        import psycopg2  # lazy import — only needed when listening
+
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(os.environ["DATABASE_URL"], sslmode=DB_SSLMODE)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                logger.info("Listening for emission factor changes on '%s'.", NOTIFY_CHANNEL)
+
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        note = conn.notifies.pop(0)
+                        try:
+                            self.cache.observe_version(int(note.payload))
+                        except ValueError:
+                            self.cache.invalidate("notify")
+            except Exception as exc:
+                logger.warning("Emission factor listener error: %s — retrying in 10s", exc)
+                self._stop.wait(10)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+_listener: Optional[_FactorChangeListener] = None
+
+
+def start_listener() -> None:
+    global _listener
+    if FACTOR_CACHE_LISTEN and _listener is None and os.environ.get("DATABASE_URL"):
+        _listener = _FactorChangeListener(factor_cache)
+        _listener.start()
+
+
+def stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,214 @@
+"""
+EcoLink Australia — Columnar emission-factor registry.
+
+A factor set (the tuple `factor_cache` serves, or any list of factor dicts)
+is indexed once into a `FactorRegistry`:
+
+  - a hash index by UUID, replacing the linear `str(f["id"]) == factor_id`
+    scans the classifier used to run for every LLM verdict and cache hit;
+  - secondary indexes by (scope, category), by scope and by unit, for the
+    /factors filter and the merchant-rule factor picker;
+  - array-backed columns (co2e_factor, scope, calculation method code) read
+    by the batch calculator without touching the factor objects;
+  - one `EmissionFactorSummary` (and one JSON-ready summary dict for the
+    fast response path) per factor, built on first use and shared by every
+    result row that matched it, instead of a new model per row.
+
+Registries for immutable sets (tuples) are memoised by identity, so each
+cached (nga_year, state) set is indexed exactly once per process.
+"""
+
+from __future__ import annotations
+
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional, Sequence
+from uuid import UUID
+
+from .models import CalculationMethod, EmissionFactorSummary
+
+# calculation_method codes stored in the `method` column
+ACTIVITY_BASED, SPEND_BASED, UNKNOWN_METHOD = range(3)
+
+_MEMO: "OrderedDict[int, tuple[tuple, FactorRegistry]]" = OrderedDict()
+_MEMO_SIZE = 32
+_MEMO_LOCK = threading.Lock()
+
+
+def method_code(method: Optional[str]) -> int:
+    """Column code for a factor's calculation_method (missing → spend_based)."""
+    method = method or "spend_based"
+    if method == "activity_based":
+        return ACTIVITY_BASED
+    if method in ("spend_based", "hybrid"):
+        return SPEND_BASED
+    return UNKNOWN_METHOD
+
+
+class FactorRegistry:
+    """Immutable index over one factor set. Positions follow the set's order."""
+
+    __slots__ = (
+        "factors", "ids", "co2e_factor", "scope", "method", "unit", "category",
+        "_by_id", "_by_object", "_by_scope", "_by_scope_category", "_by_unit",
+        "_summaries", "_summary_rows", "_lock",
+    )
+
+    def __init__(self, factors: Iterable) -> None:
+        self.factors: tuple = tuple(factors)
+        self.ids:         tuple[str, ...] = tuple(str(f["id"]) for f in self.factors)
+        self.co2e_factor = array("d", (float(f["co2e_factor"]) for f in self.factors))
+        self.scope       = array("b", (int(f["scope"]) for f in self.factors))
+        self.method      = array("b", (method_code(f.get("calculation_method")) for f in self.factors))
+        self.unit:        tuple[str, ...] = tuple(f["unit"] for f in self.factors)
+        self.category:    tuple = tuple(f.get("category", "Uncategorised") for f in self.factors)
+
+        # First occurrence wins, like the linear scan it replaces.
+        self._by_id: dict[str, int] = {}
+        for i, factor_id in enumerate(self.ids):
+            self._by_id.setdefault(factor_id, i)
+        self._by_object: dict[int, int] = {id(f): i for i, f in enumerate(self.factors)}
+
+        by_scope: dict[int, list[int]] = {}
+        by_scope_category: dict[tuple, list[int]] = {}
+        by_unit: dict[str, list[int]] = {}
+        for i in range(len(self.factors)):
+            by_scope.setdefault(self.scope[i], []).append(i)
+            by_scope_category.setdefault((self.scope[i], self.category[i]), []).append(i)
+            by_unit.setdefault(self.unit[i], []).append(i)
+        self._by_scope          = {k: tuple(v) for k, v in by_scope.items()}
+        self._by_scope_category = {k: tuple(v) for k, v in by_scope_category.items()}
+        self._by_unit           = {k: tuple(v) for k, v in by_unit.items()}
+
+        self._summaries:    dict[tuple[int, int], EmissionFactorSummary] = {}
+        self._summary_rows: dict[tuple[int, int], dict] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.factors)
+
+    # ── Lookups ──────────────────────────────────────────────────────────────
+
+    def get(self, factor_id: object) -> Optional[dict]:
+        """The factor with this UUID, or None."""
+        i = self._by_id.get(str(factor_id))
+        return self.factors[i] if i is not None else None
+
+    def position(self, factor: object) -> Optional[int]:
+        """Position of this factor object in the set (identity, not equality)."""
+        return self._by_object.get(id(factor))
+
+    def positions(self, factors: Sequence) -> Optional[list[int]]:
+        """
+        Position of every factor (-1 for None), or None if any of them is
+        not an object of this set.
+        """
+        by_object = self._by_object
+        out = [-1] * len(factors)
+        for i, factor in enumerate(factors):
+            if factor is not None:
+                pos = by_object.get(id(factor))
+                if pos is None:
+                    return None
+                out[i] = pos
+        return out
+
+    def select(
+        self,
+        scope: Optional[int] = None,
+        category: Optional[str] = None,
+        unit: Optional[str] = None,
+    ) -> list:
+        """Factors matching every given filter, in set order."""
+        if scope is not None and category is not None:
+            candidates: Sequence[int] = self._by_scope_category.get((scope, category), ())
+        elif scope is not None:
+            candidates = self._by_scope.get(scope, ())
+        elif unit is not None:
+            candidates = self._by_unit.get(unit, ())
+        else:
+            candidates = range(len(self.factors))
+        return [
+            self.factors[i] for i in candidates
+            if (category is None or self.category[i] == category)
+            and (unit is None or self.unit[i] == unit)
+        ]
+
+    # ── Response models ──────────────────────────────────────────────────────
+
+    def summary(self, factor: dict, nga_year: int) -> EmissionFactorSummary:
+        """
+        The result-row snapshot of `factor`, shared by every row that matched
+        it. Factors from outside the set get a fresh, unshared snapshot.
+        """
+        return self._shared(self._summaries, factor_summary, factor, nga_year)
+
+    def summary_row(self, factor: dict, nga_year: int) -> dict:
+        """`summary(...).model_dump(mode="json")`, shared the same way. Read-only."""
+        return self._shared(self._summary_rows, factor_summary_row, factor, nga_year)
+
+    def _shared(self, memo: dict, build: Callable, factor: dict, nga_year: int):
+        i = self._by_object.get(id(factor))
+        if i is None:
+            return build(factor, nga_year)
+        key = (i, nga_year)
+        value = memo.get(key)
+        if value is None:
+            with self._lock:
+                value = memo.setdefault(key, build(factor, nga_year))
+        return value
+
+
+def factor_summary(factor: dict, nga_year: int) -> EmissionFactorSummary:
+    """Result-row snapshot of a factor; `nga_year` is used when the row has none."""
+    return EmissionFactorSummary(
+        factor_id   = factor["id"],
+        activity    = factor["activity"],
+        category    = factor["category"],
+        scope       = factor["scope"],
+        unit        = factor["unit"],
+        co2e_factor = float(factor["co2e_factor"]),
+        nga_year    = factor.get("nga_year", nga_year),
+        method      = factor.get("calculation_method", "spend_based"),
+    )
+
+
+def factor_summary_row(factor: dict, nga_year: int) -> dict:
+    """
+    `factor_summary(...).model_dump(mode="json")` built directly — the same
+    coercions (UUID, enum, float), without constructing the model.
+    """
+    return {
+        "factor_id":   str(UUID(str(factor["id"]))),
+        "activity":    factor["activity"],
+        "category":    factor["category"],
+        "scope":       int(factor["scope"]),
+        "unit":        factor["unit"],
+        "co2e_factor": float(factor["co2e_factor"]),
+        "nga_year":    int(factor.get("nga_year", nga_year)),
+        "method":      CalculationMethod(factor.get("calculation_method", "spend_based")).value,
+    }
+
+
+def registry_for(factors: Sequence) -> FactorRegistry:
+    """
+    Registry for a factor set. Tuples (immutable, as served by factor_cache)
+    are indexed once and memoised by identity; other sequences are indexed
+    on every call.
+    """
+    if not isinstance(factors, tuple):
+        return FactorRegistry(factors)
+
+    with _MEMO_LOCK:
+        memo = _MEMO.get(id(factors))
+        if memo and memo[0] is factors:
+            _MEMO.move_to_end(id(factors))
+            return memo[1]
+
+    registry = FactorRegistry(factors)
+    with _MEMO_LOCK:
+        _MEMO[id(factors)] = (factors, registry)
+        while len(_MEMO) > _MEMO_SIZE:
+            _MEMO.popitem(last=False)
+    return registry
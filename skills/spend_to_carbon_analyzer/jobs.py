@@ -0,0 +1,178 @@
+"""
+EcoLink Australia — Background workers for analysis jobs.
+
+POST /analyse/jobs stages a ledger in the Postgres queue (migration 024)
+and returns at once. A pool of worker threads claims jobs and runs them
+through the same pipeline as /analyse (`classify_batch` → `calculate_batch`),
+ANALYSIS_JOB_CHUNK_SIZE transactions at a time.
+
+Each chunk's transaction upserts, per-item results, progress cursor and
+running aggregate commit in one DB transaction (`commit_analysis_job_chunk`).
+A restarted or crashed worker therefore resumes from the last committed
+chunk:
+  - clean shutdown → the job is handed back to the queue immediately;
+  - crash → its lease (heartbeat_at) expires after ANALYSIS_JOB_LEASE_SECONDS
+    and another worker picks it up.
+
+A job that keeps failing is marked 'failed' after ANALYSIS_JOB_MAX_ATTEMPTS.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import uuid
+from typing import Optional
+
+from .calculator import RunningAggregate
+from .db import (
+    claim_analysis_job,
+    commit_analysis_job_chunk,
+    fetch_analysis_job_items,
+    finish_analysis_job,
+    release_analysis_job,
+)
+from .factor_cache import get_factors
+from .factor_registry import registry_for
+from .models import AnalyseStreamSummary, TransactionInput
+from .pipeline import classified_row, classify_and_calculate, summary_fields
+
+logger = logging.getLogger("ecolink.jobs")
+
+ANALYSIS_JOB_WORKERS        = int(os.environ.get("ANALYSIS_JOB_WORKERS", "2"))
+ANALYSIS_JOB_CHUNK_SIZE     = int(os.environ.get("ANALYSIS_JOB_CHUNK_SIZE", "200"))
+ANALYSIS_JOB_POLL_SECONDS   = float(os.environ.get("ANALYSIS_JOB_POLL_SECONDS", "2"))
+ANALYSIS_JOB_LEASE_SECONDS  = float(os.environ.get("ANALYSIS_JOB_LEASE_SECONDS", "300"))
+ANALYSIS_JOB_MAX_ATTEMPTS   = int(os.environ.get("ANALYSIS_JOB_MAX_ATTEMPTS", "3"))
+
+
+class _LeaseLost(Exception):
+    """Another worker took the job over (our lease expired)."""
+
+
+class AnalysisJobWorker(threading.Thread):
+    """Claims one job at a time and processes it chunk by chunk."""
+
+    def __init__(self, number: int, stop_event: threading.Event) -> None:
+        super().__init__(name=f"analysis-job-{number}", daemon=True)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{number}:{uuid.uuid4().hex[:8]}"
+        self._stop_event = stop_event
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                job = claim_analysis_job(self.worker_id, ANALYSIS_JOB_LEASE_SECONDS)
+            except Exception as exc:
+                logger.warning("Analysis job claim failed: %s", exc)
+                job = None
+            if job is None:
+                self._stop_event.wait(ANALYSIS_JOB_POLL_SECONDS)
+                continue
+            self._run_job(job)
+
+    def _run_job(self, job: dict) -> None:
+        job_id = str(job["id"])
+        logger.info(
+            "Worker %s claimed job %s (%d/%d done, attempt %d)",
+            self.worker_id, job_id, job["next_seq"], job["total_transactions"], job["attempts"],
+        )
+        try:
+            finished = self._process(job)
+        except _LeaseLost:
+            logger.warning("Job %s was taken over by another worker.", job_id)
+            return
+        except Exception as exc:
+            failed = job["attempts"] >= ANALYSIS_JOB_MAX_ATTEMPTS
+            logger.error(
+                "Job %s failed on attempt %d%s: %s",
+                job_id, job["attempts"], " — giving up" if failed else "", exc,
+            )
+            self._release(job_id, str(exc), failed)
+            return
+
+        if not finished:
+            # Shutting down: hand the job back so the next worker resumes it.
+            self._release(job_id, None, False)
+
+    def _process(self, job: dict) -> bool:
+        """Run the job's remaining chunks. Returns False if interrupted by shutdown."""
+        job_id     = str(job["id"])
+        company_id = str(job["company_id"])
+        nga_year   = job["nga_year"]
+        chunk_size = job["chunk_size"] or ANALYSIS_JOB_CHUNK_SIZE
+        seq        = job["next_seq"]
+
+        factors   = get_factors(nga_year, job["state"])
+        registry  = registry_for(factors)
+        aggregate = RunningAggregate.from_state(job["aggregate"])
+
+        while seq < job["total_transactions"]:
+            if self._stop_event.is_set():
+                return False
+
+            # ── Step 1: load and classify the next chunk ─────────────────────
+            items = fetch_analysis_job_items(job_id, seq, chunk_size)
+            if not items:
+                break
+            tx_dicts = [TransactionInput.model_validate(item["payload"]).model_dump() for item in items]
+            enriched = classify_and_calculate(tx_dicts, factors, aggregate)
+
+            # ── Step 2: commit results + progress atomically ─────────────────
+            results = [classified_row(e, nga_year, registry) for e in enriched]
+            if not commit_analysis_job_chunk(
+                job_id, self.worker_id, company_id, seq, enriched, results, aggregate.to_state(),
+            ):
+                raise _LeaseLost(job_id)
+            seq += len(items)
+
+        # ── Step 3: final summary ────────────────────────────────────────────
+        summary = AnalyseStreamSummary(
+            company_id = company_id,
+            nga_year   = nga_year,
+            state      = job["state"],
+            **summary_fields(aggregate),
+        )
+        finish_analysis_job(job_id, self.worker_id, summary.model_dump(mode="json"))
+        logger.info("Job %s completed: %d transactions.", job_id, aggregate.total_transactions)
+        return True
+
+    def _release(self, job_id: str, error: Optional[str], failed: bool) -> None:
+        try:
+            release_analysis_job(job_id, self.worker_id, error=error, failed=failed)
+        except Exception as exc:
+            # The lease expiry will return the job to the queue anyway.
+            logger.warning("Could not release job %s: %s", job_id, exc)
+
+
+class AnalysisJobPool:
+    """Starts / stops the worker threads (driven by the FastAPI lifespan)."""
+
+    def __init__(self, workers: int = ANALYSIS_JOB_WORKERS) -> None:
+        self.size = workers
+        self._stop_event = threading.Event()
+        self._workers: list[AnalysisJobWorker] = []
+
+    @property
+    def running(self) -> bool:
+        return any(w.is_alive() for w in self._workers)
+
+    def start(self) -> None:
+        if self.running or self.size <= 0 or not os.environ.get("DATABASE_URL"):
+            return
+        self._stop_event.clear()
+        self._workers = [AnalysisJobWorker(n, self._stop_event) for n in range(self.size)]
+        for worker in self._workers:
+            worker.start()
+        logger.info("Analysis job pool started with %d workers.", self.size)
+
+    def stop(self, timeout: float = 60.0) -> None:
+        """Let each worker finish its current chunk, then return its job to the queue."""
+        self._stop_event.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+
+job_pool = AnalysisJobPool()
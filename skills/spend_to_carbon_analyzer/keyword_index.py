@@ -0,0 +1,179 @@
+"""
+EcoLink Australia — Compiled keyword index for the classifier fast path.
+
+`_keyword_prematch` used to test every keyword of every factor against every
+transaction (cost: transactions × factors × keywords). This module compiles
+all `match_keywords[]` of a factor set into a single Aho-Corasick automaton,
+built once per (nga_year, state) factor set, so each transaction's haystack
+is scanned exactly once and every matching keyword — including overlapping
+ones like 'bp' inside 'bp station' — is reported in that single pass.
+
+Scoring is identical to the original loop:
+  score = min(matched / total_keywords × 0.95, 0.92)
+        + min(longest_matched_keyword × 0.005, 0.05)
+with ties resolved in favour of the factor that appears first in the list.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+
+# ---------------------------------------------------------------------------
+# Aho-Corasick automaton
+# ---------------------------------------------------------------------------
+
+class KeywordAutomaton:
+    """
+    Multi-pattern substring matcher over lower-cased keywords.
+
+    `find_all(text)` returns the set of pattern ids that occur anywhere in
+    `text` (overlapping matches included) in O(len(text) + matches).
+    """
+
+    __slots__ = ("_goto", "_fail", "_out")
+
+    def __init__(self, patterns: list[str]) -> None:
+        goto: list[dict[str, int]] = [{}]
+        out:  list[list[int]]      = [[]]
+
+        # ── Trie ────────────────────────────────────────────────────────────
+        for pid, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                node = nxt
+            out[node].append(pid)
+
+        # ── Failure links (BFS) ─────────────────────────────────────────────
+        fail: list[int] = [0] * len(goto)
+        queue: list[int] = list(goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, child in goto[node].items():
+                queue.append(child)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[child] = target if target != child else 0
+                out[child] = out[child] + out[fail[child]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out  = out
+
+    def find_all(self, text: str) -> set[int]:
+        goto, fail, out = self._goto, self._fail, self._out
+        found: set[int] = set()
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+# ---------------------------------------------------------------------------
+# Factor keyword index
+# ---------------------------------------------------------------------------
+
+class KeywordIndex:
+    """
+    Prebuilt keyword index for one emission-factor set.
+
+    Build it once per factor set (e.g. once per `classify_batch` call) and
+    reuse it for every transaction in that set.
+    """
+
+    __slots__ = (
+        "factors", "_automaton", "_postings",
+        "_keyword_totals", "_always",
+    )
+
+    def __init__(self, factors: list[dict]) -> None:
+        self.factors = factors
+
+        patterns:   list[str]                          = []
+        pattern_id: dict[str, int]                     = {}
+        # pattern id → [(factor index, occurrences, longest original keyword)]
+        postings:   list[list[tuple[int, int, int]]]   = []
+        totals:     list[int]                          = []
+        # Empty-string keywords match every haystack (same as `"" in s`).
+        always:     dict[int, tuple[int, int]]         = {}
+
+        for fi, factor in enumerate(factors):
+            keywords: list[str] = factor.get("match_keywords") or []
+            totals.append(len(keywords))
+
+            per_pattern: dict[str, list[int]] = {}
+            for kw in keywords:
+                entry = per_pattern.setdefault(kw.lower(), [0, 0])
+                entry[0] += 1
+                entry[1]  = max(entry[1], len(kw))
+
+            for lowered, (count, longest) in per_pattern.items():
+                if not lowered:
+                    always[fi] = (count, longest)
+                    continue
+                pid = pattern_id.get(lowered)
+                if pid is None:
+                    pid = len(patterns)
+                    pattern_id[lowered] = pid
+                    patterns.append(lowered)
+                    postings.append([])
+                postings[pid].append((fi, count, longest))
+
+        self._automaton      = KeywordAutomaton(patterns)
+        self._postings       = postings
+        self._keyword_totals = totals
+        self._always         = always
+
+    def best_match(
+        self,
+        haystack: str,
+        threshold: float,
+    ) -> Optional[tuple[dict, float]]:
+        """
+        Return (factor, rounded score) for the best-scoring factor whose
+        score reaches `threshold`, or None.
+        """
+        # factor index → [matched keyword count, longest matched keyword]
+        hits: dict[int, list[int]] = {
+            fi: [count, longest] for fi, (count, longest) in self._always.items()
+        }
+        for pid in self._automaton.find_all(haystack):
+            for fi, count, longest in self._postings[pid]:
+                entry = hits.get(fi)
+                if entry is None:
+                    hits[fi] = [count, longest]
+                else:
+                    entry[0] += count
+                    if longest > entry[1]:
+                        entry[1] = longest
+
+        best_factor = None
+        best_score  = 0.0
+        totals      = self._keyword_totals
+
+        for fi in sorted(hits):
+            matched, longest = hits[fi]
+            score = min(matched / max(totals[fi], 1) * 0.95, 0.92)
+            score += min(longest * 0.005, 0.05)
+            if score > best_score:
+                best_score  = score
+                best_factor = self.factors[fi]
+
+        if best_factor and best_score >= threshold:
+            return best_factor, round(best_score, 3)
+
+        return None
@@ -0,0 +1,149 @@
+"""
+EcoLink Australia — Process-wide LLM provider clients.
+
+Each Groq call used to import the SDK and build a new `Groq(...)` client —
+a new HTTP connection pool, so a new TCP + TLS handshake per transaction —
+and each Gemini call re-ran `genai.configure` and built a new
+`GenerativeModel`. The registry builds them once:
+
+  - Groq: one client per (API key, base URL) on a keep-alive httpx pool
+    (LLM_POOL_CONNECTIONS connections, LLM_POOL_KEEPALIVE kept idle for
+    LLM_KEEPALIVE_SECONDS), shared by every thread. Timeouts are set per
+    request;
+  - Gemini: `genai.configure` once per API key, one `GenerativeModel` per
+    completion budget (the batch prompts' max_output_tokens vary).
+
+Clients are created lazily on first use, rebuilt if the API key changes
+(rotation), and closed by `close()` at application shutdown.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Any, Optional
+
+logger = logging.getLogger("ecolink.llm_clients")
+
+LLM_POOL_CONNECTIONS  = int(os.environ.get("LLM_POOL_CONNECTIONS", "32"))
+LLM_POOL_KEEPALIVE    = int(os.environ.get("LLM_POOL_KEEPALIVE", "16"))
+LLM_KEEPALIVE_SECONDS = float(os.environ.get("LLM_KEEPALIVE_SECONDS", "60"))
+
+# Retries inside the Groq SDK (its own default is 2). Off by default: the
+# circuit breaker and the Gemini fallback handle a failed call, and an SDK
+# retry with backoff can outlast the 2 x timeout deadline `first_answer`
+# gives the primary before asking the fallback.
+LLM_SDK_MAX_RETRIES = int(os.environ.get("LLM_SDK_MAX_RETRIES", "0"))
+
+GROQ_MODEL   = "llama-3.3-70b-versatile"
+GEMINI_MODEL = "gemini-2.0-flash"
+
+
+class LLMClients:
+    """Lazily built, shared provider clients."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._groq: Optional[Any] = None
+        self._groq_config: Optional[tuple] = None
+        self._retired: list[Any] = []     # replaced Groq clients, closed at shutdown
+        self._gemini_key: Optional[str] = None
+        self._gemini_models: dict[tuple[str, int], Any] = {}
+        self.groq_clients  = 0
+        self.gemini_models = 0
+
+    def groq(self) -> Any:
+        """The shared Groq client for the current GROQ_API_KEY / GROQ_BASE_URL."""
+        api_key = os.environ.get("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("GROQ_API_KEY is not set.")
+        config = (api_key, os.environ.get("GROQ_BASE_URL"))
+
+        client = self._groq
+        if client is not None and self._groq_config == config:
+            return client
+        with self._lock:
+            if self._groq is not None and self._groq_config == config:
+                return self._groq
+
+            import httpx
+            from groq import DefaultHttpxClient, Groq  # lazy import
+
+            client = Groq(
+                api_key=api_key,
+                base_url=config[1],
+                max_retries=LLM_SDK_MAX_RETRIES,
+                http_client=DefaultHttpxClient(limits=httpx.Limits(
+                    max_connections=LLM_POOL_CONNECTIONS,
+                    max_keepalive_connections=LLM_POOL_KEEPALIVE,
+                    keepalive_expiry=LLM_KEEPALIVE_SECONDS,
+                )),
+            )
+            # In-flight calls may still hold the old client; close it at shutdown.
+            if self._groq is not None:
+                self._retired.append(self._groq)
+            self._groq, self._groq_config = client, config
+            self.groq_clients += 1
+            logger.info("Groq client created (pool: %d connections).", LLM_POOL_CONNECTIONS)
+            return client
+
+    def gemini(self, max_tokens: int, system_instruction: str) -> Any:
+        """A shared `GenerativeModel` for this completion budget and system prompt."""
+        api_key = os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY is not set.")
+
+        key = (system_instruction, max_tokens)
+        if self._gemini_key == api_key:
+            model = self._gemini_models.get(key)
+            if model is not None:
+                return model
+        with self._lock:
+            import google.generativeai as genai  # lazy import
+
+            if self._gemini_key != api_key:
+                genai.configure(api_key=api_key)
+                self._gemini_key = api_key
+                self._gemini_models.clear()
+            model = self._gemini_models.get(key)
+            if model is None:
+                model = genai.GenerativeModel(
+                    model_name=GEMINI_MODEL,
+                    system_instruction=system_instruction,
+                    generation_config=genai.GenerationConfig(
+                        temperature=0.1,
+                        max_output_tokens=max_tokens,
+                        response_mime_type="application/json",
+                    ),
+                )
+                self._gemini_models[key] = model
+                self.gemini_models += 1
+            return model
+
+    def close(self) -> None:
+        """Close pooled connections; the next call builds fresh clients."""
+        with self._lock:
+            clients = [c for c in (self._groq, *self._retired) if c is not None]
+            self._groq = self._groq_config = None
+            self._retired = []
+            self._gemini_key = None
+            self._gemini_models.clear()
+        for client in clients:
+            try:
+                client.close()
+            except Exception as exc:
+                logger.warning("Closing Groq client failed: %s", exc)
+
+    def stats(self) -> dict:
+        return {
+            "groq_clients_created":  self.groq_clients,
+            "gemini_models_created": self.gemini_models,
+            "groq_ready":            self._groq is not None,
+            "pool_connections":      LLM_POOL_CONNECTIONS,
+            "pool_keepalive":        LLM_POOL_KEEPALIVE,
+        }
+
+
+# Process-wide registry shared by every classify call.
+llm_clients = LLMClients()
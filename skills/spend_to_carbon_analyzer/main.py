@@ -4,9 +4,17 @@ Spend-to-Carbon Analysis Engine
 
 Endpoints:
   POST /analyse          — classify transactions and return CO2e totals
+  POST /analyse/stream   — NDJSON in, NDJSON out, for full-year ledgers
+  POST /analyse/jobs     — queue a full-year ledger for background analysis
+  GET  /analyse/jobs/{id} — job progress, running totals and results
+  GET  /reports/aggregate — stored transactions' totals for a date range
+  GET  /transactions     — stored transactions, newest first (keyset pages)
+  GET  /review/queue     — next unresolved transactions with candidate factors
+  POST /review/resolve   — bulk accept / override, audit-logged
   GET  /factors          — list available NGA emission factors
   GET  /factors/{id}     — get a single emission factor
   GET  /health           — health check
+  GET  /stats            — runtime counters (caches, persistence queue)
 
 Run locally:
   uvicorn skills.spend_to_carbon_analyzer.main:app --reload --port 8000
@@ -14,27 +22,63 @@ Run locally:
 
 from __future__ import annotations
 
+import base64
+import binascii
+import json
 import logging
 import os
-from datetime import datetime
-from typing import Optional
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from typing import AsyncIterator, Optional
 from uuid import UUID
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-
-from .calculator import aggregate_results, calculate_co2e
-from .classifier import classify_batch
-from .db import fetch_all_factors, fetch_factor_by_id, upsert_transactions
+from fastapi.responses import Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+from pydantic import ValidationError
+
+from .calculator import RunningAggregate
+from . import async_db, provider_health
+from .factor_cache import aget_factors, factor_cache, start_listener, stop_listener
+from .factor_registry import registry_for
+from .jobs import ANALYSIS_JOB_CHUNK_SIZE, job_pool
+from .llm_clients import llm_clients
+from .merchant_rules import merchant_rules
+from .pipeline import (
+    classified_row,
+    classify_and_calculate,
+    override_decision,
+    review_item,
+    summary_fields,
+    summary_values,
+    to_classified_transaction,
+)
+from .quantity_parser import cache_stats as quantity_cache_stats
+from .response_json import render_json
+from .rollups import period_summaries, quarter_span
+from .result_cache import classification_cache
+from .supplier_knowledge import supplier_knowledge
+from .write_behind import write_behind
 from .models import (
+    AnalyseJobCreated,
+    AnalyseJobRequest,
+    AnalyseJobStatus,
     AnalyseRequest,
     AnalyseResponse,
-    CategorySummary,
+    AnalyseStreamSummary,
     ClassificationStatus,
-    ClassifiedTransaction,
-    EmissionFactorSummary,
-    ScopeSummary,
+    JobStatus,
+    ReportAggregateResponse,
+    ReportPeriod,
+    ReviewAction,
+    ReviewQueueResponse,
+    ReviewResolveRequest,
+    ReviewResolveResponse,
+    TransactionInput,
 )
 
 load_dotenv()
@@ -48,10 +92,44 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ecolink.api")
 
+# ---------------------------------------------------------------------------
+# Lifecycle
+# ---------------------------------------------------------------------------
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    try:
+        await async_db.init_pool()
+    except Exception as exc:
+        logger.warning("Non-fatal: async database pool not initialised: %s", exc)
+    # Preload current NGA editions so the first /analyse doesn't pay for it.
+    # Both loads are blocking psycopg2 queries — keep them off the event loop.
+    if os.environ.get("FACTOR_CACHE_WARM", "1") != "0":
+        try:
+            await run_in_threadpool(factor_cache.warm_up)
+        except Exception as exc:
+            logger.warning("Non-fatal: emission factor cache warm-up failed: %s", exc)
+    await run_in_threadpool(merchant_rules.reload)
+    start_listener()
+    if os.environ.get("PERSIST_WRITE_BEHIND", "1") != "0":
+        write_behind.start()
+    job_pool.start()
+    yield
+    # Workers finish their current chunk and hand their jobs back to the queue.
+    await run_in_threadpool(job_pool.stop)
+    # Drain queued writes before the process exits.
+    await run_in_threadpool(write_behind.stop)
+    provider_health.shutdown()
+    llm_clients.close()
+    stop_listener()
+    await async_db.close_pool()
+
+
 # ---------------------------------------------------------------------------
 # App
 # ---------------------------------------------------------------------------
 app = FastAPI(
+    lifespan=lifespan,
     title="EcoLink Australia — Carbon Analysis API",
     description=(
         "Spend-to-Carbon AI engine for Australian SMEs. "
@@ -108,11 +186,29 @@ async def _verify_api_key(api_key: str = Security(_API_KEY_HEADER)) -> str:
 
 @app.get("/health", tags=["System"])
 def health_check() -> dict:
+    providers = provider_health.snapshot()
+    # Degraded, not down: local stages still classify while both LLMs are out.
+    llm_down = all(providers[name]["state"] == "open" for name in ("groq", "gemini"))
+    return {
+        "status":        "degraded" if llm_down else "ok",
+        "service":       "EcoLink Carbon Analysis API",
+        "version":       "1.0.0",
+        "timestamp":     datetime.utcnow().isoformat() + "Z",
+        "llm_providers": providers,
+    }
+
+
+@app.get("/stats", tags=["System"], dependencies=[Depends(_verify_api_key)])
+def runtime_stats() -> dict:
+    """Runtime counters used to size caches and queues."""
     return {
-        "status":    "ok",
-        "service":   "EcoLink Carbon Analysis API",
-        "version":   "1.0.0",
-        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "classification_cache": classification_cache.stats(),
+        "factor_cache":         factor_cache.stats(),
+        "llm_clients":          llm_clients.stats(),
+        "merchant_rules":       merchant_rules.stats(),
+        "quantity_parse_cache": quantity_cache_stats(),
+        "supplier_knowledge":   supplier_knowledge.stats(),
+        "persistence_queue":    write_behind.stats(),
     }
 
 
@@ -121,7 +217,7 @@ def health_check() -> dict:
 # ---------------------------------------------------------------------------
 
 @app.get("/factors", tags=["Emission Factors"], dependencies=[Depends(_verify_api_key)])
-def list_factors(
+async def list_factors(
     nga_year: int           = Query(2024, description="NGA publication year."),
     scope:    Optional[int] = Query(None, ge=1, le=3, description="Filter by scope (1, 2 or 3)."),
     state:    Optional[str] = Query(None, description="Filter by Australian state for electricity factors."),
@@ -131,13 +227,13 @@ def list_factors(
     Optionally filter by scope or state.
     """
     try:
-        factors = fetch_all_factors(nga_year=nga_year, state=state)
+        factors = await aget_factors(nga_year=nga_year, state=state)
     except Exception as exc:
         logger.error("Failed to fetch emission factors: %s", exc)
         raise HTTPException(status_code=503, detail="Database unavailable.")
 
     if scope is not None:
-        factors = [f for f in factors if f["scope"] == scope]
+        factors = registry_for(factors).select(scope=scope)
 
     return {
         "nga_year":     nga_year,
@@ -162,10 +258,10 @@ def list_factors(
 
 
 @app.get("/factors/{factor_id}", tags=["Emission Factors"], dependencies=[Depends(_verify_api_key)])
-def get_factor(factor_id: UUID) -> dict:
+async def get_factor(factor_id: UUID) -> dict:
     """Retrieve a single emission factor by UUID."""
     try:
-        factor = fetch_factor_by_id(str(factor_id))
+        factor = await async_db.fetch_factor_by_id(str(factor_id))
     except Exception as exc:
         logger.error("DB error fetching factor %s: %s", factor_id, exc)
         raise HTTPException(status_code=503, detail="Database unavailable.")
@@ -188,8 +284,56 @@ def get_factor(factor_id: UUID) -> dict:
 # Core: Spend-to-Carbon Analysis
 # ---------------------------------------------------------------------------
 
+# Transactions classified per step of /analyse/stream.
+STREAM_CHUNK_SIZE     = int(os.environ.get("STREAM_CHUNK_SIZE", "200"))
+STREAM_MAX_LINE_BYTES = int(os.environ.get("STREAM_MAX_LINE_BYTES", str(64 * 1024)))
+
+# A streamed ledger waits for queue space instead of dropping rows.
+_STREAM_ENQUEUE_TIMEOUT = 30.0
+
+# /analyse renders its JSON straight from the enriched rows instead of
+# building AnalyseResponse models for FastAPI to re-validate (same bytes).
+ANALYSE_FAST_RESPONSE = os.environ.get("ANALYSE_FAST_RESPONSE", "1") != "0"
+
+
+async def _load_factors(nga_year: int, state: Optional[str]):
+    try:
+        factors = await aget_factors(nga_year=nga_year, state=state)
+    except Exception as exc:
+        logger.error("DB error loading factors: %s", exc)
+        raise HTTPException(
+            status_code=503,
+            detail="Unable to load emission factors from database.",
+        )
+
+    if not factors:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No emission factors found for NGA year {nga_year}. "
+                   "Run the database seed first.",
+        )
+    return factors
+
+
+async def _persist(company_id: str, enriched: list[dict], enqueue_timeout: Optional[float] = None) -> None:
+    """Best-effort — don't fail the API if DB is down."""
+    # Normally handed to the write-behind queue so the response doesn't wait
+    # on the DB; written inline only when the queue isn't running.
+    if write_behind.running:
+        if enqueue_timeout is None:
+            await run_in_threadpool(write_behind.submit, company_id, enriched)
+        else:
+            await run_in_threadpool(write_behind.submit, company_id, enriched, enqueue_timeout)
+        return
+    try:
+        saved = await async_db.upsert_transactions(company_id, enriched)
+        logger.info("Persisted %d transactions for company %s", saved, company_id)
+    except Exception as exc:
+        logger.warning("Non-fatal: failed to persist transactions: %s", exc)
+
+
 @app.post("/analyse", response_model=AnalyseResponse, tags=["Carbon Analysis"], dependencies=[Depends(_verify_api_key)])
-def analyse_transactions(body: AnalyseRequest) -> AnalyseResponse:
+async def analyse_transactions(body: AnalyseRequest) -> Response:
     """
     **Main endpoint** — Classify financial transactions and calculate CO2e emissions.
 
@@ -200,9 +344,12 @@ def analyse_transactions(body: AnalyseRequest) -> AnalyseResponse:
     - Breakdown by NGA emission category
     - Coverage quality metrics
 
-    The engine uses a two-stage pipeline:
-    1. Keyword pre-matching (fast, deterministic)
-    2. Groq LLM classification (Gemini fallback)
+    Each line goes through the classifier's stages until one answers:
+    1. Merchant rules (known merchants, 100% confidence)
+    2. Keyword pre-matching, supplier knowledge and — when enabled — the
+       nearest-factor embedding lookup (fast, deterministic)
+    3. Cached LLM answers for the same line and factor set
+    4. Groq LLM classification (Gemini fallback, hedged)
     """
     logger.info(
         "Analyse request: company=%s, %d transactions, NGA year=%d, state=%s",
@@ -213,142 +360,494 @@ def analyse_transactions(body: AnalyseRequest) -> AnalyseResponse:
     )
 
     # ── 1. Load emission factors from DB ─────────────────────────────────────
-    try:
-        factors = fetch_all_factors(nga_year=body.nga_year, state=body.state)
-    except Exception as exc:
-        logger.error("DB error loading factors: %s", exc)
-        raise HTTPException(
-            status_code=503,
-            detail="Unable to load emission factors from database.",
+    factors = await _load_factors(body.nga_year, body.state)
+
+    # ── 2–3. Classify (AI), calculate CO2e and aggregate totals in one pass —
+    #         blocking work, off the event loop ──
+    tx_dicts  = [tx.model_dump() for tx in body.transactions]
+    aggregate = RunningAggregate()
+    enriched  = await run_in_threadpool(classify_and_calculate, tx_dicts, factors, aggregate)
+    registry  = registry_for(factors)
+
+    # ── 4. Persist to database (best-effort — don't fail the API if DB is down) ──
+    await _persist(str(body.company_id), enriched)
+
+    # ── 5–6. Build the response ─────────────────────────────────────────────────
+    if ANALYSE_FAST_RESPONSE:
+        return Response(
+            content=render_json({
+                "company_id": str(body.company_id),
+                "nga_year":   body.nga_year,
+                "state":      body.state,
+                "results":    [classified_row(e, body.nga_year, registry) for e in enriched],
+                **summary_values(aggregate),
+            }),
+            media_type="application/json",
         )
+    return AnalyseResponse(
+        company_id              = body.company_id,
+        nga_year                = body.nga_year,
+        state                   = body.state,
+        results                 = [to_classified_transaction(e, body.nga_year, registry) for e in enriched],
+        **summary_fields(aggregate),
+    )
 
-    if not factors:
-        raise HTTPException(
-            status_code=404,
-            detail=f"No emission factors found for NGA year {body.nga_year}. "
-                   "Run the database seed first.",
+
+# ---------------------------------------------------------------------------
+# Streaming analysis (NDJSON)
+# ---------------------------------------------------------------------------
+
+async def _ndjson_lines(request: Request) -> AsyncIterator[tuple[int, Optional[bytes]]]:
+    """
+    Split the request body into (line number, raw line) as it arrives.
+    Lines longer than STREAM_MAX_LINE_BYTES are skipped and yielded as
+    (line number, None) so the buffer never grows past one line.
+    """
+    buffer    = b""
+    line_no   = 0
+    oversized = False
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw in lines:
+            line_no += 1
+            if oversized:
+                oversized = False
+                yield line_no, None
+            else:
+                yield line_no, raw
+        if len(buffer) > STREAM_MAX_LINE_BYTES:
+            oversized = True
+            buffer = b""
+    if buffer.strip() or oversized:
+        yield line_no + 1, None if oversized else buffer
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that may keep reading the request body while it sends.
+
+    On ASGI < 2.4 servers Starlette runs a disconnect listener that also
+    calls receive(), which would swallow the body chunks `_ndjson_lines` is
+    still waiting for. Here a disconnect surfaces via the body stream
+    (ClientDisconnect) or a failed send instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+def _ndjson(record: dict) -> bytes:
+    return json.dumps(record, separators=(",", ":")).encode() + b"\n"
+
+
+@app.post("/analyse/stream", tags=["Carbon Analysis"], dependencies=[Depends(_verify_api_key)])
+async def analyse_stream(
+    request:    Request,
+    company_id: UUID          = Query(..., description="EcoLink company UUID."),
+    nga_year:   int           = Query(2024, description="NGA Factors publication year."),
+    state:      Optional[str] = Query(None, pattern=r"^(NSW|VIC|QLD|WA|SA|TAS|ACT|NT)$"),
+) -> _DuplexStreamingResponse:
+    """
+    Streaming variant of /analyse for full-year ledgers — no 500-row cap.
+
+    Request body: NDJSON (`application/x-ndjson`), one TransactionInput per
+    line; chunked transfer encoding is fine. Lines are classified in chunks
+    of STREAM_CHUNK_SIZE, so memory stays flat regardless of ledger size.
+
+    Response body: NDJSON, in input order —
+    - `{"type": "result", "line": n, ...ClassifiedTransaction}` per line
+    - `{"type": "error", "line": n, "detail": ...}` for lines that fail validation
+    - one trailing `{"type": "summary", ...}` with the /analyse totals,
+      breakdowns and quality metrics, plus `error_count`
+    """
+    logger.info(
+        "Streaming analyse request: company=%s, NGA year=%d, state=%s",
+        company_id, nga_year, state,
+    )
+    factors  = await _load_factors(nga_year, state)
+    registry = registry_for(factors)
+
+    async def _results() -> AsyncIterator[bytes]:
+        aggregate = RunningAggregate()
+        errors    = 0
+        # (line number, transaction) or (line number, pre-rendered error record);
+        # errors wait in the chunk so the output keeps input order.
+        chunk: list[tuple[int, object]] = []
+
+        async def _flush() -> list[bytes]:
+            valid    = [tx for _, tx in chunk if isinstance(tx, dict)]
+            enriched = await run_in_threadpool(classify_and_calculate, valid, factors, aggregate)
+            await _persist(str(company_id), enriched, _STREAM_ENQUEUE_TIMEOUT)
+
+            rows = iter(enriched)
+            out: list[bytes] = []
+            for line_no, tx in chunk:
+                if isinstance(tx, bytes):
+                    out.append(tx)
+                    continue
+                result = classified_row(next(rows), nga_year, registry)
+                out.append(_ndjson({"type": "result", "line": line_no, **result}))
+            return out
+
+        async for line_no, raw in _ndjson_lines(request):
+            if raw is not None and not raw.strip():
+                continue
+            try:
+                if raw is None:
+                    raise ValueError(f"line exceeds {STREAM_MAX_LINE_BYTES} bytes")
+                chunk.append((line_no, TransactionInput.model_validate_json(raw).model_dump()))
+            except (ValidationError, ValueError) as exc:
+                errors += 1
+                chunk.append((line_no, _ndjson({"type": "error", "line": line_no, "detail": str(exc)})))
+
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                for out in await _flush():
+                    yield out
+                chunk = []
+
+        if chunk:
+            for out in await _flush():
+                yield out
+
+        logger.info(
+            "Streamed %d transactions (%d invalid lines) for company %s",
+            aggregate.total_transactions, errors, company_id,
         )
+        summary = AnalyseStreamSummary(
+            company_id  = company_id,
+            nga_year    = nga_year,
+            state       = state,
+            error_count = errors,
+            **summary_fields(aggregate),
+        )
+        yield _ndjson({"type": "summary", **summary.model_dump(mode="json")})
 
-    # ── 2. Classify transactions (AI) ────────────────────────────────────────
-    tx_dicts = [tx.model_dump() for tx in body.transactions]
-    classifications = classify_batch(tx_dicts, factors)
-
-    # ── 3. Calculate CO2e for each transaction ───────────────────────────────
-    enriched: list[dict] = []
-    for tx_dict, clf in zip(tx_dicts, classifications):
-        calc = calculate_co2e(tx_dict, clf)
-        factor = clf.get("matched_factor")
-        enriched.append({
-            **tx_dict,
-            "matched_factor":          factor,
-            "classification_status":   clf["status"],
-            "classification_confidence": clf.get("confidence"),
-            "classification_notes":    clf.get("notes"),
-            "emission_factor_id":      str(factor["id"]) if factor else None,
-            "quantity_value":          calc.get("quantity_value"),
-            "quantity_unit":           calc.get("quantity_unit"),
-            "co2e_kg":                 calc.get("co2e_kg"),
-            "scope":                   factor["scope"] if factor else None,
-        })
+    return _DuplexStreamingResponse(_results(), media_type="application/x-ndjson")
+
+
+# ---------------------------------------------------------------------------
+# Analysis jobs (background, Postgres-backed queue)
+# ---------------------------------------------------------------------------
+
+@app.post(
+    "/analyse/jobs",
+    response_model=AnalyseJobCreated,
+    status_code=202,
+    tags=["Carbon Analysis"],
+    dependencies=[Depends(_verify_api_key)],
+)
+async def create_analysis_job(body: AnalyseJobRequest) -> AnalyseJobCreated:
+    """
+    Queue a full-year ledger for background analysis and return its job id
+    at once. Poll `GET /analyse/jobs/{job_id}` for progress and results.
+    """
+    # Fail fast on a missing NGA edition instead of queueing a doomed job.
+    await _load_factors(body.nga_year, body.state)
 
-    # ── 4. Persist to database (best-effort — don't fail the API if DB is down) ──
     try:
-        saved = upsert_transactions(str(body.company_id), enriched)
-        logger.info("Persisted %d transactions for company %s", saved, body.company_id)
+        job = await async_db.create_analysis_job(
+            str(body.company_id),
+            body.nga_year,
+            body.state,
+            [tx.model_dump(mode="json") for tx in body.transactions],
+            ANALYSIS_JOB_CHUNK_SIZE,
+        )
     except Exception as exc:
-        logger.warning("Non-fatal: failed to persist transactions: %s", exc)
-
-    # ── 5. Aggregate totals ───────────────────────────────────────────────────
-    aggregation = aggregate_results(enriched)
-    scope_totals = aggregation["scope_totals"]
-    total_co2e   = aggregation["total_co2e_kg"]
+        logger.error("DB error creating analysis job: %s", exc)
+        raise HTTPException(status_code=503, detail="Database unavailable.")
 
-    # ── 6. Build response objects ─────────────────────────────────────────────
-    classified_amount_aud = sum(
-        tx["amount_aud"]
-        for tx, e in zip(tx_dicts, enriched)
-        if e["classification_status"] == "classified"
+    logger.info(
+        "Queued analysis job %s: company=%s, %d transactions",
+        job["id"], body.company_id, job["total_transactions"],
     )
-    total_amount_aud = sum(tx["amount_aud"] for tx in tx_dicts)
-    coverage_pct = (
-        round(classified_amount_aud / total_amount_aud * 100, 1)
-        if total_amount_aud > 0 else 0.0
+    return AnalyseJobCreated(
+        job_id             = job["id"],
+        status             = JobStatus(job["status"]),
+        total_transactions = job["total_transactions"],
+        created_at         = job["created_at"],
     )
 
-    results: list[ClassifiedTransaction] = []
-    for e in enriched:
-        factor = e.get("matched_factor")
-        ef_summary: Optional[EmissionFactorSummary] = None
-        if factor:
-            ef_summary = EmissionFactorSummary(
-                factor_id   = factor["id"],
-                activity    = factor["activity"],
-                category    = factor["category"],
-                scope       = factor["scope"],
-                unit        = factor["unit"],
-                co2e_factor = float(factor["co2e_factor"]),
-                nga_year    = factor.get("nga_year", body.nga_year),
-                method      = factor.get("calculation_method", "spend_based"),
-            )
-
-        results.append(
-            ClassifiedTransaction(
-                description             = e["description"],
-                amount_aud              = e["amount_aud"],
-                transaction_date        = e["transaction_date"],
-                supplier_name           = e.get("supplier_name"),
-                external_id             = e.get("external_id"),
-                status                  = ClassificationStatus(e["classification_status"]),
-                confidence              = e.get("classification_confidence"),
-                classification_notes    = e.get("classification_notes"),
-                emission_factor         = ef_summary,
-                quantity_value          = e.get("quantity_value"),
-                quantity_unit           = e.get("quantity_unit"),
-                co2e_kg                 = e.get("co2e_kg"),
-                scope                   = e.get("scope"),
-            )
+
+@app.get(
+    "/analyse/jobs/{job_id}",
+    response_model=AnalyseJobStatus,
+    tags=["Carbon Analysis"],
+    dependencies=[Depends(_verify_api_key)],
+)
+async def get_analysis_job(
+    job_id:          UUID,
+    include_results: bool = Query(False, description="Include a page of per-transaction results."),
+    offset:          int  = Query(0, ge=0, description="First result (input position) to return."),
+    limit:           int  = Query(500, ge=1, le=5000, description="Maximum results to return."),
+) -> AnalyseJobStatus:
+    """
+    Progress of an analysis job. `summary` holds running totals for the
+    chunks committed so far, and the final totals once `status` is completed.
+    """
+    try:
+        job = await async_db.fetch_analysis_job(str(job_id))
+        results = (
+            await async_db.fetch_analysis_job_results(str(job_id), offset, limit)
+            if job and include_results else None
         )
+    except Exception as exc:
+        logger.error("DB error fetching analysis job %s: %s", job_id, exc)
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Analysis job '{job_id}' not found.")
+
+    summary = job["summary"] or AnalyseStreamSummary(
+        company_id = job["company_id"],
+        nga_year   = job["nga_year"],
+        state      = job["state"],
+        **summary_fields(RunningAggregate.from_state(job["aggregate"])),
+    )
+    total = job["total_transactions"]
+
+    return AnalyseJobStatus(
+        job_id                 = job["id"],
+        company_id             = job["company_id"],
+        status                 = JobStatus(job["status"]),
+        nga_year               = job["nga_year"],
+        state                  = job["state"],
+        total_transactions     = total,
+        processed_transactions = job["processed_transactions"],
+        progress_pct           = round(job["processed_transactions"] / total * 100, 1) if total else 100.0,
+        summary                = summary,
+        error                  = job["error"],
+        created_at             = job["created_at"],
+        updated_at             = job["updated_at"],
+        completed_at           = job["completed_at"],
+        results                = results,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Reports
+# ---------------------------------------------------------------------------
+
+@app.get(
+    "/reports/aggregate",
+    response_model=ReportAggregateResponse,
+    tags=["Reports"],
+    dependencies=[Depends(_verify_api_key)],
+)
+async def aggregate_report(
+    company_id: UUID         = Query(..., description="EcoLink company UUID."),
+    date_from:  date         = Query(..., description="First transaction date (inclusive)."),
+    date_to:    date         = Query(..., description="Last transaction date (inclusive)."),
+    period:     ReportPeriod = Query(ReportPeriod.MONTH, description="Granularity of `by_period`."),
+) -> ReportAggregateResponse:
+    """
+    Scope, category and per-period totals of a company's stored
+    transactions — the summary of an /analyse response, computed by one
+    grouped query. Monthly reports group by transaction date. Quarterly
+    reports cover the whole financial quarters containing date_from and
+    date_to, with each line under its reporting quarter (its own
+    reporting_year / reporting_quarter, else its date's) — read from the
+    emission_rollups table (migration 026) when it exists.
+    """
+    if date_to < date_from:
+        raise HTTPException(status_code=422, detail="date_to is before date_from.")
+
+    groups, source = None, "rollups"
+    try:
+        if period == ReportPeriod.QUARTER:
+            span = quarter_span(date_from, date_to)
+            groups = await async_db.fetch_rollup_groups(str(company_id), *span)
+            if groups is None:
+                source = "transactions"
+                groups = await async_db.fetch_quarter_groups(str(company_id), *span)
+        else:
+            source = "transactions"
+            groups = await async_db.fetch_report_groups(str(company_id), date_from, date_to)
+    except Exception as exc:
+        logger.error("DB error aggregating report for %s: %s", company_id, exc)
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+    return ReportAggregateResponse(
+        company_id = company_id,
+        date_from  = date_from,
+        date_to    = date_to,
+        period     = period,
+        source     = source,
+        by_period  = period_summaries(groups, period.value),
+        **summary_fields(RunningAggregate().add_groups(groups)),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Transactions
+# ---------------------------------------------------------------------------
+
+DEFAULT_TRANSACTION_FIELDS = (
+    "id", "transaction_date", "description", "supplier_name", "amount_aud",
+    "classification_status", "classification_confidence", "emission_factor_id",
+    "co2e_kg", "scope",
+)
+
+
+def _encode_cursor(row: dict) -> str:
+    key = f"{row['transaction_date'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[date, str]:
+    try:
+        key = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        day, tx_id = key.split("|")
+        return date.fromisoformat(day), str(UUID(tx_id))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=422, detail="Invalid cursor.")
+
+
+@app.get("/transactions", tags=["Transactions"], dependencies=[Depends(_verify_api_key)])
+async def list_transactions(
+    company_id: UUID                               = Query(..., description="EcoLink company UUID."),
+    status:     Optional[list[ClassificationStatus]] = Query(None, description="Only these statuses (repeatable)."),
+    scope:      Optional[int]                      = Query(None, ge=1, le=3, description="Only this scope."),
+    fields:     Optional[str]                      = Query(None, description="Comma-separated columns to return."),
+    limit:      int                                = Query(100, ge=1, le=1000, description="Maximum rows per page."),
+    cursor:     Optional[str]                      = Query(None, description="`next_cursor` of the previous page."),
+) -> dict:
+    """
+    A company's persisted transactions, newest first (transaction_date,
+    then id). Pages are keyset-based: pass the previous page's
+    `next_cursor` to continue; it is null on the last page. Deep pages cost
+    the same as the first.
+    """
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(DEFAULT_TRANSACTION_FIELDS)
+    unknown = sorted(set(selected) - set(async_db.TRANSACTION_FIELDS))
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(unknown)}.")
+    after = _decode_cursor(cursor) if cursor else None
 
-    # Scope summary
-    by_scope: list[ScopeSummary] = []
-    for s in [1, 2, 3]:
-        co2e = scope_totals.get(s, 0.0)
-        count = sum(1 for e in enriched if e.get("scope") == s and e.get("co2e_kg"))
-        pct = round(co2e / total_co2e * 100, 1) if total_co2e > 0 else 0.0
-        by_scope.append(ScopeSummary(scope=s, co2e_kg=co2e, tx_count=count, percentage=pct))
-
-    # Category summary
-    by_category: list[CategorySummary] = [
-        CategorySummary(
-            category  = c["category"],
-            scope     = c["scope"],
-            co2e_kg   = c["co2e_kg"],
-            tx_count  = c["tx_count"],
+    try:
+        rows = await async_db.fetch_transactions_page(
+            str(company_id), selected, limit + 1,
+            statuses=[s.value for s in status] if status else None,
+            scope=scope,
+            after=after,
         )
-        for c in aggregation["by_category"]
-    ]
-
-    # Status counts
-    status_counts = {s.value: 0 for s in ClassificationStatus}
-    for e in enriched:
-        status_counts[e["classification_status"]] = (
-            status_counts.get(e["classification_status"], 0) + 1
+    except Exception as exc:
+        logger.error("DB error listing transactions for %s: %s", company_id, exc)
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+    page = rows[:limit]
+    next_cursor = _encode_cursor(page[-1]) if len(rows) > limit else None
+    return {
+        "company_id":   str(company_id),
+        "count":        len(page),
+        "next_cursor":  next_cursor,
+        "transactions": [
+            {f: float(row[f]) if isinstance(row[f], Decimal) else row[f] for f in selected}
+            for row in page
+        ],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Review queue
+# ---------------------------------------------------------------------------
+
+_REVIEW_STATUSES = (ClassificationStatus.NEEDS_REVIEW, ClassificationStatus.FACTOR_NOT_FOUND)
+
+
+@app.get(
+    "/review/queue",
+    response_model=ReviewQueueResponse,
+    tags=["Review"],
+    dependencies=[Depends(_verify_api_key)],
+)
+async def review_queue(
+    company_id: UUID                           = Query(..., description="EcoLink company UUID."),
+    limit:      int                            = Query(20, ge=1, le=200, description="Items to return."),
+    status:     Optional[ClassificationStatus] = Query(None, description="needs_review or factor_not_found only."),
+    candidates: int                            = Query(5, ge=0, le=20, description="Candidate factors per item."),
+    nga_year:   int                            = Query(2024, description="NGA edition to draw candidates from."),
+    state:      Optional[str]                  = Query(None, description="Australian state for electricity factors."),
+) -> ReviewQueueResponse:
+    """
+    The company's next unresolved transactions (needs_review and
+    factor_not_found), oldest classification first, each with its best
+    candidate factors ranked against the factor set.
+    """
+    if status is not None and status not in _REVIEW_STATUSES:
+        raise HTTPException(status_code=422, detail="status must be needs_review or factor_not_found.")
+    try:
+        rows, size = await async_db.fetch_review_queue(
+            str(company_id), limit, status.value if status else None,
         )
+    except Exception as exc:
+        logger.error("DB error reading review queue for %s: %s", company_id, exc)
+        raise HTTPException(status_code=503, detail="Database unavailable.")
 
-    return AnalyseResponse(
-        company_id              = body.company_id,
-        nga_year                = body.nga_year,
-        state                   = body.state,
-        results                 = results,
-        total_co2e_kg           = total_co2e,
-        total_scope1_co2e_kg    = scope_totals.get(1, 0.0),
-        total_scope2_co2e_kg    = scope_totals.get(2, 0.0),
-        total_scope3_co2e_kg    = scope_totals.get(3, 0.0),
-        by_scope                = by_scope,
-        by_category             = by_category,
-        total_transactions      = len(enriched),
-        classified_count        = status_counts.get("classified", 0),
-        needs_review_count      = status_counts.get("needs_review", 0),
-        factor_not_found_count  = status_counts.get("factor_not_found", 0),
-        coverage_pct            = coverage_pct,
+    factors = await _load_factors(nga_year, state) if rows and candidates else ()
+    items = await run_in_threadpool(lambda: [review_item(row, factors, candidates) for row in rows])
+    return ReviewQueueResponse(company_id=company_id, queue_size=size, items=items)
+
+
+@app.post(
+    "/review/resolve",
+    response_model=ReviewResolveResponse,
+    tags=["Review"],
+    dependencies=[Depends(_verify_api_key)],
+)
+async def resolve_review(body: ReviewResolveRequest) -> ReviewResolveResponse:
+    """
+    Accept the suggested factor or override it, for many queued
+    transactions at once. Overrides recompute CO2e against the new factor.
+    All rows are updated and their `transaction_audit_log` entries written
+    by one statement; transactions that are not in the company's queue are
+    returned in `skipped`.
+    """
+    company_id = str(body.company_id)
+    latest = {d.transaction_id: d for d in body.decisions}     # last decision per transaction wins
+    overrides = [d for d in latest.values() if d.action == ReviewAction.OVERRIDE]
+
+    try:
+        rows, factors = {}, {}
+        if overrides:
+            rows = {
+                UUID(str(row["id"])): row
+                for row in await async_db.fetch_review_rows(company_id, [str(d.transaction_id) for d in overrides])
+            }
+            factors = {
+                UUID(str(f["id"])): f
+                for f in await async_db.fetch_factors_by_ids(list({str(d.emission_factor_id) for d in overrides}))
+            }
+    except Exception as exc:
+        logger.error("DB error preparing review decisions for %s: %s", company_id, exc)
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+    unknown = sorted({str(d.emission_factor_id) for d in overrides if d.emission_factor_id not in factors})
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown emission factors: {', '.join(unknown)}.")
+
+    decisions: list[dict] = []
+    for tx_id, d in latest.items():
+        if d.action == ReviewAction.ACCEPT:
+            decisions.append({"id": str(tx_id), "action": "accept", "note": d.note})
+        elif tx_id in rows:
+            decisions.append(override_decision(rows[tx_id], factors[d.emission_factor_id], d.note))
+
+    try:
+        resolved = await async_db.resolve_reviews(company_id, str(body.reviewer_id), decisions) if decisions else []
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    except Exception as exc:
+        logger.error("DB error resolving reviews for %s: %s", company_id, exc)
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+    done = {UUID(r) for r in resolved}
+    return ReviewResolveResponse(
+        resolved = [tx_id for tx_id in latest if tx_id in done],
+        skipped  = [tx_id for tx_id in latest if tx_id not in done],
     )
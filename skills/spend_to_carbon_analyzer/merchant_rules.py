@@ -0,0 +1,278 @@
+"""
+EcoLink Australia — Deterministic merchant rules (stage 0 of the classifier).
+
+`merchant_classification_rules` (migrations 016 / 018) maps known merchants
+— BP, Ampol, Origin, Qantas, Xero, ... — to an emission category with 100%
+confidence. The Next.js classify route already applies them; this module
+gives the Python analyser the same rules so those lines never reach the
+keyword scorer or the LLM.
+
+The active rules are compiled once into:
+  - an Aho-Corasick automaton for `contains` patterns (keyword_index.py),
+  - a prefix trie for `starts_with` patterns,
+  - a dict for `exact` patterns,
+so a description is matched against every rule in O(len(description)).
+Each rule's position in `ORDER BY priority DESC, created_at ASC` is its
+rank; the lowest-ranked hit wins, exactly like the TypeScript router's
+first-match loop. Descriptions are lower-cased and matched as they are,
+like the router's `includes()`: a word-style pattern such as ' klm ' needs
+the surrounding spaces to be in the text.
+
+Hot reload: at most every MERCHANT_RULES_CHECK_SECONDS the table's
+fingerprint (row count + newest updated_at) is compared and the engine is
+rebuilt when a rule was added, edited, toggled or deleted.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from .db import fetch_merchant_rules, fetch_merchant_rules_fingerprint
+from .factor_registry import registry_for
+from .keyword_index import KeywordAutomaton
+
+logger = logging.getLogger("ecolink.merchant_rules")
+
+MERCHANT_RULES_ENABLED       = os.environ.get("MERCHANT_RULES", "1") != "0"
+MERCHANT_RULES_CHECK_SECONDS = float(os.environ.get("MERCHANT_RULES_CHECK_SECONDS", "30"))
+
+_NO_MATCH = 1 << 30
+
+# category_code → activity fragment used to pick the factor, per scope.
+# Mirrors fetchFactor() in frontend/src/app/api/transactions/classify/route.ts.
+_SCOPE1_ACTIVITY = {
+    "fuel_petrol":  "petrol",
+    "fuel_diesel":  "diesel",
+    "fuel_lpg":     "lpg",
+    "natural_gas":  "natural gas",
+    "refrigerants": "refrigerant",
+}
+_SCOPE3_ACTIVITY = {
+    "air_travel_domestic":      "domestic",
+    "air_travel_international": "international",
+    "rideshare_taxi":           "taxi",
+    "public_transport":         "bus",
+    "rental_vehicle":           "hire",
+    "accommodation_business":   "accommodation",
+    "road_freight":             "freight",
+    "waste":                    "waste",
+}
+
+
+class MerchantRule(NamedTuple):
+    id:             str
+    merchant_name:  str
+    pattern:        str      # lower-cased
+    match_type:     str      # contains | starts_with | exact
+    category_code:  str
+    scope:          int      # 0 = excluded
+    activity_unit:  Optional[str]
+    requires_state: bool
+    notes_citation: Optional[str]
+    priority:       int
+    action:         str      # EXTRACT_VOLUME | IGNORE | NEEDS_REVIEW
+
+    @property
+    def excluded(self) -> bool:
+        return self.action == "IGNORE" or self.category_code.startswith("excluded_")
+
+
+class MerchantRuleEngine:
+    """Compiled rule set. Immutable — a reload builds a new engine."""
+
+    def __init__(self, rows: list[dict]) -> None:
+        rules: list[MerchantRule] = []
+        for row in rows:
+            pattern = (row.get("pattern") or "").lower()
+            if not pattern:
+                logger.warning("Skipping merchant rule %s with an empty pattern.", row.get("id"))
+                continue
+            rules.append(MerchantRule(
+                id             = str(row["id"]),
+                merchant_name  = row["merchant_name"],
+                pattern        = pattern,
+                match_type     = row.get("match_type") or "contains",
+                category_code  = row["category_code"],
+                scope          = int(row["scope"]),
+                activity_unit  = row.get("activity_unit"),
+                requires_state = bool(row.get("requires_state")),
+                notes_citation = row.get("notes_citation"),
+                priority       = int(row.get("priority", 100)),
+                action         = row.get("action") or "EXTRACT_VOLUME",
+            ))
+        # Stable sort: rows arrive ordered by created_at within a priority.
+        rules.sort(key=lambda r: -r.priority)
+        self.rules: tuple[MerchantRule, ...] = tuple(rules)
+
+        # ── contains → Aho-Corasick ─────────────────────────────────────────
+        contains = [(rank, r.pattern) for rank, r in enumerate(self.rules) if r.match_type == "contains"]
+        self._contains_rank = [rank for rank, _ in contains]
+        self._automaton     = KeywordAutomaton([p for _, p in contains]) if contains else None
+
+        # ── starts_with → prefix trie (best rank ending at each node) ───────
+        trie: list[dict[str, int]] = [{}]
+        best: list[int] = [_NO_MATCH]
+        for rank, rule in enumerate(self.rules):
+            if rule.match_type != "starts_with":
+                continue
+            node = 0
+            for ch in rule.pattern:
+                nxt = trie[node].get(ch)
+                if nxt is None:
+                    nxt = len(trie)
+                    trie[node][ch] = nxt
+                    trie.append({})
+                    best.append(_NO_MATCH)
+                node = nxt
+            best[node] = min(best[node], rank)
+        self._trie, self._trie_best = trie, best
+
+        # ── exact → dict ─────────────────────────────────────────────────────
+        self._exact: dict[str, int] = {}
+        for rank, rule in enumerate(self.rules):
+            if rule.match_type == "exact":
+                self._exact.setdefault(rule.pattern, rank)
+
+        # Factor chosen for each rule, per factor set (see `factor_for`).
+        self._factor_memo: "OrderedDict[int, tuple[object, dict]]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _best_rank(self, text: str) -> int:
+        best = self._exact.get(text, _NO_MATCH)
+
+        node, trie, trie_best = 0, self._trie, self._trie_best
+        for ch in text:
+            node = trie[node].get(ch)
+            if node is None:
+                break
+            if trie_best[node] < best:
+                best = trie_best[node]
+
+        if self._automaton is not None:
+            ranks = self._contains_rank
+            for pid in self._automaton.find_all(text):
+                if ranks[pid] < best:
+                    best = ranks[pid]
+        return best
+
+    def match(self, transaction: dict) -> Optional[MerchantRule]:
+        """Highest-priority rule matching the description or the supplier name."""
+        if not self.rules:
+            return None
+        best = _NO_MATCH
+        for field in ("description", "supplier_name"):
+            text = transaction.get(field)
+            if text:
+                best = min(best, self._best_rank(text.lower()))
+        return self.rules[best] if best != _NO_MATCH else None
+
+    def factor_for(self, rule: MerchantRule, factors: list[dict]) -> Optional[dict]:
+        """
+        The factor in `factors` for a rule's category, chosen like the classify
+        route's fetchFactor(): state grid factor for electricity, activity
+        fragment for fuels and scope 3 categories. None if the set has none.
+        """
+        key = id(factors)
+        with self._memo_lock:
+            memo = self._factor_memo.get(key)
+            if memo and memo[0] is factors:
+                self._factor_memo.move_to_end(key)
+                chosen = memo[1]
+            else:
+                chosen = {}
+                self._factor_memo[key] = (factors, chosen)
+                while len(self._factor_memo) > 32:
+                    self._factor_memo.popitem(last=False)
+            if rule.category_code not in chosen:
+                chosen[rule.category_code] = _pick_factor(rule, factors)
+            return chosen[rule.category_code]
+
+
+def _pick_factor(rule: MerchantRule, factors: list[dict]) -> Optional[dict]:
+    in_scope = registry_for(factors).select(scope=rule.scope)
+    if rule.scope == 2 and rule.category_code == "electricity":
+        return next((f for f in in_scope if f.get("state")), None)
+    fragment = (
+        _SCOPE1_ACTIVITY.get(rule.category_code) if rule.scope == 1
+        else _SCOPE3_ACTIVITY.get(rule.category_code) if rule.scope == 3
+        else None
+    )
+    if fragment is None:
+        return None
+    return next(
+        (f for f in in_scope if fragment in (f.get("activity") or "").lower()),
+        None,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Hot-reloading holder
+# ---------------------------------------------------------------------------
+
+class MerchantRules:
+    """Serves the current engine; rebuilds it when the rules table changes."""
+
+    def __init__(self, check_seconds: float = MERCHANT_RULES_CHECK_SECONDS) -> None:
+        self.check_seconds = check_seconds
+        self._engine       = MerchantRuleEngine([])
+        self._fingerprint: Optional[str] = None
+        self._checked_at   = 0.0
+        self._lock         = threading.Lock()
+        self.loads         = 0
+        self.last_error: Optional[str] = None
+
+    def engine(self) -> MerchantRuleEngine:
+        """Current engine; checks for rule edits at most every `check_seconds`."""
+        if not MERCHANT_RULES_ENABLED or not os.environ.get("DATABASE_URL"):
+            return self._engine
+        if time.monotonic() - self._checked_at >= self.check_seconds:
+            # One thread refreshes; the others keep using the current engine.
+            if self._lock.acquire(blocking=False):
+                try:
+                    self._refresh()
+                finally:
+                    self._lock.release()
+        return self._engine
+
+    def reload(self) -> int:
+        """Force a check (used at startup). Returns the number of active rules."""
+        self._checked_at = 0.0
+        return len(self.engine())
+
+    def load(self, rows: list[dict]) -> None:
+        """Install a rule set directly (tests, benchmarks)."""
+        self._engine = MerchantRuleEngine(rows)
+
+    def _refresh(self) -> None:
+        self._checked_at = time.monotonic()
+        try:
+            fingerprint = fetch_merchant_rules_fingerprint()
+            if fingerprint is None or fingerprint == self._fingerprint:
+                return
+            engine = MerchantRuleEngine(fetch_merchant_rules())
+        except Exception as exc:
+            self.last_error = str(exc)
+            logger.warning("Merchant rule reload failed: %s", exc)
+            return
+        self._engine, self._fingerprint = engine, fingerprint
+        self.loads += 1
+        logger.info("Merchant rules loaded: %d active rules.", len(engine))
+
+    def stats(self) -> dict:
+        return {
+            "rules":       len(self._engine),
+            "fingerprint": self._fingerprint,
+            "loads":       self.loads,
+            "last_error":  self.last_error,
+        }
+
+
+merchant_rules = MerchantRules()
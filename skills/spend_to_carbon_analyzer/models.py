@@ -5,12 +5,18 @@ All monetary values are AUD. All emission values are kg CO2e.
 
 from __future__ import annotations
 
-from datetime import date
+from datetime import date, datetime
 from enum import Enum
 from typing import Optional
 from uuid import UUID
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+# Upper bound for one POST /analyse/jobs submission.
+ANALYSIS_JOB_MAX_TRANSACTIONS = 100_000
+
+# Upper bound for one POST /review/resolve call.
+REVIEW_MAX_DECISIONS = 1_000
 
 
 # ---------------------------------------------------------------------------
@@ -31,6 +37,23 @@ class CalculationMethod(str, Enum):
     HYBRID         = "hybrid"
 
 
+class JobStatus(str, Enum):
+    QUEUED    = "queued"
+    RUNNING   = "running"
+    COMPLETED = "completed"
+    FAILED    = "failed"
+
+
+class ReportPeriod(str, Enum):
+    MONTH   = "month"
+    QUARTER = "quarter"
+
+
+class ReviewAction(str, Enum):
+    ACCEPT   = "accept"      # confirm the suggested factor
+    OVERRIDE = "override"    # replace it with emission_factor_id
+
+
 class EmissionScope(int, Enum):
     SCOPE_1 = 1
     SCOPE_2 = 2
@@ -99,6 +122,49 @@ class AnalyseRequest(BaseModel):
     )
 
 
+class ReviewDecision(BaseModel):
+    """A reviewer's verdict on one queued transaction."""
+    transaction_id:     UUID
+    action:             ReviewAction
+    emission_factor_id: Optional[UUID] = Field(None, description="Replacement factor (override only).")
+    note:               Optional[str]  = Field(None, max_length=1000)
+
+    @model_validator(mode="after")
+    def override_needs_factor(self) -> "ReviewDecision":
+        if self.action == ReviewAction.OVERRIDE and self.emission_factor_id is None:
+            raise ValueError("override requires emission_factor_id")
+        return self
+
+
+class ReviewResolveRequest(BaseModel):
+    """Request body for POST /review/resolve."""
+
+    company_id:  UUID = Field(..., description="EcoLink company UUID.")
+    reviewer_id: UUID = Field(..., description="users.id of the reviewer (recorded in the audit log).")
+    decisions:   list[ReviewDecision] = Field(..., min_length=1, max_length=REVIEW_MAX_DECISIONS)
+
+
+class AnalyseJobRequest(BaseModel):
+    """Request body for POST /analyse/jobs — a full-year ledger, processed in the background."""
+
+    company_id: UUID = Field(..., description="EcoLink company UUID.")
+    transactions: list[TransactionInput] = Field(
+        ...,
+        min_length=1,
+        max_length=ANALYSIS_JOB_MAX_TRANSACTIONS,
+        description="Transactions to classify and measure.",
+    )
+    nga_year: int = Field(
+        2024,
+        description="NGA Factors publication year to use (default: 2024 = 2023–24 edition).",
+    )
+    state: Optional[str] = Field(
+        None,
+        description="Australian state for state-specific electricity factors (NSW, VIC, QLD, etc.).",
+        pattern=r"^(NSW|VIC|QLD|WA|SA|TAS|ACT|NT)$",
+    )
+
+
 # ---------------------------------------------------------------------------
 # Output models
 # ---------------------------------------------------------------------------
@@ -186,3 +252,148 @@ class AnalyseResponse(BaseModel):
     coverage_pct:           float = Field(
         ..., description="Percentage of total AUD spend successfully classified."
     )
+
+
+class AnalyseStreamSummary(BaseModel):
+    """
+    AnalyseResponse without `results` — the trailing record of
+    POST /analyse/stream and the `summary` of an analysis job.
+    """
+
+    company_id:             UUID
+    nga_year:               int
+    state:                  Optional[str]
+
+    # Aggregated totals
+    total_co2e_kg:          float
+    total_scope1_co2e_kg:   float
+    total_scope2_co2e_kg:   float
+    total_scope3_co2e_kg:   float
+
+    # Breakdowns
+    by_scope:               list[ScopeSummary]
+    by_category:            list[CategorySummary]
+
+    # Quality metrics
+    total_transactions:     int
+    classified_count:       int
+    needs_review_count:     int
+    factor_not_found_count: int
+    coverage_pct:           float
+    error_count:            int = Field(0, description="NDJSON lines rejected by validation.")
+
+
+class PeriodSummary(BaseModel):
+    """Emission totals for one month or financial quarter."""
+    period:         str  = Field(..., examples=["2024-07", "FY2025 Q1"])
+    period_start:   date
+    co2e_kg:        float
+    scope1_co2e_kg: float
+    scope2_co2e_kg: float
+    scope3_co2e_kg: float
+    tx_count:       int
+
+
+class ReportAggregateResponse(BaseModel):
+    """Response from GET /reports/aggregate — AnalyseResponse's summary for stored transactions."""
+
+    company_id:             UUID
+    date_from:              date
+    date_to:                date
+    period:                 ReportPeriod
+    source:                 str = Field(..., description="`rollups` (emission_rollups) or `transactions`.")
+
+    # Aggregated totals
+    total_co2e_kg:          float
+    total_scope1_co2e_kg:   float
+    total_scope2_co2e_kg:   float
+    total_scope3_co2e_kg:   float
+
+    # Breakdowns
+    by_scope:               list[ScopeSummary]
+    by_category:            list[CategorySummary]
+    by_period:              list[PeriodSummary]
+
+    # Quality metrics
+    total_transactions:     int
+    classified_count:       int
+    needs_review_count:     int
+    factor_not_found_count: int
+    coverage_pct:           float
+
+
+class ReviewCandidate(BaseModel):
+    """A candidate factor for a queued transaction, by text relevance."""
+    factor_id: UUID
+    activity:  str
+    category:  str
+    scope:     int
+    unit:      str
+    method:    CalculationMethod
+    score:     float
+
+
+class ReviewItem(BaseModel):
+    """One unresolved transaction in the review queue."""
+    transaction_id:       UUID
+    transaction_date:     date
+    description:          str
+    supplier_name:        Optional[str]
+    account_name:         Optional[str]
+    amount_aud:           float
+    status:               ClassificationStatus
+    confidence:           Optional[float]
+    classification_notes: Optional[str]
+    suggested_factor_id:  Optional[UUID]
+    co2e_kg:              Optional[float]
+    scope:                Optional[int]
+    candidates:           list[ReviewCandidate]
+
+
+class ReviewQueueResponse(BaseModel):
+    """Response from GET /review/queue."""
+    company_id: UUID
+    queue_size: int = Field(..., description="Unresolved transactions left, including these.")
+    items:      list[ReviewItem]
+
+
+class ReviewResolveResponse(BaseModel):
+    """Response from POST /review/resolve."""
+    resolved: list[UUID]
+    skipped:  list[UUID] = Field(
+        ..., description="Not resolved: unknown, already resolved, another company's, or accepted without a factor."
+    )
+
+
+class AnalyseJobCreated(BaseModel):
+    """Response from POST /analyse/jobs."""
+    job_id:             UUID
+    status:             JobStatus
+    total_transactions: int
+    created_at:         datetime
+
+
+class AnalyseJobStatus(BaseModel):
+    """Response from GET /analyse/jobs/{job_id}."""
+
+    job_id:                 UUID
+    company_id:             UUID
+    status:                 JobStatus
+    nga_year:               int
+    state:                  Optional[str]
+
+    # Progress
+    total_transactions:     int
+    processed_transactions: int
+    progress_pct:           float
+
+    # Running totals while the job runs; final totals once completed.
+    summary:                AnalyseStreamSummary
+    error:                  Optional[str]
+
+    created_at:             datetime
+    updated_at:             datetime
+    completed_at:           Optional[datetime]
+
+    # Page of per-transaction results (only when include_results=true).
+    results:                Optional[list[ClassifiedTransaction]] = None
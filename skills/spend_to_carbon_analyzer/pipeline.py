@@ -0,0 +1,253 @@
+"""
+EcoLink Australia — Shared analysis pipeline.
+
+The classify → calculate → summarise steps used by every entry point:
+POST /analyse, the /analyse/stream NDJSON endpoint and the background
+analysis-job workers (`jobs.py`).
+
+Results come out either as Pydantic models (`to_classified_transaction`,
+`summary_fields`) or, for the fast response path, as the JSON-ready dicts
+those models would dump to (`classified_row`, `summary_values`), built
+straight from the trusted internal rows without model validation.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from .batch_calculator import calculate_batch
+from .calculator import RunningAggregate, calculate_co2e
+from .classifier import candidate_factors, classify_batch
+from .factor_registry import FactorRegistry, factor_summary, factor_summary_row, registry_for
+from .models import (
+    ReviewCandidate,
+    ReviewItem,
+    CategorySummary,
+    ClassificationStatus,
+    ClassifiedTransaction,
+    EmissionFactorSummary,
+    ScopeSummary,
+)
+
+
+def classify_and_calculate(
+    tx_dicts: list[dict],
+    factors,
+    aggregate: Optional[RunningAggregate] = None,
+) -> list[dict]:
+    """
+    Classify a batch and attach CO2e figures. Blocking (LLM calls + CPU).
+
+    CO2e is computed column-wise by `calculate_batch`; when `aggregate` is
+    given the batch's totals are folded into it in the same pass, exactly
+    as `aggregate.add(enriched)` would.
+    """
+    classifications = classify_batch(tx_dicts, factors)
+    batch = calculate_batch(tx_dicts, classifications, aggregate, registry=registry_for(factors))
+
+    enriched: list[dict] = []
+    for i, (tx_dict, clf) in enumerate(zip(tx_dicts, classifications)):
+        calc = batch.row(i)
+        factor = clf.get("matched_factor")
+        enriched.append({
+            **tx_dict,
+            "matched_factor":          factor,
+            "classification_status":   clf["status"],
+            "classification_confidence": clf.get("confidence"),
+            "classification_notes":    clf.get("notes"),
+            "emission_factor_id":      str(factor["id"]) if factor else None,
+            "quantity_value":          calc["quantity_value"],
+            "quantity_unit":           calc["quantity_unit"],
+            "co2e_kg":                 calc["co2e_kg"],
+            "scope":                   factor["scope"] if factor else None,
+        })
+    return enriched
+
+
+def to_classified_transaction(
+    e: dict,
+    nga_year: int,
+    registry: Optional[FactorRegistry] = None,
+) -> ClassifiedTransaction:
+    """
+    Response row for an enriched transaction. With the factor set's
+    `registry`, rows matching the same factor share one factor summary.
+    """
+    factor = e.get("matched_factor")
+    ef_summary: Optional[EmissionFactorSummary] = None
+    if factor:
+        ef_summary = (
+            registry.summary(factor, nga_year) if registry is not None
+            else factor_summary(factor, nga_year)
+        )
+
+    return ClassifiedTransaction(
+        description             = e["description"],
+        amount_aud              = e["amount_aud"],
+        transaction_date        = e["transaction_date"],
+        supplier_name           = e.get("supplier_name"),
+        external_id             = e.get("external_id"),
+        status                  = ClassificationStatus(e["classification_status"]),
+        confidence              = e.get("classification_confidence"),
+        classification_notes    = e.get("classification_notes"),
+        emission_factor         = ef_summary,
+        quantity_value          = e.get("quantity_value"),
+        quantity_unit           = e.get("quantity_unit"),
+        co2e_kg                 = e.get("co2e_kg"),
+        scope                   = e.get("scope"),
+    )
+
+
+def _float(value) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+def classified_row(
+    e: dict,
+    nga_year: int,
+    registry: Optional[FactorRegistry] = None,
+) -> dict:
+    """
+    `to_classified_transaction(e, nga_year, registry).model_dump(mode="json")`
+    without building the models: same keys, order and coercions.
+    """
+    factor = e.get("matched_factor")
+    ef_row: Optional[dict] = None
+    if factor:
+        ef_row = (
+            registry.summary_row(factor, nga_year) if registry is not None
+            else factor_summary_row(factor, nga_year)
+        )
+    scope = e.get("scope")
+
+    return {
+        "description":          e["description"],
+        "amount_aud":           float(e["amount_aud"]),
+        "transaction_date":     e["transaction_date"].isoformat(),
+        "supplier_name":        e.get("supplier_name"),
+        "external_id":          e.get("external_id"),
+        "status":               ClassificationStatus(e["classification_status"]).value,
+        "confidence":           _float(e.get("classification_confidence")),
+        "classification_notes": e.get("classification_notes"),
+        "emission_factor":      ef_row,
+        "quantity_value":       _float(e.get("quantity_value")),
+        "quantity_unit":        e.get("quantity_unit"),
+        "co2e_kg":              _float(e.get("co2e_kg")),
+        "scope":                None if scope is None else int(scope),
+    }
+
+
+def summary_values(aggregate: RunningAggregate) -> dict:
+    """
+    AnalyseResponse totals, breakdowns and quality metrics for an aggregate,
+    as JSON-ready values (`summary_fields` wraps the breakdowns in models).
+    """
+    aggregation  = aggregate.result()
+    scope_totals = aggregation["scope_totals"]
+    total_co2e   = aggregation["total_co2e_kg"]
+
+    coverage_pct = (
+        round(aggregate.classified_amount_aud / aggregate.total_amount_aud * 100, 1)
+        if aggregate.total_amount_aud > 0 else 0.0
+    )
+
+    # Scope summary
+    by_scope: list[dict] = []
+    for s in [1, 2, 3]:
+        co2e = float(scope_totals.get(s, 0.0))
+        pct = round(co2e / total_co2e * 100, 1) if total_co2e > 0 else 0.0
+        by_scope.append({"scope": s, "co2e_kg": co2e, "tx_count": aggregate.scope_counts[s], "percentage": pct})
+
+    # Category summary
+    by_category: list[dict] = [
+        {
+            "category": c["category"],
+            "scope":    c["scope"],
+            "co2e_kg":  float(c["co2e_kg"]),
+            "tx_count": c["tx_count"],
+        }
+        for c in aggregation["by_category"]
+    ]
+
+    status_counts = aggregate.status_counts
+    return {
+        "total_co2e_kg":          float(total_co2e),
+        "total_scope1_co2e_kg":   float(scope_totals.get(1, 0.0)),
+        "total_scope2_co2e_kg":   float(scope_totals.get(2, 0.0)),
+        "total_scope3_co2e_kg":   float(scope_totals.get(3, 0.0)),
+        "by_scope":               by_scope,
+        "by_category":            by_category,
+        "total_transactions":     aggregate.total_transactions,
+        "classified_count":       status_counts.get("classified", 0),
+        "needs_review_count":     status_counts.get("needs_review", 0),
+        "factor_not_found_count": status_counts.get("factor_not_found", 0),
+        "coverage_pct":           float(coverage_pct),
+    }
+
+
+def summary_fields(aggregate: RunningAggregate) -> dict:
+    """AnalyseResponse totals, breakdowns and quality metrics for an aggregate."""
+    values = summary_values(aggregate)
+    return {
+        **values,
+        "by_scope":    [ScopeSummary(**s) for s in values["by_scope"]],
+        "by_category": [CategorySummary(**c) for c in values["by_category"]],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Review queue
+# ---------------------------------------------------------------------------
+
+def review_item(row: dict, factors, k: int) -> ReviewItem:
+    """A queued transaction row with its `k` best candidate factors from `factors`."""
+    return ReviewItem(
+        transaction_id       = row["id"],
+        transaction_date     = row["transaction_date"],
+        description          = row["description"],
+        supplier_name        = row["supplier_name"],
+        account_name         = row["account_name"],
+        amount_aud           = float(row["amount_aud"]),
+        status               = row["classification_status"],
+        confidence           = _float(row["classification_confidence"]),
+        classification_notes = row["classification_notes"],
+        suggested_factor_id  = row["emission_factor_id"],
+        co2e_kg              = _float(row["co2e_kg"]),
+        scope                = row["scope"],
+        candidates           = [
+            ReviewCandidate(
+                factor_id = f["id"],
+                activity  = f["activity"],
+                category  = f["category"],
+                scope     = f["scope"],
+                unit      = f["unit"],
+                method    = f["calculation_method"],
+                score     = round(score, 3),
+            )
+            for f, score in candidate_factors(row, factors, k)
+        ],
+    )
+
+
+def override_decision(row: dict, factor: dict, note: Optional[str]) -> dict:
+    """
+    `async_db.resolve_reviews` arguments for replacing a row's factor: CO2e,
+    quantity and scope recomputed against the new factor.
+    """
+    tx = {
+        "description":    row["description"],
+        "amount_aud":     float(row["amount_aud"]),
+        "quantity_value": _float(row["quantity_value"]),
+        "quantity_unit":  row["quantity_unit"],
+    }
+    calc = calculate_co2e(tx, {"matched_factor": factor})
+    return {
+        "id":             str(row["id"]),
+        "action":         "override",
+        "factor_id":      str(factor["id"]),
+        "co2e_kg":        calc["co2e_kg"],
+        "scope":          factor["scope"],
+        "quantity_value": calc["quantity_value"],
+        "quantity_unit":  calc["quantity_unit"],
+        "note":           note,
+    }
@@ -0,0 +1,344 @@
+"""
+EcoLink Australia — LLM provider health: circuit breakers, hedging, limits.
+
+Every keyword miss used to wait for Groq to fail before trying Gemini, so a
+slow or dead Groq put its full timeout on every unmatched line. Each
+provider is now wrapped in a `Provider`:
+
+  - explicit timeout — passed to the SDK call (LLM_TIMEOUT_SECONDS);
+  - rate limits — the provider's own token bucket (GROQ_MAX_RPS /
+    GEMINI_MAX_RPS) plus one bucket shared by both (LLM_MAX_RPS), so
+    hedged duplicates cannot exceed the overall quota. Waiting for a token
+    is bounded by the timeout too;
+  - circuit breaker — LLM_BREAKER_FAILURES consecutive failures open the
+    circuit: calls are skipped instantly for LLM_BREAKER_COOLDOWN_SECONDS,
+    then one probe call decides between closing and re-opening;
+  - latency window — the recent successful call latencies, whose p95 is
+    the hedge delay.
+
+`first_answer(primary, fallback)` runs the primary; if it has not answered
+by its p95 latency — timed from when it starts running, not from when it
+was queued — the fallback is started as well (a hedged request) and the
+first usable answer wins; a loser still queued is cancelled. An open
+primary circuit goes straight to the fallback. `snapshot()` is reported on
+/health.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+from .ratelimit import TokenBucket, bucket_from_env
+
+logger = logging.getLogger("ecolink.providers")
+
+LLM_TIMEOUT_SECONDS  = float(os.environ.get("LLM_TIMEOUT_SECONDS", "20"))
+LLM_BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN = float(os.environ.get("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+LLM_HEDGE            = os.environ.get("LLM_HEDGE", "1") != "0"
+LLM_HEDGE_DEFAULT    = float(os.environ.get("LLM_HEDGE_DEFAULT_SECONDS", "1.0"))  # until p95 is known
+LLM_HEDGE_MIN        = float(os.environ.get("LLM_HEDGE_MIN_SECONDS", "0.25"))
+LLM_HEDGE_WORKERS    = int(os.environ.get("LLM_HEDGE_WORKERS", "16"))
+
+HEDGE_PERCENTILE = 0.95
+_LATENCY_WINDOW  = 200      # recent successful calls per provider
+_MIN_SAMPLES     = 20       # before the observed p95 replaces LLM_HEDGE_DEFAULT
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+Request = Callable[[float], Optional[dict]]
+
+# Caps every provider call together (hedging sends some prompts twice).
+_SHARED_LIMITER = bucket_from_env("LLM_MAX_RPS")
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe."""
+
+    def __init__(
+        self,
+        failure_threshold: int = LLM_BREAKER_FAILURES,
+        cooldown_seconds: float = LLM_BREAKER_COOLDOWN,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds  = cooldown_seconds
+        self.state      = CLOSED
+        self.failures   = 0
+        self.opens      = 0
+        self._opened_at = 0.0
+        self._probing   = False
+        self._lock      = threading.Lock()
+
+    def blocked(self) -> bool:
+        """True while calls would be refused — open and cooling down, or probe in flight."""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self._opened_at < self.cooldown_seconds
+            return self.state == HALF_OPEN and self._probing
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (claims the probe when half-open)."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state, self.failures, self._probing = CLOSED, 0, False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opens += 1
+                self.state, self._opened_at, self._probing = OPEN, time.monotonic(), False
+
+    def reset(self) -> None:
+        with self._lock:
+            self.state, self.failures, self._probing = CLOSED, 0, False
+
+
+class LatencyWindow:
+    """Latencies of the last `size` successful calls."""
+
+    def __init__(self, size: int = _LATENCY_WINDOW) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+
+class Provider:
+    """One LLM provider behind a timeout, rate limits and a circuit breaker."""
+
+    def __init__(
+        self,
+        name: str,
+        limiter: TokenBucket,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.name    = name
+        self.limiter = limiter
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyWindow()
+        self._lock   = threading.Lock()
+        self.calls = self.successes = self.failures = 0
+        self.short_circuited = self.rate_limited = 0
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def call(self, request: Request) -> Optional[dict]:
+        """
+        Run `request(timeout)`. Returns its answer, or None when the circuit
+        is open, no rate-limit token came within the timeout, or the call
+        failed (exceptions are logged, not raised).
+        """
+        if self.breaker.blocked():
+            self._count("short_circuited")
+            return None
+        if not (self.limiter.acquire(timeout=self.timeout) and _SHARED_LIMITER.acquire(timeout=self.timeout)):
+            self._count("rate_limited")
+            return None
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            return None
+
+        self._count("calls")
+        started = time.monotonic()
+        try:
+            answer = request(self.timeout)
+        except Exception as exc:
+            logger.warning("%s classification failed: %s", self.name, exc)
+            answer = None
+
+        if answer is None:
+            self._count("failures")
+            self.breaker.record_failure()
+        else:
+            self._count("successes")
+            self.breaker.record_success()
+            self.latency.add(time.monotonic() - started)
+        return answer
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for this provider before starting the fallback as well."""
+        p95 = self.latency.percentile(HEDGE_PERCENTILE) if len(self.latency) >= _MIN_SAMPLES else None
+        delay = max(LLM_HEDGE_MIN, p95 if p95 is not None else LLM_HEDGE_DEFAULT)
+        # Never wait out most of the timeout before hedging.
+        return min(delay, self.timeout / 2)
+
+    def reset(self) -> None:
+        self.breaker.reset()
+        self.latency.clear()
+
+    def snapshot(self) -> dict:
+        p50 = self.latency.percentile(0.50)
+        p95 = self.latency.percentile(HEDGE_PERCENTILE)
+        return {
+            "state":            self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "opens":            self.breaker.opens,
+            "calls":            self.calls,
+            "successes":        self.successes,
+            "failures":         self.failures,
+            "short_circuited":  self.short_circuited,
+            "rate_limited":     self.rate_limited,
+            "latency_p50_ms":   round(p50 * 1000, 1) if p50 is not None else None,
+            "latency_p95_ms":   round(p95 * 1000, 1) if p95 is not None else None,
+            "hedge_delay_ms":   round(self.hedge_delay() * 1000, 1),
+            "timeout_s":        self.timeout,
+        }
+
+
+GROQ   = Provider("Groq",   bucket_from_env("GROQ_MAX_RPS"))
+GEMINI = Provider("Gemini", bucket_from_env("GEMINI_MAX_RPS"))
+
+# ---------------------------------------------------------------------------
+# Hedged requests
+# ---------------------------------------------------------------------------
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+hedges = 0
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=LLM_HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+    return _pool
+
+
+def first_answer(
+    primary: Provider,
+    primary_request: Request,
+    fallback: Provider,
+    fallback_request: Request,
+    label: str = "",
+) -> Optional[dict]:
+    """
+    The primary's answer, or the fallback's when the primary fails, is
+    skipped by its breaker, or is still running after its hedge delay (then
+    both run and the first usable answer wins). None if neither answers.
+    """
+    global hedges
+
+    started = threading.Event()
+
+    def ask_primary() -> Optional[dict]:
+        started.set()
+        return primary.call(primary_request)
+
+    def ask_fallback() -> Optional[dict]:
+        return fallback.call(fallback_request)
+
+    def in_turn() -> Optional[dict]:
+        answer = ask_primary()
+        if answer is None:
+            logger.info("Falling back to %s for: %s", fallback.name, label)
+            answer = ask_fallback()
+        return answer
+
+    if not LLM_HEDGE or primary.breaker.state != CLOSED:
+        return in_turn()
+
+    # Each call is bounded by its provider timeout (and token wait).
+    budget = 2 * max(primary.timeout, fallback.timeout)
+    first = _executor().submit(ask_primary)
+    # The hedge clock starts when the primary does: time spent queued behind
+    # other prompts in a busy pool is not provider latency, and hedging it
+    # would only queue a second paid call behind the first.
+    if not started.wait(timeout=budget) and first.cancel():
+        logger.warning("Hedge pool busy for %.0fs — asking in turn for: %s", budget, label)
+        return in_turn()
+
+    def hedge() -> Optional[dict]:
+        # Dequeued after the primary answered, before the caller cancelled it.
+        if first.done() and first.result() is not None:
+            return None
+        return ask_fallback()
+
+    pending: set[Future] = {first}
+    try:
+        done, pending = wait(pending, timeout=primary.hedge_delay())
+        if done:
+            answer = done.pop().result()
+            if answer is not None:
+                return answer
+            logger.info("Falling back to %s for: %s", fallback.name, label)
+            return ask_fallback()
+
+        with _pool_lock:
+            hedges += 1
+        logger.info("%s slower than %.2fs — hedging with %s for: %s",
+                    primary.name, primary.hedge_delay(), fallback.name, label)
+        pending.add(_executor().submit(hedge))
+        deadline = time.monotonic() + budget
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                answer = future.result()
+                if answer is not None:
+                    return answer
+        return None
+    finally:
+        # A losing call still queued never goes out; one already running
+        # cannot be interrupted and finishes on its own.
+        for future in pending:
+            future.cancel()
+
+
+def shutdown() -> None:
+    """Stop the hedge threads. Queued calls are cancelled; losing calls still in flight are abandoned."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def snapshot() -> dict:
+    """Provider health for /health."""
+    return {
+        "groq":   GROQ.snapshot(),
+        "gemini": GEMINI.snapshot(),
+        "hedges": hedges,
+        "hedging": LLM_HEDGE,
+    }
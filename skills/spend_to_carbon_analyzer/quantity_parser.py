@@ -0,0 +1,166 @@
+"""
+EcoLink Australia — Quantity tokenizer for transaction descriptions.
+
+One compiled pattern finds every "<number> <unit>" pair in a description
+in a single scan ("Diesel 2 kL + 40 litres" → (2, kL), (40, L)). Unit
+spellings are normalised to the factor units used in emission_factors
+(litres/ltr/L → L, megawatt hours → MWh, ...), and units of the same
+family convert into each other:
+
+  volume       L, kL          (1 kL = 1,000 L)
+  electricity  kWh, MWh       (1 MWh = 1,000 kWh)
+  energy       MJ, GJ         (1 GJ = 1,000 MJ)
+  mass         kg, tonne      (1 tonne = 1,000 kg)
+  km, m3                      (no conversions)
+
+Parses are cached per description (QUANTITY_CACHE_SIZE entries), so the
+calculator's description fallback and the LLM quantity-hint
+reconciliation share one scan per description, however many rows or
+candidate factor units look at it.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from decimal import Decimal
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+QUANTITY_CACHE_SIZE = int(os.environ.get("QUANTITY_CACHE_SIZE", "20000"))
+
+
+class Quantity(NamedTuple):
+    value: float
+    unit:  str      # canonical unit, e.g. "kL"
+
+
+# canonical unit → (family, scale within the family)
+_UNITS: dict[str, tuple[str, int]] = {
+    "L":     ("volume", 1),
+    "kL":    ("volume", 1_000),
+    "kWh":   ("electricity", 1),
+    "MWh":   ("electricity", 1_000),
+    "MJ":    ("energy", 1),
+    "GJ":    ("energy", 1_000),
+    "kg":    ("mass", 1),
+    "tonne": ("mass", 1_000),
+    "km":    ("distance", 1),
+    "m3":    ("gas_volume", 1),
+}
+
+# Spellings accepted in descriptions / hints (matched case-insensitively).
+_ALIASES: dict[str, tuple[str, ...]] = {
+    "L":     ("l", "ltr", "ltrs", "litre", "litres", "liter", "liters"),
+    "kL":    ("kl", "kilolitre", "kilolitres", "kiloliter", "kiloliters"),
+    "kWh":   ("kwh", "kilowatt hour", "kilowatt hours", "kilowatt-hour", "kilowatt-hours"),
+    "MWh":   ("mwh", "megawatt hour", "megawatt hours", "megawatt-hour", "megawatt-hours"),
+    "MJ":    ("mj", "megajoule", "megajoules"),
+    "GJ":    ("gj", "gigajoule", "gigajoules"),
+    "kg":    ("kg", "kgs", "kilogram", "kilograms"),
+    "tonne": ("tonne", "tonnes", "ton", "tons"),
+    "km":    ("km", "kms", "kilometre", "kilometres", "kilometer", "kilometers"),
+    "m3":    ("m3", "cubic metre", "cubic metres", "cubic meter", "cubic meters"),
+}
+
+_CANONICAL: dict[str, str] = {
+    alias: unit for unit, aliases in _ALIASES.items() for alias in aliases
+}
+
+# Longest spelling first so "litres" wins over "l"; the unit must end at a
+# word boundary ("5 Lunches" and "3 kmart" are not quantities).
+_UNIT_ALT = "|".join(
+    re.escape(alias).replace(r"\ ", r"\s*")
+    for alias in sorted(_CANONICAL, key=len, reverse=True)
+)
+_QUANTITY_RE = re.compile(
+    rf"(\d{{1,3}}(?:,\d{{3}})+(?:\.\d+)?|\d+(?:\.\d+)?)\s*({_UNIT_ALT})\b",
+    re.I,
+)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def canonical_unit(unit: Optional[str]) -> Optional[str]:
+    """'Litres' → 'L', 'mwh' → 'MWh'; None for units the tokenizer doesn't know."""
+    if not unit:
+        return None
+    return _CANONICAL.get(_SPACE_RE.sub(" ", str(unit).strip().lower()))
+
+
+def convert_quantity(value: float, unit: Optional[str], target_unit: str) -> Optional[float]:
+    """`value` in `unit` expressed in `target_unit`, or None if they don't convert."""
+    if unit and str(unit).strip().lower() == str(target_unit).strip().lower():
+        return value
+    source, target = canonical_unit(unit), canonical_unit(target_unit)
+    if source is None or target is None:
+        return None
+    if source == target:
+        return value
+    (family, scale), (target_family, target_scale) = _UNITS[source], _UNITS[target]
+    if family != target_family:
+        return None
+    # Decimal keeps "45.2 L" → 0.0452 kL free of binary artefacts.
+    return float(Decimal(repr(float(value))) * scale / target_scale)
+
+
+@lru_cache(maxsize=QUANTITY_CACHE_SIZE)
+def parse_quantities(description: str) -> tuple[Quantity, ...]:
+    """Every (value, canonical unit) pair in the description, in order of appearance."""
+    return tuple(
+        Quantity(float(number.replace(",", "")), _CANONICAL[_SPACE_RE.sub(" ", unit.lower())])
+        for number, unit in _QUANTITY_RE.findall(description)
+    )
+
+
+def quantity_in_unit(description: str, unit: str) -> Optional[float]:
+    """
+    Quantity from the description expressed in `unit`. A figure already in
+    that unit wins; otherwise the first convertible one is converted
+    ("2 kL" → 2000.0 for a per-litre factor).
+    """
+    target = canonical_unit(unit)
+    if target is None:
+        return None
+    quantities = parse_quantities(description)
+    for q in quantities:
+        if q.unit == target:
+            return q.value
+    for q in quantities:
+        converted = convert_quantity(q.value, q.unit, target)
+        if converted is not None:
+            return converted
+    return None
+
+
+def reconcile_quantity_hint(hint: Optional[dict], description: str, unit: str) -> Optional[float]:
+    """
+    The LLM's quantity_hint expressed in the factor's `unit`, or None.
+
+    The model often echoes a figure from the description but labels it
+    with the factor's unit ("2 MWh" reported as {value: 2, unit: "kWh"}).
+    When the hint's value appears in the description, the description's
+    unit is trusted; otherwise the hint's own unit is converted.
+    """
+    if not hint or not hint.get("value") or not hint.get("unit"):
+        return None
+    try:
+        value = float(hint["value"])
+    except (TypeError, ValueError):
+        return None
+
+    for q in parse_quantities(description):
+        if q.value == value:
+            converted = convert_quantity(q.value, q.unit, unit)
+            if converted is not None:
+                return converted
+    return convert_quantity(value, hint["unit"], unit)
+
+
+def cache_stats() -> dict:
+    info = parse_quantities.cache_info()
+    return {
+        "entries":  info.currsize,
+        "capacity": info.maxsize,
+        "hits":     info.hits,
+        "misses":   info.misses,
+    }
@@ -0,0 +1,66 @@
+"""
+EcoLink Australia — Thread-safe token-bucket rate limiter.
+
+Used to keep concurrent LLM classification under each provider's
+requests-per-second quota (Groq / Gemini free and paid tiers differ).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, bursting up to `burst`.
+
+    A rate of 0 (or less) disables limiting — `acquire()` returns immediately.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate     = float(rate)
+        self.capacity = float(burst if burst is not None else max(self.rate, 1.0))
+        self._tokens  = self.capacity
+        self._updated = time.monotonic()
+        self._lock    = threading.Lock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens  = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """
+        Block until `tokens` are available. Returns False if `timeout`
+        seconds pass first, True otherwise.
+        """
+        if self.unlimited:
+            return True
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+def bucket_from_env(var: str) -> TokenBucket:
+    """Build a bucket from a `<PROVIDER>_MAX_RPS` style env var (unset = unlimited)."""
+    return TokenBucket(float(os.environ.get(var, "0") or 0))
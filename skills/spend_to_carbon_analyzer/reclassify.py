@@ -0,0 +1,258 @@
+"""
+EcoLink Australia — Factor refresh: recompute stored CO2e after factors change.
+
+Factor refreshes (migrations 014, 017) edit factor values in place or
+publish a new NGA edition. Rather than re-running /analyse over every
+ledger, this job diffs the factor sets and rewrites only the transactions
+under a changed factor:
+
+    python -m skills.spend_to_carbon_analyzer.reclassify plan [--from-year 2024 --to-year 2025] [--since DATE] [--company ID]
+    python -m skills.spend_to_carbon_analyzer.reclassify run  [...] [--workers 4] [--batch 5000]
+
+  - In place: factors whose co2e_factor, unit, method or scope differ from
+    `emission_factor_applied` (migration 029) — what the ledger was
+    computed with.
+  - Edition move (--from-year / --to-year): rows on a from_year factor move
+    to its to_year successor (same activity and state). Factors the new
+    edition dropped are listed by `plan` and left alone. --since limits the
+    move to transactions dated on or after a day (the first reporting
+    period the new edition applies to).
+
+Per company, rows whose factor kept its unit and method are recomputed by
+one UPDATE (stored quantity × new factor). The rest go through
+`calculate_batch` in keyset pages, one UPDATE per page. Rows locked to a
+report are never touched. The rollup triggers (migration 026) apply the
+deltas; a company whose rollups still drift afterwards (a factor changed
+category) is rebuilt.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Optional
+
+from . import db
+from .batch_calculator import calculate_batch
+from .factor_registry import FactorRegistry
+
+logger = logging.getLogger("ecolink.reclassify")
+
+_FIRST_ID = "00000000-0000-0000-0000-000000000000"
+
+
+def is_arithmetic(change: dict) -> bool:
+    """True when the new factor keeps the unit and method: co2e = stored quantity × new value."""
+    return change["unit"] == change["old_unit"] and change["calculation_method"] == change["old_method"]
+
+
+def new_factor_registry(changes: list[dict]) -> FactorRegistry:
+    """Registry over the replacement factors of a diff, keyed by new_id."""
+    factors = {
+        c["new_id"]: {
+            "id":                 c["new_id"],
+            "activity":           c["activity"],
+            "category":           c["category"],
+            "scope":              c["scope"],
+            "unit":               c["unit"],
+            "calculation_method": c["calculation_method"],
+            "co2e_factor":        c["co2e_factor"],
+        }
+        for c in changes
+        if c["new_id"] is not None
+    }
+    return FactorRegistry(factors.values())
+
+
+def recalculate(rows: list[dict], registry: FactorRegistry) -> list[dict]:
+    """
+    `db.write_recalculated` rows for a page of `db.recalculation_rows`:
+    quantity re-resolved against the new factor's unit (stored quantity
+    converted, else description, else spend) and CO2e recomputed, with the
+    same rules as /analyse. Rows whose factor has an unknown method are
+    dropped.
+    """
+    transactions = [
+        {
+            "description":    row["description"],
+            "amount_aud":     float(row["amount_aud"]),
+            "quantity_value": None if row["quantity_value"] is None else float(row["quantity_value"]),
+            "quantity_unit":  row["quantity_unit"],
+        }
+        for row in rows
+    ]
+    classifications = [{"matched_factor": registry.get(row["factor_id"])} for row in rows]
+    batch = calculate_batch(transactions, classifications, registry=registry)
+
+    out: list[dict] = []
+    for i, (row, clf) in enumerate(zip(rows, classifications)):
+        if batch.co2e_kg[i] is None:
+            continue
+        calc = batch.row(i)
+        out.append({
+            "id":             row["id"],
+            "factor_id":      row["factor_id"],
+            "co2e_kg":        calc["co2e_kg"],
+            "scope":          clf["matched_factor"]["scope"],
+            "quantity_value": calc["quantity_value"],
+            "quantity_unit":  calc["quantity_unit"],
+        })
+    return out
+
+
+def refresh_company(
+    cur,
+    company_id: str,
+    changes: list[dict],
+    registry: FactorRegistry,
+    since: Optional[date] = None,
+    batch: int = 5_000,
+) -> dict:
+    """
+    Apply a factor diff to one company's ledger, inside the caller's
+    transaction. Returns the row counts: recomputed (SQL), recalculated
+    (Python batches) and skipped.
+    """
+    cur.execute("SET LOCAL statement_timeout = 0")
+    arithmetic = [is_arithmetic(c) for c in changes]
+    recomputed = db.recompute_co2e(cur, company_id, [c for c, a in zip(changes, arithmetic) if a], since)
+
+    recalculated = skipped = 0
+    after = _FIRST_ID
+    while True:
+        rows = db.recalculation_rows(cur, company_id, changes, arithmetic, since, after, batch)
+        if not rows:
+            break
+        updates = recalculate(rows, registry)
+        recalculated += db.write_recalculated(cur, updates)
+        skipped += len(rows) - len(updates)
+        after = rows[-1]["id"]
+
+    return {"company_id": company_id, "recomputed": recomputed,
+            "recalculated": recalculated, "skipped": skipped}
+
+
+def refresh_rollups(cur, company_id: str) -> bool:
+    """Rebuild a company's rollups if the refresh left them drifting. True when rebuilt."""
+    cur.execute("SET LOCAL statement_timeout = 0")
+    if not db.rollup_drift(cur, company_id):
+        return False
+    db.rebuild_rollup_rows(cur, company_id)
+    return True
+
+
+def run(
+    changes: list[dict],
+    since: Optional[date] = None,
+    company_id: Optional[str] = None,
+    workers: int = 4,
+    batch: int = 5_000,
+) -> dict:
+    """
+    Apply a factor diff to every affected company (or one), `workers`
+    companies at a time, each in its own transaction — an interrupted run
+    can simply be repeated. Then refresh drifted rollups and, after a full
+    in-place run, record the new values as applied.
+    """
+    targets = [c for c in changes if c["new_id"] is not None]
+    summary = {"companies": 0, "recomputed": 0, "recalculated": 0, "skipped": 0, "rollups_rebuilt": 0}
+    if not targets:
+        return summary
+
+    registry = new_factor_registry(targets)
+    old_ids  = sorted({c["old_id"] for c in targets})
+    if company_id is not None:
+        companies = [company_id]
+    else:
+        with db.get_cursor() as cur:
+            companies = db.refresh_companies(cur, old_ids, since)
+
+    def _one(company: str) -> dict:
+        with db.get_cursor() as cur:
+            return refresh_company(cur, company, targets, registry, since, batch)
+
+    # One pooled connection per worker, plus the one the caller may hold.
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, db.DB_POOL_MAX - 1)),
+                            thread_name_prefix="reclassify") as pool:
+        results = list(pool.map(_one, companies))
+
+    # Serially: a rebuild locks emission_rollups, which concurrent refreshes write.
+    for result in results:
+        summary["companies"]    += 1
+        summary["recomputed"]   += result["recomputed"]
+        summary["recalculated"] += result["recalculated"]
+        summary["skipped"]      += result["skipped"]
+        if result["recomputed"] or result["recalculated"]:
+            with db.get_cursor() as cur:
+                summary["rollups_rebuilt"] += refresh_rollups(cur, result["company_id"])
+
+    in_place = [c["old_id"] for c in targets if c["kind"] == "in_place"]
+    if in_place and company_id is None and since is None:
+        with db.get_cursor() as cur:
+            db.record_applied_factors(cur, in_place)
+    return summary
+
+
+def describe_change(change: dict, counts: Optional[dict] = None) -> str:
+    """One line naming a factor change and, with counts, the rows it affects."""
+    where = f" ({change['state']})" if change["state"] else ""
+    if change["new_id"] is None:
+        line = f"{change['kind']:8} {change['activity']}{where}: dropped by the new edition"
+    else:
+        line = (
+            f"{change['kind']:8} {change['activity']}{where}: "
+            f"{change['old_co2e_factor']} {change['old_unit']} {change['old_method']} → "
+            f"{change['co2e_factor']} {change['unit']} {change['calculation_method']}"
+            f"{'' if is_arithmetic(change) else ' [recalculate]'}"
+        )
+    if counts is not None:
+        line += f" — {counts.get('refreshable', 0)} rows, {counts.get('locked', 0)} locked"
+    return line
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recompute stored CO2e for factors that changed.")
+    parser.add_argument("command", choices=("plan", "run"))
+    parser.add_argument("--from-year", type=int, help="NGA edition to move rows off (with --to-year)")
+    parser.add_argument("--to-year", type=int, help="NGA edition to move rows onto (with --from-year)")
+    parser.add_argument("--since", type=date.fromisoformat, help="only transactions dated on or after (YYYY-MM-DD)")
+    parser.add_argument("--company", help="only this company id (default: every company)")
+    parser.add_argument("--workers", type=int, default=4, help="companies refreshed concurrently")
+    parser.add_argument("--batch", type=int, default=5_000, help="rows per recalculation page")
+    args = parser.parse_args(argv)
+    if (args.from_year is None) != (args.to_year is None):
+        parser.error("--from-year and --to-year go together")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    with db.get_cursor() as cur:
+        changes = db.factor_changes(cur, args.from_year, args.to_year)
+        counts = db.factor_change_counts(
+            cur, [c["old_id"] for c in changes], args.since, args.company,
+        ) if changes and args.command == "plan" else {}
+
+    if args.command == "plan":
+        for change in changes:
+            logger.info("%s", describe_change(change, counts.get(change["old_id"], {})))
+        rows = sum(counts.get(c["old_id"], {}).get("refreshable", 0) for c in changes if c["new_id"])
+        logger.info("%d factor changes, %d rows to refresh.", len(changes), rows)
+        return 0
+
+    summary = run(changes, args.since, args.company, args.workers, args.batch)
+    logger.info(
+        "Refreshed %d companies: %d rows recomputed in SQL, %d recalculated, %d skipped; "
+        "%d rollups rebuilt.",
+        summary["companies"], summary["recomputed"], summary["recalculated"],
+        summary["skipped"], summary["rollups_rebuilt"],
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""
+EcoLink Australia — JSON rendering for the fast /analyse response path.
+
+With `response_model=AnalyseResponse`, FastAPI validates the returned
+models again and serialises them. The fast path returns ready-made bytes
+instead, so they must match what FastAPI itself would send:
+
+  - FastAPI releases with the `dump_json` response path serialise through
+    pydantic-core (`field.serialize_json`): compact separators, UTF-8,
+    NaN/Infinity as null, floats in pydantic's notation (0.00001, 1e+16);
+  - older releases dump to a dict and render it with JSONResponse, i.e.
+    `json.dumps(..., ensure_ascii=False, allow_nan=False, separators=(",", ":"))`.
+
+`render_json` picks whichever the installed FastAPI uses.
+"""
+
+from __future__ import annotations
+
+import inspect
+import json
+
+import pydantic_core
+from fastapi.routing import serialize_response
+
+
+def _render_pydantic(content: object) -> bytes:
+    return pydantic_core.to_json(content, inf_nan_mode="null")
+
+
+def _render_stdlib(content: object) -> bytes:
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+FASTAPI_DUMPS_WITH_PYDANTIC = "dump_json" in inspect.signature(serialize_response).parameters
+
+_RENDER = _render_pydantic if FASTAPI_DUMPS_WITH_PYDANTIC else _render_stdlib
+
+
+def render_json(content: object) -> bytes:
+    """Response bytes for JSON-ready `content`, exactly as FastAPI would render them."""
+    return _RENDER(content)
@@ -0,0 +1,231 @@
+"""
+EcoLink Australia — Classification result cache.
+
+Recurring supplier lines ("Origin Energy", "BP Station", "Telstra") come
+back every month; this cache stores the LLM's verdict per normalised line so
+a repeat skips both the Groq and the Gemini call.
+
+Key: (factor-set version, normalised description, supplier, account name).
+Normalisation lower-cases, strips punctuation and collapses digit runs, so
+"Telstra INV-10293 Jul" and "Telstra INV-10417 Aug" share an entry. Because
+digits are collapsed, cached entries do not carry the LLM's quantity_hint —
+the calculator re-extracts quantities from the actual description.
+
+The key has no tenant in it, so an entry serves every company sending the
+same line. Entries therefore hold only the verdict (factor id, status,
+confidence) — never the LLM's reasoning, which can quote the description;
+the classifier writes a generic note on a hit.
+
+Tiers:
+  1. In-process LRU with TTL (always on).
+  2. Postgres `classification_cache` table (migration 022), shared across
+     workers — enabled with CLASSIFICATION_CACHE_PG=1. Best-effort: DB
+     errors are logged and treated as misses.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger("ecolink.cache")
+
+CACHE_MAX_ENTRIES = int(os.environ.get("CLASSIFICATION_CACHE_SIZE", "10000"))
+CACHE_TTL_SECONDS = int(os.environ.get("CLASSIFICATION_CACHE_TTL", str(30 * 24 * 3600)))
+CACHE_USE_PG      = os.environ.get("CLASSIFICATION_CACHE_PG", "").lower() in ("1", "true", "yes")
+
+_PUNCT_RE  = re.compile(r"[^\w\s]+")
+_DIGITS_RE = re.compile(r"\d+")
+_SPACE_RE  = re.compile(r"\s+")
+
+
+def normalise_text(text: Optional[str]) -> str:
+    text = _PUNCT_RE.sub(" ", (text or "").lower())
+    text = _DIGITS_RE.sub("#", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def factor_set_version(factors: list[dict]) -> str:
+    """Stable fingerprint of a factor set — changes when any id, value or unit changes."""
+    digest = hashlib.sha256()
+    for key in sorted(f"{f['id']}:{f.get('co2e_factor')}:{f.get('unit')}" for f in factors):
+        digest.update(key.encode())
+        digest.update(b"\n")
+    return digest.hexdigest()[:16]
+
+
+def cache_key(transaction: dict, version: str) -> str:
+    parts = [
+        version,
+        normalise_text(transaction.get("description")),
+        normalise_text(transaction.get("supplier_name")),
+        normalise_text(transaction.get("account_name")),
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+class ClassificationCache:
+    """
+    Thread-safe LRU + TTL cache of classification verdicts.
+
+    Values are small dicts: { factor_id, status, confidence }.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl_seconds: int = CACHE_TTL_SECONDS,
+        use_pg: bool = CACHE_USE_PG,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.use_pg      = use_pg
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._lock     = threading.Lock()
+        self.hits      = 0
+        self.pg_hits   = 0
+        self.misses    = 0
+        self.evictions = 0
+
+    # ── Public API ───────────────────────────────────────────────────────────
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        value = self._pg_get(key) if self.use_pg else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.pg_hits += 1
+            self._put_local(key, value, now)
+        return value
+
+    def set(self, key: str, value: dict, version: str) -> None:
+        with self._lock:
+            self._put_local(key, value, time.monotonic())
+        if self.use_pg:
+            self._pg_set(key, value, version)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.pg_hits + self.misses
+            return {
+                "entries":     len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits":        self.hits,
+                "pg_hits":     self.pg_hits,
+                "misses":      self.misses,
+                "evictions":   self.evictions,
+                "hit_rate":    round((self.hits + self.pg_hits) / lookups, 4) if lookups else 0.0,
+                "postgres":    self.use_pg,
+            }
+
+    # ── In-process tier ──────────────────────────────────────────────────────
+
+    def _put_local(self, key: str, value: dict, now: float) -> None:
+        self._entries[key] = (now + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # ── Postgres tier ────────────────────────────────────────────────────────
+
+    def _pg_get(self, key: str) -> Optional[dict]:
+        try:
+            from .db import get_cursor  # lazy import — keeps the classifier DB-free
+
+            with get_cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE classification_cache
+                       SET hit_count = hit_count + 1
+                     WHERE cache_key = %s
+                       AND expires_at > NOW()
+                    RETURNING emission_factor_id, classification_status, confidence
+                    """,
+                    (key,),
+                )
+                row = cur.fetchone()
+        except Exception as exc:
+            logger.warning("Classification cache read failed: %s", exc)
+            return None
+
+        if not row:
+            return None
+        return {
+            "factor_id":  str(row["emission_factor_id"]) if row["emission_factor_id"] else None,
+            "status":     row["classification_status"],
+            "confidence": float(row["confidence"]) if row["confidence"] is not None else None,
+        }
+
+    def _pg_set(self, key: str, value: dict, version: str) -> None:
+        try:
+            from .db import get_cursor
+
+            with get_cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO classification_cache (
+                        cache_key, factor_set_version, emission_factor_id,
+                        classification_status, confidence, expires_at
+                    )
+                    VALUES (%s, %s, %s, %s, %s, NOW() + make_interval(secs => %s))
+                    ON CONFLICT (cache_key) DO UPDATE SET
+                        emission_factor_id    = EXCLUDED.emission_factor_id,
+                        classification_status = EXCLUDED.classification_status,
+                        confidence            = EXCLUDED.confidence,
+                        expires_at            = EXCLUDED.expires_at
+                    """,
+                    (
+                        key, version, value["factor_id"], value["status"],
+                        value["confidence"], self.ttl_seconds,
+                    ),
+                )
+                # Opportunistic purge of expired rows (cheap with idx_cc_expires).
+                cur.execute(
+                    """
+                    DELETE FROM classification_cache
+                     WHERE cache_key IN (
+                        SELECT cache_key FROM classification_cache
+                         WHERE expires_at < NOW() LIMIT 100
+                     )
+                    """
+                )
+        except Exception as exc:
+            logger.warning("Classification cache write failed: %s", exc)
+
+
+# Process-wide cache shared by every classify call.
+classification_cache = ClassificationCache()
+
+
+def to_cache_value(result: dict) -> dict:
+    """Reduce a classification result to the verdict stored in the cache (no notes — see module doc)."""
+    factor = result.get("matched_factor")
+    return {
+        "factor_id":  str(factor["id"]) if factor else None,
+        "status":     result["status"],
+        "confidence": result.get("confidence"),
+    }
@@ -0,0 +1,124 @@
+"""
+EcoLink Australia — Candidate factor retrieval for LLM prompts.
+
+Ranks the emission factors of one (nga_year, state) set against a
+transaction with BM25 over each factor's activity, category, subcategory
+and match_keywords, so the LLM prompt only carries the top-k candidates
+instead of the whole catalogue.
+
+The index is built once per factor set (see `classify_batch`). Scoring uses
+an inverted index, so ranking costs O(matching postings), not O(factors).
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from collections import Counter, defaultdict
+from math import log
+from typing import Optional
+
+# Candidate factors sent to the LLM per transaction (0 = whole catalogue).
+TOP_K = int(os.environ.get("CLASSIFIER_TOP_K", "12"))
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens; 2-char tokens are kept ('bp', '91', 'nt')."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1]
+
+
+def _factor_document(factor: dict) -> str:
+    return " ".join(filter(None, [
+        factor.get("activity"),
+        factor.get("category"),
+        factor.get("subcategory"),
+        " ".join(factor.get("match_keywords") or []),
+    ]))
+
+
+def _transaction_query(transaction: dict) -> str:
+    return " ".join(filter(None, [
+        transaction.get("description"),
+        transaction.get("supplier_name"),
+        transaction.get("account_name"),
+    ]))
+
+
+class FactorRetriever:
+    """
+    BM25 ranking of one emission-factor set (k1=1.5, b=0.75).
+
+    `top_k` is the default candidate count (CLASSIFIER_TOP_K when omitted).
+    """
+
+    def __init__(
+        self,
+        factors: list[dict],
+        top_k: Optional[int] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> None:
+        self.factors = factors
+        self.k  = TOP_K if top_k is None else top_k
+        self.k1 = k1
+        self.b  = b
+
+        docs = [Counter(tokenize(_factor_document(f))) for f in factors]
+        lengths = [sum(d.values()) for d in docs]
+        avgdl   = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+        n  = len(docs)
+        df = Counter(token for d in docs for token in d)
+        idf = {token: log((n - freq + 0.5) / (freq + 0.5) + 1) for token, freq in df.items()}
+
+        # token → [(factor index, precomputed BM25 term weight)]
+        postings: dict[str, list[tuple[int, float]]] = defaultdict(list)
+        for fi, doc in enumerate(docs):
+            norm = k1 * (1 - b + b * lengths[fi] / avgdl) if avgdl else k1
+            for token, tf in doc.items():
+                postings[token].append((fi, idf[token] * tf * (k1 + 1) / (tf + norm)))
+
+        self._postings = dict(postings)
+
+    def rank(self, transaction: dict) -> list[tuple[int, float]]:
+        """Return (factor index, score) pairs with score > 0, best first."""
+        scores: dict[int, float] = defaultdict(float)
+        for token in tokenize(_transaction_query(transaction)):
+            for fi, weight in self._postings.get(token, ()):
+                scores[fi] += weight
+        # Stable on ties: catalogue order wins.
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def _top_indices(self, transaction: dict, k: int) -> Optional[list[int]]:
+        """Indices of the k best factors, or None meaning 'whole catalogue'."""
+        if k <= 0 or k >= len(self.factors):
+            return None
+        ranked = self.rank(transaction)
+        if not ranked:
+            return None
+        return [fi for fi, _ in ranked[:k]]
+
+    def top_k(self, transaction: dict, k: Optional[int] = None) -> list[dict]:
+        """
+        The k best candidate factors for `transaction`, in catalogue order.
+
+        Falls back to the whole catalogue when k is 0 or no factor shares a
+        single token with the transaction — there is nothing to rank on, so
+        let the LLM see everything rather than guess.
+        """
+        keep = self._top_indices(transaction, self.k if k is None else k)
+        if keep is None:
+            return self.factors
+        return [self.factors[fi] for fi in sorted(keep)]
+
+    def top_k_union(self, transactions: list[dict], k: Optional[int] = None) -> list[dict]:
+        """Union of each transaction's top-k candidates, in catalogue order."""
+        keep: set[int] = set()
+        for tx in transactions:
+            indices = self._top_indices(tx, self.k if k is None else k)
+            if indices is None:
+                return self.factors
+            keep.update(indices)
+        return [self.factors[fi] for fi in sorted(keep)]
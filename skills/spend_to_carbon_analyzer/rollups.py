@@ -0,0 +1,169 @@
+"""
+EcoLink Australia — Emission rollups: report totals, consistency check, rebuild.
+
+`emission_rollups` (migration 026) holds the company's emission totals per
+(reporting_year, reporting_quarter, scope, category), maintained by delta
+triggers on `transactions`. Report totals are read from those rows instead
+of scanning every transaction of the year.
+
+The triggers keep the table exact under normal writes. A factor whose
+category is edited later, a restore that bypassed the triggers, or a manual
+fix can still leave drift, so the table can be verified and rebuilt:
+
+    python -m skills.spend_to_carbon_analyzer.rollups check   [--company ID]
+    python -m skills.spend_to_carbon_analyzer.rollups rebuild [--company ID]
+
+`check` exits 1 when any key differs from a fresh aggregate of
+`transactions` (and lists them); `rebuild` replaces the rows under a table
+lock, so concurrent writes apply their deltas on top of the result.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+
+from . import db
+
+logger = logging.getLogger("ecolink.rollups")
+
+UNMATCHED_CATEGORY = ""    # rollup category of rows without a matched factor
+
+
+def report_totals(rows: list[dict]) -> dict:
+    """
+    `carbon_reports` totals from rollup rows (`db.fetch_rollups`): scope
+    totals, emissions_by_category and transaction counts.
+    """
+    scope_totals = {1: Decimal(0), 2: Decimal(0), 3: Decimal(0)}
+    by_category: list[dict] = []
+    counts = {"transaction_count": 0, "transactions_classified": 0,
+              "transactions_needs_review": 0, "transactions_excluded": 0}
+
+    for row in rows:
+        counts["transaction_count"]         += int(row["tx_count"])
+        counts["transactions_classified"]   += int(row["classified_count"])
+        counts["transactions_needs_review"] += int(row["needs_review_count"])
+        counts["transactions_excluded"]     += int(row["excluded_count"])
+        if row["scope"] in scope_totals:
+            scope_totals[row["scope"]] += row["co2e_kg"]
+            if row["category"] != UNMATCHED_CATEGORY and row["emitting_count"]:
+                by_category.append({
+                    "category":          row["category"],
+                    "scope":             row["scope"],
+                    "co2e_kg":           float(row["co2e_kg"]),
+                    "transaction_count": int(row["emitting_count"]),
+                })
+
+    by_category.sort(key=lambda c: c["co2e_kg"], reverse=True)
+    return {
+        "total_scope1_co2e_kg":  float(scope_totals[1]),
+        "total_scope2_co2e_kg":  float(scope_totals[2]),
+        "total_scope3_co2e_kg":  float(scope_totals[3]),
+        "emissions_by_category": by_category,
+        **counts,
+    }
+
+
+def fetch_report_totals(
+    company_id: str,
+    reporting_year: int,
+    quarters: Optional[list[int]] = None,
+) -> dict:
+    """Report totals for one company's financial year (or some of its quarters)."""
+    return report_totals(db.fetch_rollups(company_id, reporting_year, quarters))
+
+
+# ---------------------------------------------------------------------------
+# Financial periods
+# ---------------------------------------------------------------------------
+
+def financial_quarter(d: date) -> tuple[int, int]:
+    """(financial year, quarter) of a date — SQL `au_financial_year` / `au_financial_quarter`."""
+    return d.year + (d.month >= 7), (d.month + 5) % 12 // 3 + 1
+
+
+def quarter_span(date_from: date, date_to: date) -> tuple[tuple[int, int], tuple[int, int]]:
+    """
+    First and last financial quarters a quarterly report covers: the ones
+    containing `date_from` and `date_to`, whole.
+    """
+    return financial_quarter(date_from), financial_quarter(date_to)
+
+
+def period_label(period_start: date, period: str) -> str:
+    if period == "month":
+        return f"{period_start:%Y-%m}"
+    year, quarter = financial_quarter(period_start)
+    return f"FY{year} Q{quarter}"
+
+
+def period_summaries(groups: list[dict], period: str) -> list[dict]:
+    """`by_period` of a report: per-period totals of (period_start, scope, category) groups, in date order."""
+    totals: dict[date, dict] = defaultdict(
+        lambda: {"co2e_kg": 0.0, 1: 0.0, 2: 0.0, 3: 0.0, "tx_count": 0}
+    )
+    for g in groups:
+        entry = totals[g["period_start"]]
+        entry["tx_count"] += int(g["tx_count"])
+        if g["scope"] in (1, 2, 3) and g["emitting_count"]:
+            entry[g["scope"]]  += float(g["co2e_kg"])
+            entry["co2e_kg"]   += float(g["co2e_kg"])
+    return [
+        {
+            "period":         period_label(start, period),
+            "period_start":   start,
+            "co2e_kg":        round(t["co2e_kg"], 4),
+            "scope1_co2e_kg": round(t[1], 4),
+            "scope2_co2e_kg": round(t[2], 4),
+            "scope3_co2e_kg": round(t[3], 4),
+            "tx_count":       t["tx_count"],
+        }
+        for start, t in sorted(totals.items())
+    ]
+
+
+def describe_drift(row: dict) -> str:
+    """One line naming a drifted key and the metrics that differ."""
+    key = "/".join(str(row[k]) for k in db.ROLLUP_KEY[1:])
+    diffs = [
+        f"{m} expected={row['expected_' + m]} stored={row['stored_' + m]}"
+        for m in db.ROLLUP_METRICS
+        if row["expected_" + m] != row["stored_" + m]
+    ]
+    return f"{row['company_id']} {key}: " + ", ".join(diffs)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check or rebuild the emission_rollups table.")
+    parser.add_argument("command", choices=("check", "rebuild"))
+    parser.add_argument("--company", help="only this company id (default: every company)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command == "rebuild":
+        written = db.rebuild_rollups(args.company)
+        logger.info("Rebuilt emission_rollups: %d rows.", written)
+        return 0
+
+    drift = db.fetch_rollup_drift(args.company)
+    for row in drift:
+        logger.info("%s", describe_drift(row))
+    if drift:
+        logger.info("%d rollup keys out of date — run `rebuild`.", len(drift))
+        return 1
+    logger.info("emission_rollups is consistent with transactions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+EcoLink Australia — Cross-company supplier → factor knowledge.
+
+Every company buys from the same suppliers. Once a supplier's lines have
+been classified with high confidence — or a reviewer has confirmed or
+corrected them — in any company's `transactions`, the shared
+`supplier_factor_knowledge` table (migration 025, filled by triggers on
+`transactions`) records which factor they took. The classifier asks this
+module before any LLM call: a supplier with enough consistent evidence is
+answered directly.
+
+Lookup:
+  - key: `supplier_key(supplier_name)` — the same normalisation as the SQL
+    function of the same name (lower-case, punctuation → space, legal
+    suffixes dropped), so "ORIGIN ENERGY PTY LTD" finds "Origin Energy Ltd.";
+  - exact key first, else the nearest stored key by trigram distance, kept
+    only if its similarity ≥ SUPPLIER_KNOWLEDGE_MIN_SIMILARITY;
+  - evidence per factor = confirmed × CONFIRMED_WEIGHT + automatic; the
+    leading factor must hold SUPPLIER_KNOWLEDGE_MIN_SHARE of the supplier's
+    evidence (a retailer selling both electricity and gas stays ambiguous)
+    and at least SUPPLIER_KNOWLEDGE_MIN_EVIDENCE in absolute terms.
+
+Verdicts (and misses) are kept in an in-process LRU for
+SUPPLIER_KNOWLEDGE_TTL seconds; `prefetch` resolves a whole batch's
+suppliers in one query. Best-effort: DB errors are logged, treated as
+misses and retried after a short back-off.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Callable, Iterable, NamedTuple, Optional
+
+logger = logging.getLogger("ecolink.supplier_knowledge")
+
+SUPPLIER_KNOWLEDGE_ENABLED        = os.environ.get("SUPPLIER_KNOWLEDGE", "1") != "0"
+SUPPLIER_KNOWLEDGE_MIN_SIMILARITY = float(os.environ.get("SUPPLIER_KNOWLEDGE_MIN_SIMILARITY", "0.7"))
+SUPPLIER_KNOWLEDGE_MIN_SHARE      = float(os.environ.get("SUPPLIER_KNOWLEDGE_MIN_SHARE", "0.8"))
+SUPPLIER_KNOWLEDGE_MIN_EVIDENCE   = int(os.environ.get("SUPPLIER_KNOWLEDGE_MIN_EVIDENCE", "3"))
+SUPPLIER_KNOWLEDGE_TTL            = float(os.environ.get("SUPPLIER_KNOWLEDGE_TTL", "300"))
+SUPPLIER_KNOWLEDGE_CACHE_SIZE     = int(os.environ.get("SUPPLIER_KNOWLEDGE_CACHE_SIZE", "20000"))
+
+# One reviewer confirmation outweighs this many automatic classifications.
+CONFIRMED_WEIGHT = 5
+
+# Seconds to stop querying after a DB error (missing table, outage).
+_ERROR_BACKOFF_SECONDS = 60.0
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_LEGAL_RE     = re.compile(r"\b(pty|ltd|limited|inc|llc|plc|co|corp|corporation|the)\b")
+
+Fetch = Callable[[list[str]], list[dict]]
+
+
+def supplier_key(name: Optional[str]) -> Optional[str]:
+    """Normalised supplier name — must match the SQL `supplier_key()` (migration 025)."""
+    if not name:
+        return None
+    key = _NON_ALNUM_RE.sub(" ", name.lower())
+    key = _LEGAL_RE.sub(" ", key)
+    return " ".join(key.split()) or None
+
+
+class SupplierVerdict(NamedTuple):
+    factor_id:    str
+    activity:     str
+    supplier_key: str       # stored key that matched (differs from the query on fuzzy hits)
+    similarity:   float     # trigram similarity of query and stored key (1.0 = exact)
+    confirmed:    int
+    automatic:    int
+    share:        float     # this factor's share of the supplier's weighted evidence
+
+
+def verdict_from_rows(rows: list[dict]) -> Optional[SupplierVerdict]:
+    """Best supported factor among one query key's knowledge rows, or None."""
+    if not rows:
+        return None
+    similarity = float(rows[0]["similarity"])
+    if similarity < SUPPLIER_KNOWLEDGE_MIN_SIMILARITY:
+        return None
+
+    def evidence(row: dict) -> int:
+        return row["confirmed_count"] * CONFIRMED_WEIGHT + row["auto_count"]
+
+    total = sum(evidence(row) for row in rows)
+    best  = max(rows, key=evidence)
+    if total <= 0 or evidence(best) < SUPPLIER_KNOWLEDGE_MIN_EVIDENCE:
+        return None
+    share = evidence(best) / total
+    if share < SUPPLIER_KNOWLEDGE_MIN_SHARE:
+        return None
+    return SupplierVerdict(
+        factor_id    = str(best["emission_factor_id"]),
+        activity     = best["activity"],
+        supplier_key = best["supplier_key"],
+        similarity   = similarity,
+        confirmed    = int(best["confirmed_count"]),
+        automatic    = int(best["auto_count"]),
+        share        = share,
+    )
+
+
+# ---------------------------------------------------------------------------
+# In-memory knowledge (benchmarks, tests, scripts without a database)
+# ---------------------------------------------------------------------------
+
+def _trigrams(text: str) -> set[str]:
+    """pg_trgm's trigram set: each word padded with two spaces before, one after."""
+    grams: set[str] = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigram_similarity(a: str, b: str) -> float:
+    """pg_trgm `similarity(a, b)` for normalised (lower-case, alphanumeric) keys."""
+    ta, tb = _trigrams(a), _trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def memory_fetch(rows: list[dict]) -> Fetch:
+    """
+    A fetch function over knowledge rows held in memory, answering like
+    `db.fetch_supplier_knowledge`. Rows: supplier_key, emission_factor_id,
+    activity, confirmed_count, auto_count.
+    """
+    by_key: dict[str, list[dict]] = defaultdict(list)
+    for row in rows:
+        by_key[row["supplier_key"]].append(row)
+    stored = list(by_key)
+
+    def fetch(keys: list[str]) -> list[dict]:
+        out: list[dict] = []
+        for key in keys:
+            if key in by_key:
+                nearest, similarity = key, 1.0
+            else:
+                scored = [(trigram_similarity(key, s), s) for s in stored]
+                if not scored:
+                    continue
+                similarity, nearest = max(scored, key=lambda pair: pair[0])
+            out.extend(
+                {**row, "query_key": key, "similarity": similarity}
+                for row in by_key[nearest]
+            )
+        return out
+
+    return fetch
+
+
+# ---------------------------------------------------------------------------
+# Lookup service
+# ---------------------------------------------------------------------------
+
+class SupplierKnowledge:
+    """Thread-safe LRU + TTL front of the supplier knowledge table."""
+
+    def __init__(
+        self,
+        fetch: Optional[Fetch] = None,
+        max_entries: int = SUPPLIER_KNOWLEDGE_CACHE_SIZE,
+        ttl_seconds: float = SUPPLIER_KNOWLEDGE_TTL,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._fetch      = fetch
+        self._entries: "OrderedDict[str, tuple[float, Optional[SupplierVerdict]]]" = OrderedDict()
+        self._lock       = threading.Lock()
+        self._backoff_until = 0.0
+        self.hits        = 0
+        self.misses      = 0
+        self.queries     = 0
+        self.errors      = 0
+        self.last_error: Optional[str] = None
+
+    def enabled(self) -> bool:
+        if not SUPPLIER_KNOWLEDGE_ENABLED:
+            return False
+        return self._fetch is not None or bool(os.environ.get("DATABASE_URL"))
+
+    def load(self, rows: list[dict]) -> None:
+        """Serve knowledge rows from memory instead of Postgres (tests, benchmarks)."""
+        self._fetch = memory_fetch(rows)
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    # ── Public API ───────────────────────────────────────────────────────────
+
+    def lookup(self, supplier_name: Optional[str]) -> Optional[SupplierVerdict]:
+        """The supported factor for this supplier, or None."""
+        key = supplier_key(supplier_name)
+        if key is None or not self.enabled():
+            return None
+        found, verdict = self._get(key)
+        if not found:
+            verdict = self._resolve([key]).get(key)
+        with self._lock:
+            if verdict is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return verdict
+
+    def prefetch(self, supplier_names: Iterable[Optional[str]]) -> None:
+        """Resolve every uncached supplier in one query, ahead of per-line lookups."""
+        if not self.enabled():
+            return
+        keys = {supplier_key(name) for name in supplier_names}
+        keys.discard(None)
+        pending = [key for key in keys if not self._get(key)[0]]
+        if pending:
+            self._resolve(pending)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled":     self.enabled(),
+                "entries":     len(self._entries),
+                "ttl_seconds": self.ttl_seconds,
+                "hits":        self.hits,
+                "misses":      self.misses,
+                "hit_rate":    round(self.hits / lookups, 4) if lookups else 0.0,
+                "queries":     self.queries,
+                "errors":      self.errors,
+                "last_error":  self.last_error,
+            }
+
+    # ── Internals ────────────────────────────────────────────────────────────
+
+    def _get(self, key: str) -> tuple[bool, Optional[SupplierVerdict]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires, verdict = entry
+            if expires <= now:
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, verdict
+
+    def _resolve(self, keys: list[str]) -> dict[str, Optional[SupplierVerdict]]:
+        now = time.monotonic()
+        if now < self._backoff_until:
+            return {}
+        fetch = self._fetch
+        if fetch is None:
+            from .db import fetch_supplier_knowledge as fetch  # lazy import — keeps the classifier DB-free
+        try:
+            rows = fetch(keys)
+        except Exception as exc:
+            with self._lock:
+                self.errors += 1
+                self.last_error = str(exc)
+            self._backoff_until = now + _ERROR_BACKOFF_SECONDS
+            logger.warning("Supplier knowledge lookup failed: %s", exc)
+            return {}
+
+        grouped: dict[str, list[dict]] = defaultdict(list)
+        for row in rows:
+            grouped[row["query_key"]].append(row)
+        verdicts = {key: verdict_from_rows(grouped.get(key, [])) for key in keys}
+
+        expires = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self.queries += 1
+            for key, verdict in verdicts.items():
+                self._entries[key] = (expires, verdict)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return verdicts
+
+
+# Process-wide knowledge front shared by every classify call.
+supplier_knowledge = SupplierKnowledge()
@@ -0,0 +1,104 @@
+"""
+Shared setup for the analyser tests: run from the repository root
+(`python -m pytest skills/spend_to_carbon_analyzer/tests`), offline, with
+no API keys or database. Tests that need Postgres read BENCH_DATABASE_URL
+and skip without it.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+
+# No background warm-up or write-behind thread during tests.
+os.environ.setdefault("FACTOR_CACHE_WARM", "0")
+os.environ.setdefault("PERSIST_WRITE_BEHIND", "0")
+os.environ.setdefault("INTERNAL_API_KEY", "test-key")
+
+
+# ---------------------------------------------------------------------------
+# Fake LLM providers
+# ---------------------------------------------------------------------------
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """
+    `fake_llm(answer)` routes both providers to `answer(user_prompt,
+    max_tokens, timeout)`. The embedding stage and hedging are off (a hedge
+    is a second request by design); the classification cache and both
+    providers' breakers and latency windows start and end empty.
+    """
+    from skills.spend_to_carbon_analyzer import classifier, provider_health
+    from skills.spend_to_carbon_analyzer.result_cache import classification_cache
+
+    def install(answer):
+        monkeypatch.setattr(classifier, "_groq_request", answer)
+        monkeypatch.setattr(classifier, "_gemini_request", answer)
+        return answer
+
+    monkeypatch.setattr(classifier, "EMBEDDING_STAGE", False)
+    monkeypatch.setattr(provider_health, "LLM_HEDGE", False)
+    for provider in (provider_health.GROQ, provider_health.GEMINI):
+        provider.reset()
+    classification_cache.clear()
+    yield install
+    classification_cache.clear()
+    for provider in (provider_health.GROQ, provider_health.GEMINI):
+        provider.reset()
+
+
+# ---------------------------------------------------------------------------
+# Scratch ledger (Postgres)
+# ---------------------------------------------------------------------------
+
+from support import LEDGER_COMPANIES, LEDGER_ROWS, LEDGER_SCHEMA, create_ledger, drop_ledger  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def ledger_dsn():
+    """
+    BENCH_DATABASE_URL with the scratch ledger (`support.create_ledger`)
+    loaded: LEDGER_ROWS transactions for each of LEDGER_COMPANIES, ~36 per
+    day. Dropped at the end of the session.
+    """
+    dsn = os.environ.get("BENCH_DATABASE_URL")
+    if not dsn:
+        pytest.skip("BENCH_DATABASE_URL not set")
+    pytest.importorskip("asyncpg")
+    psycopg2 = pytest.importorskip("psycopg2")
+
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            create_ledger(cur, LEDGER_COMPANIES, LEDGER_ROWS)
+        conn.commit()
+        yield dsn
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            drop_ledger(cur)
+        conn.commit()
+        conn.close()
+
+
+@pytest.fixture
+def ledger(ledger_dsn):
+    """`ledger(work)` runs `await work(conn)` on an asyncpg connection to the scratch ledger."""
+    import asyncio
+
+    import asyncpg
+
+    def _run(work):
+        async def _with_conn():
+            conn = await asyncpg.connect(ledger_dsn, server_settings={"search_path": f"{LEDGER_SCHEMA}, public"})
+            try:
+                return await work(conn)
+            finally:
+                await conn.close()
+        return asyncio.run(_with_conn())
+
+    return _run
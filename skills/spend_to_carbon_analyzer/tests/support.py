@@ -0,0 +1,253 @@
+"""
+Test data for the analyser tests: factor sets, labelled lines and the
+scratch Postgres ledger. Owned by the tests — bench.py keeps its own data,
+so refactoring a benchmark never breaks a test.
+"""
+
+import json
+import random
+import re
+from pathlib import Path
+from typing import Optional
+
+REPO_ROOT  = Path(__file__).resolve().parents[3]
+MIGRATIONS = REPO_ROOT / "database" / "migrations"
+
+# ---------------------------------------------------------------------------
+# Factor sets
+# ---------------------------------------------------------------------------
+
+_SEED_SQL = REPO_ROOT / "database" / "seeds" / "emission_factors.sql"
+
+_SEED_ROW = re.compile(
+    r"\((\d{4}),\s*TRUE,\s*(\d),\s*'([^']*)',\s*'([^']*)',\s*'([^']*)',\s*'([^']*)',\s*"
+    r"([\d.]+),[^']*?'(\w+)',\s*ARRAY\[([^\]]*)\],\s*'([^']*)',\s*NULL,\s*(?:TRUE|FALSE),\s*(NULL|'\w+')\)",
+)
+
+
+def seed_factors() -> list[dict]:
+    """The NGA 2024 seed file as factor dicts shaped like `fetch_all_factors` rows."""
+    factors = []
+    for i, m in enumerate(_SEED_ROW.finditer(_SEED_SQL.read_text(encoding="utf-8"))):
+        year, scope, category, subcategory, activity, unit, co2e, method, keywords, table, state = m.groups()
+        factors.append({
+            "id":                 f"00000000-0000-0000-0001-{i:012d}",
+            "nga_year":           int(year),
+            "scope":              int(scope),
+            "category":           category,
+            "subcategory":        subcategory,
+            "activity":           activity,
+            "unit":               unit,
+            "co2e_factor":        float(co2e),
+            "calculation_method": method,
+            "match_keywords":     re.findall(r"'([^']*)'", keywords),
+            "source_table":       table,
+            "state":              None if state == "NULL" else state.strip("'"),
+        })
+    assert factors, f"no factors parsed from {_SEED_SQL}"
+    return factors
+
+
+_KEYWORDS = ["petrol", "diesel", "natural gas", "electricity", "flight", "taxi", "hotel",
+             "freight", "courier", "waste", "water", "stationery", "internet", "lpg"]
+
+
+def make_factors(count: int = 40, seed: int = 7) -> list[dict]:
+    """A deterministic synthetic factor set (ids ...-000000000000, -000000000001, ...)."""
+    rng = random.Random(seed)
+    return [
+        {
+            "id":                 f"00000000-0000-0000-0000-{i:012d}",
+            "scope":              rng.choice([1, 2, 3]),
+            "category":           f"Category {i % 8}",
+            "activity":           f"Activity {i}",
+            "unit":               rng.choice(["L", "kWh", "GJ", "km", "AUD"]),
+            "calculation_method": rng.choice(["activity_based", "spend_based"]),
+            "co2e_factor":        round(rng.uniform(0.001, 3.0), 6),
+            "match_keywords":     rng.sample(_KEYWORDS, rng.randint(1, 3)),
+        }
+        for i in range(count)
+    ]
+
+
+def llm_misses(count: int) -> list[dict]:
+    """
+    Distinct, keyword-free lines: each misses the fast path and the
+    classification cache (which ignores digits), so each reaches the LLM.
+    """
+    def letters(n: int) -> str:
+        out = ""
+        while True:
+            n, r = divmod(n, 26)
+            out += chr(ord("a") + r)
+            if not n:
+                return out
+
+    return [{"description": f"Misc supplier {letters(i)} invoice", "amount_aud": 100.0} for i in range(count)]
+
+
+def prompt_transactions(user_prompt: str) -> list[dict]:
+    """The transactions in a single ("Transaction:") or batch ("Transactions:") LLM prompt."""
+    if "Transactions:\n" in user_prompt:
+        return json.loads(user_prompt.split("Transactions:\n", 1)[1].split("\n", 1)[0])
+    return [json.loads(user_prompt.split("Transaction:\n", 1)[1].split("\n", 1)[0])]
+
+
+# (description, supplier_name, account_name, expected activity in seed_factors()).
+# Phrased to miss the seed's match_keywords, like the lines that reach the LLM.
+LABELLED_LINES: list[tuple[str, Optional[str], Optional[str], str]] = [
+    ("Sydney to Singapore business class", "Singapore Airlines", "Travel - International", "Air Travel — International Flights (spend-based)"),
+    ("Overnight air cargo to Darwin",      "Qantas Freight",     "Freight Outwards",       "Freight — Domestic Air (spend-based)"),
+    ("Quarterly water usage 92 kL",        "Sydney Water",       "Water Rates",            "Water — Mains Supply (spend-based)"),
+    ("Toner cartridges x4",                "Officeworks",        "Office Expenses",        "Purchased Goods — Office Supplies (spend-based)"),
+    ("General waste lift x4",              "Cleanaway",          "Waste Removal",          "Waste — Municipal Solid Waste to Landfill"),
+    ("Diesel for work ute",                "Puma Energy",        "Motor Vehicle Expenses", "Diesel — Passenger Vehicles"),
+    ("Top up R32 refrigerant",             "Daikin Service",     "Repairs & Maintenance",  "Refrigerant — R-32 (HVAC)"),
+    ("Ausgrid network charges",            None,                 "Electricity",            "Electricity — NSW Grid"),
+    ("Power bill Jul-Sep 4,210 kWh",       "Energex",            "Electricity",            "Electricity — QLD Grid"),
+    ("Fuel card - unleaded 45.2L",         "Coles Express",      "Motor Vehicle Expenses", "Petrol — Passenger Vehicles"),
+    ("Trip to airport",                    "Uber",               "Travel - Local",         "Ground Transport — Taxi & Ride Share (spend-based)"),
+    ("Conference stay 3 nights",           "Ibis Melbourne",     "Travel",                 "Accommodation — Hotels & Motels (spend-based)"),
+    ("Office milk and coffee",             "Woolworths",         "Staff Amenities",        "Purchased Goods — Food & Beverages (spend-based)"),
+    ("Contract review",                    "Gilbert + Tobin",    "Legal Fees",             "Purchased Services — Professional & Business Services (spend-based)"),
+]
+
+
+# ---------------------------------------------------------------------------
+# Query plans
+# ---------------------------------------------------------------------------
+
+def plan_nodes(plan: dict):
+    """Every node of an EXPLAIN (FORMAT JSON) plan, depth first."""
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+# ---------------------------------------------------------------------------
+# Scratch ledger (Postgres)
+# ---------------------------------------------------------------------------
+
+LEDGER_SCHEMA    = "ecolink_test"
+LEDGER_COMPANIES = [f"00000000-0000-0000-0000-0000000c0a{i:02x}" for i in range(5)]
+LEDGER_ROWS      = 40_000      # per company, over three financial years
+
+# The transactions columns the endpoints, review queue and rollup triggers
+# (migration 026) read and write, plus what /review/resolve audits into.
+_LEDGER_DDL = f"""
+CREATE SCHEMA {LEDGER_SCHEMA};
+SET search_path TO {LEDGER_SCHEMA}, public;
+CREATE TABLE emission_factors (
+    id                 UUID PRIMARY KEY,
+    n                  INT NOT NULL,
+    category           TEXT NOT NULL,
+    scope              SMALLINT NOT NULL,
+    nga_year           SMALLINT NOT NULL DEFAULT 2024,
+    activity           TEXT NOT NULL DEFAULT '',
+    state              TEXT,
+    unit               TEXT NOT NULL DEFAULT 'AUD',
+    calculation_method TEXT NOT NULL DEFAULT 'spend_based',
+    co2e_factor        NUMERIC(18,6) NOT NULL DEFAULT 0.35
+);
+CREATE TABLE transactions (
+    id                        UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    company_id                UUID NOT NULL,
+    source                    TEXT NOT NULL,
+    external_id               TEXT,
+    transaction_date          DATE NOT NULL,
+    description               TEXT NOT NULL,
+    supplier_name             TEXT,
+    amount_aud                NUMERIC(14,2) NOT NULL,
+    account_code              TEXT,
+    account_name              TEXT,
+    emission_factor_id        UUID REFERENCES emission_factors (id),
+    classification_status     TEXT NOT NULL,
+    classification_confidence NUMERIC(4,3),
+    classification_notes      TEXT,
+    classified_at             TIMESTAMPTZ,
+    classified_by             TEXT NOT NULL,
+    quantity_value            NUMERIC(14,4),
+    quantity_unit             TEXT,
+    co2e_kg                   NUMERIC(14,4),
+    scope                     SMALLINT,
+    reporting_year            SMALLINT,
+    reporting_quarter         SMALLINT,
+    scope1_co2e_kg            NUMERIC(14,4) NOT NULL DEFAULT 0,
+    scope2_co2e_kg            NUMERIC(14,4) NOT NULL DEFAULT 0,
+    scope3_co2e_kg            NUMERIC(14,4) NOT NULL DEFAULT 0,
+    reviewed_by_user_id       UUID,
+    reviewed_at               TIMESTAMPTZ,
+    review_notes              TEXT,
+    report_id                 UUID,
+    updated_at                TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE TABLE transaction_audit_log (
+    id             BIGSERIAL PRIMARY KEY,
+    transaction_id UUID NOT NULL,
+    event_type     TEXT NOT NULL,
+    user_id        UUID,
+    payload        JSONB,
+    created_at     TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE UNIQUE INDEX ON transactions (company_id, source, external_id) WHERE external_id IS NOT NULL;
+CREATE INDEX idx_tx_company_date_id ON transactions (company_id, transaction_date DESC, id DESC);
+"""
+
+LEDGER_FACTORS = 24
+_CATEGORIES = ("Stationary Energy", "Transport", "Electricity", "Waste", "Water", "Purchased Goods")
+_UNITS = (("L", "activity_based", 2.31), ("kWh", "activity_based", 0.66), ("AUD", "spend_based", 0.35))
+
+# `rows` lines over FY2022–FY2024 (~rows / 1095 per day): 70% classified,
+# 10% each needs_review / factor_not_found / excluded.
+LEDGER_LOAD_SQL = """
+INSERT INTO transactions (
+    company_id, source, external_id, transaction_date, description, supplier_name, amount_aud,
+    emission_factor_id, classification_status, classified_by, co2e_kg, scope,
+    scope1_co2e_kg, scope2_co2e_kg, scope3_co2e_kg
+)
+SELECT %(company)s, 'xero', 'T-' || g, DATE '2021-07-01' + (g %% 1095),
+       'Ledger line ' || g, 'Supplier ' || (g %% 500), (g %% 997) + 0.5,
+       CASE WHEN st.status IN ('classified', 'needs_review') THEN f.id END,
+       st.status, 'ai', s.co2e, CASE WHEN s.co2e IS NOT NULL THEN f.scope END,
+       CASE WHEN f.scope = 1 THEN COALESCE(s.co2e, 0) ELSE 0 END,
+       CASE WHEN f.scope = 2 THEN COALESCE(s.co2e, 0) ELSE 0 END,
+       CASE WHEN f.scope = 3 THEN COALESCE(s.co2e, 0) ELSE 0 END
+FROM generate_series(1, %(rows)s) g
+JOIN emission_factors f ON f.n = g %% %(factors)s
+CROSS JOIN LATERAL (
+    SELECT CASE g %% 10 WHEN 0 THEN 'needs_review' WHEN 1 THEN 'factor_not_found'
+                        WHEN 2 THEN 'excluded' ELSE 'classified' END AS status
+) st
+CROSS JOIN LATERAL (
+    SELECT CASE WHEN st.status IN ('classified', 'needs_review') THEN (g %% 1000) * 0.37 END AS co2e
+) s
+"""
+
+
+def create_ledger(cur, companies: list[str], rows: int) -> None:
+    """
+    Fresh LEDGER_SCHEMA with LEDGER_FACTORS factors, migrations 026 (rollups)
+    and 030 (reporting-quarter index) applied and `rows` transactions per
+    company. Leaves search_path on it.
+    """
+    cur.execute(f"DROP SCHEMA IF EXISTS {LEDGER_SCHEMA} CASCADE")
+    cur.execute(_LEDGER_DDL)
+    cur.executemany(
+        """
+        INSERT INTO emission_factors (id, n, category, scope, activity, unit, calculation_method, co2e_factor)
+        VALUES (gen_random_uuid(), %s, %s, %s, %s, %s, %s, %s)
+        """,
+        [
+            (n, _CATEGORIES[n % len(_CATEGORIES)], 1 + n % 3, f"Ledger activity {n}", *_UNITS[n % 3])
+            for n in range(LEDGER_FACTORS)
+        ],
+    )
+    cur.execute((MIGRATIONS / "026_emission_rollups.sql").read_text())     # its own BEGIN / COMMIT
+    cur.execute((MIGRATIONS / "030_report_period_index.sql").read_text())
+    for company in companies:
+        cur.execute(LEDGER_LOAD_SQL, {"company": company, "rows": rows, "factors": LEDGER_FACTORS})
+    cur.execute("ANALYZE transactions; ANALYZE emission_rollups")
+
+
+def drop_ledger(cur) -> None:
+    cur.execute(f"DROP SCHEMA IF EXISTS {LEDGER_SCHEMA} CASCADE")
@@ -0,0 +1,76 @@
+"""/analyse renders the same bytes with and without ANALYSE_FAST_RESPONSE."""
+
+import os
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+from support import LABELLED_LINES, seed_factors
+
+from skills.spend_to_carbon_analyzer import main
+from skills.spend_to_carbon_analyzer.factor_cache import EmissionFactor
+from skills.spend_to_carbon_analyzer.result_cache import classification_cache
+
+HEADERS = {"X-API-Key": os.environ["INTERNAL_API_KEY"]}
+
+
+@pytest.fixture
+def client(fake_llm, monkeypatch):
+    factors = tuple(EmissionFactor(row, 2024) for row in seed_factors())
+
+    async def _factors(nga_year, state=None):
+        return factors
+
+    async def _no_persist(company_id, enriched, enqueue_timeout=None):
+        return None
+
+    # Keyword misses get a confident match, a low-confidence match or no
+    # match, so every result shape appears in the response.
+    @fake_llm
+    def answer(user_prompt: str, max_tokens: int, timeout: float) -> dict:
+        pick = sum(map(ord, user_prompt)) % 3
+        return {
+            "matched_factor_id": None if pick == 2 else str(factors[sum(map(ord, user_prompt)) % len(factors)]["id"]),
+            "confidence":        (0.92, 0.41, 0.0)[pick],
+            "reasoning":         "Fake provider answer.",
+            "quantity_hint":     None,
+        }
+
+    monkeypatch.setattr(main, "aget_factors", _factors)
+    monkeypatch.setattr(main, "_persist", _no_persist)
+    return TestClient(main.app)
+
+
+def _body() -> dict:
+    rng = random.Random(7)
+    transactions = [
+        {
+            "description":      f"{description} {rng.randint(1, 900)} L" if i % 3 == 0 else description,
+            "supplier_name":    supplier,
+            "account_name":     account,
+            "amount_aud":       round(rng.uniform(5, 900), 2),
+            "transaction_date": "2024-03-01",
+        }
+        for i, (description, supplier, account, _) in enumerate(LABELLED_LINES * 3)
+    ]
+    transactions += [
+        {"description": "Mystery charge", "amount_aud": 40.0, "transaction_date": "2024-03-02"},
+        {"description": "Team lunch", "amount_aud": 180.5, "transaction_date": "2024-03-02"},
+    ]
+    return {"company_id": "00000000-0000-0000-0000-000000000001", "nga_year": 2024, "transactions": transactions}
+
+
+def test_fast_response_is_byte_identical(client, monkeypatch):
+    bodies = {}
+    for fast in (False, True):
+        monkeypatch.setattr(main, "ANALYSE_FAST_RESPONSE", fast)
+        classification_cache.clear()                 # a cache hit rewrites notes
+        response = client.post("/analyse", headers=HEADERS, json=_body())
+        assert response.status_code == 200, response.text
+        assert response.headers["content-type"] == "application/json"
+        bodies[fast] = response.content
+
+    assert bodies[True] == bodies[False]
+    results = response.json()["results"]
+    assert {row["status"] for row in results} >= {"classified", "needs_review"}
+    assert any(row["emission_factor"] is None for row in results)
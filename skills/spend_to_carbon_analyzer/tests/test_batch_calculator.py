@@ -0,0 +1,77 @@
+"""`calculate_batch` gives exactly the rows and totals of per-row `calculate_co2e`, with or without NumPy."""
+
+import random
+
+import pytest
+
+from skills.spend_to_carbon_analyzer import batch_calculator
+from skills.spend_to_carbon_analyzer.batch_calculator import calculate_batch
+from skills.spend_to_carbon_analyzer.calculator import RunningAggregate, calculate_co2e
+
+from support import make_factors
+
+FIELDS = ("co2e_kg", "quantity_value", "quantity_unit", "calculation_method_used", "calc_notes")
+
+
+def _sample(rows: int = 600, seed: int = 11) -> tuple[list[dict], list[dict]]:
+    """Activity lines with and without a quantity, spend lines, unmatched lines and near-ties."""
+    factors = make_factors(count=40, seed=seed)
+    factors.append({**factors[0], "id": "00000000-0000-0000-0000-0000000000ff",
+                    "calculation_method": "supplier_specific"})         # unknown method
+    factors.append({**factors[0], "id": "00000000-0000-0000-0000-0000000000fe",
+                    "activity": "Diesel — Stationary Combustion", "unit": "L",
+                    "calculation_method": "activity_based"})            # spend → litres estimate
+    rng = random.Random(seed)
+    statuses = ["classified", "classified", "classified", "needs_review", "factor_not_found"]
+    txs, classifications = [], []
+    for i in range(rows):
+        status = rng.choice(statuses)
+        factor = rng.choice(factors) if status != "factor_not_found" else None
+        tx = {"description": f"Line {i}", "amount_aud": round(rng.uniform(1, 5000), 2)}
+        if factor and factor["calculation_method"] == "activity_based":
+            shape = rng.randrange(3)
+            if shape == 0:                                # explicit quantity
+                tx["quantity_value"], tx["quantity_unit"] = round(rng.uniform(1, 500), 2), factor["unit"]
+            elif shape == 1:                              # quantity in the text
+                tx["description"] = f"Line {i} {rng.randint(1, 900)} {factor['unit']}"
+            # else: no quantity — spend fallback (or the fuel estimate)
+        if i % 50 == 0:
+            tx["amount_aud"] = 1.00005                    # rounding near-tie
+        txs.append(tx)
+        classifications.append({"matched_factor": factor, "status": status})
+    return txs, classifications
+
+
+@pytest.fixture(params=["numpy", "python"])
+def numpy_mode(request, monkeypatch):
+    if request.param == "numpy":
+        if batch_calculator.np is None:
+            pytest.skip("NumPy not installed")
+    else:
+        monkeypatch.setattr(batch_calculator, "np", None)
+    return request.param
+
+
+def test_batch_matches_per_row(numpy_mode):
+    txs, classifications = _sample()
+
+    expected_rows = []
+    for tx, clf in zip(txs, classifications):
+        factor = clf["matched_factor"]
+        expected_rows.append({
+            **tx, **calculate_co2e(tx, clf),
+            "matched_factor":        factor,
+            "classification_status": clf["status"],
+            "scope":                 factor["scope"] if factor else None,
+        })
+    expected = RunningAggregate().add(expected_rows)
+
+    aggregate = RunningAggregate()
+    batch = calculate_batch(txs, classifications, aggregate)
+
+    methods = {row["calculation_method_used"].split(" ")[0] for row in expected_rows}
+    assert {"activity_based", "spend_based", "spend_based_fallback", "none"} <= methods
+    for want, got in zip(expected_rows, batch.rows(with_notes=True)):
+        assert [repr(want[f]) for f in FIELDS] == [repr(got[f]) for f in FIELDS]
+    assert repr(aggregate.to_state()) == repr(expected.to_state())
+    assert aggregate.result() == expected.result()
@@ -0,0 +1,143 @@
+"""classify_batch's LLM path: input order, bounded concurrency, and garbled batched replies."""
+
+import random
+import threading
+import time
+
+import pytest
+from support import llm_misses, make_factors, prompt_transactions
+
+from skills.spend_to_carbon_analyzer import classifier
+
+
+class FakeLLM:
+    """
+    `_groq_request` / `_gemini_request` stand-in: answers after a random
+    delay with a factor derived from the transaction, and records the
+    largest number of calls in flight at once.
+    """
+
+    def __init__(self, factors: list[dict], seed: int = 3) -> None:
+        self.factors   = factors
+        self.in_flight = 0
+        self.peak      = 0
+        self.calls     = 0
+        self._rng      = random.Random(seed)
+        self._lock     = threading.Lock()
+
+    def factor_for(self, description: str) -> str:
+        return str(self.factors[sum(map(ord, description)) % len(self.factors)]["id"])
+
+    def _answer(self, tx: dict) -> dict:
+        return {"matched_factor_id": self.factor_for(tx["description"]), "confidence": 0.9,
+                "reasoning": "fake", "quantity_hint": {"value": None, "unit": None}}
+
+    def __call__(self, user_prompt: str, max_tokens: int, timeout: float) -> dict:
+        with self._lock:
+            self.calls     += 1
+            self.in_flight += 1
+            self.peak       = max(self.peak, self.in_flight)
+            delay           = self._rng.uniform(0, 0.03)
+        try:
+            time.sleep(delay)
+            if "Transactions:\n" in user_prompt:
+                return {"results": [{"index": tx["index"], **self._answer(tx)} for tx in prompt_transactions(user_prompt)]}
+            tx, = prompt_transactions(user_prompt)
+            return self._answer(tx)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.mark.parametrize("batch_size", [1, 5])
+def test_results_in_input_order_with_bounded_concurrency(fake_llm, batch_size):
+    factors = make_factors()
+    fake = fake_llm(FakeLLM(factors))
+    txs = llm_misses(60)
+    limit = 4
+
+    results = classifier.classify_batch(txs, factors, max_concurrency=limit, llm_batch_size=batch_size)
+
+    assert [str(r["matched_factor"]["id"]) for r in results] == [fake.factor_for(tx["description"]) for tx in txs]
+    assert all(r["status"] == "classified" for r in results)
+    assert fake.calls == -(-len(txs) // batch_size)
+    assert 1 < fake.peak <= limit
+
+
+def test_parse_batch_response_keeps_only_well_formed_items():
+    good = {"matched_factor_id": "f", "confidence": 0.8}
+    raw = {"results": [
+        {"index": 0, **good},
+        {"index": 1, "matched_factor_id": "f", "confidence": 1.5},     # confidence out of range
+        {"index": 2, "matched_factor_id": "f", "confidence": -0.1},
+        {"index": 3, "matched_factor_id": "f", "confidence": "high"},  # not a number
+        {"index": 4, "confidence": 0.9},                               # no factor id
+        {"index": 5, **good},
+        {"index": 5, "matched_factor_id": "g", "confidence": 0.9},     # duplicate: first wins
+        {"index": 6, "matched_factor_id": None, "confidence": 0.0},    # explicit "no match" is kept
+        {"index": 7, **good},                                          # beyond count
+        {"index": -1, **good},
+        {"index": True, **good},                                       # bool is not an index
+        {"index": "2", **good},
+        "not an item",
+    ]}
+    parsed = classifier._parse_batch_response(raw, count=7)
+    assert sorted(parsed) == [0, 5, 6]
+    assert parsed[5]["matched_factor_id"] == "f"
+
+    assert classifier._parse_batch_response(None, 3) == {}
+    assert classifier._parse_batch_response({"results": "nope"}, 3) == {}
+    assert classifier._parse_batch_response([good], 3) == {}
+
+
+class GarblingLLM(FakeLLM):
+    """Batched replies drop or corrupt the items at `bad` positions; single prompts are fine."""
+
+    def __init__(self, factors: list[dict], bad: dict[int, str]) -> None:
+        super().__init__(factors)
+        self.bad = bad
+        self.singles = 0
+
+    def __call__(self, user_prompt: str, max_tokens: int, timeout: float) -> dict:
+        reply = super().__call__(user_prompt, max_tokens, timeout)
+        if "results" not in reply:
+            with self._lock:
+                self.singles += 1
+            return reply
+        items = []
+        for item in reply["results"]:
+            fault = self.bad.get(item["index"])
+            if fault == "missing":
+                continue
+            if fault == "confidence":
+                item = {**item, "confidence": 1.7}
+            elif fault == "index":
+                item = {**item, "index": item["index"] + 100}
+            items.append(item)
+        return {"results": items}
+
+
+def test_items_a_batched_reply_garbles_fall_back_to_single_prompts(fake_llm):
+    factors = make_factors()
+    fake = fake_llm(GarblingLLM(factors, bad={1: "missing", 2: "confidence", 4: "index"}))
+    txs = llm_misses(6)
+
+    results = classifier.classify_batch(txs, factors, max_concurrency=1, llm_batch_size=6)
+
+    assert [str(r["matched_factor"]["id"]) for r in results] == [fake.factor_for(tx["description"]) for tx in txs]
+    assert all(r["status"] == "classified" for r in results)
+    assert fake.singles == 3                      # one batch prompt, then one per garbled item
+    assert fake.calls == 4
+
+
+def test_batched_reply_with_nothing_usable_falls_back_to_single_prompts(fake_llm):
+    factors = make_factors()
+    fake = fake_llm(GarblingLLM(factors, bad={i: "confidence" for i in range(4)}))
+    txs = llm_misses(4)
+
+    results = classifier.classify_batch(txs, factors, max_concurrency=1, llm_batch_size=4)
+
+    assert all(r["status"] == "classified" for r in results)
+    assert fake.singles == 4
+    # Groq's empty reply counts as a failure and Gemini is asked the batch too.
+    assert fake.calls == 2 + 4
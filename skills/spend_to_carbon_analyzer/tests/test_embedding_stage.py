@@ -0,0 +1,52 @@
+"""The nearest-factor stage answers only confident matches; everything else reaches the LLM."""
+
+import threading
+
+import pytest
+from support import LABELLED_LINES, prompt_transactions, seed_factors
+
+from skills.spend_to_carbon_analyzer import classifier
+from skills.spend_to_carbon_analyzer.embedding_index import EmbeddingIndex
+
+
+@pytest.fixture
+def asked(fake_llm, monkeypatch):
+    """Descriptions the (fake) LLM was asked about; it never finds a factor."""
+    seen: list[str] = []
+    lock = threading.Lock()
+
+    @fake_llm
+    def answer(user_prompt: str, max_tokens: int, timeout: float) -> dict:
+        tx, = prompt_transactions(user_prompt)
+        with lock:
+            seen.append(tx["description"])
+        return {"matched_factor_id": None, "confidence": 0.0, "reasoning": "No match."}
+
+    monkeypatch.setattr(classifier, "EMBEDDING_STAGE", True)
+    return seen
+
+
+def test_weak_matches_go_to_the_llm(asked):
+    factors = seed_factors()
+    index   = EmbeddingIndex(factors)
+    for description in ("Mystery charge", "Team lunch"):
+        assert classifier._embedding_stage({"description": description}, factors, index) is None
+
+    transactions = [{"description": "Mystery charge", "amount_aud": 40.0},
+                    {"description": "Team lunch", "amount_aud": 180.5}]
+    results = classifier.classify_batch(transactions, factors, llm_batch_size=1)
+    assert sorted(asked) == ["Mystery charge", "Team lunch"]
+    assert all(r["matched_factor"] is None for r in results)
+
+
+def test_embedding_answers_are_confident(asked):
+    factors = seed_factors()
+    index   = EmbeddingIndex(factors)
+    answered = [
+        classifier._embedding_stage({"description": d, "supplier_name": s, "account_name": a}, factors, index)
+        for d, s, a, _ in LABELLED_LINES
+    ]
+    answered = [r for r in answered if r]
+    assert answered
+    assert all(r["status"] == "classified" for r in answered)
+    assert all(classifier.CONFIDENCE_THRESHOLD <= r["confidence"] <= 0.95 for r in answered)
@@ -0,0 +1,41 @@
+"""An invalidation that lands while a factor set is loading must not be undone by that load."""
+
+import pytest
+
+from skills.spend_to_carbon_analyzer import factor_cache as fc
+
+
+def _row(co2e_factor: float) -> dict:
+    return {"id": "00000000-0000-0000-0000-000000000001", "scope": 2, "category": "electricity",
+            "activity": "Grid electricity", "unit": "kWh", "calculation_method": "activity_based",
+            "co2e_factor": co2e_factor}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(fc, "fetch_factor_version", lambda: 1)
+    return fc.FactorCache(check_seconds=3600, max_age=3600)
+
+
+def test_load_overlapping_notify_is_not_cached(cache, monkeypatch):
+    stored = {"value": 0.80}
+
+    def slow_load(nga_year, state):
+        rows = [_row(stored["value"])]       # read before the refresh commits …
+        stored["value"] = 0.68
+        cache.observe_version(2)             # … NOTIFY arrives before the load returns
+        return rows
+
+    monkeypatch.setattr(fc, "fetch_all_factors", slow_load)
+    assert cache.get(2025)[0].co2e_factor == 0.80   # the caller still gets an answer
+
+    monkeypatch.setattr(fc, "fetch_all_factors", lambda nga_year, state: [_row(stored["value"])])
+    assert cache.get(2025)[0].co2e_factor == 0.68
+    assert cache.stats()["loads"] == 2
+
+
+def test_load_without_invalidation_is_cached(cache, monkeypatch):
+    monkeypatch.setattr(fc, "fetch_all_factors", lambda nga_year, state: [_row(0.68)])
+    cache.get(2025)
+    cache.get(2025)
+    assert (cache.stats()["loads"], cache.stats()["hits"]) == (1, 1)
@@ -0,0 +1,37 @@
+"""Startup loads run on a worker thread, not on the event loop."""
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from skills.spend_to_carbon_analyzer import async_db, main
+
+
+def test_startup_loads_run_off_the_event_loop(monkeypatch):
+    on_loop: dict[str, bool] = {}
+
+    def _recorder(name: str):
+        def _load() -> int:
+            try:
+                asyncio.get_running_loop()
+                on_loop[name] = True
+            except RuntimeError:
+                on_loop[name] = False
+            return 0
+        return _load
+
+    async def _no_pool() -> None:
+        return None
+
+    monkeypatch.setenv("FACTOR_CACHE_WARM", "1")
+    monkeypatch.setattr(main.factor_cache, "warm_up", _recorder("warm_up"))
+    monkeypatch.setattr(main.merchant_rules, "reload", _recorder("reload"))
+    monkeypatch.setattr(async_db, "init_pool", _no_pool)
+    monkeypatch.setattr(async_db, "close_pool", _no_pool)
+    monkeypatch.setattr(main.job_pool, "start", lambda: None)
+    monkeypatch.setattr(main.job_pool, "stop", lambda: None)
+
+    with TestClient(main.app):
+        pass
+
+    assert on_loop == {"warm_up": False, "reload": False}
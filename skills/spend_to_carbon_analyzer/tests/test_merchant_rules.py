@@ -0,0 +1,111 @@
+"""Merchant rules match like the TypeScript router: priority order, plain `includes()`."""
+
+import pytest
+
+from skills.spend_to_carbon_analyzer.classifier import _merchant_rule_stage
+from skills.spend_to_carbon_analyzer.merchant_rules import MerchantRuleEngine
+
+from support import seed_factors
+
+
+def _rule(name, pattern, match_type="contains", category="fuel_petrol", scope=1,
+          unit="L", priority=100, action="EXTRACT_VOLUME", requires_state=False):
+    return {
+        "id":             f"rule-{name}",
+        "merchant_name":  name,
+        "pattern":        pattern,
+        "match_type":     match_type,
+        "category_code":  category,
+        "scope":          scope,
+        "activity_unit":  unit,
+        "requires_state": requires_state,
+        "notes_citation": None,
+        "priority":       priority,
+        "action":         action,
+    }
+
+
+# A slice of migration 016 / 018, in `ORDER BY priority DESC, created_at ASC` order.
+RULES = [
+    _rule("BP Australia", " bp", priority=199),
+    _rule("BP Connect", "bp connect", category="fuel_diesel", priority=250),
+    _rule("Qantas", "qantas", category="air_travel_domestic", scope=3, unit="passenger_km", priority=300),
+    _rule("KLM", " klm ", category="air_travel_international", scope=3, unit="passenger_km", priority=300),
+    _rule("ANA", "ana ", category="air_travel_international", scope=3, unit="passenger_km", priority=300),
+    _rule("Ampol", "ampol", match_type="starts_with", priority=200),
+    _rule("Origin", "origin energy", match_type="exact", category="electricity", scope=2,
+          unit="kWh", requires_state=True, priority=200),
+    _rule("ATO", "australian taxation office", category="excluded_tax", scope=0, unit=None,
+          action="IGNORE", priority=400),
+    _rule("Uber", "uber", category="rideshare_taxi", scope=3, unit=None,
+          action="NEEDS_REVIEW", priority=150),
+]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return MerchantRuleEngine(RULES)
+
+
+def _matched(engine, description, supplier=None):
+    rule = engine.match({"description": description, "supplier_name": supplier})
+    return rule.merchant_name if rule else None
+
+
+def test_contains_patterns_are_not_padded(engine):
+    # 'ana ' must not fire on the tail of "Havana", nor ' klm ' on a line ending in KLM.
+    assert _matched(engine, "Catering - Havana") is None
+    assert _matched(engine, "Flight AMS KLM") is None
+    assert _matched(engine, "Flight AMS KLM booking") == "KLM"
+    assert _matched(engine, "ANA flight NRT") == "ANA"
+    assert _matched(engine, "BP fuel") is None            # ' bp' needs the leading space
+    assert _matched(engine, "Fuel BP Mascot") == "BP Australia"
+
+
+def test_highest_priority_rule_wins(engine):
+    assert _matched(engine, "Fuel BP Connect Mascot") == "BP Connect"
+    # Same priority: the earlier rule wins, like the router's first-match loop.
+    assert _matched(engine, "Qantas codeshare KLM flight") == "Qantas"
+
+
+def test_supplier_name_is_matched_too(engine):
+    assert _matched(engine, "Monthly invoice", supplier="Qantas Airways") == "Qantas"
+
+
+def test_starts_with_and_exact(engine):
+    assert _matched(engine, "AMPOL Alexandria") == "Ampol"
+    assert _matched(engine, "Fuel from Ampol") is None
+    assert _matched(engine, "Origin Energy") == "Origin"
+    assert _matched(engine, "Origin Energy bill") is None
+
+
+def test_excluded_and_needs_review_rules():
+    factors = seed_factors()
+    engine = MerchantRuleEngine(RULES)
+
+    excluded = _merchant_rule_stage({"description": "Australian Taxation Office BAS"}, factors, engine)
+    assert excluded["status"] == "excluded" and excluded["matched_factor"] is None
+
+    review = _merchant_rule_stage({"description": "Uber trip"}, factors, engine)
+    assert review["status"] == "needs_review"
+    assert "taxi" in review["matched_factor"]["activity"].lower()
+
+
+def test_factor_for_picks_like_fetch_factor(engine):
+    factors = seed_factors()
+    by_name = {r.merchant_name: r for r in engine.rules}
+
+    assert engine.factor_for(by_name["BP Australia"], factors)["activity"].startswith("Petrol")
+    assert engine.factor_for(by_name["BP Connect"], factors)["activity"].startswith("Diesel")
+    assert engine.factor_for(by_name["KLM"], factors)["activity"].startswith("Air Travel — International")
+    assert engine.factor_for(by_name["Origin"], factors)["state"] is not None
+    assert engine.factor_for(by_name["ATO"], factors) is None
+    # Memoised per factor set: the same list gives the same dict back.
+    assert engine.factor_for(by_name["BP Australia"], factors) is engine.factor_for(by_name["BP Australia"], factors)
+
+
+def test_state_rule_without_a_grid_factor_needs_review(engine):
+    no_grid = [f for f in seed_factors() if f["scope"] != 2]
+    result = _merchant_rule_stage({"description": "Origin Energy"}, no_grid, engine)
+    assert result["status"] == "needs_review"
+    assert "state" in result["notes"]
@@ -0,0 +1,167 @@
+"""Circuit breaker states, and hedging that only fires on a genuinely slow primary."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from skills.spend_to_carbon_analyzer import provider_health
+from skills.spend_to_carbon_analyzer.provider_health import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, Provider, first_answer,
+)
+from skills.spend_to_carbon_analyzer.ratelimit import TokenBucket
+
+
+# ---------------------------------------------------------------------------
+# CircuitBreaker
+# ---------------------------------------------------------------------------
+
+def _tripped(cooldown: float = 0.05) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=cooldown)
+    for _ in range(3):
+        breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()            # resets the run
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.opens == 1
+    assert breaker.blocked() and not breaker.allow()
+
+
+def test_breaker_allows_a_single_half_open_probe():
+    breaker = _tripped()
+    time.sleep(0.06)
+    assert not breaker.blocked()
+
+    assert breaker.allow()              # claims the probe
+    assert breaker.state == HALF_OPEN
+    assert breaker.blocked() and not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.failures == 0
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = _tripped()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.opens == 2
+    assert breaker.blocked() and not breaker.allow()
+
+
+# ---------------------------------------------------------------------------
+# first_answer
+# ---------------------------------------------------------------------------
+
+class FakeRequest:
+    """An LLM call that takes `seconds` and answers `answer`; counts its calls."""
+
+    def __init__(self, answer, seconds: float = 0.0) -> None:
+        self.answer  = answer
+        self.seconds = seconds
+        self.calls   = 0
+        self._lock   = threading.Lock()
+
+    def __call__(self, timeout: float):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.seconds)
+        return self.answer
+
+
+def _provider(name: str) -> Provider:
+    return Provider(name, TokenBucket(0), timeout=5.0, breaker=CircuitBreaker(3, 60))
+
+
+@pytest.fixture
+def hedging(monkeypatch):
+    """Hedging on, a fresh pool of `workers` threads, and a 0.25 s hedge delay."""
+    pools = []
+
+    def install(workers: int = 4) -> None:
+        pool = ThreadPoolExecutor(max_workers=workers)
+        pools.append(pool)
+        monkeypatch.setattr(provider_health, "_pool", pool)
+
+    monkeypatch.setattr(provider_health, "LLM_HEDGE", True)
+    monkeypatch.setattr(provider_health, "LLM_HEDGE_DEFAULT", 0.25)
+    monkeypatch.setattr(provider_health, "hedges", 0)
+    install()
+    yield install
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+
+def test_fast_primary_answers_alone(hedging):
+    primary, fallback = FakeRequest({"from": "primary"}), FakeRequest({"from": "fallback"})
+    answer = first_answer(_provider("p"), primary, _provider("f"), fallback)
+    assert answer == {"from": "primary"}
+    assert (primary.calls, fallback.calls, provider_health.hedges) == (1, 0, 0)
+
+
+def test_failed_primary_falls_back(hedging):
+    primary, fallback = FakeRequest(None), FakeRequest({"from": "fallback"})
+    answer = first_answer(_provider("p"), primary, _provider("f"), fallback)
+    assert answer == {"from": "fallback"}
+    assert (primary.calls, fallback.calls, provider_health.hedges) == (1, 1, 0)
+
+
+def test_open_primary_goes_straight_to_the_fallback(hedging):
+    p = _provider("p")
+    for _ in range(3):
+        p.breaker.record_failure()
+    primary, fallback = FakeRequest({"from": "primary"}), FakeRequest({"from": "fallback"})
+    assert first_answer(p, primary, _provider("f"), fallback) == {"from": "fallback"}
+    assert primary.calls == 0 and p.short_circuited == 1
+
+
+def test_slow_primary_is_hedged(hedging):
+    primary, fallback = FakeRequest({"from": "primary"}, seconds=1.0), FakeRequest({"from": "fallback"})
+    started = time.monotonic()
+    answer = first_answer(_provider("p"), primary, _provider("f"), fallback)
+    assert answer == {"from": "fallback"}
+    assert time.monotonic() - started < 0.8
+    assert provider_health.hedges == 1
+
+
+def test_busy_pool_does_not_trigger_hedges(hedging):
+    # Eight prompts behind two threads: most wait in the queue far longer
+    # than the hedge delay, but each provider call itself is quick.
+    hedging(workers=2)
+    p, f = _provider("p"), _provider("f")
+    primary, fallback = FakeRequest({"from": "primary"}, seconds=0.1), FakeRequest({"from": "fallback"})
+    answers = []
+    callers = [threading.Thread(target=lambda: answers.append(first_answer(p, primary, f, fallback)))
+               for _ in range(8)]
+    for t in callers:
+        t.start()
+    for t in callers:
+        t.join()
+
+    assert answers == [{"from": "primary"}] * 8
+    assert (primary.calls, fallback.calls, provider_health.hedges) == (8, 0, 0)
+
+
+def test_losing_call_still_queued_is_cancelled(hedging):
+    # One thread: the hedge queues behind the primary, which then wins.
+    hedging(workers=1)
+    primary, fallback = FakeRequest({"from": "primary"}, seconds=0.4), FakeRequest({"from": "fallback"})
+    answer = first_answer(_provider("p"), primary, _provider("f"), fallback)
+    assert answer == {"from": "primary"}
+    assert provider_health.hedges == 1
+
+    provider_health._pool.submit(lambda: None).result()     # drain the pool
+    assert fallback.calls == 0
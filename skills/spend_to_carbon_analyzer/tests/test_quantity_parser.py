@@ -0,0 +1,70 @@
+"""Unit aliases, conversions within a unit family only, and LLM quantity-hint reconciliation."""
+
+import pytest
+
+from skills.spend_to_carbon_analyzer.quantity_parser import (
+    canonical_unit,
+    convert_quantity,
+    parse_quantities,
+    quantity_in_unit,
+    reconcile_quantity_hint,
+)
+
+
+@pytest.mark.parametrize("spelling, unit", [
+    ("Litres", "L"), ("ltrs", "L"), ("KL", "kL"), ("kilowatt  hours", "kWh"),
+    ("Megawatt-Hour", "MWh"), ("gigajoules", "GJ"), ("Tons", "tonne"), ("kms", "km"),
+    ("cubic metres", "m3"), ("furlongs", None), ("", None), (None, None),
+])
+def test_unit_aliases(spelling, unit):
+    assert canonical_unit(spelling) == unit
+
+
+@pytest.mark.parametrize("value, unit, target, expected", [
+    (45.2, "L", "kL", 0.0452),           # no binary artefacts
+    (2, "kL", "litres", 2000.0),
+    (2, "MWh", "kWh", 2000.0),
+    (1500, "MJ", "GJ", 1.5),
+    (3, "tonnes", "kg", 3000.0),
+    (12, "kWh", "kWh", 12),
+    (7, "widgets", "widgets", 7),        # unknown but identical units pass through
+])
+def test_conversions_within_a_family(value, unit, target, expected):
+    assert convert_quantity(value, unit, target) == expected
+
+
+@pytest.mark.parametrize("unit, target", [
+    ("L", "kWh"), ("GJ", "kWh"), ("m3", "kL"), ("kg", "km"), ("L", "AUD"), (None, "L"),
+])
+def test_cross_family_conversions_are_rejected(unit, target):
+    assert convert_quantity(10, unit, target) is None
+
+
+def test_parse_quantities_needs_a_word_boundary():
+    assert parse_quantities("Diesel 1,250.5 L and 2 kL delivered") == (
+        (1250.5, "L"), (2.0, "kL"),
+    )
+    assert parse_quantities("5 Lunches at 3 kmart") == ()
+
+
+def test_quantity_in_unit_prefers_a_figure_already_in_that_unit():
+    assert quantity_in_unit("Fuel 2 kL (2,010 L metered)", "L") == 2010.0
+    assert quantity_in_unit("Fuel 2 kL", "L") == 2000.0
+    assert quantity_in_unit("Fuel 2 kL", "kWh") is None
+
+
+@pytest.mark.parametrize("hint, description, unit, expected", [
+    # Echoed figure mislabelled with the factor's unit: the description wins.
+    ({"value": 2, "unit": "kWh"}, "Origin Energy 2 MWh", "kWh", 2000.0),
+    # Figure not in the description: the hint's own unit is converted.
+    ({"value": 3, "unit": "kL"}, "Bulk diesel delivery", "L", 3000.0),
+    # Echoed figure whose description unit doesn't convert: fall back to the hint.
+    ({"value": 40, "unit": "L"}, "40 km trip, fuel card", "L", 40.0),
+    ({"value": 5, "unit": "GJ"}, "Gas account", "kWh", None),
+    ({"value": "n/a", "unit": "L"}, "Fuel", "L", None),
+    ({"value": 0, "unit": "L"}, "Fuel", "L", None),
+    ({"value": 5}, "Fuel", "L", None),
+    (None, "Fuel 5 L", "L", None),
+])
+def test_reconcile_quantity_hint(hint, description, unit, expected):
+    assert reconcile_quantity_hint(hint, description, unit) == expected
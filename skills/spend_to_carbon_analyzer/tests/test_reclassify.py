@@ -0,0 +1,150 @@
+"""Factor refresh: SQL vs Python path, spend fallback rows, dropped factors, when applied values advance."""
+
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from skills.spend_to_carbon_analyzer import reclassify
+from skills.spend_to_carbon_analyzer.reclassify import is_arithmetic, new_factor_registry, recalculate
+
+
+def _change(old_id, new_id, kind="in_place", unit="L", old_unit="L",
+            method="activity_based", old_method="activity_based", co2e=2.5, activity="Diesel"):
+    return {
+        "kind": kind, "old_id": old_id, "new_id": new_id, "activity": activity, "state": None,
+        "category": "Transport", "scope": 1,
+        "unit": unit, "old_unit": old_unit,
+        "calculation_method": method, "old_method": old_method,
+        "co2e_factor": co2e, "old_co2e_factor": 2.0,
+    }
+
+
+def test_is_arithmetic_only_when_unit_and_method_are_kept():
+    assert is_arithmetic(_change("a", "a"))
+    assert not is_arithmetic(_change("a", "a", unit="kL"))
+    assert not is_arithmetic(_change("a", "a", method="spend_based"))
+
+
+def _row(i, factor_id, amount="200.00", quantity=None, unit=None, description="Fuel"):
+    return {"id": f"tx-{i}", "factor_id": factor_id, "description": description,
+            "amount_aud": Decimal(amount), "quantity_value": quantity, "quantity_unit": unit}
+
+
+def test_recalculate_converts_quantities_and_falls_back_to_spend():
+    registry = new_factor_registry([
+        _change("diesel", "diesel-kl", unit="kL", co2e=2700.0),
+        _change("cloud", "cloud-aud", unit="AUD", method="spend_based", co2e=0.25, activity="Cloud"),
+        _change("power", "power-kwh", unit="kWh", co2e=0.7, activity="Electricity"),
+        _change("odd", "odd-new", method="supplier_specific", activity="Odd"),
+    ])
+    rows = [
+        _row(1, "diesel-kl", quantity=Decimal("500"), unit="L"),     # stored litres → kL
+        _row(2, "cloud-aud", quantity=Decimal("40"), unit="L"),      # spend-based: the amount
+        _row(3, "power-kwh", description="Power bill"),              # no quantity: spend fallback
+        _row(4, "power-kwh", description="Power 1,200 kWh"),         # quantity from the description
+        _row(5, "odd-new"),                                          # unknown method: dropped
+    ]
+    out = {r["id"]: r for r in recalculate(rows, registry)}
+
+    assert set(out) == {"tx-1", "tx-2", "tx-3", "tx-4"}
+    assert (out["tx-1"]["co2e_kg"], out["tx-1"]["quantity_value"], out["tx-1"]["quantity_unit"]) == (1350.0, 0.5, "kL")
+    assert (out["tx-2"]["co2e_kg"], out["tx-2"]["quantity_value"], out["tx-2"]["quantity_unit"]) == (50.0, 200.0, "AUD")
+    assert (out["tx-3"]["co2e_kg"], out["tx-3"]["quantity_value"], out["tx-3"]["quantity_unit"]) == (140.0, 200.0, "AUD")
+    assert (out["tx-4"]["co2e_kg"], out["tx-4"]["quantity_value"], out["tx-4"]["quantity_unit"]) == (840.0, 1200.0, "kWh")
+    assert all(r["scope"] == 1 for r in out.values())
+
+
+# ---------------------------------------------------------------------------
+# run() over a fake database layer
+# ---------------------------------------------------------------------------
+
+class FakeDB:
+    """The `db` functions reclassify uses; records what it was asked to do."""
+
+    DB_POOL_MAX = 4
+
+    def __init__(self, companies=("co-1", "co-2"), pages=()):
+        self.companies = list(companies)
+        self.pages     = list(pages)
+        self.recomputed: list[tuple] = []
+        self.recalc_args: list[list[bool]] = []
+        self.applied: list[list[str]] = []
+
+    @contextmanager
+    def get_cursor(self):
+        yield self
+
+    def execute(self, sql, params=None):
+        pass
+
+    def refresh_companies(self, cur, old_ids, since):
+        return self.companies
+
+    def recompute_co2e(self, cur, company_id, changes, since):
+        self.recomputed.append((company_id, [c["old_id"] for c in changes]))
+        return 10 * len(changes)
+
+    def recalculation_rows(self, cur, company_id, changes, arithmetic, since, after, limit):
+        self.recalc_args.append(list(arithmetic))
+        return self.pages.pop(0) if self.pages and after == reclassify._FIRST_ID else []
+
+    def write_recalculated(self, cur, rows):
+        return len(rows)
+
+    def rollup_drift(self, cur, company_id):
+        return False
+
+    def rebuild_rollup_rows(self, cur, company_id):
+        raise AssertionError("no drift, no rebuild")
+
+    def record_applied_factors(self, cur, factor_ids):
+        self.applied.append(sorted(factor_ids))
+        return len(factor_ids)
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    def install(**kwargs) -> FakeDB:
+        fake = FakeDB(**kwargs)
+        monkeypatch.setattr(reclassify, "db", fake)
+        return fake
+    return install
+
+
+def test_run_routes_changes_to_sql_or_python(fake_db):
+    db = fake_db(companies=["co-1"], pages=[[_row(1, "b-kl", quantity=Decimal("500"), unit="L")]])
+    changes = [_change("a", "a"), _change("b", "b-kl", unit="kL", co2e=2700.0)]
+    summary = reclassify.run(changes)
+
+    assert db.recomputed == [("co-1", ["a"])]              # only the arithmetic change in SQL
+    assert db.recalc_args[0] == [True, False]
+    assert (summary["recomputed"], summary["recalculated"], summary["skipped"]) == (10, 1, 0)
+
+
+def test_dropped_factors_are_left_alone(fake_db):
+    db = fake_db()
+    changes = [_change("gone", None, kind="edition"), _change("kept", "kept-2025", kind="edition")]
+    reclassify.run(changes)
+    assert sorted(db.recomputed) == [("co-1", ["kept"]), ("co-2", ["kept"])]
+
+    db = fake_db()
+    summary = reclassify.run([_change("gone", None, kind="edition")])
+    assert summary["companies"] == 0 and db.recomputed == [] and db.applied == []
+
+
+def test_applied_values_advance_only_after_a_full_in_place_run(fake_db):
+    changes = [_change("a", "a"), _change("b", "b-2025", kind="edition")]
+
+    db = fake_db()
+    reclassify.run(changes)
+    assert db.applied == [["a"]]                           # in-place factors only
+
+    db = fake_db()
+    reclassify.run(changes, company_id="co-1")
+    assert db.applied == []
+
+    db = fake_db()
+    reclassify.run(changes, since=date(2025, 7, 1))
+    assert db.applied == []
@@ -0,0 +1,133 @@
+"""
+GET /reports/aggregate is one grouped, index-bounded query, and quarterly
+reports file each line under the same quarter as emission_rollups.
+"""
+
+import json
+import os
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from support import LEDGER_COMPANIES, plan_nodes
+
+from skills.spend_to_carbon_analyzer import async_db, main
+from skills.spend_to_carbon_analyzer.async_db import QUARTER_GROUPS_SQL, REPORT_GROUPS_SQL, ROLLUP_GROUPS_SQL
+from skills.spend_to_carbon_analyzer.calculator import RunningAggregate
+from skills.spend_to_carbon_analyzer.pipeline import summary_values
+from skills.spend_to_carbon_analyzer.rollups import period_summaries
+
+HEADERS = {"X-API-Key": os.environ["INTERNAL_API_KEY"]}
+COMPANY = "00000000-0000-0000-0000-000000000001"
+
+
+def _group(period_start: date, scope: int, category: str, tx_count: int, co2e_kg: float) -> dict:
+    return {
+        "period_start": period_start, "scope": scope, "category": category, "tx_count": tx_count,
+        "classified_count": tx_count, "needs_review_count": 0, "factor_not_found_count": 0,
+        "excluded_count": 0, "emitting_count": tx_count, "co2e_kg": co2e_kg,
+        "amount_aud": 100.0 * tx_count, "classified_amount_aud": 100.0 * tx_count,
+    }
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    calls: list[tuple] = []
+
+    async def _report_groups(company_id, date_from, date_to):
+        calls.append(("transactions", date_from, date_to))
+        return [_group(date(2023, 1, 1), 1, "Transport", 3, 30.0),
+                _group(date(2023, 2, 1), 2, "Electricity", 2, 12.5)]
+
+    async def _quarter_groups(company_id, first, last):
+        calls.append(("transactions", first, last))
+        return [_group(date(2023, 7, 1), 1, "Transport", 3, 30.0)]
+
+    async def _rollup_groups(company_id, first, last):
+        calls.append(("rollups", first, last))
+        return None                                  # migration 026 not applied
+
+    monkeypatch.setattr(async_db, "fetch_report_groups", _report_groups)
+    monkeypatch.setattr(async_db, "fetch_quarter_groups", _quarter_groups)
+    monkeypatch.setattr(async_db, "fetch_rollup_groups", _rollup_groups)
+    return calls
+
+
+def test_monthly_report_is_one_query(queries):
+    response = TestClient(main.app).get(
+        "/reports/aggregate", headers=HEADERS,
+        params={"company_id": COMPANY, "date_from": "2023-01-01", "date_to": "2023-03-31", "period": "month"},
+    )
+    assert response.status_code == 200, response.text
+    assert queries == [("transactions", date(2023, 1, 1), date(2023, 3, 31))]
+    body = response.json()
+    assert body["source"] == "transactions"
+    assert body["total_co2e_kg"] == 42.5
+    assert [p["co2e_kg"] for p in body["by_period"]] == [30.0, 12.5]
+
+
+def test_quarterly_report_covers_whole_financial_quarters(queries):
+    response = TestClient(main.app).get(
+        "/reports/aggregate", headers=HEADERS,
+        params={"company_id": COMPANY, "date_from": "2023-08-15", "date_to": "2023-11-20", "period": "quarter"},
+    )
+    assert response.status_code == 200, response.text
+    # Both sources are asked for the same quarters: FY2024 Q1 (Jul–Sep) to Q2 (Oct–Dec).
+    assert queries == [("rollups", (2024, 1), (2024, 2)), ("transactions", (2024, 1), (2024, 2))]
+    body = response.json()
+    assert body["source"] == "transactions"
+    assert [p["period"] for p in body["by_period"]] == ["FY2024 Q1"]
+
+
+# ---------------------------------------------------------------------------
+# Query plan (BENCH_DATABASE_URL)
+# ---------------------------------------------------------------------------
+
+_FY2023 = ((2023, 1), (2023, 4))
+
+
+@pytest.mark.parametrize("period", ["month", "quarter"])
+def test_report_query_plan(ledger, period):
+    sql, args, index = {
+        "month":   (REPORT_GROUPS_SQL, (date(2022, 7, 1), date(2023, 6, 30)), "idx_tx_company_date_id"),
+        "quarter": (QUARTER_GROUPS_SQL, (*_FY2023[0], *_FY2023[1]), "idx_tx_company_reporting_period"),
+    }[period]
+
+    async def _explain(conn):
+        return await conn.fetchval("EXPLAIN (FORMAT JSON) " + sql, LEDGER_COMPANIES[0], *args)
+
+    nodes = list(plan_nodes(json.loads(ledger(_explain))[0]["Plan"]))
+    aggregates = [n for n in nodes if n["Node Type"] == "Aggregate"]
+    scans      = [n for n in nodes if n.get("Relation Name") == "transactions"]
+
+    assert len(aggregates) == 1, "one GROUP BY over the period range"
+    assert len(scans) == 1, "transactions read once"
+    assert scans[0]["Node Type"] != "Seq Scan"
+    assert index in {n.get("Index Name") for n in nodes}
+
+
+def test_quarter_groups_match_rollups(ledger):
+    # A synced line whose reporting period is not its date's quarter must land
+    # in the same quarter whichever source answers.
+    async def _compare(conn):
+        tx = conn.transaction()
+        await tx.start()
+        try:
+            await conn.execute(
+                """
+                UPDATE transactions SET reporting_year = 2023, reporting_quarter = 4
+                WHERE company_id = $1::uuid AND transaction_date BETWEEN '2023-07-01' AND '2023-07-31'
+                """,
+                LEDGER_COMPANIES[0],
+            )
+            args = (LEDGER_COMPANIES[0], *_FY2023[0], *_FY2023[1])
+            return ([dict(r) for r in await conn.fetch(QUARTER_GROUPS_SQL, *args)],
+                    [dict(r) for r in await conn.fetch(ROLLUP_GROUPS_SQL, *args)])
+        finally:
+            await tx.rollback()
+
+    def _summary(groups):
+        return summary_values(RunningAggregate().add_groups(groups)), period_summaries(groups, "quarter")
+
+    from_transactions, from_rollups = ledger(_compare)
+    assert _summary(from_transactions) == _summary(from_rollups)
@@ -0,0 +1,34 @@
+"""The classification cache is shared across tenants: it must not carry LLM reasoning."""
+
+import pytest
+from support import make_factors
+
+from skills.spend_to_carbon_analyzer import classifier
+from skills.spend_to_carbon_analyzer.result_cache import to_cache_value
+
+SECRET = "Invoice for Jane Citizen's divorce settlement"
+
+
+@pytest.fixture
+def factors(fake_llm):
+    factors = make_factors()
+
+    @fake_llm
+    def answer(user_prompt: str, max_tokens: int, timeout: float) -> dict:
+        return {"matched_factor_id": str(factors[0]["id"]), "confidence": 0.9,
+                "reasoning": f"Matched because: {SECRET}"}
+
+    return factors
+
+
+def test_cache_hit_carries_no_reasoning(factors):
+    tx = {"description": "Misc supplier qzx invoice", "amount_aud": 100.0}
+
+    first,  = classifier.classify_batch([tx], factors, llm_batch_size=1)
+    second, = classifier.classify_batch([tx], factors, llm_batch_size=1)
+
+    assert SECRET in first["notes"]
+    assert "notes" not in to_cache_value(first)
+    assert second["matched_factor"] is first["matched_factor"]
+    assert second["status"] == first["status"] == "classified"
+    assert SECRET not in second["notes"]
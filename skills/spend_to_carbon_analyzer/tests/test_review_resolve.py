@@ -0,0 +1,130 @@
+"""Overrides recompute CO2e against the new factor; resolved rows leave the queue with an audit entry."""
+
+import json
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+from support import LEDGER_COMPANIES
+
+from skills.spend_to_carbon_analyzer import async_db
+from skills.spend_to_carbon_analyzer.pipeline import override_decision
+
+REVIEWER = "00000000-0000-0000-0000-00000000beef"
+
+DIESEL = {"id": UUID(int=1), "scope": 1, "unit": "L", "calculation_method": "activity_based",
+          "co2e_factor": Decimal("2.7"), "activity": "Diesel — Heavy Vehicles"}
+CLOUD  = {"id": UUID(int=2), "scope": 3, "unit": "AUD", "calculation_method": "spend_based",
+          "co2e_factor": Decimal("0.25"), "activity": "Cloud services"}
+
+
+def _row(**overrides) -> dict:
+    """A review-queue row as asyncpg returns it (UUIDs and Decimals)."""
+    row = {
+        "id": UUID(int=99), "description": "Fuel card", "amount_aud": Decimal("300.00"),
+        "quantity_value": None, "quantity_unit": None,
+    }
+    row.update(overrides)
+    return row
+
+
+# ---------------------------------------------------------------------------
+# override_decision
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("row, factor, co2e, quantity, unit", [
+    # Stored quantity converted into the new factor's unit.
+    (_row(quantity_value=Decimal("0.5"), quantity_unit="kL"), DIESEL, 1350.0, 500.0, "L"),
+    # No stored quantity: parsed from the description.
+    (_row(description="Fuel card 40 L"), DIESEL, 108.0, 40.0, "L"),
+    # Spend-based factor: the amount is the quantity.
+    (_row(quantity_value=Decimal("40"), quantity_unit="L"), CLOUD, 75.0, 300.0, "AUD"),
+])
+def test_override_recomputes_against_the_new_factor(row, factor, co2e, quantity, unit):
+    decision = override_decision(row, factor, "wrong factor")
+    assert decision == {
+        "id":             str(row["id"]),
+        "action":         "override",
+        "factor_id":      str(factor["id"]),
+        "co2e_kg":        co2e,
+        "scope":          factor["scope"],
+        "quantity_value": quantity,
+        "quantity_unit":  unit,
+        "note":           "wrong factor",
+    }
+
+
+def test_override_without_a_quantity_falls_back_to_spend():
+    factor = {**DIESEL, "unit": "kWh", "activity": "Electricity"}
+    decision = override_decision(_row(description="Power bill"), factor, None)
+    assert (decision["co2e_kg"], decision["quantity_value"], decision["quantity_unit"]) == (810.0, 300.0, "AUD")
+
+
+# ---------------------------------------------------------------------------
+# resolve_reviews against the scratch ledger (BENCH_DATABASE_URL)
+# ---------------------------------------------------------------------------
+
+def test_resolved_rows_leave_the_queue_with_an_audit_row(ledger, monkeypatch):
+    company = LEDGER_COMPANIES[1]
+
+    async def _resolve(conn):
+        async def _pool():
+            return conn                 # the connection stands in for the pool
+        monkeypatch.setattr(async_db, "_get_pool", _pool)
+
+        tx = conn.transaction()
+        await tx.start()
+        try:
+            review = await conn.fetch(
+                "SELECT id FROM transactions WHERE company_id = $1::uuid"
+                " AND classification_status = 'needs_review' ORDER BY id LIMIT 2",
+                company,
+            )
+            missing = await conn.fetchval(
+                "SELECT id FROM transactions WHERE company_id = $1::uuid"
+                " AND classification_status = 'factor_not_found' ORDER BY id LIMIT 1",
+                company,
+            )
+            accepted, overridden = (str(r["id"]) for r in review)
+            rows = await async_db.fetch_review_rows(company, [overridden])
+            factor = dict(await conn.fetchrow(
+                "SELECT * FROM emission_factors WHERE calculation_method = 'spend_based' ORDER BY n LIMIT 1"
+            ))
+            decisions = [
+                {"id": accepted, "action": "accept", "note": None},
+                override_decision(rows[0], factor, "supplier invoice checked"),
+                {"id": str(missing), "action": "accept", "note": None},    # no factor to accept
+            ]
+            resolved = await async_db.resolve_reviews(company, REVIEWER, decisions)
+            still_queued = await async_db.fetch_review_rows(company, [accepted, overridden, str(missing)])
+            audit = await conn.fetch(
+                "SELECT transaction_id, event_type, user_id, payload FROM transaction_audit_log"
+                " WHERE transaction_id = ANY($1::uuid[])",
+                [accepted, overridden, str(missing)],
+            )
+            stored = await conn.fetchrow(
+                "SELECT emission_factor_id, co2e_kg, classification_status FROM transactions WHERE id = $1::uuid",
+                overridden,
+            )
+            return accepted, overridden, str(missing), decisions[1], factor, resolved, still_queued, audit, stored
+        finally:
+            await tx.rollback()
+
+    accepted, overridden, missing, decision, factor, resolved, still_queued, audit, stored = ledger(_resolve)
+
+    assert sorted(resolved) == sorted([accepted, overridden])
+    assert [str(r["id"]) for r in still_queued] == [missing]
+
+    by_tx = {str(a["transaction_id"]): a for a in audit}
+    assert set(by_tx) == {accepted, overridden}
+    for entry in by_tx.values():
+        assert entry["event_type"] == "manual_review_resolved"
+        assert str(entry["user_id"]) == REVIEWER
+    payload = json.loads(by_tx[overridden]["payload"])
+    assert payload["action"] == "override"
+    assert payload["note"] == "supplier invoice checked"
+    assert payload["emission_factor_id"] == str(factor["id"])
+
+    assert stored["classification_status"] == "classified"
+    assert stored["emission_factor_id"] == factor["id"]
+    assert float(stored["co2e_kg"]) == decision["co2e_kg"]
@@ -0,0 +1,170 @@
+"""GET /transactions keyset pages: every row exactly once, in a stable order, at any depth."""
+
+import json
+import os
+import random
+from datetime import date, timedelta
+from uuid import UUID
+
+import pytest
+from fastapi.testclient import TestClient
+from support import LEDGER_COMPANIES, LEDGER_ROWS, plan_nodes
+
+from skills.spend_to_carbon_analyzer import async_db, main
+from skills.spend_to_carbon_analyzer.async_db import transactions_page_query
+
+HEADERS = {"X-API-Key": os.environ["INTERNAL_API_KEY"]}
+COMPANY = "00000000-0000-0000-0000-000000000001"
+
+
+def _ledger(n: int = 240, days: int = 9) -> list[dict]:
+    """`n` rows over only `days` dates, so most rows tie on transaction_date."""
+    rng = random.Random(11)
+    statuses = ["classified", "classified", "needs_review", "factor_not_found"]
+    return [
+        {
+            "id":                    UUID(int=rng.getrandbits(128), version=4),
+            "transaction_date":      date(2024, 3, 1) + timedelta(days=rng.randrange(days)),
+            "description":           f"Line {i}",
+            "amount_aud":            10.0 + i,
+            "classification_status": rng.choice(statuses),
+            "scope":                 1 + i % 3,
+        }
+        for i in range(n)
+    ]
+
+
+def _newest_first(rows: list[dict]) -> list[dict]:
+    return sorted(rows, key=lambda r: (r["transaction_date"], r["id"]), reverse=True)
+
+
+@pytest.fixture
+def ledger_rows(monkeypatch):
+    rows = _ledger()
+
+    # ORDER BY transaction_date DESC, id DESC with a (date, id) < after bound —
+    # Postgres compares uuids bytewise, as UUID objects do.
+    async def _page(company_id, fields, limit, statuses=None, scope=None, after=None):
+        found = [
+            r for r in _newest_first(rows)
+            if (not statuses or r["classification_status"] in statuses)
+            and (scope is None or r["scope"] == scope)
+            and (after is None or (r["transaction_date"], r["id"]) < (after[0], UUID(after[1])))
+        ]
+        return [dict(r) for r in found[:limit]]
+
+    monkeypatch.setattr(async_db, "fetch_transactions_page", _page)
+    return rows
+
+
+def _walk(params: dict) -> list[dict]:
+    client, pages, cursor = TestClient(main.app), [], None
+    while True:
+        response = client.get("/transactions", headers=HEADERS,
+                              params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert body["count"] == len(body["transactions"]) <= params["limit"]
+        pages.append(body["transactions"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+        assert body["count"] == params["limit"]    # only the last page is short
+        assert len(pages) < 1_000
+    return [row for page in pages for row in page]
+
+
+@pytest.mark.parametrize("limit", [1, 7, 40, 240, 500])
+def test_pages_cover_every_row_once_in_order(ledger_rows, limit):
+    seen = _walk({"company_id": COMPANY, "limit": limit, "fields": "id,transaction_date"})
+    ids = [row["id"] for row in seen]
+    assert len(ids) == len(set(ids))
+    assert ids == [str(r["id"]) for r in _newest_first(ledger_rows)]
+
+
+def test_filtered_pages_cover_every_match(ledger_rows):
+    seen = _walk({"company_id": COMPANY, "limit": 9, "status": ["needs_review", "factor_not_found"],
+                  "scope": 2, "fields": "id"})
+    expected = [
+        str(r["id"]) for r in _newest_first(ledger_rows)
+        if r["classification_status"] in ("needs_review", "factor_not_found") and r["scope"] == 2
+    ]
+    assert [row["id"] for row in seen] == expected
+
+
+def test_pages_are_stable_when_dates_tie(ledger_rows):
+    params = {"company_id": COMPANY, "limit": 25, "fields": "id,transaction_date"}
+    first, second = _walk(params), _walk(params)
+    assert first == second
+    tied = [row for row in first if row["transaction_date"] == first[0]["transaction_date"]]
+    assert len(tied) > 25                          # the tie spans a page boundary
+    assert [row["id"] for row in tied] == sorted((row["id"] for row in tied), reverse=True)
+
+
+def test_invalid_cursor_is_rejected(ledger_rows):
+    response = TestClient(main.app).get(
+        "/transactions", headers=HEADERS, params={"company_id": COMPANY, "cursor": "not-a-cursor"},
+    )
+    assert response.status_code == 422
+
+
+# ---------------------------------------------------------------------------
+# Real queries (BENCH_DATABASE_URL)
+# ---------------------------------------------------------------------------
+
+FIELDS = ["id", "transaction_date", "classification_status"]
+
+
+async def _walk_sql(conn, company_id: str, limit: int, statuses=None) -> list[UUID]:
+    ids, after = [], None
+    while True:
+        sql, args = transactions_page_query(company_id, FIELDS, limit, statuses, after=after)
+        rows = await conn.fetch(sql, *args)
+        ids.extend(row["id"] for row in rows)
+        if len(rows) < limit:
+            return ids
+        after = (rows[-1]["transaction_date"], str(rows[-1]["id"]))
+
+
+@pytest.mark.parametrize("statuses", [None, ["needs_review"]])
+def test_keyset_walk_matches_full_order(ledger, statuses):
+    company = LEDGER_COMPANIES[1]
+
+    async def _both(conn):
+        walked = await _walk_sql(conn, company, 997, statuses)
+        full = await conn.fetch(
+            "SELECT id FROM transactions WHERE company_id = $1::uuid "
+            "AND ($2::text[] IS NULL OR classification_status = ANY($2::text[])) "
+            "ORDER BY transaction_date DESC, id DESC",
+            company, statuses,
+        )
+        return walked, [row["id"] for row in full]
+
+    walked, full = ledger(_both)
+    assert len(walked) == len(set(walked))
+    assert walked == full
+
+
+@pytest.mark.parametrize("depth", [0, LEDGER_ROWS // 2, LEDGER_ROWS - 150])
+def test_deep_page_reads_only_its_rows(ledger, depth):
+    company, limit = LEDGER_COMPANIES[2], 100
+
+    async def _explain(conn):
+        after = None
+        if depth:
+            row = await conn.fetchrow(
+                "SELECT transaction_date, id FROM transactions WHERE company_id = $1::uuid "
+                "ORDER BY transaction_date DESC, id DESC OFFSET $2 LIMIT 1",
+                company, depth - 1,
+            )
+            after = (row["transaction_date"], str(row["id"]))
+        sql, args = transactions_page_query(company, FIELDS, limit + 1, after=after)
+        return await conn.fetchval("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, *args)
+
+    nodes = list(plan_nodes(json.loads(ledger(_explain))[0]["Plan"]))
+    scans = [n for n in nodes if n.get("Relation Name") == "transactions"]
+    assert [n["Node Type"] for n in scans] == ["Index Scan"]
+    assert scans[0]["Index Name"] == "idx_tx_company_date_id"
+    assert not any(n["Node Type"] == "Sort" for n in nodes)
+    # The same rows read at any depth — no OFFSET-style skipping.
+    assert scans[0]["Actual Rows"] <= limit + 1
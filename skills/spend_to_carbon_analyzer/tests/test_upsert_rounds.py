@@ -0,0 +1,48 @@
+"""A repeated (source, external_id) never lands twice in one upsert statement, and the last occurrence wins."""
+
+from skills.spend_to_carbon_analyzer.db import _conflict_rounds
+
+
+def _row(external_id, version, source="xero"):
+    return {"source": source, "external_id": external_id, "version": version}
+
+
+def _keys(rounds):
+    return [[(r["source"], r["external_id"], r["version"]) for r in batch] for batch in rounds]
+
+
+def test_unique_keys_are_one_round():
+    rows = [_row(f"T-{i}", 0) for i in range(5)]
+    assert _conflict_rounds(rows) == [rows]
+
+
+def test_repeated_keys_go_to_later_rounds_in_input_order():
+    rows = [
+        _row("T-1", 0), _row("T-2", 0), _row("T-1", 1),
+        _row("T-3", 0), _row("T-1", 2), _row("T-2", 1),
+    ]
+    assert _keys(_conflict_rounds(rows)) == [
+        [("xero", "T-1", 0), ("xero", "T-2", 0), ("xero", "T-3", 0)],
+        [("xero", "T-1", 1), ("xero", "T-2", 1)],
+        [("xero", "T-1", 2)],
+    ]
+
+
+def test_last_occurrence_wins_when_rounds_run_in_order():
+    rows = [_row("T-1", v) for v in range(4)] + [_row("T-2", 9)]
+    final = {}
+    for batch in _conflict_rounds(rows):
+        keys = [(r["source"], r["external_id"]) for r in batch]
+        assert len(keys) == len(set(keys)), "a key repeated inside one statement"
+        final.update({key: r["version"] for key, r in zip(keys, batch)})
+    assert final == {("xero", "T-1"): 3, ("xero", "T-2"): 9}
+
+
+def test_rows_without_external_id_and_other_sources_never_conflict():
+    rows = [
+        _row(None, 0), _row(None, 1), _row("T-1", 0),
+        _row("T-1", 0, source="myob"), _row(None, 2),
+    ]
+    rounds = _conflict_rounds(rows)
+    assert len(rounds) == 1
+    assert rounds[0] == rows
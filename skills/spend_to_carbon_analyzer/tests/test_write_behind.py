@@ -0,0 +1,100 @@
+"""
+A row the database rejects must not take the rest of its flush batch down
+with it — and a database outage must not be mistaken for bad rows.
+"""
+
+import threading
+import time
+
+import psycopg2
+import psycopg2.errors
+
+from skills.spend_to_carbon_analyzer.write_behind import WriteBehindQueue
+
+
+class FakeWriter:
+    """
+    Stands in for `upsert_transactions`; rejects a whole call if any row is
+    locked, and fails the first `outages` calls as if the database were down.
+    """
+
+    def __init__(self, outages: int = 0) -> None:
+        self.saved: list[str] = []
+        self.calls = 0
+        self.outages = outages
+        self._lock = threading.Lock()
+
+    def __call__(self, company_id: str, rows: list[dict]) -> int:
+        with self._lock:
+            self.calls += 1
+            if self.calls <= self.outages:
+                raise psycopg2.OperationalError("could not connect to server")
+            if any(row.get("locked") for row in rows):
+                raise psycopg2.errors.RaiseException("transaction is locked to a submitted report")
+            self.saved.extend(row["external_id"] for row in rows)
+        return len(rows)
+
+
+def _rows(prefix: str, n: int, locked: int = -1) -> list[dict]:
+    return [{"external_id": f"{prefix}-{i}", "locked": i == locked} for i in range(n)]
+
+
+def test_bad_row_is_isolated_from_other_requests():
+    writer = FakeWriter()
+    wb = WriteBehindQueue(batch_size=100, flush_seconds=5.0, max_retries=1, writer=writer)
+    wb.submit("co-1", _rows("a", 10))
+    wb.submit("co-1", _rows("b", 10, locked=3))
+    wb.submit("co-1", _rows("c", 10))
+    wb.start()
+    wb.stop()
+
+    expected = {f"{p}-{i}" for p in "abc" for i in range(10)} - {"b-3"}
+    assert sorted(writer.saved) == sorted(expected)
+    stats = wb.stats()
+    assert (stats["persisted"], stats["failed"]) == (29, 1)
+    assert "locked" in stats["last_error"]
+
+
+def test_healthy_batch_is_one_write_per_company():
+    writer = FakeWriter()
+    wb = WriteBehindQueue(batch_size=100, flush_seconds=5.0, writer=writer)
+    wb.submit("co-1", _rows("a", 5))
+    wb.submit("co-1", _rows("b", 5))
+    wb.submit("co-2", _rows("c", 5))
+    wb.start()
+    wb.stop()
+
+    assert writer.calls == 2
+    assert (wb.stats()["persisted"], wb.stats()["failed"]) == (15, 0)
+
+
+def test_outage_holds_the_batch_instead_of_isolating_it():
+    writer = FakeWriter(outages=2)
+    wb = WriteBehindQueue(batch_size=100, flush_seconds=0.05, max_retries=0, writer=writer)
+    for prefix in "abc":
+        wb.submit("co-1", _rows(prefix, 10))
+    wb.start()
+    deadline = time.monotonic() + 5.0
+    while wb.stats()["persisted"] < 30 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    wb.stop()
+
+    # Two failed whole-batch writes, then one that succeeds — never row by row.
+    assert writer.calls == 3
+    assert len(writer.saved) == 30
+    stats = wb.stats()
+    assert (stats["persisted"], stats["failed"], stats["held"]) == (30, 0, 0)
+
+
+def test_rows_still_held_at_shutdown_are_failed():
+    writer = FakeWriter(outages=1_000)
+    wb = WriteBehindQueue(batch_size=100, flush_seconds=5.0, max_retries=0, writer=writer)
+    wb.submit("co-1", _rows("a", 10))
+    wb.submit("co-1", _rows("b", 10))
+    wb.start()
+    wb.stop()
+
+    assert writer.calls == 2        # the flush, then the final drain attempt
+    stats = wb.stats()
+    assert (stats["persisted"], stats["failed"], stats["held"]) == (0, 20, 0)
+    assert "could not connect" in stats["last_error"]
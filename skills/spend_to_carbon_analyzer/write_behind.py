@@ -0,0 +1,305 @@
+"""
+EcoLink Australia — Write-behind persistence for classified transactions.
+
+Persisting /analyse results is best-effort, yet the endpoint used to wait
+for `upsert_transactions` before responding. This module moves the write
+off the request path: rows are put on a bounded in-process queue and a
+background thread flushes them in batches.
+
+  - Bounded: at most PERSIST_QUEUE_SIZE rows are held. When the queue is
+    full, `submit` waits up to PERSIST_ENQUEUE_TIMEOUT seconds (back-
+    pressure) and then rejects the rows — counted and logged.
+  - Batching: a flush happens when PERSIST_BATCH_SIZE rows are waiting or
+    PERSIST_FLUSH_SECONDS after the first row of a batch arrived.
+  - Retries: a failed flush is retried PERSIST_MAX_RETRIES times with
+    exponential backoff.
+  - Isolation: a batch merges rows from many requests, so one bad row (say,
+    one locked to a report — migration 020) would fail them all. When the
+    retries are spent on a row-level error (bad data, a constraint, a lock
+    trigger's RAISE), each request's rows are written on their own, and a
+    request that still fails is written row by row. Only the rows that fail
+    alone are counted as failed.
+  - Outages: any other error (connection refused, pool exhausted, ...) says
+    nothing about the rows, so the batch is held and retried with the next
+    flush — at least every PERSIST_FLUSH_SECONDS — instead of being split
+    into one doomed write per row. At most PERSIST_QUEUE_SIZE rows are held;
+    the oldest beyond that, and whatever is still held after the final
+    drain, are counted as failed.
+  - Shutdown: `stop()` drains everything already queued before returning
+    (bounded by PERSIST_DRAIN_SECONDS).
+
+`stats()` exposes queue depth and counters for GET /stats.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from itertools import count
+from typing import Optional
+
+import psycopg2
+import psycopg2.errors
+
+from .db import upsert_transactions
+
+logger = logging.getLogger("ecolink.write_behind")
+
+PERSIST_QUEUE_SIZE      = int(os.environ.get("PERSIST_QUEUE_SIZE", "20000"))
+PERSIST_BATCH_SIZE      = int(os.environ.get("PERSIST_BATCH_SIZE", "500"))
+PERSIST_FLUSH_SECONDS   = float(os.environ.get("PERSIST_FLUSH_SECONDS", "1.0"))
+PERSIST_MAX_RETRIES     = int(os.environ.get("PERSIST_MAX_RETRIES", "3"))
+PERSIST_ENQUEUE_TIMEOUT = float(os.environ.get("PERSIST_ENQUEUE_TIMEOUT", "0.5"))
+PERSIST_DRAIN_SECONDS   = float(os.environ.get("PERSIST_DRAIN_SECONDS", "30"))
+
+_STOP = object()
+
+# Errors caused by the rows themselves — worth isolating. Anything else
+# (OperationalError, InterfaceError, PoolError, ...) is an outage.
+_ROW_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError, psycopg2.errors.RaiseException)
+
+
+class WriteBehindQueue:
+    """Bounded queue of (company_id, submission, row) items with one flushing thread."""
+
+    def __init__(
+        self,
+        capacity: int = PERSIST_QUEUE_SIZE,
+        batch_size: int = PERSIST_BATCH_SIZE,
+        flush_seconds: float = PERSIST_FLUSH_SECONDS,
+        max_retries: int = PERSIST_MAX_RETRIES,
+        writer=upsert_transactions,
+    ) -> None:
+        self._queue: "queue.Queue" = queue.Queue(maxsize=capacity)
+        self.capacity      = capacity
+        self.batch_size    = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_retries   = max_retries
+        self._writer       = writer
+        self._thread: Optional[threading.Thread] = None
+        self._lock         = threading.Lock()
+        self._submissions  = count()
+        self._held: list[tuple[str, int, dict]] = []    # worker thread only
+        self.enqueued      = 0
+        self.persisted     = 0
+        self.failed        = 0
+        self.rejected      = 0
+        self.retries       = 0
+        self.batches       = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ── Producer side ────────────────────────────────────────────────────────
+
+    def submit(self, company_id: str, rows: list[dict], timeout: float = PERSIST_ENQUEUE_TIMEOUT) -> int:
+        """
+        Queue rows for persistence. Returns how many were accepted; the rest
+        were rejected because the queue stayed full for `timeout` seconds.
+        """
+        deadline   = time.monotonic() + timeout
+        submission = next(self._submissions)
+        accepted   = 0
+        for row in rows:
+            try:
+                self._queue.put((company_id, submission, row), timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+            accepted += 1
+
+        with self._lock:
+            self.enqueued += accepted
+            self.rejected += len(rows) - accepted
+        if accepted < len(rows):
+            logger.warning(
+                "Persistence queue full: dropped %d of %d rows for company %s",
+                len(rows) - accepted, len(rows), company_id,
+            )
+        return accepted
+
+    # ── Lifecycle ────────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        logger.info(
+            "Write-behind persistence started (capacity=%d, batch=%d, flush=%.1fs).",
+            self.capacity, self.batch_size, self.flush_seconds,
+        )
+
+    def stop(self, timeout: float = PERSIST_DRAIN_SECONDS) -> None:
+        """Flush everything already queued, then stop the worker."""
+        if not self.running:
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(max(0.0, deadline - time.monotonic()))
+        if self._thread.is_alive():
+            logger.error(
+                "Write-behind drain timed out after %.0fs with %d rows still queued.",
+                timeout, self._queue.qsize(),
+            )
+        else:
+            logger.info("Write-behind persistence drained and stopped.")
+        self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running":    self.running,
+                "depth":      self._queue.qsize(),
+                "held":       len(self._held),
+                "capacity":   self.capacity,
+                "enqueued":   self.enqueued,
+                "persisted":  self.persisted,
+                "failed":     self.failed,
+                "rejected":   self.rejected,
+                "retries":    self.retries,
+                "batches":    self.batches,
+                "last_error": self.last_error,
+            }
+
+    # ── Consumer side ────────────────────────────────────────────────────────
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            try:
+                # Held rows are retried at least every flush window.
+                item = self._queue.get(timeout=self.flush_seconds if self._held else None)
+            except queue.Empty:
+                self._flush([])
+                continue
+            if item is _STOP:
+                break
+            batch    = [item]
+            deadline = time.monotonic() + self.flush_seconds
+
+            # ── Collect until the batch is full or the flush window closes ──
+            while len(batch) < self.batch_size:
+                try:
+                    if stopping:
+                        item = self._queue.get_nowait()
+                    else:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    # Keep draining without waiting for the flush window.
+                    stopping = True
+                    continue
+                batch.append(item)
+
+            self._flush(batch)
+
+        # Anything that arrived after the sentinel still gets written.
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        for start in range(0, len(leftover), self.batch_size):
+            self._flush(leftover[start:start + self.batch_size])
+        if self._held:
+            self._flush([], final=True)
+
+    def _flush(self, batch: list[tuple[str, int, dict]], final: bool = False) -> None:
+        batch, self._held = self._held + batch, []
+        by_company: dict[str, list[tuple[int, dict]]] = defaultdict(list)
+        for company_id, submission, row in batch:
+            by_company[company_id].append((submission, row))
+
+        for company_id, items in by_company.items():
+            rows  = [row for _, row in items]
+            error = self._write(company_id, rows, self.max_retries)
+            if error is None:
+                continue
+            if not isinstance(error, _ROW_ERRORS):
+                self._hold(company_id, items, final)
+                continue
+
+            # Isolate the failure: each request on its own, then row by row.
+            by_submission: dict[int, list[dict]] = defaultdict(list)
+            for submission, row in items:
+                by_submission[submission].append(row)
+            lost = 0
+            for submission, group in by_submission.items():
+                if len(by_submission) > 1:
+                    error = self._write(company_id, group)
+                    if error is None:
+                        continue
+                    if not isinstance(error, _ROW_ERRORS):
+                        self._hold(company_id, [(submission, row) for row in group], final)
+                        continue
+                for row in group:
+                    error = self._write(company_id, [row])
+                    if error is None:
+                        continue
+                    if isinstance(error, _ROW_ERRORS):
+                        lost += 1
+                    else:
+                        self._hold(company_id, [(submission, row)], final)
+            with self._lock:
+                self.failed += lost
+            if lost:
+                logger.error(
+                    "Failed to persist %d of %d transactions for company %s: %s",
+                    lost, len(rows), company_id, self.last_error,
+                )
+
+    def _hold(self, company_id: str, items: list[tuple[int, dict]], final: bool) -> None:
+        """Keep rows an outage kept from being written for the next flush (or give up on the last one)."""
+        self._held.extend((company_id, submission, row) for submission, row in items)
+        overflow = len(self._held) if final else len(self._held) - self.capacity
+        if overflow <= 0:
+            return
+        dropped, self._held = self._held[:overflow], self._held[overflow:]
+        with self._lock:
+            self.failed += len(dropped)
+        logger.error(
+            "Dropped %d held transactions for company %s: %s",
+            len(dropped), company_id, self.last_error,
+        )
+
+    def _write(self, company_id: str, rows: list[dict], retries: int = 0) -> Optional[Exception]:
+        """One writer call, retried with backoff. Returns the last error, or None once written."""
+        for attempt in range(retries + 1):
+            try:
+                saved = self._writer(company_id, rows)
+            except Exception as exc:
+                with self._lock:
+                    self.last_error = str(exc)
+                    if attempt < retries:
+                        self.retries += 1
+                if attempt < retries:
+                    time.sleep(min(0.5 * 2 ** attempt, 10.0))
+                    continue
+                logger.warning(
+                    "Writing %d transactions for company %s failed after %d attempts: %s",
+                    len(rows), company_id, attempt + 1, exc,
+                )
+                return exc
+            with self._lock:
+                self.persisted += len(rows)
+                self.batches   += 1
+            logger.info("Persisted %d transactions for company %s", saved, company_id)
+            return None
+        return None
+
+
+# Process-wide queue, started and drained by the FastAPI lifespan.
+write_behind = WriteBehindQueue()